@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+# Allow running benchmarks without installing the package (src-layout).
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+
+def synthetic_content_list(n: int) -> list:
+    """A content_list of n elements with MinerU's mix of element types, 25 per page."""
+    items = []
+    for i in range(n):
+        page = i // 25
+        kind = i % 20
+        if kind == 0:
+            item = {"type": "text", "text": f"Section {i // 20}", "text_level": 1 + i % 3}
+        elif kind == 7:
+            item = {
+                "type": "table",
+                "img_path": f"images/t{i}.jpg",
+                "table_caption": [f"Table {i}"],
+                "table_body": "<table>" + "<tr><td>1</td><td>2</td></tr>" * 5 + "</table>",
+            }
+        elif kind == 13:
+            item = {"type": "image", "img_path": f"images/f{i}.jpg", "image_caption": [f"Fig {i}"]}
+        elif kind == 17:
+            item = {"type": "equation", "text": "$$E = mc^2 + \\sum_{k=0}^{n} x_k$$"}
+        elif kind == 19:
+            item = {"type": "page_footnote", "text": f"Footnote {i} & <note>"}
+        else:
+            item = {"type": "text", "text": f"Paragraph {i} with <markup> & words. " * 8}
+        item["page_idx"] = page
+        item["bbox"] = [50, 50 + kind * 30, 550, 75 + kind * 30]
+        items.append(item)
+    return items
+
+
+@pytest.fixture
+def content_list(request) -> list:
+    return synthetic_content_list(request.param)
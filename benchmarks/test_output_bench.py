@@ -0,0 +1,85 @@
+import io
+import itertools
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path: Path):
+    from p2r.mineru import MinerUClient
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return MinerUClient(api_token="bench", api_base_url="http://localhost/api/v4")
+
+
+def test_organize_output_dir(benchmark, client, tmp_path: Path):
+    """A result directory with 5000 entries, a fifth of them raw artifacts."""
+    rounds = itertools.count()
+
+    def setup():
+        out = tmp_path / f"out{next(rounds)}"
+        out.mkdir()
+        for i in range(5000):
+            name = f"doc{i}_content_list.json" if i % 5 == 0 else f"page{i}.md"
+            (out / name).write_bytes(b"{}")
+        return (out,), {}
+
+    benchmark.pedantic(client._organize_output_dir, setup=setup, rounds=5)
+
+
+def test_safe_move_to_dir_with_conflicts(benchmark, client, tmp_path: Path):
+    """Moving into a directory that already holds 500 versions of the same name."""
+    dest = tmp_path / "raw"
+    dest.mkdir()
+    (dest / "layout.json").write_bytes(b"{}")
+    for n in range(2, 501):
+        (dest / f"layout_v{n}.json").write_bytes(b"{}")
+    src = tmp_path / "layout.json"
+
+    def setup():
+        (dest / "layout_v501.json").unlink(missing_ok=True)
+        src.write_bytes(b"{}")
+        return (src, dest), {}
+
+    result = benchmark.pedantic(client._safe_move_to_dir, setup=setup, rounds=20)
+    assert result.name == "layout_v501.json"
+
+
+@pytest.fixture(scope="module")
+def large_zip() -> bytes:
+    """About 40 MB: 2000 compressible JSON pages plus 20 MB of incompressible images."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        page = b'{"type": "text", "text": "' + b"lorem ipsum " * 800 + b'"}'
+        for i in range(2000):
+            zf.writestr(f"pages/page{i:04d}.json", page)
+        for i in range(20):
+            zf.writestr(f"images/{i:02d}.jpg", os.urandom(1024 * 1024), zipfile.ZIP_STORED)
+    return buf.getvalue()
+
+
+def test_download_result_extracts_large_zip(benchmark, client, monkeypatch, tmp_path, large_zip):
+    class Response:
+        status_code = 200
+        content = large_zip
+
+    monkeypatch.setattr("p2r.mineru.requests.get", lambda url, timeout=None: Response())
+    rounds = itertools.count()
+
+    def setup():
+        return ("http://localhost/result.zip", tmp_path / f"out{next(rounds)}"), {}
+
+    out = benchmark.pedantic(client.download_result, setup=setup, rounds=5)
+    assert len(list((out / "pages").iterdir())) == 2000
+
+
+def test_load_config(benchmark, monkeypatch, tmp_path: Path):
+    from p2r.config import load_config
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    load_config()  # Creates the file, so the benchmark measures the steady state
+
+    assert benchmark(load_config)["mineru"]
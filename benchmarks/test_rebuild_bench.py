@@ -0,0 +1,18 @@
+import pytest
+
+
+SIZES = [10, 1_000, 100_000]
+
+
+@pytest.mark.parametrize("content_list", SIZES, indirect=True)
+def test_rebuild_markdown(benchmark, content_list):
+    from p2r.rebuild import rebuild_markdown
+
+    assert benchmark(rebuild_markdown, content_list)
+
+
+@pytest.mark.parametrize("content_list", SIZES, indirect=True)
+def test_rebuild_html(benchmark, content_list):
+    from p2r.rebuild import rebuild_html
+
+    assert benchmark(rebuild_html, content_list)
@@ -3,3 +3,15 @@
 __version__ = "0.1.0"
 __author__ = "Your Name"
 __email__ = "your.email@example.com"
+
+__all__ = ["Completed", "Event", "Failed", "Progress", "convert_many"]
+
+
+def __getattr__(name):
+    # Imported on first use: p2r.bulk pulls in the client and every module it drives,
+    # which `import p2r.<module>` should not pay for.
+    if name in __all__:
+        from . import bulk
+
+        return getattr(bulk, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,309 @@
+"""p2r-bench: drive concurrent conversions through the real client, offline.
+
+Starts a `FakeMinerU` server on localhost, converts the same PDF `documents` times with
+`concurrency` threads sharing one `MinerUClient`, and reports throughput, latency
+percentiles, peak RSS and the requests the server saw.
+"""
+
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+from rich.console import Console
+
+from .fakeserver import FakeMinerU
+from .metrics import Metrics
+from .mineru import MinerUClient, MinerUError
+from .profiling import max_rss
+from .timing import write_report
+
+
+# Smallest well-formed one-page PDF; padded with a comment to reach --pdf-size.
+SAMPLE_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of values; 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))  # ceil without floats
+    return ordered[min(int(rank), len(ordered)) - 1]
+
+
+def run_bench(
+    documents: int = 20,
+    concurrency: int = 4,
+    workdir: Optional[Path] = None,
+    poll_interval: float = 0.05,
+    pdf_size: int = 0,
+    server_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Convert documents against a local fake MinerU and measure the run.
+
+    Args:
+        documents: Number of conversions
+        concurrency: Conversions in flight at once
+        workdir: Where outputs go (default: a temporary directory, removed afterwards)
+        poll_interval: Client poll interval in seconds
+        pdf_size: Size of the uploaded PDF in bytes (at least the built-in sample)
+        server_options: Keyword arguments for FakeMinerU (latency, queue_depth, ...)
+
+    Returns:
+        Report with counts, wall time, throughput, latency percentiles, peak RSS and
+        per-endpoint request counts
+    """
+    if workdir is None:
+        with tempfile.TemporaryDirectory(prefix="p2r_bench_") as tmp:
+            return run_bench(
+                documents, concurrency, Path(tmp), poll_interval, pdf_size, server_options
+            )
+
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    pdf = workdir / "bench.pdf"
+    pdf.write_bytes(SAMPLE_PDF + b"%" * max(0, pdf_size - len(SAMPLE_PDF)))
+
+    with FakeMinerU(**(server_options or {})) as server, MinerUClient(
+        api_token="bench", api_base_url=server.api_base_url
+    ) as client:
+        client.poll_interval = poll_interval
+        client.metrics = Metrics()  # Keep configured exporters out of the measurement
+        client.usage_ledger = None  # Fake pages must not count against the real quota
+
+        def convert(n: int) -> Tuple[bool, float, str]:
+            started = time.perf_counter()
+            try:
+                for _ in client.parse_pdf(
+                    pdf,
+                    workdir / f"doc-{n:05d}",
+                    model_version="pipeline",
+                    extra_formats=["html"],
+                    raw_compression="none",
+                    image_store="",
+                    optimize_images=False,
+                    search_index="",
+                    output_format="directory",
+                    upload_images=False,
+                    extract_metadata=False,
+                ):
+                    pass
+            except MinerUError as e:
+                return False, time.perf_counter() - started, str(e).split(":")[0]
+            return True, time.perf_counter() - started, ""
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            results = list(pool.map(convert, range(documents)))
+        wall = time.perf_counter() - started
+        counts = dict(sorted(server.counts.items()))
+        pages = server.pages
+
+    latencies = [seconds for ok, seconds, _ in results if ok]
+    completed = len(latencies)
+    return {
+        "documents": documents,
+        "completed": completed,
+        "failed": documents - completed,
+        "errors": dict(Counter(error for ok, _, error in results if not ok).most_common()),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 6),
+        "docs_per_sec": round(completed / wall, 3) if wall else 0.0,
+        "pages_per_sec": round(completed * pages / wall, 3) if wall else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 50), 6),
+            "p99": round(percentile(latencies, 99), 6),
+            "max": round(max(latencies, default=0.0), 6),
+        },
+        "peak_rss_bytes": max_rss(),
+        "requests": counts,
+    }
+
+
+@click.command()
+@click.option(
+    "-n",
+    "--documents",
+    type=int,
+    default=20,
+    show_default=True,
+    help="Number of conversions",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Conversions in flight at once",
+)
+@click.option(
+    "--pages",
+    type=int,
+    default=10,
+    show_default=True,
+    help="Pages per document",
+)
+@click.option(
+    "--page-time",
+    type=float,
+    default=0.01,
+    show_default=True,
+    help="Simulated parse seconds per page",
+)
+@click.option(
+    "--pending-time",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Minimum simulated queue seconds per task",
+)
+@click.option(
+    "--queue-depth",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Tasks the fake service parses at once (0 = unlimited)",
+)
+@click.option(
+    "--latency",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Seconds added to every response",
+)
+@click.option(
+    "--zip-size",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Minimum result ZIP size in bytes",
+)
+@click.option(
+    "--pdf-size",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Uploaded PDF size in bytes",
+)
+@click.option(
+    "--error-rate",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Fraction of API requests failing with HTTP 500",
+)
+@click.option(
+    "--throttle-rate",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Fraction of API requests failing with HTTP 429",
+)
+@click.option(
+    "--fail-rate",
+    type=float,
+    default=0.0,
+    show_default=True,
+    help="Fraction of tasks ending in state failed",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=0.05,
+    show_default=True,
+    help="Client poll interval in seconds",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Fault-injection seed",
+)
+@click.option(
+    "--workdir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Keep outputs here (default: temporary directory)",
+)
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Also write the report as JSON",
+)
+def main(
+    documents: int,
+    concurrency: int,
+    pages: int,
+    page_time: float,
+    pending_time: float,
+    queue_depth: int,
+    latency: float,
+    zip_size: int,
+    pdf_size: int,
+    error_rate: float,
+    throttle_rate: float,
+    fail_rate: float,
+    poll_interval: float,
+    seed: int,
+    workdir: Optional[Path],
+    json_path: Optional[Path],
+):
+    """Benchmark concurrent conversions against a local fake MinerU service.
+
+    Example:
+        p2r-bench -n 100 -c 8 --queue-depth 4 --zip-size 5000000
+    """
+    console = Console()
+    server_options = {
+        "pages": pages,
+        "page_time": page_time,
+        "pending_time": pending_time,
+        "queue_depth": queue_depth,
+        "latency": latency,
+        "zip_size": zip_size,
+        "error_rate": error_rate,
+        "throttle_rate": throttle_rate,
+        "fail_rate": fail_rate,
+        "seed": seed,
+    }
+    report = run_bench(documents, concurrency, workdir, poll_interval, pdf_size, server_options)
+    report["server"] = server_options
+
+    latencies = report["latency_seconds"]
+    console.print(
+        f"[bold]Documents:[/bold] {report['completed']}/{report['documents']} completed "
+        f"({report['failed']} failed), concurrency {report['concurrency']}"
+    )
+    console.print(
+        f"[bold]Throughput:[/bold] {report['docs_per_sec']} docs/s, "
+        f"{report['pages_per_sec']} pages/s in {report['wall_seconds']:.2f}s"
+    )
+    console.print(
+        f"[bold]Latency:[/bold] p50 {latencies['p50']:.3f}s, p99 {latencies['p99']:.3f}s, "
+        f"max {latencies['max']:.3f}s"
+    )
+    console.print(f"[bold]Peak RSS:[/bold] {report['peak_rss_bytes'] / 1024 / 1024:.1f} MiB")
+    requests_seen = ", ".join(f"{k} {v}" for k, v in report["requests"].items())
+    console.print(f"[bold]Requests:[/bold] {requests_seen}")
+    for error, count in report["errors"].items():
+        console.print(f"  [red]{count}x[/red] {error}")
+    if json_path is not None:
+        write_report(json_path, report)
+        console.print(f"Report: {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Streaming bulk conversion with a bounded number of documents in flight.
+
+`convert_many` consumes its sources lazily, so it can be fed from a generator or a queue
+of millions of items, and yields an event object per progress step and per finished
+document, in completion order. A document counts as in flight from the moment its
+source is taken from the input until the consumer has received its final event: when
+the consumer falls behind, no further documents are uploaded.
+
+    for event in p2r.convert_many(paths, "./out", max_in_flight=8):
+        if isinstance(event, p2r.Completed):
+            handle(event.output_dir)
+        elif isinstance(event, p2r.Failed):
+            log(event.source, event.error)
+"""
+
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .mineru import MinerUClient, Source
+
+
+# Seconds between checks for cancellation while a worker waits on the consumer.
+_WAIT = 0.1
+
+
+class Event:
+    """An event yielded by convert_many.
+
+    Attributes:
+        source: The source as taken from the input
+        part: Page range ("1-600") of a document split into parts, else None
+    """
+
+    __slots__ = ("source", "part")
+
+    def __init__(self, source: Source, part: Optional[str] = None):
+        self.source = source
+        self.part = part
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in _fields(type(self)))
+        return f"{type(self).__name__}({fields})"
+
+
+class Progress(Event):
+    """A MinerU task state change ("waiting-file", "pending", "running", "converting")."""
+
+    __slots__ = ("state", "extracted_pages", "total_pages")
+
+    def __init__(
+        self,
+        source: Source,
+        part: Optional[str],
+        state: str,
+        extracted_pages: Optional[int] = None,
+        total_pages: Optional[int] = None,
+    ):
+        super().__init__(source, part)
+        self.state = state
+        self.extracted_pages = extracted_pages
+        self.total_pages = total_pages
+
+
+class Completed(Event):
+    """A document (or part) converted and committed to output_dir."""
+
+    __slots__ = ("output_dir", "timings")
+
+    def __init__(
+        self, source: Source, part: Optional[str], output_dir: Path, timings: Dict[str, Any]
+    ):
+        super().__init__(source, part)
+        self.output_dir = output_dir
+        self.timings = timings
+
+
+class Failed(Event):
+    """A document (or part) that could not be converted."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, source: Source, part: Optional[str], error: str):
+        super().__init__(source, part)
+        self.error = error
+
+
+def _fields(cls: type) -> Iterator[str]:
+    for klass in reversed(cls.__mro__):
+        yield from getattr(klass, "__slots__", ())
+
+
+def _event(update: Dict[str, Any]) -> Event:
+    """Event for one parse_batch update."""
+    source, part, state = update["source"], update.get("part"), update["state"]
+    if state == "completed":
+        return Completed(source, part, Path(update["output_dir"]), update["timings"])
+    if state == "failed":
+        return Failed(source, part, update["error"])
+    return Progress(
+        source, part, state, update.get("extracted_pages"), update.get("total_pages")
+    )
+
+
+# Queue items besides events: a worker finished a source, or taking one failed.
+_DONE = object()
+
+
+class _InputError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def convert_many(
+    sources: Iterable[Source],
+    output_dir: Path,
+    max_in_flight: int = 4,
+    client: Optional[MinerUClient] = None,
+    progress: bool = True,
+    **options: Any,
+) -> Iterator[Event]:
+    """Convert local files and/or URLs, yielding events as documents finish.
+
+    Each source goes through MinerUClient.parse_batch on its own (pre-flight, splitting
+    of long PDFs into parts, output_dir/<name> naming), in up to max_in_flight worker
+    threads sharing one client. Sources are taken from the input only when a slot is
+    free, and a slot is freed only once the consumer has received the document's final
+    event, so a slow consumer stops further uploads. Closing the generator early stops
+    taking new sources and abandons the documents in flight at their next status poll;
+    only a document already being downloaded is still committed before close() returns.
+
+    Args:
+        sources: Iterable of local paths and http(s) URLs, consumed lazily
+        output_dir: Parent directory of the per-document outputs
+        max_in_flight: Documents being converted or awaiting the consumer at once
+        client: Client to use (default: one configured from ~/.p2r_config.json, closed
+            when the generator finishes)
+        progress: Also yield Progress events, not just Completed and Failed
+        **options: Passed on to MinerUClient.parse_batch (model_version, extra_formats,
+            raw_compression, image_store, optimize_images, search_index, output_format,
+            upload_images, extract_metadata)
+
+    Yields:
+        Progress, Completed and Failed events; every document (or part of a split one)
+        ends with exactly one Completed or Failed event
+
+    Raises:
+        ValueError: If max_in_flight is less than 1
+        Exception: Whatever iterating sources raises, once the documents in flight have
+            finished
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    owned = client is None
+    if client is None:
+        client = MinerUClient()
+    # Progress updates per document are bounded by polling, so this only smooths bursts.
+    events: "queue.Queue[Any]" = queue.Queue(maxsize=4 * max_in_flight)
+    slots = threading.Semaphore(max_in_flight)
+    stop = threading.Event()
+    exhausted = threading.Event()
+    source_lock = threading.Lock()
+    iterator = iter(sources)
+
+    def put(item: Any) -> bool:
+        """Hand item to the consumer; False once the generator is closed."""
+        while not stop.is_set():
+            try:
+                events.put(item, timeout=_WAIT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def convert(source: Source) -> bool:
+        updates = client.parse_batch([source], Path(output_dir), **options)
+        try:
+            for update in updates:
+                # parse_batch yields on every poll: stop polling once the generator is
+                # closed, whether or not this update would be handed over.
+                if stop.is_set():
+                    return False
+                if update["state"] in ("completed", "failed") or progress:
+                    if not put(_event(update)):
+                        return False
+        except Exception as e:
+            # Anything a document raises is its failure, never the whole stream's.
+            return put(Failed(source, None, str(e)))
+        finally:
+            updates.close()
+        return True
+
+    def work() -> None:
+        while True:
+            # Wait for the consumer to free a slot before taking the next source.
+            while not slots.acquire(timeout=_WAIT):
+                if stop.is_set():
+                    return
+            with source_lock:
+                if stop.is_set() or exhausted.is_set():
+                    return
+                try:
+                    source = next(iterator)
+                except StopIteration:
+                    exhausted.set()
+                    return
+                except Exception as e:
+                    exhausted.set()
+                    put(_InputError(e))
+                    return
+            if not convert(source) or not put(_DONE):
+                return
+
+    workers = [threading.Thread(target=work, daemon=True) for _ in range(max_in_flight)]
+    for worker in workers:
+        worker.start()
+
+    input_error = None
+    try:
+        while True:
+            try:
+                item = events.get(timeout=_WAIT)
+            except queue.Empty:
+                # Once every worker has exited nothing more can arrive.
+                if not any(worker.is_alive() for worker in workers) and events.empty():
+                    break
+                continue
+            if item is _DONE:
+                slots.release()
+            elif isinstance(item, _InputError):
+                input_error = item.error
+            else:
+                yield item
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        if owned:
+            client.close()
+    if input_error is not None:
+        raise input_error
@@ -0,0 +1,397 @@
+"""Single-file document bundles with random-access reads.
+
+A converted document normally explodes into full.md, full.html, an images/ folder and a
+raw/ folder; across a large library that means millions of small files for backups,
+rsync and inode budgets to deal with. With bundle output (`output.format = "bundle"`)
+the downloaded archive is instead written straight into one SQLite file, `<name>.p2r`:
+every file is a row (path, size, SHA-256, data), and the per-page byte ranges of the raw
+JSON artifacts (see p2r.pages) are stored next to them. The markdown, a single image or
+one page's raw JSON can then be read without unpacking anything, and `Bundle.export()`
+recreates the regular directory layout on demand.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .output import (
+    MANIFEST_NAME,
+    MANIFEST_VERSION,
+    commit_dir,
+    commit_file,
+    create_staging_dir,
+    discard_dir,
+    load_manifest,
+    write_manifest,
+)
+from .pages import (
+    ARTIFACT_KINDS,
+    PAGE_INDEX_NAME,
+    artifact_kind,
+    index_artifact,
+    write_page_index,
+)
+from .spatial import SPATIAL_INDEX_NAME, write_spatial_index
+from .storage import decompress_raw_bytes, split_compression
+
+
+BUNDLE_SUFFIX = ".p2r"
+BUNDLE_VERSION = 1
+
+# PRAGMA application_id ("p2rb"), so bundles can be told apart from other SQLite files.
+APPLICATION_ID = 0x70327262
+
+# Derived sidecars: not stored in bundles, rebuilt by export().
+_DERIVED = {f"raw/{PAGE_INDEX_NAME}", f"raw/{SPATIAL_INDEX_NAME}", MANIFEST_NAME}
+
+_SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE page_runs (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    kind TEXT NOT NULL,
+    page_idx INTEGER NOT NULL,
+    start_byte INTEGER NOT NULL,
+    end_byte INTEGER NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX page_runs_page ON page_runs(kind, page_idx);
+"""
+
+
+def is_bundle(path: Path) -> bool:
+    """Whether path is a p2r bundle (checked from the SQLite header, without opening it)."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(72)
+    except OSError:
+        return False
+    return (
+        header[:16] == b"SQLite format 3\x00"
+        and int.from_bytes(header[68:72], "big") == APPLICATION_ID
+    )
+
+
+def bundle_path(output_dir: Path) -> Path:
+    """Bundle file that stands in for a document directory (output/paper -> output/paper.p2r)."""
+    output_dir = Path(output_dir)
+    return output_dir.with_name(output_dir.name + BUNDLE_SUFFIX)
+
+
+def _member_path(name: str) -> Optional[str]:
+    """Normalised relative path of an archive member, or None for directories and paths
+    that would escape the document."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or ".." in parts or name.endswith("/"):
+        return None
+    return "/".join(parts)
+
+
+def iter_zip(zip_path: Path) -> Iterator[Tuple[str, bytes]]:
+    """Yield (relative path, data) for every file in a ZIP archive, one at a time."""
+    import zipfile
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            path = _member_path(info.filename)
+            if path is not None:
+                yield path, zf.read(info)
+
+
+def _page_runs(path: str, data: bytes) -> Iterator[Tuple[str, int, int, int, int]]:
+    """(kind, page_idx, start, end, count) for a raw JSON artifact; nothing otherwise.
+
+    Byte ranges refer to the decompressed stream of compressed artifacts, as in
+    raw/page_index.json.
+    """
+    pure = PurePosixPath(path)
+    if len(pure.parts) != 2 or pure.parts[0] != "raw":
+        return
+    name, method = split_compression(pure.name)
+    kind = artifact_kind(name)
+    if kind is None:
+        return
+    try:
+        pages = index_artifact(decompress_raw_bytes(data, method), kind)
+    except (ValueError, OSError):
+        return  # Not valid JSON of the expected shape: readable, just not by page
+    for page_idx, runs in pages.items():
+        for start, end, count in runs:
+            yield kind, int(page_idx), start, end, count
+
+
+def write_bundle(
+    path: Path, entries: Iterable[Tuple[str, bytes]], source: Optional[str] = None
+) -> Dict[str, int]:
+    """Write a new bundle from (relative POSIX path, data) pairs.
+
+    entries is consumed lazily, so only one file is held in memory at a time. Derived
+    sidecars (manifest.json, raw/page_index.json, raw/spatial_index.json) are skipped:
+    the bundle carries their information itself and export() rebuilds them.
+
+    Args:
+        path: Bundle file to create (replaced if it exists)
+        entries: Files of the document
+        source: Recorded as the document's source (see p2r.output.build_manifest)
+
+    Returns:
+        {"files": number of files, "bytes": their total size}
+    """
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(str(path))
+    files = total = 0
+    try:
+        # The bundle is committed by rename once complete, so no journal is needed.
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(f"PRAGMA application_id={APPLICATION_ID}")
+        conn.execute(f"PRAGMA user_version={BUNDLE_VERSION}")
+        conn.executescript(_SCHEMA)
+        with conn:
+            for rel_path, data in entries:
+                if rel_path in _DERIVED:
+                    continue
+                cursor = conn.execute(
+                    "INSERT INTO files (path, size, sha256, data) VALUES (?, ?, ?, ?)",
+                    (rel_path, len(data), hashlib.sha256(data).hexdigest(), data),
+                )
+                conn.executemany(
+                    "INSERT INTO page_runs VALUES (?, ?, ?, ?, ?, ?)",
+                    ((cursor.lastrowid, *run) for run in _page_runs(rel_path, data)),
+                )
+                files += 1
+                total += len(data)
+            meta = {
+                "version": str(MANIFEST_VERSION),
+                "source": source,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+    finally:
+        conn.close()
+    return {"files": files, "bytes": total}
+
+
+def _iter_dir(doc_dir: Path) -> Iterator[Tuple[str, bytes]]:
+    for root, dirs, names in os.walk(doc_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = Path(root) / name
+            if path.exists():  # Skip dangling symlinks
+                yield path.relative_to(doc_dir).as_posix(), path.read_bytes()
+
+
+def pack_dir(doc_dir: Path, dest: Optional[Path] = None) -> Path:
+    """Pack an existing document directory into a bundle.
+
+    Symlinked images (see p2r.imagestore) are stored by content. The directory is left
+    untouched.
+
+    Args:
+        doc_dir: Document output directory
+        dest: Bundle to write; defaults to doc_dir with the .p2r suffix. If it exists,
+            the next free sibling (name_v2.p2r, ...) is used
+
+    Returns:
+        Path to the committed bundle
+    """
+    doc_dir = Path(doc_dir)
+    dest = Path(dest) if dest is not None else bundle_path(doc_dir)
+    manifest = load_manifest(doc_dir) or {}
+    staging = create_staging_dir(dest)
+    try:
+        tmp = staging / dest.name
+        write_bundle(tmp, _iter_dir(doc_dir), source=manifest.get("source"))
+        return commit_file(tmp, dest)
+    finally:
+        discard_dir(staging)
+
+
+class Bundle:
+    """Read-only view of a bundle.
+
+    Example:
+        with Bundle("papers/paper.p2r") as bundle:
+            markdown = bundle.markdown()
+            figure = bundle.image("images/fig1.jpg")
+            page = bundle.read_pages([3], kind="layout")
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if not is_bundle(self.path):
+            raise ValueError(f"Not a p2r bundle: {self.path}")
+        self.conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != BUNDLE_VERSION:
+            self.conn.close()
+            raise ValueError(f"Unsupported bundle version {version}: {self.path}")
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "Bundle":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @property
+    def source(self) -> Optional[str]:
+        return self.meta.get("source")
+
+    def files(self) -> List[Dict[str, Any]]:
+        """[{"path", "size", "sha256"}] of every stored file, sorted by path."""
+        rows = self.conn.execute("SELECT path, size, sha256 FROM files ORDER BY path")
+        return [{"path": p, "size": size, "sha256": sha} for p, size, sha in rows]
+
+    def manifest(self) -> Dict[str, Any]:
+        """The document's manifest, as p2r.output.build_manifest would describe it."""
+        return {
+            "version": int(self.meta.get("version") or MANIFEST_VERSION),
+            "source": self.source,
+            "created_at": self.meta.get("created_at"),
+            "files": self.files(),
+        }
+
+    def _file_id(self, path: str) -> int:
+        row = self.conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No such file in {self.path}: {path}")
+        return row[0]
+
+    def read(self, path: str) -> bytes:
+        """Contents of one stored file (path relative to the document, e.g. "full.md").
+
+        Raises:
+            FileNotFoundError: If the bundle has no such file
+        """
+        row = self.conn.execute("SELECT data FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No such file in {self.path}: {path}")
+        return bytes(row[0])
+
+    def markdown(self) -> str:
+        """The document's markdown (full.md, or the first top-level .md file)."""
+        row = self.conn.execute(
+            "SELECT path FROM files WHERE path LIKE '%.md' AND path NOT LIKE '%/%' "
+            "ORDER BY path != 'full.md', path LIMIT 1"
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No markdown in {self.path}")
+        return self.read(row[0]).decode("utf-8")
+
+    def image(self, name: str) -> bytes:
+        """One image, by its path ("images/fig1.jpg") or file name ("fig1.jpg")."""
+        return self.read(name if "/" in name else f"images/{name}")
+
+    def _read_range(self, file_id: int, start: int, end: int) -> bytes:
+        if hasattr(self.conn, "blobopen"):  # Python 3.11+: incremental blob I/O
+            with self.conn.blobopen("files", "data", file_id, readonly=True) as blob:
+                blob.seek(start)
+                return blob.read(end - start)
+        row = self.conn.execute(
+            "SELECT substr(data, ?, ?) FROM files WHERE id = ?", (start + 1, end - start, file_id)
+        ).fetchone()
+        return bytes(row[0])
+
+    def read_pages(
+        self, page_indices: Iterable[int], kind: str = "content_list"
+    ) -> List[Dict[str, Any]]:
+        """Read selected pages of a raw artifact, decoding only their byte ranges.
+
+        Same arguments and result as p2r.pages.read_pages.
+
+        Raises:
+            FileNotFoundError: If the bundle has no indexable artifact of that kind
+        """
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+        row = self.conn.execute(
+            "SELECT f.id, f.path FROM files f JOIN page_runs r ON r.file_id = f.id "
+            "WHERE r.kind = ? ORDER BY f.path LIMIT 1",
+            (kind,),
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No indexed {kind} artifact in {self.path}")
+        file_id, path = row
+
+        method = split_compression(path)[1]
+        if method is not None:
+            # Compressed streams cannot be seeked: decompress once, decode only the ranges.
+            data = decompress_raw_bytes(self.read(path), method)
+
+            def read_range(start: int, end: int) -> bytes:
+                return data[start:end]
+
+        else:
+
+            def read_range(start: int, end: int) -> bytes:
+                return self._read_range(file_id, start, end)
+
+        results = []
+        for page_idx in page_indices:
+            runs = self.conn.execute(
+                "SELECT start_byte, end_byte FROM page_runs "
+                "WHERE file_id = ? AND kind = ? AND page_idx = ? ORDER BY start_byte",
+                (file_id, kind, page_idx),
+            ).fetchall()
+            if not runs:
+                continue
+            if kind == "content_list":
+                content: Any = []
+                for start, end in runs:
+                    content.extend(json.loads(b"[" + read_range(start, end) + b"]"))
+            else:
+                content = json.loads(read_range(*runs[0]))
+            results.append({"page_idx": page_idx, "content": content})
+        return results
+
+    def export(self, dest: Optional[Path] = None) -> Path:
+        """Unpack into the regular directory layout, sidecar indexes and manifest included.
+
+        Args:
+            dest: Document directory to create; defaults to the bundle path without its
+                suffix. If it already holds files, the next free sibling (dest_v2, ...)
+                is used
+
+        Returns:
+            The committed directory
+
+        Raises:
+            ValueError: If a stored path is absolute or would escape the document
+        """
+        dest = Path(dest) if dest is not None else self.path.with_suffix("")
+        staging = create_staging_dir(dest)
+        try:
+            for rel_path, data in self.conn.execute("SELECT path, data FROM files"):
+                if _member_path(rel_path) != rel_path:
+                    raise ValueError(f"Unsafe path in {self.path}: {rel_path!r}")
+                target = staging.joinpath(*rel_path.split("/"))
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(data)
+            raw_dir = staging / "raw"
+            if raw_dir.is_dir():
+                write_page_index(raw_dir)
+                write_spatial_index(raw_dir)
+            write_manifest(staging, source=self.source)
+            return commit_dir(staging, dest)
+        except BaseException:
+            discard_dir(staging)
+            raise
@@ -0,0 +1,355 @@
+"""Heading-aware, size-bounded chunks of converted documents for retrieval pipelines.
+
+Elements are streamed from each document's content_list (see `pages.iter_content_list`),
+packed into chunks of at most `max_chars` characters that never straddle a heading, and
+written as JSON lines carrying the heading path and the page_idx/bbox of every element
+they came from. Footnotes stay in the chunk of the page they annotate.
+
+`export_chunks()` processes documents in parallel with a bounded number in flight and
+keeps a ledger next to the output (`<output>.done`) so an interrupted export resumes
+where it stopped: documents whose content_list hash is already recorded are skipped.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .pages import iter_content_list
+from .rebuild import find_content_list, find_documents, load_content_list
+from .search import element_text
+from .storage import open_raw
+
+
+LEDGER_SUFFIX = ".done"
+DEFAULT_MAX_CHARS = 2000
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+def document_hash(doc_dir: Path) -> str:
+    """SHA-256 of a document's (decompressed) content_list, used to resume exports."""
+    source = find_content_list(doc_dir)
+    if source is None:
+        raise FileNotFoundError(f"No content_list found in {doc_dir}")
+    h = hashlib.sha256()
+    with open_raw(source) as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _iter_elements(doc_dir: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    try:
+        yield from iter_content_list(doc_dir)
+    except FileNotFoundError:
+        # No usable page index (e.g. content_list at the document root): load it whole.
+        source = find_content_list(doc_dir)
+        if source is None:
+            raise
+        yield from enumerate(load_content_list(source))
+
+
+def _split_text(text: str, max_chars: int) -> List[str]:
+    """Split an over-long element at sentence, then word, then character boundaries."""
+    pieces: List[str] = []
+    current = ""
+    for unit in _SENTENCE_END_RE.split(text):
+        while len(unit) > max_chars:
+            cut = unit.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(unit[:cut].rstrip())
+            unit = unit[cut:].lstrip()
+        if current and len(current) + 1 + len(unit) > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {unit}" if current else unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_elements(
+    elements: Iterable[Tuple[int, Dict[str, Any]]],
+    max_chars: int = DEFAULT_MAX_CHARS,
+    include_footnotes: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Pack (index, element) pairs into chunks.
+
+    A heading closes the current chunk (unless it holds only headings), and an element
+    that would push a chunk past max_chars starts a new one. Elements longer than
+    max_chars are split across several chunks.
+
+    Yields:
+        {"text", "headings", "page_start", "page_end", "elements"} where elements lists
+        {"idx", "type", "page_idx", "bbox"} (plus "img_path" for images)
+    """
+    if max_chars < 1:
+        raise ValueError("max_chars must be positive")
+
+    headings: List[str] = []
+    texts: List[str] = []
+    refs: List[Dict[str, Any]] = []
+    size = 0
+    only_headings = True
+    chunk_headings: List[str] = []
+
+    def flush() -> Iterator[Dict[str, Any]]:
+        nonlocal texts, refs, size, only_headings
+        if texts:
+            pages = [r["page_idx"] for r in refs if r["page_idx"] is not None]
+            yield {
+                "text": "\n\n".join(texts),
+                "headings": list(chunk_headings),
+                "page_start": min(pages) if pages else None,
+                "page_end": max(pages) if pages else None,
+                "elements": refs,
+            }
+        texts, refs, size, only_headings = [], [], 0, True
+
+    for idx, item in elements:
+        item_type = item.get("type", "")
+        if item_type == "page_footnote" and not include_footnotes:
+            continue
+        text = element_text(item)
+        if not text:
+            continue
+        ref = {
+            "idx": idx,
+            "type": item_type,
+            "page_idx": item.get("page_idx"),
+            "bbox": item.get("bbox"),
+        }
+        if item.get("img_path"):
+            ref["img_path"] = item["img_path"]
+
+        level = item.get("text_level") if item_type == "text" else None
+        if level:
+            if not only_headings:
+                yield from flush()
+            del headings[level - 1 :]
+            headings.extend([""] * (level - 1 - len(headings)))
+            headings.append(text)
+            if not texts:
+                chunk_headings = [h for h in headings if h]
+        elif not texts:
+            chunk_headings = [h for h in headings if h]
+
+        for piece in _split_text(text, max_chars) if len(text) > max_chars else [text]:
+            if texts and size + 2 + len(piece) > max_chars:
+                yield from flush()
+                chunk_headings = [h for h in headings if h]
+            texts.append(piece)
+            refs.append(ref)
+            size += len(piece) + (2 if len(texts) > 1 else 0)
+            only_headings = only_headings and bool(level)
+    yield from flush()
+
+
+def chunk_document(
+    doc_dir: Path,
+    max_chars: int = DEFAULT_MAX_CHARS,
+    include_footnotes: bool = True,
+    doc_hash: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the chunk records of one document, ready to be written as JSON lines.
+
+    Records add "id" (stable: hash prefix + chunk number), "doc", "doc_sha256" and
+    "chunk" to the fields produced by chunk_elements().
+    """
+    doc_dir = Path(doc_dir)
+    doc_hash = doc_hash or document_hash(doc_dir)
+    chunks = chunk_elements(_iter_elements(doc_dir), max_chars, include_footnotes)
+    for n, chunk in enumerate(chunks):
+        record = {
+            "id": f"{doc_hash[:16]}-{n:05d}",
+            "doc": str(doc_dir),
+            "doc_sha256": doc_hash,
+            "chunk": n,
+        }
+        record.update(chunk)
+        yield record
+
+
+def _export_one(
+    job: Tuple[str, List[Any], int, bool, str]
+) -> Tuple[str, List[Any], str, str, int]:
+    """Worker: hash one document and write its chunks as JSON lines to a spool file.
+
+    Records are written as they are produced, so memory use is bounded by the largest
+    chunk rather than the document.
+    """
+    doc_dir, stat, max_chars, include_footnotes, spool_dir = job
+    doc_hash = document_hash(Path(doc_dir))
+    fd, spool = tempfile.mkstemp(suffix=".jsonl", dir=spool_dir)
+    count = 0
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            for chunk in chunk_document(Path(doc_dir), max_chars, include_footnotes, doc_hash):
+                f.write(json.dumps(chunk, ensure_ascii=False, separators=(",", ":")) + "\n")
+                count += 1
+    except BaseException:
+        os.unlink(spool)
+        raise
+    return doc_dir, stat, doc_hash, spool, count
+
+
+def _load_ledger(ledger_path: Path) -> List[Dict[str, Any]]:
+    """Entries of a ledger, up to a torn last line left by an interrupted run."""
+    entries = []
+    try:
+        with open(ledger_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not isinstance(entry, dict) or "sha256" not in entry or "offset" not in entry:
+                    break
+                entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def export_chunks(
+    roots: Iterable[Path],
+    output: Path,
+    max_chars: int = DEFAULT_MAX_CHARS,
+    include_footnotes: bool = True,
+    workers: int = 0,
+    resume: bool = True,
+) -> Dict[str, int]:
+    """Export the chunks of every document below roots to a JSONL file.
+
+    Each document is hashed and its chunks streamed to a spool file by its worker, then
+    appended to output once complete and recorded in the ledger `<output>.done` with its
+    content_list's stat and the output size at that point. On resume, output written
+    after the last ledger entry (a document interrupted mid-write) is truncated away.
+    Documents whose content_list stat is in the ledger are skipped without being read;
+    the others are chunked and dropped if their hash is already recorded. A document
+    that cannot be chunked is counted as failed and does not stop the export.
+
+    Args:
+        roots: Document directories or directories containing many
+        output: JSONL file to append to
+        max_chars: Maximum characters per chunk
+        include_footnotes: Keep page footnotes
+        workers: Chunking processes (0 = one per CPU, 1 = no pool)
+        resume: Continue a previous export instead of starting over
+
+    Returns:
+        Counts of {"documents", "chunks", "skipped", "failed"}
+    """
+    output = Path(output)
+    ledger_path = output.with_name(output.name + LEDGER_SUFFIX)
+    entries = _load_ledger(ledger_path) if resume else []
+    size = output.stat().st_size if output.exists() else 0
+    if entries and entries[-1]["offset"] > size:
+        entries = []  # Output replaced or truncated behind our back: start over
+    done = {entry["sha256"] for entry in entries}
+    done_stats = {tuple(entry["stat"]) for entry in entries if "stat" in entry}
+    offset = entries[-1]["offset"] if entries else 0
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # Rewrite the ledger without any torn tail, then drop output past its last entry.
+    tmp = ledger_path.with_name(ledger_path.name + ".tmp")
+    tmp.write_text(
+        "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries), encoding="utf-8"
+    )
+    os.replace(tmp, ledger_path)
+    out = open(output, "ab")
+    out.truncate(offset)
+    ledger = open(ledger_path, "a", encoding="utf-8")
+    # Workers spool each document here; it is appended to output in submission order.
+    spool_dir = tempfile.mkdtemp(prefix=f".{output.name}.", dir=output.parent)
+
+    stats = {"documents": 0, "chunks": 0, "skipped": 0, "failed": 0}
+
+    def jobs() -> Iterator[Tuple[str, List[Any], int, bool, str]]:
+        for root in roots:
+            for doc_dir in find_documents(Path(root)):
+                source = find_content_list(doc_dir)
+                try:
+                    if source is None:
+                        raise FileNotFoundError(f"No content_list found in {doc_dir}")
+                    st = source.stat()
+                except OSError:
+                    stats["failed"] += 1
+                    continue
+                # Unchanged since it was exported: skipped without hashing it again.
+                stat = [str(source.resolve()), st.st_size, st.st_mtime_ns]
+                if tuple(stat) in done_stats:
+                    stats["skipped"] += 1
+                    continue
+                yield str(doc_dir), stat, max_chars, include_footnotes, spool_dir
+
+    def record(result: Tuple[str, List[Any], str, str, int]) -> None:
+        doc_dir, stat, doc_hash, spool, count = result
+        if doc_hash in done:
+            # Touched or copied, but its content was already exported.
+            os.unlink(spool)
+            stats["skipped"] += 1
+            return
+        with open(spool, "rb") as f:
+            shutil.copyfileobj(f, out)
+        os.unlink(spool)
+        out.flush()
+        os.fsync(out.fileno())
+        entry = {
+            "sha256": doc_hash,
+            "doc": doc_dir,
+            "stat": stat,
+            "chunks": count,
+            "offset": out.tell(),
+        }
+        ledger.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        ledger.flush()
+        done.add(doc_hash)
+        stats["documents"] += 1
+        stats["chunks"] += count
+
+    try:
+        if workers == 1:
+            for job in jobs():
+                try:
+                    result = _export_one(job)
+                except Exception:
+                    stats["failed"] += 1
+                    continue
+                record(result)
+        else:
+            workers = workers or os.cpu_count() or 1
+            # At most this many documents are chunked or waiting to be written at once.
+            window = 2 * workers
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for job in jobs():
+                    pending.append(pool.submit(_export_one, job))
+                    if len(pending) >= window:
+                        _drain(pending.pop(0), record, stats)
+                for future in pending:
+                    _drain(future, record, stats)
+    finally:
+        out.close()
+        ledger.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+    return stats
+
+
+def _drain(future: Any, record: Any, stats: Dict[str, int]) -> None:
+    try:
+        result = future.result()
+    except Exception:
+        # Any error chunking one document (malformed content_list, unreadable file).
+        stats["failed"] += 1
+        return
+    record(result)
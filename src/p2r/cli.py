@@ -2,12 +2,20 @@
 
 import sys
 import tempfile
+import time
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 import click
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from . import __version__
-from .mineru import MinerUClient, MinerUError
+from .bundle import BUNDLE_SUFFIX, Bundle, is_bundle
+from .metrics import PrometheusMetrics
+from .mineru import MinerUClient, MinerUError, is_url, source_name
+from .output import manifest_paths
+from .preflight import plan_parts, preflight
+from .profiling import DEFAULT_TOP, MODES, Profiler, default_name
+from .quota import DAILY_PRIORITY_PAGES, configured_usage_path, estimate, pages_used
 from .config import get_config_path, get_api_token, update_token
 
 
@@ -16,18 +24,56 @@ console = Console()
 
 @click.group()
 @click.version_option(version=__version__)
-def main():
+@click.option(
+    "--profile",
+    type=click.Choice(list(MODES)),
+    default=None,
+    help="Profile the subcommand: cpu (cProfile + stack samples) or mem (tracemalloc)",
+)
+@click.option(
+    "--profile-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("."),
+    show_default=True,
+    help="Directory for profile output",
+)
+@click.option(
+    "--profile-top",
+    type=int,
+    default=DEFAULT_TOP,
+    show_default=True,
+    help="Entries in the profile summary",
+)
+@click.pass_context
+def main(ctx: click.Context, profile: Optional[str], profile_dir: Path, profile_top: int):
     """p2r - Convert PDF papers to Markdown using MinerU."""
-    pass
+    if profile is None:
+        return
+    profiler = Profiler(
+        profile,
+        profile_dir,
+        name=default_name(ctx.invoked_subcommand, profile),
+        top=profile_top,
+    )
+
+    def report() -> None:
+        console.print(f"\n[bold]Profile ({profile}):[/bold]")
+        for kind, path in profiler.files.items():
+            console.print(f"  {kind}: {path}")
+
+    # Closed after the subcommand returns (or exits): the profiler stops first, then reports.
+    ctx.call_on_close(report)
+    ctx.with_resource(profiler)
 
 
 @main.command()
-@click.argument("pdf_file", type=click.Path(exists=True, path_type=Path))
+@click.argument("sources", nargs=-1, required=True)
 @click.option(
     "-o",
     "--output",
     type=click.Path(path_type=Path),
-    help="Output directory (default: temporary directory)",
+    help="Output directory; with several sources, the parent of one per document "
+    "(default: temporary directory)",
 )
 @click.option(
     "--model",
@@ -41,14 +87,100 @@ def main():
     show_default=True,
     help="Request HTML output from MinerU (default: enabled)",
 )
-def convert(pdf_file: Path, output: Path, model: str, html: bool):
-    """Convert a PDF file to Markdown.
+@click.option(
+    "--compress-raw",
+    type=click.Choice(["none", "gzip", "zstd"]),
+    default=None,
+    help="Store raw/ JSON artifacts compressed (default: output.raw_compression config)",
+)
+@click.option(
+    "--image-store",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Deduplicate images into this shared store (default: output.image_store config)",
+)
+@click.option(
+    "--optimize-images/--no-optimize-images",
+    default=None,
+    help="Post-process images: dimensions, lazy loading, transcoding (default: images config)",
+)
+@click.option(
+    "--upload-images/--no-upload-images",
+    default=None,
+    help="Upload images through PicGo and link to them (default: picgo.enabled config)",
+)
+@click.option(
+    "--metadata/--no-metadata",
+    "extract_metadata",
+    default=None,
+    help="Write metadata.json and frontmatter from PDF/CrossRef (default: metadata config)",
+)
+@click.option(
+    "--search-index",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Add the document to this search index (default: search.index_path config)",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["directory", "bundle"]),
+    default=None,
+    help="Save each document as a directory or a single .p2r bundle "
+    "(default: output.format config)",
+)
+@click.option(
+    "--report-json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write a per-stage timing report (JSON) to this file",
+)
+@click.option(
+    "--metrics-textfile",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write Prometheus metrics to this file (textfile collector format)",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Only pre-flight the PDFs and estimate pages and quota; upload nothing",
+)
+def convert(
+    sources: Tuple[str, ...],
+    output: Path,
+    model: str,
+    html: bool,
+    compress_raw: str,
+    image_store: Path,
+    optimize_images: bool,
+    upload_images: bool,
+    extract_metadata: bool,
+    search_index: Path,
+    output_format: str,
+    report_json: Path,
+    metrics_textfile: Path,
+    dry_run: bool,
+):
+    """Convert PDF files or URLs to Markdown.
+
+    SOURCES are local files, directories (all PDFs below them) and/or http(s) URLs. URLs
+    are handed to MinerU directly, so hosted documents are neither downloaded nor
+    uploaded by p2r. Several sources are submitted together and each document is saved
+    to OUTPUT/<name>. Local PDFs are pre-flighted first: files MinerU would reject are
+    never uploaded, and ones over 600 pages are split into parts.
 
     Example:
         p2r convert paper.pdf
         p2r convert paper.pdf -o ./output
+        p2r convert https://arxiv.org/pdf/2401.00001 notes.pdf -o ./papers
+        p2r convert ./papers --dry-run
     """
     try:
+        inputs = _collect_sources(sources)
+
+        if dry_run:
+            sys.exit(_dry_run(inputs, model))
+
         # Verify API token is configured
         try:
             get_api_token()
@@ -60,8 +192,18 @@ def convert(pdf_file: Path, output: Path, model: str, html: bool):
             console.print("Or set the P2R_MINERU_TOKEN environment variable.")
             sys.exit(1)
 
-        # Initialize client
+        # Initialize client (closed with the command, however it exits)
         client = MinerUClient()
+        click.get_current_context().call_on_close(client.close)
+        spans = []
+        if report_json is not None:
+            # Collected as they finish, so a failed run still reports how far it got.
+            client.add_hook(spans.append)
+        if metrics_textfile is not None:
+            client.metrics = PrometheusMetrics(textfile=metrics_textfile)
+        timings = None
+        output_dir = None
+        started = time.perf_counter()
 
         # Create output directory
         if output is None:
@@ -70,71 +212,1115 @@ def convert(pdf_file: Path, output: Path, model: str, html: bool):
         else:
             output.mkdir(parents=True, exist_ok=True)
 
-        console.print(f"\n[bold]Converting:[/bold] {pdf_file.name}")
+        extra_formats = ["html"] if html else None
+        # Only forward options the user set, so config defaults stay in charge.
+        options = {}
+        if compress_raw is not None:
+            options["raw_compression"] = compress_raw
+        if image_store is not None:
+            options["image_store"] = str(image_store)
+        if optimize_images is not None:
+            options["optimize_images"] = optimize_images
+        if upload_images is not None:
+            options["upload_images"] = upload_images
+        if extract_metadata is not None:
+            options["extract_metadata"] = extract_metadata
+        if search_index is not None:
+            options["search_index"] = str(search_index)
+        if output_format is not None:
+            options["output_format"] = output_format
+
+        if len(inputs) > 1 or _needs_split(client, inputs[0], model):
+            console.print(f"\n[bold]Converting:[/bold] {len(inputs)} documents")
+            console.print(f"[bold]Model:[/bold] {model}")
+            _convert_batch(
+                client, inputs, output, model, extra_formats, options, report_json, started
+            )
+            return
+
+        pdf_file = inputs[0]
+        console.print(f"\n[bold]Converting:[/bold] {source_name(pdf_file)}")
         console.print(f"[bold]Model:[/bold] {model}")
 
         # Parse PDF with progress display
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            console=console,
-        ) as progress:
+        with _progress() as progress:
             # Create initial task
-            task = progress.add_task("Uploading file...", total=100)
+            description = "Submitting URL..." if is_url(pdf_file) else "Uploading file..."
+            task = progress.add_task(description, total=100)
 
             try:
-                extra_formats = ["html"] if html else None
                 for update in client.parse_pdf(
-                    pdf_file, output, model_version=model, extra_formats=extra_formats
+                    pdf_file, output, model_version=model, extra_formats=extra_formats, **options
                 ):
                     state = update.get("state")
 
-                    if state == "waiting-file":
-                        progress.update(task, description="Waiting for file upload...", completed=20)
-                    elif state == "pending":
-                        progress.update(task, description="Queued for processing...", completed=30)
-                    elif state == "running":
-                        prog = update.get("progress", "")
-                        progress.update(
-                            task,
-                            description=f"Parsing ({prog} pages)...",
-                            completed=50,
-                        )
-                    elif state == "converting":
-                        progress.update(task, description="Converting to Markdown...", completed=80)
-                    elif state == "completed":
+                    if state == "completed":
                         progress.update(task, description="Download complete!", completed=100)
                         output_dir = update.get("output_dir")
+                        timings = update.get("timings")
+                    else:
+                        _show_progress(progress, task, update)
 
             except MinerUError as e:
                 console.print(f"\n[red]Error:[/red] {e}")
+                if report_json is not None:
+                    _write_timing_report(
+                        report_json, source_name(pdf_file), spans, started, error=str(e)
+                    )
                 sys.exit(1)
 
-        # Success message
-        console.print(f"\n[green]Success![/green] Files saved to: {output}")
-
-        # List output files
-        if output.exists():
-            md_files = list(output.glob("**/*.md"))
-            html_files = list(output.glob("**/*.html"))
-            if md_files:
-                console.print(f"\nMarkdown files:")
-                for md_file in md_files:
-                    rel_path = md_file.relative_to(output)
-                    console.print(f"  - {rel_path}")
-            if html_files:
-                console.print(f"\nHTML files:")
-                for html_file in html_files:
-                    rel_path = html_file.relative_to(output)
-                    console.print(f"  - {rel_path}")
+        if report_json is not None:
+            _write_timing_report(
+                report_json, source_name(pdf_file), spans, started, timings=timings
+            )
+            console.print(f"Timing report: {report_json}")
+
+        # Success message (the client picks output_vN if output already held files)
+        saved_to = Path(output_dir) if output_dir else output
+        console.print(f"\n[green]Success![/green] Files saved to: {saved_to}")
+
+        # List output files from the manifest written at commit time
+        if is_bundle(saved_to):
+            with Bundle(saved_to) as bundle:
+                paths = [f["path"] for f in bundle.files()]
+            md_files = [p for p in paths if p.endswith(".md")]
+            html_files = [p for p in paths if p.endswith(".html")]
+        else:
+            md_files = manifest_paths(saved_to, [".md"]) or []
+            html_files = manifest_paths(saved_to, [".html"]) or []
+        if md_files:
+            console.print(f"\nMarkdown files:")
+            for rel_path in md_files:
+                console.print(f"  - {rel_path}")
+        if html_files:
+            console.print(f"\nHTML files:")
+            for rel_path in html_files:
+                console.print(f"  - {rel_path}")
 
     except Exception as e:
         console.print(f"[red]Unexpected error:[/red] {e}")
         sys.exit(1)
 
 
+def _collect_sources(sources: Tuple[str, ...]) -> List[Any]:
+    """Expand SOURCES arguments: URLs, files, and all PDFs below directories."""
+    inputs: List[Any] = []
+    for source in sources:
+        if is_url(source):
+            inputs.append(source)
+        elif Path(source).is_dir():
+            # Any case: scanners and Windows tools often write "SCAN.PDF".
+            inputs.extend(
+                sorted(
+                    p for p in Path(source).rglob("*") if p.suffix.lower() == ".pdf" and p.is_file()
+                )
+            )
+        elif Path(source).exists():
+            inputs.append(Path(source))
+        else:
+            console.print(f"[red]Error:[/red] File not found: {source}")
+            sys.exit(1)
+    if not inputs:
+        console.print("[red]Error:[/red] No PDF files found")
+        sys.exit(1)
+    return inputs
+
+
+def _progress() -> Progress:
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        console=console,
+    )
+
+
+def _show_progress(progress: Progress, task: Any, update: Dict[str, Any], label: str = "") -> None:
+    """Reflect a MinerU task state on a progress bar."""
+    state = update.get("state")
+    if state == "waiting-file":
+        progress.update(task, description=f"{label}Waiting for file upload...", completed=20)
+    elif state == "pending":
+        progress.update(task, description=f"{label}Queued for processing...", completed=30)
+    elif state == "running":
+        prog = update.get("progress", "")
+        total = update.get("total_pages") or 0
+        done = update.get("extracted_pages") or 0
+        progress.update(
+            task,
+            description=f"{label}Parsing ({prog} pages)...",
+            completed=40 + 40 * done / total if total else 50,
+        )
+    elif state == "converting":
+        progress.update(task, description=f"{label}Converting to Markdown...", completed=80)
+
+
+def _convert_batch(
+    client: MinerUClient,
+    sources: List[Any],
+    output: Path,
+    model: str,
+    extra_formats: Optional[List[str]],
+    options: Dict[str, Any],
+    report_json: Optional[Path],
+    started: float,
+) -> None:
+    """Convert several files/URLs in shared MinerU batches, one progress bar each."""
+    from .timing import batch_report, write_report
+
+    saved: List[Tuple[Any, str]] = []
+    failed: List[Tuple[Any, str]] = []
+    reports: List[Dict[str, Any]] = []
+    with _progress() as progress:
+        tasks = {}
+        for source in sources:
+            description = f"{source_name(source)}: Submitting..."
+            tasks[(str(source), None)] = progress.add_task(description, total=100)
+        try:
+            for update in client.parse_batch(
+                sources, output, model_version=model, extra_formats=extra_formats, **options
+            ):
+                source = update["source"]
+                label = f"{source_name(source)}: "
+                if update.get("part"):
+                    label = f"{source_name(source)} (pages {update['part']}): "
+                key = (str(source), update.get("part"))
+                if key not in tasks:
+                    # A split document: the first part takes over the document's bar.
+                    whole = tasks.pop((str(source), None), None)
+                    tasks[key] = whole if whole is not None else progress.add_task(label, total=100)
+                task = tasks[key]
+                if update["state"] == "completed":
+                    progress.update(task, description=f"{label}Done", completed=100)
+                    saved.append((source, update["output_dir"]))
+                    reports.append(update["timings"])
+                elif update["state"] == "failed":
+                    progress.update(task, description=f"{label}Failed")
+                    failed.append((source, update["error"]))
+                    reports.append({"document": source_name(source), "error": update["error"]})
+                else:
+                    _show_progress(progress, task, update, label)
+        except MinerUError as e:
+            console.print(f"\n[red]Error:[/red] {e}")
+            sys.exit(1)
+
+    if report_json is not None:
+        wall = time.perf_counter() - started
+        write_report(report_json, batch_report(reports, wall_seconds=wall))
+        console.print(f"Timing report: {report_json}")
+
+    if saved:
+        console.print(f"\n[green]Success![/green] {len(saved)} documents saved to: {output}")
+        for source, output_dir in saved:
+            console.print(f"  - {source} -> {output_dir}")
+    if failed:
+        console.print(f"\n[red]Failed:[/red] {len(failed)} documents")
+        for source, error in failed:
+            console.print(f"  - {source}: {error}")
+        sys.exit(1)
+
+
+def _needs_split(client: MinerUClient, source: Any, model: str) -> bool:
+    """Whether a local PDF is over MinerU's page limit (converted in parts).
+
+    The client keeps the pre-flight result for the conversion that follows.
+    """
+    if is_url(source):
+        return False
+    return len(client.plan(source, model)) > 1
+
+
+def _dry_run(inputs: List[Any], model: str) -> int:
+    """Pre-flight every source and print the plan; the exit code (1 if any is rejected)."""
+    from .config import load_config
+
+    tasks = pages = rejected = unknown = 0
+    started = time.perf_counter()
+    console.print(f"\n[bold]Pre-flight:[/bold] {len(inputs)} documents ({model} model)")
+    for source in inputs:
+        if is_url(source):
+            tasks += 1
+            unknown += 1
+            console.print(f"  {source}: fetched by MinerU, pages unknown")
+            continue
+        info = preflight(source) if source.suffix.lower() == ".pdf" else None
+        if info is None:
+            tasks += 1
+            unknown += 1
+            console.print(f"  {source}: not a PDF, not checked")
+            continue
+        size = f"{info['size'] / 1024 / 1024:.1f}MB"
+        if info["errors"]:
+            rejected += 1
+            console.print(f"  [red]✗[/red] {source}: {size}, {'; '.join(info['errors'])}")
+            continue
+        parts = plan_parts(info, model)
+        tasks += len(parts)
+        if info["pages"] is None:
+            unknown += 1
+        pages += info["pages"] or 0
+        kind = {True: "scanned", False: "text", None: "text/scanned unknown"}[info["scanned"]]
+        plan = []
+        if len(parts) > 1:
+            plan.append(f"{len(parts)} parts")
+        if parts[0]["options"].get("is_ocr"):
+            plan.append("OCR")
+        line = f"  [green]✓[/green] {source}: {info['pages'] or '?'} pages, {size}, {kind}"
+        console.print(line + (f" -> {', '.join(plan)}" if plan else ""))
+        for warning in info["warnings"]:
+            console.print(f"      [yellow]⚠[/yellow] {warning}")
+
+    cfg = load_config()
+    limit = cfg.get("mineru", {}).get("daily_priority_pages", DAILY_PRIORITY_PAGES)
+    ledger = configured_usage_path(cfg)
+    used = pages_used(path=ledger) if ledger is not None else 0
+    quota = estimate(pages, used=used, limit=limit)
+    console.print(
+        f"\n[bold]Tasks:[/bold] {tasks}, {pages} pages"
+        + (f" (+{unknown} of unknown length)" if unknown else "")
+        + (f", {rejected} rejected" if rejected else "")
+        + f", checked in {time.perf_counter() - started:.3f}s"
+    )
+    console.print(
+        f"[bold]Quota:[/bold] {quota['used']} of {quota['limit']} priority pages used today"
+    )
+    console.print(
+        f"  This run: {quota['priority_pages']} pages at priority, "
+        f"{quota['low_priority_pages']} at lower priority"
+    )
+    return 1 if rejected else 0
+
+
+def _write_timing_report(
+    path: Path,
+    document: str,
+    spans: List[Dict[str, Any]],
+    started: float,
+    timings: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Write a --report-json timing report for one converted document."""
+    from .timing import batch_report, stage_totals, write_report
+
+    if timings is None:
+        timings = {"document": document, "stages": spans, "totals": stage_totals(spans)}
+    if error is not None:
+        timings["error"] = error
+    write_report(path, batch_report([timings], wall_seconds=time.perf_counter() - started))
+
+
+@main.command()
+@click.argument(
+    "paths", nargs=-1, required=True, type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.option(
+    "--page-markers/--no-page-markers",
+    default=True,
+    show_default=True,
+    help="Insert page separators",
+)
+@click.option(
+    "--footnotes/--no-footnotes",
+    default=True,
+    show_default=True,
+    help="Include page footnotes",
+)
+@click.option(
+    "--aside/--no-aside",
+    default=False,
+    show_default=True,
+    help="Include aside text (e.g. arXiv identifiers in the margin)",
+)
+@click.option("--force", is_flag=True, help="Rebuild even if outputs are up to date")
+@click.option(
+    "--chunk-pages",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Write page-chunked HTML to rebuilt_html/ with at most N pages per chunk (0: off)",
+)
+@click.option(
+    "--split-level",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="With --chunk-pages, start a new chunk at headings up to this level (0: pages only)",
+)
+def rebuild(
+    paths,
+    page_markers: bool,
+    footnotes: bool,
+    aside: bool,
+    force: bool,
+    chunk_pages: int,
+    split_level: int,
+):
+    """Rebuild Markdown/HTML from content_list.json, skipping unchanged documents.
+
+    Each PATH may be a converted document directory or a directory containing many.
+
+    Example:
+        p2r rebuild ./output
+        p2r rebuild ./corpus --no-page-markers
+        p2r rebuild ./book --chunk-pages 20
+    """
+    from .rebuild import find_documents, rebuild_document
+
+    rebuilt = skipped = failed = 0
+    for root in paths:
+        for doc_dir in find_documents(root):
+            try:
+                changed = rebuild_document(
+                    doc_dir,
+                    include_page_markers=page_markers,
+                    include_footnotes=footnotes,
+                    include_aside=aside,
+                    force=force,
+                    chunk_pages=chunk_pages,
+                    split_level=split_level,
+                )
+            except (OSError, ValueError) as e:
+                console.print(f"[red]Error:[/red] {doc_dir}: {e}")
+                failed += 1
+                continue
+            if changed:
+                rebuilt += 1
+                console.print(f"  [green]rebuilt[/green] {doc_dir}")
+            else:
+                skipped += 1
+
+    console.print(f"\nRebuilt: {rebuilt}, up to date: {skipped}, failed: {failed}")
+    if failed:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("doc_dir", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.argument("page_spec")
+@click.option(
+    "--source",
+    type=click.Choice(["content_list", "layout", "model"]),
+    default="content_list",
+    show_default=True,
+    help="Raw artifact to read from",
+)
+def pages(doc_dir: Path, page_spec: str, source: str):
+    """Print selected pages of a raw artifact as JSON.
+
+    PAGE_SPEC uses 1-based page numbers, e.g. "40-45" or "2,4-6". Only the byte ranges of
+    the requested pages are decoded, using raw/page_index.json.
+
+    Example:
+        p2r pages ./output 40-45
+        p2r pages ./output 3 --source layout
+    """
+    import json
+
+    from .pages import parse_page_spec, read_pages
+
+    try:
+        page_indices = parse_page_spec(page_spec)
+        result = read_pages(doc_dir, page_indices, kind=source)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+
+    click.echo(json.dumps({"pages": result}, ensure_ascii=False))
+
+
+@main.group()
+def bundle():
+    """Read, export and create single-file .p2r bundles.
+
+    Bundles hold a whole converted document in one SQLite file (see `convert
+    --output-format bundle`). These commands read parts of one without unpacking it.
+    """
+
+
+@bundle.command("ls")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def bundle_ls(path: Path):
+    """List the files stored in a bundle.
+
+    Example:
+        p2r bundle ls ./papers/paper.p2r
+    """
+    import sqlite3
+
+    try:
+        with Bundle(path) as b:
+            files = b.files()
+            source = b.source
+    except (ValueError, sqlite3.Error) as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+    if source:
+        console.print(f"Source: {source}")
+    for f in files:
+        click.echo(f"{f['size']:>12}  {f['path']}")
+
+
+@bundle.command("cat")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("member", required=False)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write to this file instead of standard output",
+)
+def bundle_cat(path: Path, member: Optional[str], output: Optional[Path]):
+    """Print one file of a bundle (default: the markdown).
+
+    MEMBER is a path inside the document, e.g. full.html or images/fig1.jpg.
+
+    Example:
+        p2r bundle cat ./papers/paper.p2r
+        p2r bundle cat ./papers/paper.p2r images/fig1.jpg -o fig1.jpg
+    """
+    import sqlite3
+
+    try:
+        with Bundle(path) as b:
+            data = b.read(member) if member else b.markdown().encode("utf-8")
+    except (OSError, ValueError, sqlite3.Error) as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+    if output is not None:
+        output.write_bytes(data)
+    else:
+        click.echo(data, nl=False)
+
+
+@bundle.command("pages")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("page_spec")
+@click.option(
+    "--source",
+    type=click.Choice(["content_list", "layout", "model"]),
+    default="content_list",
+    show_default=True,
+    help="Raw artifact to read from",
+)
+def bundle_pages(path: Path, page_spec: str, source: str):
+    """Print selected pages of a raw artifact in a bundle as JSON (like `p2r pages`).
+
+    Example:
+        p2r bundle pages ./papers/paper.p2r 40-45
+    """
+    import json
+    import sqlite3
+
+    from .pages import parse_page_spec
+
+    try:
+        with Bundle(path) as b:
+            result = b.read_pages(parse_page_spec(page_spec), kind=source)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+
+    click.echo(json.dumps({"pages": result}, ensure_ascii=False))
+
+
+@bundle.command("export")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Parent directory of the exported documents (default: next to each bundle)",
+)
+def bundle_export(paths, output: Optional[Path]):
+    """Unpack bundles into regular document directories.
+
+    PATHS are bundles or directories containing them.
+
+    Example:
+        p2r bundle export ./papers/paper.p2r
+        p2r bundle export ./papers -o ./unpacked
+    """
+    import sqlite3
+
+    bundles: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            bundles.extend(p for p in sorted(path.rglob(f"*{BUNDLE_SUFFIX}")) if is_bundle(p))
+        else:
+            bundles.append(path)
+    failed = 0
+    for path in bundles:
+        dest = output / path.stem if output is not None else None
+        try:
+            with Bundle(path) as b:
+                console.print(f"{path} -> {b.export(dest)}")
+        except (OSError, ValueError, sqlite3.Error) as e:
+            console.print(f"[red]Error:[/red] {path}: {e}")
+            failed += 1
+    if failed:
+        sys.exit(1)
+
+
+@bundle.command("pack")
+@click.argument(
+    "paths", nargs=-1, required=True, type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.option("--remove", is_flag=True, help="Delete each directory once its bundle is written")
+def bundle_pack(paths, remove: bool):
+    """Pack converted document directories into .p2r bundles next to them.
+
+    PATHS are document directories or directories containing them.
+
+    Example:
+        p2r bundle pack ./papers --remove
+    """
+    import shutil
+    import sqlite3
+
+    from .bundle import pack_dir
+    from .rebuild import find_documents
+
+    failed = 0
+    for root in paths:
+        # Listed up front: packing and removing changes the tree being walked.
+        for doc_dir in list(find_documents(root)):
+            try:
+                console.print(f"{doc_dir} -> {pack_dir(doc_dir)}")
+            except (OSError, sqlite3.Error) as e:
+                console.print(f"[red]Error:[/red] {doc_dir}: {e}")
+                failed += 1
+                continue
+            if remove:
+                shutil.rmtree(doc_dir)
+    if failed:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(["webp", "avif", "keep"]),
+    default=None,
+    help="Transcode images to this format (default: images.format config)",
+)
+@click.option("--quality", type=int, default=None, help="Encoder quality (default: config)")
+@click.option(
+    "--thumbnail-width", type=int, default=None, help="Thumbnail width, 0: none (default: config)"
+)
+@click.option("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+@click.option(
+    "--transcode/--no-transcode",
+    default=True,
+    show_default=True,
+    help="Re-encode images and generate thumbnails (requires Pillow)",
+)
+def images(paths, fmt: str, quality: int, thumbnail_width: int, workers: int, transcode: bool):
+    """Post-process the images of converted documents.
+
+    Records image dimensions in images.json, moves inline base64 images out of MinerU's
+    HTML, adds lazy-loading attributes and, with Pillow installed, writes transcoded
+    variants and thumbnails. Each PATH may be a document directory or contain many.
+
+    Example:
+        p2r images ./output
+        p2r images ./corpus --format avif --quality 60
+    """
+    from .config import load_config
+    from .images import has_pillow, image_pool, postprocess_images
+    from .output import refresh_manifest
+    from .rebuild import find_documents
+
+    options = dict(load_config().get("images", {}))
+    options.pop("enabled", None)
+    if fmt is not None:
+        options["format"] = "" if fmt == "keep" else fmt
+    for key, value in (
+        ("quality", quality),
+        ("thumbnail_width", thumbnail_width),
+        ("workers", workers),
+    ):
+        if value is not None:
+            options[key] = value
+
+    if transcode and not has_pillow():
+        console.print(
+            "[yellow]⚠[/yellow] Pillow is not installed: only dimensions and lazy loading "
+            "are applied (pip install pillow)"
+        )
+
+    processed = failed = 0
+    # One pool for the whole run: starting interpreters per document dominates otherwise.
+    pool = image_pool(options.get("workers") or 0) if transcode and has_pillow() else None
+    try:
+        for root in paths:
+            for doc_dir in find_documents(root):
+                try:
+                    summary = postprocess_images(
+                        doc_dir, options, transcode=transcode, pool=pool
+                    )
+                    refresh_manifest(doc_dir)
+                except (OSError, ValueError) as e:
+                    console.print(f"[red]Error:[/red] {doc_dir}: {e}")
+                    failed += 1
+                    continue
+                processed += 1
+                console.print(
+                    f"  {doc_dir}: {summary['images']} image(s), "
+                    f"{summary['transcoded']} transcoded, {summary['inlined_moved']} un-inlined"
+                )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    console.print(f"\nProcessed {processed} document(s), failed: {failed}")
+    if failed:
+        sys.exit(1)
+
+
+def _search_index_path(index: Path) -> Path:
+    """Resolve --index against the search.index_path config, exiting if neither is set."""
+    from .search import default_index_path
+
+    if index is None:
+        index = default_index_path()
+        if index is None:
+            console.print("[red]Error:[/red] No search index configured (use --index)")
+            sys.exit(1)
+    return index
+
+
+@main.command()
+@click.argument("query", nargs=-1, required=True)
+@click.option(
+    "--index",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Search index file (default: search.index_path config)",
+)
+@click.option("-n", "--limit", type=int, default=20, show_default=True, help="Maximum hits")
+@click.option("--type", "element_type", default=None, help="Only match this element type")
+@click.option("--raw", is_flag=True, help="Pass QUERY to SQLite FTS5 unchanged")
+@click.option("--json", "as_json", is_flag=True, help="Print hits as JSON lines")
+def search(query, index: Path, limit: int, element_type: str, raw: bool, as_json: bool):
+    """Full-text search over converted documents.
+
+    All terms must match; end a term with * to match a prefix. Hits are listed best
+    first with their document, page and element type.
+
+    Example:
+        p2r search attention mechanism
+        p2r search --type table "ablation"
+    """
+    import json
+
+    from .search import SearchIndex
+
+    index = _search_index_path(index)
+    if not index.exists():
+        console.print(f"[red]Error:[/red] Search index not found: {index} (run p2r reindex)")
+        sys.exit(1)
+
+    try:
+        with SearchIndex(index) as search_index:
+            hits = search_index.search(
+                " ".join(query), limit=limit, element_type=element_type, raw=raw
+            )
+    except ValueError as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+
+    if as_json:
+        for hit in hits:
+            click.echo(json.dumps(hit, ensure_ascii=False))
+        return
+    for hit in hits:
+        page = hit["page_idx"] + 1 if hit["page_idx"] is not None else "?"
+        console.print(
+            f"[bold]{hit['title']}[/bold] [dim]{hit['path']}[/dim] p.{page} ({hit['type']})",
+            highlight=False,
+        )
+        console.print(f"  {hit['snippet']}", markup=False, highlight=False)
+    if not hits:
+        console.print("No matches")
+
+
+@main.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--index",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Search index file (default: search.index_path config)",
+)
+@click.option("--workers", type=int, default=0, help="Parser processes (default: one per CPU)")
+@click.option("--full", is_flag=True, help="Re-index documents even if unchanged")
+def reindex(paths, index: Path, workers: int, full: bool):
+    """Build or update the search index from converted documents.
+
+    Unchanged documents are skipped and documents that were deleted are dropped.
+
+    Example:
+        p2r reindex ./corpus
+        p2r reindex ./corpus --index ~/p2r-search.db --full
+    """
+    import sqlite3
+
+    from .search import SearchIndex
+
+    index = _search_index_path(index)
+    try:
+        with SearchIndex(index) as search_index:
+            stats = search_index.reindex(paths, workers=workers, force=full)
+    except (sqlite3.Error, ValueError) as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+
+    console.print(
+        f"Indexed: {stats['indexed']}, unchanged: {stats['unchanged']}, "
+        f"removed: {stats['removed']}, failed: {stats['failed']}"
+    )
+    if stats["failed"]:
+        sys.exit(1)
+
+
+@main.command("export-chunks")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    required=True,
+    help="JSONL file to write (resumed if it was interrupted)",
+)
+@click.option(
+    "--max-chars",
+    type=click.IntRange(min=1),
+    default=2000,
+    show_default=True,
+    help="Maximum characters per chunk",
+)
+@click.option(
+    "--footnotes/--no-footnotes", default=True, show_default=True, help="Include page footnotes"
+)
+@click.option("--workers", type=int, default=0, help="Chunking processes (default: one per CPU)")
+@click.option("--restart", is_flag=True, help="Discard a previous export instead of resuming")
+def export_chunks(
+    paths, output: Path, max_chars: int, footnotes: bool, workers: int, restart: bool
+):
+    """Export heading-aware chunks with page/bbox provenance as JSON lines.
+
+    Chunks are built from each document's content_list and never cross a heading. A
+    ledger (OUTPUT.done) records exported documents by content hash, so re-running the
+    command skips them and an interrupted export picks up where it stopped.
+
+    Example:
+        p2r export-chunks ./corpus -o chunks.jsonl
+        p2r export-chunks ./corpus -o chunks.jsonl --max-chars 1000 --no-footnotes
+    """
+    from .chunks import export_chunks as run_export
+
+    try:
+        stats = run_export(
+            paths,
+            output,
+            max_chars=max_chars,
+            include_footnotes=footnotes,
+            workers=workers,
+            resume=not restart,
+        )
+    except OSError as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+
+    console.print(
+        f"Exported {stats['chunks']} chunk(s) from {stats['documents']} document(s) "
+        f"to {output} (skipped: {stats['skipped']}, failed: {stats['failed']})"
+    )
+    if stats["failed"]:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--api-url",
+    default=None,
+    help="PicGo upload endpoint (default: picgo.api_url config)",
+)
+@click.option("--workers", type=int, default=None, help="Uploads in flight (default: config)")
+def picgo(paths, api_url: Optional[str], workers: Optional[int]):
+    """Upload the images of converted documents through PicGo and link to them.
+
+    Image links in each document's Markdown and HTML are pointed at the uploaded copies.
+    Images already uploaded (by any document) are not uploaded again; ones that fail
+    keep their local images/ links. Each PATH may be a document directory or contain
+    many.
+
+    Example:
+        p2r picgo ./output
+        p2r picgo ./corpus --api-url http://127.0.0.1:36677/upload --workers 16
+    """
+    import sqlite3
+
+    from .config import load_config
+    from .output import refresh_manifest
+    from .picgo import PicGoUploader, upload_document
+    from .rebuild import find_documents
+
+    options = dict(load_config().get("picgo", {}))
+    if api_url is not None:
+        options["api_url"] = api_url
+    if workers is not None:
+        options["workers"] = workers
+
+    try:
+        uploader = PicGoUploader.from_options(options)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        console.print(f"[red]Error:[/red] Failed to set up PicGo uploads: {e}")
+        sys.exit(1)
+
+    totals = {"uploaded": 0, "cached": 0, "failed": 0}
+    with uploader:
+        for root in paths:
+            for doc_dir in find_documents(root):
+                try:
+                    summary = upload_document(doc_dir, uploader)
+                    if summary["links"]:
+                        refresh_manifest(doc_dir)
+                except (OSError, sqlite3.Error) as e:
+                    console.print(f"[red]Error:[/red] {doc_dir}: {e}")
+                    totals["failed"] += 1
+                    continue
+                for key in totals:
+                    totals[key] += summary[key]
+                console.print(
+                    f"  {doc_dir}: {summary['images']} image(s), {summary['uploaded']} "
+                    f"uploaded, {summary['cached']} cached, {summary['failed']} failed"
+                )
+                for error in summary["errors"]:
+                    console.print(f"    [red]✗[/red] {error}")
+    console.print(
+        f"\n{totals['uploaded']} uploaded, {totals['cached']} cached, "
+        f"{totals['failed']} failed"
+    )
+    if totals["failed"]:
+        sys.exit(1)
+
+
+@main.command()
+@click.option(
+    "--store",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Image store directory (default: output.image_store config)",
+)
+@click.option("--dry-run", is_flag=True, help="Only list images that would be removed")
+def gc(store: Path, dry_run: bool):
+    """Remove images from the shared image store that no document references.
+
+    Example:
+        p2r gc
+        p2r gc --store ~/p2r-images --dry-run
+    """
+    from .config import load_config
+    from .imagestore import ImageStore
+
+    if store is None:
+        configured = load_config().get("output", {}).get("image_store", "")
+        if not configured:
+            console.print("[red]Error:[/red] No image store configured (use --store)")
+            sys.exit(1)
+        store = Path(configured)
+
+    try:
+        orphans = ImageStore(store).gc(dry_run=dry_run)
+    except OSError as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+    if dry_run:
+        for path in orphans:
+            console.print(f"  would remove {path.name}")
+    verb = "Would remove" if dry_run else "Removed"
+    console.print(f"{verb} {len(orphans)} orphaned image(s) from {store}")
+
+
+def _open_queue(spec: Optional[str]) -> Any:
+    """Open --queue, or the worker.queue config, exiting if neither is set."""
+    from .config import load_config
+    from .jobqueue import DEFAULT_MAX_ATTEMPTS, open_queue
+
+    worker_cfg = load_config().get("worker", {})
+    spec = spec or worker_cfg.get("queue", "")
+    if not spec:
+        console.print("[red]Error:[/red] No job queue configured (use --queue)")
+        sys.exit(1)
+    try:
+        return open_queue(spec, worker_cfg.get("max_attempts", DEFAULT_MAX_ATTEMPTS))
+    except (ValueError, OSError) as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("sources", nargs=-1, required=True)
+@click.option(
+    "--queue", "queue_spec", default=None, help="Job queue (default: worker.queue config)"
+)
+def enqueue(sources: Tuple[str, ...], queue_spec: Optional[str]):
+    """Add PDF files or URLs to the shared job queue for `p2r worker`.
+
+    Files are keyed by the SHA-256 of their content, so documents already queued (from
+    any path or host) are skipped.
+
+    Example:
+        p2r enqueue ./corpus --queue /shared/p2r-queue.db
+    """
+    from .jobqueue import enqueue_sources
+
+    inputs = _collect_sources(sources)
+    with _open_queue(queue_spec) as queue:
+        stats = enqueue_sources(queue, inputs)
+        counts = queue.counts()
+    console.print(f"Queued {stats['added']} documents ({stats['skipped']} already queued)")
+    console.print(", ".join(f"{state}: {n}" for state, n in counts.items()))
+
+
+@main.command()
+@click.option(
+    "--queue", "queue_spec", default=None, help="Job queue (default: worker.queue config)"
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(file_okay=False, path_type=Path),
+    required=True,
+    help="Parent directory of the documents (shared by all workers)",
+)
+@click.option(
+    "--model",
+    type=click.Choice(["pipeline", "vlm"]),
+    default="vlm",
+    help="MinerU model version (default: vlm)",
+)
+@click.option(
+    "--html/--no-html",
+    default=True,
+    show_default=True,
+    help="Request HTML output from MinerU (default: enabled)",
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["directory", "bundle"]),
+    default=None,
+    help="Save each document as a directory or a single .p2r bundle "
+    "(default: output.format config)",
+)
+@click.option("--concurrency", type=int, default=1, show_default=True, help="Jobs at once")
+@click.option(
+    "--lease",
+    type=float,
+    default=None,
+    help="Seconds a claim lasts without a heartbeat (default: worker.lease_seconds config)",
+)
+@click.option("--max-jobs", type=int, default=None, help="Stop after this many jobs")
+@click.option("--exit-when-empty", is_flag=True, help="Stop when the queue has nothing to claim")
+def worker(
+    queue_spec: Optional[str],
+    output: Path,
+    model: str,
+    html: bool,
+    output_format: Optional[str],
+    concurrency: int,
+    lease: Optional[float],
+    max_jobs: Optional[int],
+    exit_when_empty: bool,
+):
+    """Convert documents claimed from the shared job queue.
+
+    Run any number of workers, on one or several hosts, against the same queue (a SQLite
+    file on a shared disk): each job is leased to one worker at a time, kept alive by
+    heartbeats, and handed to another worker if its lease expires.
+
+    Example:
+        p2r enqueue ./corpus --queue /shared/p2r-queue.db
+        p2r worker --queue /shared/p2r-queue.db -o /shared/papers --concurrency 4
+    """
+    from .config import load_config
+    from .jobqueue import DEFAULT_LEASE_SECONDS, run_worker
+
+    try:
+        get_api_token()
+    except ValueError as e:
+        console.print(f"[red]Error:[/red] {e}")
+        sys.exit(1)
+    if lease is None:
+        lease = load_config().get("worker", {}).get("lease_seconds", DEFAULT_LEASE_SECONDS)
+    options: Dict[str, Any] = {"model_version": model, "extra_formats": ["html"] if html else None}
+    if output_format is not None:
+        options["output_format"] = output_format
+
+    def report(result: Dict[str, Any]) -> None:
+        source = result["job"]["source"]
+        if result["state"] == "done":
+            note = " (already done by another worker)" if result["duplicate"] else ""
+            console.print(f"[green]Done:[/green] {source}{note}")
+        elif result["state"] == "pending":
+            console.print(f"[yellow]Retrying:[/yellow] {source}: {result['error']}")
+        elif result["state"] == "failed":
+            console.print(f"[red]Failed:[/red] {source}: {result['error']}")
+
+    output.mkdir(parents=True, exist_ok=True)
+    with _open_queue(queue_spec) as queue:
+        try:
+            stats = run_worker(
+                queue,
+                output,
+                concurrency=concurrency,
+                lease_seconds=lease,
+                max_jobs=max_jobs,
+                exit_when_empty=exit_when_empty,
+                on_result=report,
+                **options,
+            )
+        except KeyboardInterrupt:
+            console.print("\nInterrupted; jobs in progress were returned to the queue")
+            sys.exit(130)
+    console.print(
+        f"\n{stats['done']} done, {stats['retried']} retried, {stats['failed']} failed, "
+        f"{stats['duplicates']} duplicates"
+    )
+
+
+@main.command("queue-status")
+@click.option(
+    "--queue", "queue_spec", default=None, help="Job queue (default: worker.queue config)"
+)
+@click.option("--failed", "show_failed", is_flag=True, help="List failed jobs and their errors")
+@click.option("--retry-failed", is_flag=True, help="Return failed jobs to the queue")
+def queue_status(queue_spec: Optional[str], show_failed: bool, retry_failed: bool):
+    """Show how many jobs of the shared queue are pending, leased, done or failed.
+
+    Example:
+        p2r queue-status --queue /shared/p2r-queue.db --failed
+    """
+    with _open_queue(queue_spec) as queue:
+        if retry_failed:
+            console.print(f"Returned {queue.retry_failed()} failed jobs to the queue")
+        console.print(", ".join(f"{state}: {n}" for state, n in queue.counts().items()))
+        now = time.time()
+        for job in queue.jobs("leased"):
+            left = job["lease_until"] - now
+            status = f"{left:.0f}s left" if left > 0 else "lease expired"
+            console.print(f"  leased by {job['worker']} ({status}): {job['source']}")
+        if show_failed:
+            for job in queue.jobs("failed"):
+                console.print(f"  [red]failed[/red] {job['source']}: {job['error']}")
+
+
 @main.command()
 @click.argument("token")
 def config_token(token: str):
@@ -176,6 +1362,12 @@ def show_config():
         console.print(f"  Poll Interval: {cfg.get('mineru', {}).get('poll_interval')}s")
         console.print(f"  Max Poll Time: {cfg.get('mineru', {}).get('max_poll_time')}s")
         console.print(f"  Temp Directory: {cfg.get('output', {}).get('temp_dir')}")
+        console.print(
+            f"  Raw Compression: {cfg.get('output', {}).get('raw_compression', 'none')}"
+        )
+        index_path = cfg.get("search", {}).get("index_path", "")
+        console.print(f"  Search Index: {index_path or '(disabled)'}")
+        console.print(f"  Metrics: {cfg.get('metrics', {}).get('backend', 'none')}")
     else:
         console.print("[yellow]⚠[/yellow] Configuration file does not exist")
         console.print("It will be created automatically on first use.")
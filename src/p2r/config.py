@@ -3,6 +3,7 @@
 import json
 import os
 import re
+import tempfile
 from pathlib import Path
 from typing import Dict, Any
 
@@ -34,9 +35,76 @@ def get_default_config() -> Dict[str, Any]:
             "api_base_url": "https://mineru.net/api/v4",
             "poll_interval": 3,  # seconds
             "max_poll_time": 600,  # 10 minutes
+            # Check PDFs locally (pages, encryption, scans) before uploading them.
+            "preflight": True,
+            # Pages per day parsed at the highest priority (see p2r.quota).
+            "daily_priority_pages": 2000,
+            # Ledger of pages parsed per day, for quota estimates ("" disables it).
+            "usage_ledger": "~/.p2r_usage.json",
         },
         "output": {
             "temp_dir": "/tmp/p2r",
+            # Storage of raw/ JSON artifacts: "none", "gzip" or "zstd" (needs zstandard).
+            "raw_compression": "none",
+            # Shared content-addressed image store directory ("" disables it).
+            "image_store": "",
+            # "directory", or "bundle" for one SQLite file per document (see p2r.bundle).
+            "format": "directory",
+        },
+        "images": {
+            # Post-process extracted images (dimensions, lazy-loading HTML, transcoding).
+            "enabled": False,
+            "format": "webp",  # "webp", "avif" or "" to keep originals (needs Pillow)
+            "quality": 80,
+            "max_dimension": 2000,  # longest side of transcoded variants; 0 = no limit
+            "thumbnail_width": 320,  # 0 disables thumbnails
+            "workers": 0,  # image worker processes; 0 = one per CPU
+        },
+        "picgo": {
+            # Upload images to an image host through PicGo and link to them (see
+            # p2r.picgo); images that fail to upload keep their local links.
+            "enabled": False,
+            "api_url": "http://127.0.0.1:36677/upload",
+            "workers": 8,  # uploads in flight at once
+            "timeout": 30,  # seconds per upload
+            # Image -> URL cache shared by all runs ("" = ~/.p2r_picgo_cache.db).
+            "cache_path": "",
+        },
+        "metadata": {
+            # Write metadata.json and Markdown frontmatter (title, authors, year, DOI),
+            # from the PDF, its first page and CrossRef (see p2r.metadata).
+            "enabled": False,
+            "crossref": True,  # look DOIs up on CrossRef
+            "crossref_url": "https://api.crossref.org",
+            "mailto": "",  # contact address for CrossRef's polite pool
+            "timeout": 10,  # seconds per CrossRef request
+            # DOI lookups shared by all runs ("" = ~/.p2r_metadata_cache.db).
+            "cache_path": "",
+            "frontmatter": True,
+            "frontmatter_fields": {},  # e.g. {"tags": ["literature-note", "unread"]}
+            # Name of documents converted together, e.g. "{author}-{year}-{title}"
+            # ("" keeps the source file name).
+            "name_template": "",
+        },
+        "search": {
+            # SQLite full-text index updated after every conversion ("" disables it).
+            "index_path": "",
+        },
+        "worker": {
+            # Job queue shared by `p2r worker` processes: a SQLite file, e.g. on a shared
+            # disk ("" = none; see p2r.jobqueue).
+            "queue": "",
+            "lease_seconds": 300,  # claims expire unless renewed by heartbeats
+            "max_attempts": 3,
+        },
+        "metrics": {
+            # "none", "prometheus" (HTTP endpoint and/or textfile) or "statsd" (UDP).
+            "backend": "none",
+            "prefix": "p2r",
+            "port": 0,  # Prometheus /metrics port; 0 = no HTTP endpoint
+            "textfile": "",  # Prometheus textfile rewritten after every document
+            "statsd_host": "127.0.0.1",
+            "statsd_port": 8125,
         },
     }
 
@@ -109,12 +177,18 @@ def save_config(config: Dict[str, Any]) -> None:
     # Ensure parent directory exists
     config_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Write config file
-    with open(config_path, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
-
-    # Set permissions to 600 (user read/write only)
-    config_path.chmod(0o600)
+    # Write to a private temporary file and rename it into place, so processes starting
+    # at the same time (e.g. several workers) never read a half-written config.
+    fd, tmp = tempfile.mkstemp(prefix=CONFIG_FILE_NAME + ".", dir=str(config_path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2, ensure_ascii=False)
+        # Set permissions to 600 (user read/write only)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, config_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 def get_api_token() -> str:
@@ -0,0 +1,350 @@
+"""Compact columnar representation of a MinerU content_list.
+
+A content_list element is a dict with string keys plus a 4-element bbox list, which costs
+several hundred bytes per element once loaded. `Document` stores the same data in typed
+columns instead:
+
+- element types as interned small-int codes (`array('H')`)
+- `page_idx`, `text_level` and flattened bboxes as `array` columns
+- all text in one UTF-8 buffer addressed by offsets
+- rarely present fields (img_path, captions, table_body, ...) in a sparse side table,
+  along with any core field whose value does not fit its column (kept verbatim)
+
+Columns are plain `array.array` objects, so they can be wrapped zero-copy by NumPy via
+`Document.to_numpy()` when NumPy is installed. The built-in queries are plain scans over
+the columns (narrowed to one page by binary search) and need no NumPy.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+
+# Seeded so the common types get the same code in every Document.
+KNOWN_TYPES = (
+    "text",
+    "image",
+    "table",
+    "equation",
+    "list",
+    "page_footnote",
+    "page_number",
+    "aside_text",
+    "header",
+    "footer",
+    "code",
+    "ref_text",
+)
+
+_CORE_KEYS = frozenset({"type", "text", "text_level", "bbox", "page_idx"})
+
+# Per-element presence flags (a key may be absent rather than empty).
+_HAS_TEXT = 1
+_HAS_BBOX = 2
+_HAS_PAGE = 4
+_HAS_LEVEL = 8
+
+# Ranges of the page_idx ("i") and text_level ("b") columns.
+_PAGE_RANGE = range(-(2**31), 2**31)
+_LEVEL_RANGE = range(-128, 128)
+
+
+class Document:
+    """Columnar, read-only view of one document's content_list."""
+
+    __slots__ = (
+        "type_names",
+        "_type_index",
+        "type_codes",
+        "page_idx",
+        "text_level",
+        "bbox",
+        "flags",
+        "_text",
+        "_text_offsets",
+        "extras",
+        "_page_sorted",
+    )
+
+    def __init__(self) -> None:
+        self.type_names: List[str] = list(KNOWN_TYPES)
+        self._type_index: Dict[str, int] = {name: i for i, name in enumerate(self.type_names)}
+        self.type_codes = array("H")
+        self.page_idx = array("i")
+        self.text_level = array("b")
+        self.bbox = array("d")  # 4 floats per element: x0, y0, x1, y1
+        self.flags = array("B")
+        self._text = b""
+        self._text_offsets = array("I", [0])
+        self.extras: Dict[int, Dict[str, Any]] = {}
+        self._page_sorted = True
+
+    # ------------------------------------------------------------------ construction
+
+    @classmethod
+    def from_content_list(cls, content_list: Iterable[Dict[str, Any]]) -> "Document":
+        """Build a Document from content_list elements (any iterable of dicts).
+
+        A page_idx or text_level that is not an integer in its column's range, a bbox
+        that is not 4 numbers, or a text that is not a string is kept verbatim in extras
+        and the element is treated as having none.
+        """
+        doc = cls()
+        chunks: List[bytes] = []
+        offset = 0
+        last_page = None
+
+        for i, item in enumerate(content_list):
+            flags = 0
+            extra = {k: v for k, v in item.items() if k not in _CORE_KEYS}
+            doc.type_codes.append(doc._intern(item["type"]))
+
+            page = item.get("page_idx")
+            if _fits(page, _PAGE_RANGE):
+                flags |= _HAS_PAGE
+            else:
+                if page is not None:
+                    extra["page_idx"] = page
+                page = -1
+            # Missing pages are stored as -1 and take part in the order page_range bisects.
+            if last_page is not None and page < last_page:
+                doc._page_sorted = False
+            last_page = page
+            doc.page_idx.append(page)
+
+            level = item.get("text_level")
+            if _fits(level, _LEVEL_RANGE):
+                flags |= _HAS_LEVEL
+            else:
+                if level is not None:
+                    extra["text_level"] = level
+                level = 0
+            doc.text_level.append(level)
+
+            bbox = item.get("bbox")
+            coords = _coords(bbox)
+            if coords is not None:
+                flags |= _HAS_BBOX
+                doc.bbox.extend(coords)
+            else:
+                if bbox is not None:
+                    extra["bbox"] = bbox
+                doc.bbox.extend((-1.0, -1.0, -1.0, -1.0))
+
+            text = item.get("text")
+            if isinstance(text, str):
+                flags |= _HAS_TEXT
+                encoded = text.encode("utf-8", "surrogatepass")
+                chunks.append(encoded)
+                offset += len(encoded)
+            elif text is not None:
+                extra["text"] = text
+            doc._text_offsets.append(offset)
+            doc.flags.append(flags)
+
+            if extra:
+                doc.extras[i] = extra
+
+        doc._text = b"".join(chunks)
+        return doc
+
+    @classmethod
+    def load(cls, path: Path) -> "Document":
+        """Load a Document from a *_content_list.json file or a document directory."""
+        from .rebuild import find_content_list, load_content_list
+
+        path = Path(path)
+        if path.is_dir():
+            found = find_content_list(path)
+            if found is None:
+                raise FileNotFoundError(f"No content_list.json found in {path}")
+            path = found
+        return cls.from_content_list(load_content_list(path))
+
+    def _intern(self, type_name: str) -> int:
+        code = self._type_index.get(type_name)
+        if code is None:
+            code = len(self.type_names)
+            self.type_names.append(type_name)
+            self._type_index[type_name] = code
+        return code
+
+    # ------------------------------------------------------------------ element access
+
+    def __len__(self) -> int:
+        return len(self.type_codes)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate elements as content_list dicts (so renderers accept a Document)."""
+        for i in range(len(self)):
+            yield self.element(i)
+
+    def type_of(self, i: int) -> str:
+        return self.type_names[self.type_codes[i]]
+
+    def text_of(self, i: int) -> str:
+        data = self._text[self._text_offsets[i] : self._text_offsets[i + 1]]
+        return data.decode("utf-8", "surrogatepass")
+
+    def bbox_of(self, i: int) -> Optional[List[float]]:
+        if not self.flags[i] & _HAS_BBOX:
+            return None
+        return list(self.bbox[4 * i : 4 * i + 4])
+
+    def element(self, i: int) -> Dict[str, Any]:
+        """Reconstruct element i as a content_list dict."""
+        flags = self.flags[i]
+        item: Dict[str, Any] = {"type": self.type_of(i)}
+        if flags & _HAS_TEXT:
+            item["text"] = self.text_of(i)
+        if flags & _HAS_LEVEL:
+            item["text_level"] = self.text_level[i]
+        if flags & _HAS_BBOX:
+            item["bbox"] = [_as_number(v) for v in self.bbox[4 * i : 4 * i + 4]]
+        if flags & _HAS_PAGE:
+            item["page_idx"] = self.page_idx[i]
+        extra = self.extras.get(i)
+        if extra:
+            item.update(extra)
+        return item
+
+    def to_content_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    # ------------------------------------------------------------------ queries
+
+    def type_code(self, type_name: str) -> Optional[int]:
+        """Interned code of a type name (None for types never seen by this document)."""
+        return self._type_index.get(type_name)
+
+    def type_counts(self) -> Counter:
+        """Count elements per type, like Counter(item["type"] for item in content_list)."""
+        counts = Counter(self.type_codes)
+        return Counter({self.type_names[code]: n for code, n in counts.items()})
+
+    def page_counts(self) -> Counter:
+        """Count elements per page_idx."""
+        return Counter(self.page_idx)
+
+    @property
+    def num_pages(self) -> int:
+        return max(self.page_idx, default=-1) + 1
+
+    def page_range(self, page: int) -> Sequence[int]:
+        """Element indices on one page.
+
+        content_list is emitted in page order, so this is a binary search; unsorted input
+        falls back to a scan.
+        """
+        if self._page_sorted:
+            return range(bisect_left(self.page_idx, page), bisect_right(self.page_idx, page))
+        return [i for i, p in enumerate(self.page_idx) if p == page]
+
+    def select(
+        self, type: Optional[str] = None, page: Optional[int] = None  # noqa: A002
+    ) -> List[int]:
+        """Element indices matching an optional type and/or page (a linear scan)."""
+        candidates: Iterable[int] = range(len(self)) if page is None else self.page_range(page)
+        if type is None:
+            return list(candidates)
+        code = self._type_index.get(type)
+        if code is None:
+            return []
+        codes = self.type_codes
+        return [i for i in candidates if codes[i] == code]
+
+    def footnotes(self, page: Optional[int] = None) -> List[int]:
+        """Indices of page footnotes, optionally restricted to one page."""
+        return self.select(type="page_footnote", page=page)
+
+    def in_bbox(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        page: Optional[int] = None,
+        intersects: bool = False,
+    ) -> List[int]:
+        """Indices of elements inside (or, with intersects=True, overlapping) a rectangle.
+
+        Coordinates use the content_list's own bbox space. This is a linear scan over the
+        bbox column (of one page if given); use to_numpy() for vectorised queries.
+        """
+        candidates: Iterable[int] = range(len(self)) if page is None else self.page_range(page)
+        b, flags = self.bbox, self.flags
+        hits = []
+        for i in candidates:
+            if not flags[i] & _HAS_BBOX:
+                continue
+            ex0, ey0, ex1, ey1 = b[4 * i], b[4 * i + 1], b[4 * i + 2], b[4 * i + 3]
+            if intersects:
+                if ex0 <= x1 and ex1 >= x0 and ey0 <= y1 and ey1 >= y0:
+                    hits.append(i)
+            elif ex0 >= x0 and ey0 >= y0 and ex1 <= x1 and ey1 <= y1:
+                hits.append(i)
+        return hits
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Zero-copy NumPy views of the columns (requires NumPy).
+
+        Returns:
+            Dict with "type_codes", "page_idx", "text_level", "flags" (1-D) and "bbox"
+            (n x 4) arrays
+        """
+        try:
+            import numpy as np
+        except ImportError as e:  # pragma: no cover - optional dependency
+            raise ImportError("Document.to_numpy() requires NumPy (pip install numpy)") from e
+
+        return {
+            "type_codes": np.frombuffer(self.type_codes, dtype=np.uint16),
+            "page_idx": np.frombuffer(self.page_idx, dtype=np.int32),
+            "text_level": np.frombuffer(self.text_level, dtype=np.int8),
+            "flags": np.frombuffer(self.flags, dtype=np.uint8),
+            "bbox": np.frombuffer(self.bbox, dtype=np.float64).reshape(-1, 4),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and the text buffer (extras excluded)."""
+        columns = (
+            self.type_codes,
+            self.page_idx,
+            self.text_level,
+            self.bbox,
+            self.flags,
+            self._text_offsets,
+        )
+        return sum(c.itemsize * len(c) for c in columns) + len(self._text)
+
+
+def _fits(value: Any, bounds: range) -> bool:
+    """Whether value is an int (not a bool) that an array column of bounds can hold."""
+    return isinstance(value, int) and not isinstance(value, bool) and value in bounds
+
+
+def _coords(bbox: Any) -> Optional[List[float]]:
+    """bbox as 4 floats, or None unless it is 4 numbers that floats hold exactly."""
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return None
+    coords = []
+    for value in bbox:
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return None
+        try:
+            number = float(value)
+        except OverflowError:
+            return None
+        if number != value:
+            return None  # An int beyond 2**53 would not round-trip
+        coords.append(number)
+    return coords
+
+
+def _as_number(value: float) -> Union[int, float]:
+    """Return floats that hold whole numbers as ints (content_list bboxes are ints)."""
+    return int(value) if value.is_integer() else value
+
@@ -0,0 +1,594 @@
+"""Local stand-in for the MinerU cloud API, for offline testing and benchmarking.
+
+`FakeMinerU` serves the endpoints `MinerUClient` uses over real HTTP on localhost:
+
+- POST /api/v4/file-urls/batch: creates a batch and returns presigned upload URLs
+- PUT /upload/<batch>/<n>: receives a file
+- POST /api/v4/extract/task/batch: creates a batch of URL tasks, queued at once (the
+  URLs are not fetched)
+- GET /api/v4/extract-results/batch/<batch>: task states progressing from
+  "waiting-file" through "pending" (queued behind `queue_depth` running tasks) and
+  "running" (with extract_progress, `page_time` seconds per page) to "done" or "failed"
+- GET /zip/<batch>/<n>: a result ZIP with full.md, full.html, content_list, layout.json
+  and images, padded to `zip_size` bytes
+
+Latency, HTTP 500s, 429s and failed tasks can be injected; injected faults are drawn from
+a seeded RNG so runs are reproducible. `counts` records requests per endpoint.
+
+`FakePicGo` stands in for a PicGo upload server (see p2r.picgo) and `FakeCrossRef` for
+the CrossRef works API (see p2r.metadata) in the same way.
+"""
+
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import parse_qs, urlsplit
+
+
+API_PREFIX = "/api/v4"
+
+_S = TypeVar("_S", bound="_FakeServer")
+
+
+def build_result_zip(name: str, pages: int, zip_size: int = 0) -> bytes:
+    """A MinerU-like result ZIP for a document with the given number of pages.
+
+    Args:
+        name: Stem of the uploaded file (used for raw artifact names)
+        pages: Number of pages
+        zip_size: Minimum archive size in bytes, reached with an incompressible image
+
+    Returns:
+        The ZIP archive
+    """
+    content_list: List[Dict[str, Any]] = []
+    layout_pages = []
+    md = []
+    for page in range(pages):
+        heading = f"Section {page + 1}"
+        text = f"Text of page {page + 1}. " * 20
+        title_box, text_box = [60, 60, 500, 90], [60, 100, 540, 700]
+        content_list.append(
+            {"type": "text", "text": heading, "text_level": 1, "page_idx": page, "bbox": title_box}
+        )
+        content_list.append({"type": "text", "text": text, "page_idx": page, "bbox": text_box})
+        blocks = [{"type": "title", "bbox": title_box}, {"type": "text", "bbox": text_box}]
+        layout_pages.append({"page_idx": page, "para_blocks": blocks})
+        md.append(f"# {heading}\n\n{text}\n")
+
+    if zip_size > 0:
+        md.append("![](images/padding.jpg)\n")
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("full.md", "\n".join(md))
+        headings = "".join(f"<h1>Section {p + 1}</h1>" for p in range(pages))
+        zf.writestr("full.html", f"<html><body>{headings}</body></html>")
+        zf.writestr(f"{name}_content_list.json", json.dumps(content_list))
+        zf.writestr("layout.json", json.dumps({"pdf_info": layout_pages}))
+        if zip_size > 0:
+            # Random bytes do not compress, so the archive grows by about this much.
+            padding = random.Random(zip_size).getrandbits(8 * zip_size).to_bytes(zip_size, "big")
+            zf.writestr("images/padding.jpg", padding, compress_type=zipfile.ZIP_STORED)
+    return buf.getvalue()
+
+
+class _Task:
+    def __init__(self, name: str, pages: int, fail: bool, data_id: Optional[str] = None):
+        self.name = name
+        self.data_id = data_id
+        self.pages = pages
+        self.fail = fail
+        self.uploaded_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+
+class _FakeServer:
+    """Server lifecycle shared by the fake servers, usable as a context manager.
+
+    A ThreadingHTTPServer is served on a free localhost port from a daemon thread.
+    Subclasses provide their request handler class (_handler) and the URL start()
+    returns (_url, base_url by default).
+    """
+
+    def __init__(self):
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type:
+        raise NotImplementedError
+
+    def _url(self) -> str:
+        return self.base_url
+
+    def start(self) -> str:
+        """Start serving on a free localhost port.
+
+        Returns:
+            The URL to give the client under test
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._url()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self: _S) -> _S:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler base of the fake servers: quiet, keep-alive, JSON helpers."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+
+class FakeMinerU(_FakeServer):
+    """A fake MinerU API server running in a background thread.
+
+    Example:
+        with FakeMinerU(page_time=0.01) as server:
+            client = MinerUClient(api_token="test", api_base_url=server.api_base_url)
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        queue_depth: int = 0,
+        pages: int = 10,
+        page_time: float = 0.01,
+        pending_time: float = 0.0,
+        zip_size: int = 0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+        token: Optional[str] = None,
+    ):
+        """Configure the fake service.
+
+        Args:
+            latency: Seconds added before every response
+            queue_depth: Tasks parsed at once; later ones stay "pending" (0 = unlimited)
+            pages: Pages per document
+            page_time: Seconds of "running" per page
+            pending_time: Minimum seconds in "pending" after upload
+            zip_size: Minimum result ZIP size in bytes
+            error_rate: Fraction of API requests answered with HTTP 500
+            throttle_rate: Fraction of API requests answered with HTTP 429
+            fail_rate: Fraction of tasks ending in state "failed"
+            seed: Seed of the fault-injection RNG
+            token: Required bearer token (None accepts any)
+        """
+        super().__init__()
+        self.latency = latency
+        self.queue_depth = queue_depth
+        self.pages = pages
+        self.page_time = page_time
+        self.pending_time = pending_time
+        self.zip_size = zip_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.fail_rate = fail_rate
+        self.token = token
+        self.counts: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._batches: Dict[str, List[_Task]] = {}
+        self._queue: List[_Task] = []  # Tasks not yet started, in submission order
+        self._slots: List[float] = []  # When each parse slot frees up
+        self._zips: Dict[Tuple[str, int], bytes] = {}
+
+    @property
+    def api_base_url(self) -> str:
+        return self.base_url + API_PREFIX
+
+    def _handler(self) -> type:
+        return _make_handler(self)
+
+    def _url(self) -> str:
+        # start() returns the API base URL to give MinerUClient.
+        return self.api_base_url
+
+    def _count(self, endpoint: str) -> None:
+        with self._lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def _inject(self) -> Optional[int]:
+        """HTTP status of an injected fault for this API request, if any."""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def _schedule(self, now: float) -> None:
+        """Move uploaded tasks through the parse queue up to now (lock held)."""
+        for task in self._queue:
+            if task.uploaded_at is None:
+                continue
+            ready = task.uploaded_at + self.pending_time
+            if self.queue_depth and len(self._slots) >= self.queue_depth:
+                # Every slot is taken: start when the earliest one frees up.
+                self._slots.sort()
+                start = max(ready, self._slots[0])
+                if start > now:
+                    break  # Later tasks wait behind this one (FIFO)
+                self._slots.pop(0)
+            else:
+                start = ready
+                if start > now:
+                    continue
+            task.started_at = start
+            task.finished_at = start + task.pages * self.page_time
+            if self.queue_depth:
+                self._slots.append(task.finished_at)
+        self._queue = [task for task in self._queue if task.started_at is None]
+
+    def create_batch(
+        self, files: List[Dict[str, Any]], uploaded: bool = False
+    ) -> Tuple[str, List[str]]:
+        """Queue one task per file entry ({"name"} or {"url"}, optional "data_id").
+
+        Returns:
+            Tuple of (batch_id, upload URLs); URL tasks count as uploaded right away
+        """
+        batch_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            tasks = []
+            for f in files:
+                name = f.get("name") or f.get("url", "").rstrip("/").rsplit("/", 1)[-1]
+                task = _Task(
+                    re.sub(r"\.pdf$", "", name or "file.pdf", flags=re.I),
+                    self.pages,
+                    self._rng.random() < self.fail_rate,
+                    f.get("data_id"),
+                )
+                if uploaded:
+                    task.uploaded_at = now
+                tasks.append(task)
+            self._batches[batch_id] = tasks
+            self._queue.extend(tasks)
+        urls = [f"{self.base_url}/upload/{batch_id}/{n}" for n in range(len(tasks))]
+        return batch_id, urls
+
+    def task(self, batch_id: str, n: int) -> Optional[_Task]:
+        tasks = self._batches.get(batch_id)
+        return tasks[n] if tasks is not None and 0 <= n < len(tasks) else None
+
+    def mark_uploaded(self, task: _Task) -> None:
+        with self._lock:
+            task.uploaded_at = time.monotonic()
+
+    def batch_status(self, batch_id: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.monotonic()
+        with self._lock:
+            tasks = self._batches.get(batch_id)
+            if tasks is None:
+                return None
+            self._schedule(now)
+            results = []
+            for n, task in enumerate(tasks):
+                result: Dict[str, Any] = {"file_name": task.name + ".pdf"}
+                if task.data_id is not None:
+                    result["data_id"] = task.data_id
+                if task.uploaded_at is None:
+                    result["state"] = "waiting-file"
+                elif task.started_at is None or task.started_at > now:
+                    result["state"] = "pending"
+                elif task.finished_at > now:
+                    done = int((now - task.started_at) / self.page_time) if self.page_time else 0
+                    result["state"] = "running"
+                    result["extract_progress"] = {
+                        "extracted_pages": min(done, task.pages),
+                        "total_pages": task.pages,
+                    }
+                elif task.fail:
+                    result["state"] = "failed"
+                    result["err_msg"] = "injected failure"
+                else:
+                    result["state"] = "done"
+                    result["full_zip_url"] = f"{self.base_url}/zip/{batch_id}/{n}"
+                results.append(result)
+            return results
+
+    def result_zip(self, batch_id: str, n: int) -> Optional[bytes]:
+        task = self.task(batch_id, n)
+        if task is None or task.finished_at is None or task.fail:
+            return None
+        key = (task.name, task.pages)
+        with self._lock:
+            if key not in self._zips:
+                self._zips[key] = build_result_zip(task.name, task.pages, self.zip_size)
+            return self._zips[key]
+
+
+def _make_handler(fake: FakeMinerU) -> type:
+    class Handler(_Handler):
+        def _read_body(self) -> bytes:
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                data = bytearray()
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return bytes(data)
+                    data += self.rfile.read(size)
+                    self.rfile.readline()
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _api_guard(self, endpoint: str) -> bool:
+            """Count the request, apply latency and faults; False if already answered."""
+            fake._count(endpoint)
+            if fake.latency:
+                time.sleep(fake.latency)
+            if not endpoint.startswith("api."):
+                return True
+            if fake.token is not None and (
+                self.headers.get("Authorization") != f"Bearer {fake.token}"
+            ):
+                self._json({"code": -10001, "msg": "invalid token"}, 401)
+                return False
+            status = fake._inject()
+            if status is not None:
+                self._json({"code": -status, "msg": "injected error"}, status)
+                return False
+            return True
+
+        def do_POST(self) -> None:  # noqa: N802 (http.server naming)
+            body = self._read_body()
+            endpoints = {
+                f"{API_PREFIX}/file-urls/batch": "api.file_urls",
+                f"{API_PREFIX}/extract/task/batch": "api.task_batch",
+            }
+            endpoint = endpoints.get(self.path)
+            if endpoint is None:
+                self._json({"code": -404, "msg": "not found"}, 404)
+                return
+            if not self._api_guard(endpoint):
+                return
+            try:
+                files = json.loads(body or b"{}").get("files") or []
+            except ValueError:
+                files = []
+            if not files:
+                self._json({"code": -60001, "msg": "no files"})
+                return
+            if endpoint == "api.task_batch":
+                if not all(f.get("url") for f in files):
+                    self._json({"code": -60003, "msg": "file url is required"})
+                    return
+                batch_id, _ = fake.create_batch(files, uploaded=True)
+                self._json({"code": 0, "data": {"batch_id": batch_id}})
+                return
+            batch_id, urls = fake.create_batch(files)
+            self._json({"code": 0, "data": {"batch_id": batch_id, "file_urls": urls}})
+
+        def do_PUT(self) -> None:  # noqa: N802
+            body = self._read_body()
+            match = re.fullmatch(r"/upload/(\w+)/(\d+)", self.path)
+            task = match and fake.task(match.group(1), int(match.group(2)))
+            if not self._api_guard("upload"):
+                return
+            if not task or not body:
+                self._send(400 if task else 404, b"", "text/plain")
+                return
+            fake.mark_uploaded(task)
+            self._send(200, b"", "text/plain")
+
+        def do_GET(self) -> None:  # noqa: N802
+            match = re.fullmatch(rf"{API_PREFIX}/extract-results/batch/(\w+)", self.path)
+            if match:
+                if not self._api_guard("api.batch_status"):
+                    return
+                results = fake.batch_status(match.group(1))
+                if results is None:
+                    self._json({"code": -60002, "msg": "batch not found"})
+                else:
+                    self._json(
+                        {"code": 0, "data": {"batch_id": match.group(1), "extract_result": results}}
+                    )
+                return
+            match = re.fullmatch(r"/zip/(\w+)/(\d+)", self.path)
+            if match:
+                self._api_guard("zip")
+                data = fake.result_zip(match.group(1), int(match.group(2)))
+                if data is None:
+                    self._send(404, b"", "text/plain")
+                else:
+                    self._send(200, data, "application/zip")
+                return
+            self._json({"code": -404, "msg": "not found"}, 404)
+
+    return Handler
+
+
+class FakePicGo(_FakeServer):
+    """A fake PicGo upload server running in a background thread.
+
+    POST /upload with {"list": [<path>, ...]} reads the files and answers
+    {"success": true, "result": [<url>, ...]}, one http://<host>/i/<sha256><suffix> URL per
+    file; GET on a URL returns the bytes. `counts["upload"]` counts uploaded files and
+    `max_in_flight` records the most requests served at once.
+
+    Example:
+        with FakePicGo() as picgo:
+            uploader = PicGoUploader(api_url=picgo.api_url)
+    """
+
+    def __init__(self, latency: float = 0.0, fail: bool = False):
+        """Configure the fake server.
+
+        Args:
+            latency: Seconds added before every upload response
+            fail: Answer every upload with {"success": false}
+        """
+        super().__init__()
+        self.latency = latency
+        self.fail = fail
+        self.counts: Dict[str, int] = {}
+        self.max_in_flight = 0
+        self.images: Dict[str, bytes] = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self) -> str:
+        return self.base_url + "/upload"
+
+    def _handler(self) -> type:
+        return _make_picgo_handler(self)
+
+    def _url(self) -> str:
+        # start() returns the upload endpoint URL.
+        return self.api_url
+
+    def upload(self, paths: List[str]) -> Optional[List[str]]:
+        """Store the files; their URLs, or None if any cannot be read."""
+        urls = []
+        for path in paths:
+            try:
+                data = Path(path).read_bytes()
+            except OSError:
+                return None
+            name = hashlib.sha256(data).hexdigest() + Path(path).suffix.lower()
+            with self._lock:
+                self.images[name] = data
+                self.counts["upload"] = self.counts.get("upload", 0) + 1
+            urls.append(f"{self.base_url}/i/{name}")
+        return urls
+
+
+def _make_picgo_handler(fake: FakePicGo) -> type:
+    class Handler(_Handler):
+        def do_POST(self) -> None:  # noqa: N802 (http.server naming)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path != "/upload":
+                self._json({"success": False, "message": "not found"}, 404)
+                return
+            with fake._lock:
+                fake._in_flight += 1
+                fake.max_in_flight = max(fake.max_in_flight, fake._in_flight)
+            try:
+                if fake.latency:
+                    time.sleep(fake.latency)
+                try:
+                    paths = json.loads(body or b"{}").get("list") or []
+                except ValueError:
+                    paths = []
+                urls = None if fake.fail or not paths else fake.upload(paths)
+                if urls is None:
+                    self._json({"success": False, "message": "upload failed"})
+                else:
+                    self._json({"success": True, "result": urls})
+            finally:
+                with fake._lock:
+                    fake._in_flight -= 1
+
+        def do_GET(self) -> None:  # noqa: N802
+            match = re.fullmatch(r"/i/([\w.]+)", self.path)
+            data = fake.images.get(match.group(1)) if match else None
+            if data is None:
+                self._send(404, b"", "text/plain")
+            else:
+                self._send(200, data, "application/octet-stream")
+
+    return Handler
+
+
+class FakeCrossRef(_FakeServer):
+    """A fake CrossRef REST API serving given work records.
+
+    GET /works?filter=doi:<doi>,doi:<doi>...&rows=<n> answers {"status": "ok", "message":
+    {"items": [...]}} with the records of the DOIs it knows. `counts["works"]` counts
+    requests and `counts["dois"]` the DOIs asked about.
+
+    Example:
+        with FakeCrossRef({"10.1/x": {"DOI": "10.1/x", "title": ["A"]}}) as crossref:
+            resolver = DOIResolver(api_url=crossref.base_url)
+    """
+
+    def __init__(self, records: Optional[Dict[str, Dict[str, Any]]] = None, latency: float = 0.0):
+        """Configure the fake API.
+
+        Args:
+            records: Work records by DOI (CrossRef "message" objects)
+            latency: Seconds added before every response
+        """
+        super().__init__()
+        self.records = {doi.lower(): record for doi, record in (records or {}).items()}
+        self.latency = latency
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _handler(self) -> type:
+        # start() returns base_url, the API base URL to give DOIResolver.
+        return _make_crossref_handler(self)
+
+    def works(self, dois: List[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.counts["works"] = self.counts.get("works", 0) + 1
+            self.counts["dois"] = self.counts.get("dois", 0) + len(dois)
+        return [self.records[doi.lower()] for doi in dois if doi.lower() in self.records]
+
+
+def _make_crossref_handler(fake: FakeCrossRef) -> type:
+    class Handler(_Handler):
+        def do_GET(self) -> None:  # noqa: N802 (http.server naming)
+            url = urlsplit(self.path)
+            if url.path != "/works":
+                self._json({"status": "error", "message": "not found"}, 404)
+                return
+            if fake.latency:
+                time.sleep(fake.latency)
+            filters = (parse_qs(url.query).get("filter") or [""])[0]
+            dois = [f[4:] for f in filters.split(",") if f.startswith("doi:")]
+            items = fake.works(dois)
+            self._json(
+                {
+                    "status": "ok",
+                    "message-type": "work-list",
+                    "message": {"items": items, "total-results": len(items)},
+                }
+            )
+
+    return Handler
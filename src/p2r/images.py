@@ -0,0 +1,399 @@
+"""Post-extraction image stage: dimensions, transcoding, thumbnails and lazy-loading HTML.
+
+MinerU serves extracted JPEGs as-is, and its HTML inlines every image as a base64 data
+URI, so browsers must download and decode all of them before first paint. This stage:
+
+1. moves inline data-URI images of MinerU's HTML into images/ so they can load lazily
+2. records the width/height of every image (read from the file header, no decoding)
+3. optionally re-encodes images (WebP/AVIF, quality cap, max dimension) and generates
+   thumbnails across a process pool (requires Pillow)
+4. writes images.json and annotates <img> tags with loading="lazy", decoding="async",
+   explicit dimensions and a srcset of the generated variants
+
+`p2r.rebuild.rebuild_html` reads the same images.json.
+"""
+
+import base64
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import struct
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+IMAGES_MANIFEST_NAME = "images.json"
+THUMBS_DIR = "thumbs"
+
+# Matches the CSS max-width of the rebuilt HTML body.
+DEFAULT_SIZES = "(max-width: 800px) 100vw, 800px"
+
+_IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_SRC_RE = re.compile(r'\bsrc\s*=\s*"([^"]*)"', re.IGNORECASE)
+_DATA_URI_RE = re.compile(r"data:image/([a-zA-Z0-9.+-]+);base64,(.*)", re.DOTALL)
+
+_EXTENSIONS = {"jpeg": ".jpg", "jpg": ".jpg", "png": ".png", "gif": ".gif", "webp": ".webp"}
+
+
+def default_options() -> Dict[str, Any]:
+    """Default image stage options (mirrors the "images" config section)."""
+    return {
+        "format": "webp",  # "webp", "avif" or "" to keep the original encoding
+        "quality": 80,
+        "max_dimension": 2000,  # of transcoded variants; 0 disables downscaling
+        "thumbnail_width": 320,  # 0 disables thumbnails
+        "workers": 0,  # 0 = one per CPU
+    }
+
+
+def has_pillow() -> bool:
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def image_size_from_bytes(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a JPEG, PNG, GIF or WebP header without decoding pixels."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            w, h = struct.unpack("<HH", data[26:30])
+            return w & 0x3FFF, h & 0x3FFF
+        if chunk == b"VP8L":
+            b = data[21:25]
+            w = 1 + (((b[1] & 0x3F) << 8) | b[0])
+            h = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+            return w, h
+        if chunk == b"VP8X":
+            w = 1 + int.from_bytes(data[24:27], "little")
+            h = 1 + int.from_bytes(data[27:30], "little")
+            return w, h
+        return None
+    if data[:2] == b"\xff\xd8":
+        pos = 2
+        while pos + 9 < len(data):
+            if data[pos] != 0xFF:
+                pos += 1
+                continue
+            marker = data[pos + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                pos += 1 if marker == 0xFF else 2
+                continue
+            (length,) = struct.unpack(">H", data[pos + 2 : pos + 4])
+            # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC) carry the frame size.
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                h, w = struct.unpack(">HH", data[pos + 5 : pos + 9])
+                return w, h
+            pos += 2 + length
+    return None
+
+
+def image_size(path: Path) -> Optional[Tuple[int, int]]:
+    """Read (width, height) of an image file from its header."""
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    size = image_size_from_bytes(head)
+    if size is None and head[:2] == b"\xff\xd8":
+        # Large EXIF/ICC segments can push the JPEG frame header further out.
+        size = image_size_from_bytes(Path(path).read_bytes())
+    return size
+
+
+def externalize_inline_images(html_text: str, images_dir: Path) -> Tuple[str, int]:
+    """Move base64 data-URI images of an HTML document into files under images_dir.
+
+    Files are named by the SHA-256 of their bytes, like MinerU's own images.
+
+    Returns:
+        (rewritten HTML, number of images moved out)
+    """
+    moved = 0
+
+    def replace_src(tag_match: "re.Match") -> str:
+        nonlocal moved
+        tag = tag_match.group()
+        src = _SRC_RE.search(tag)
+        if not src:
+            return tag
+        data_uri = _DATA_URI_RE.fullmatch(src.group(1).strip())
+        if not data_uri:
+            return tag
+        try:
+            data = base64.b64decode(data_uri.group(2))
+        except ValueError:
+            return tag
+        ext = _EXTENSIONS.get(data_uri.group(1).lower(), "." + data_uri.group(1).lower())
+        name = hashlib.sha256(data).hexdigest() + ext
+        images_dir.mkdir(parents=True, exist_ok=True)
+        target = images_dir / name
+        if not target.exists():
+            target.write_bytes(data)
+        moved += 1
+        rel = f"{images_dir.name}/{name}"
+        return tag[: src.start(1)] + html.escape(rel) + tag[src.end(1) :]
+
+    return _IMG_TAG_RE.sub(replace_src, html_text), moved
+
+
+def _variant_path(images_dir: Path, name: str, fmt: str, thumb: bool = False) -> Path:
+    stem = Path(name).stem
+    base = images_dir / THUMBS_DIR if thumb else images_dir
+    return base / f"{stem}.{fmt}"
+
+
+def _save_variant(
+    im: Any, target: Path, fmt: str, quality: int, box: Tuple[int, int], reuse_after: float
+) -> Dict[str, Any]:
+    """Write a downscaled copy of im (unless an up-to-date one exists) and describe it."""
+    if reuse_after and target.exists() and target.stat().st_mtime >= reuse_after:
+        size = image_size(target)
+        if size:
+            return {"width": size[0], "height": size[1]}
+    out = im.copy()
+    if out.size[0] > box[0] or out.size[1] > box[1]:
+        out.thumbnail(box)
+    pil_format = "JPEG" if fmt in ("jpg", "jpeg") else fmt.upper()
+    if pil_format == "JPEG" and out.mode not in ("RGB", "L"):
+        out = out.convert("RGB")
+    target.parent.mkdir(exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp")
+    out.save(tmp, format=pil_format, quality=quality)
+    os.replace(tmp, target)
+    return {"width": out.size[0], "height": out.size[1]}
+
+
+def _process_one(job: Tuple[str, str, Dict[str, Any], bool, bool]) -> Tuple[str, Dict[str, Any]]:
+    """Worker: measure one image and, with Pillow, write its variants."""
+    path_str, images_dir_str, options, use_pillow, reuse = job
+    path, images_dir = Path(path_str), Path(images_dir_str)
+    info: Dict[str, Any] = {}
+    size = image_size(path)
+    if size:
+        info["width"], info["height"] = size
+    if not use_pillow:
+        return path.name, info
+
+    from PIL import Image
+
+    fmt = options.get("format") or ""
+    quality = int(options.get("quality") or 80)
+    max_dim = int(options.get("max_dimension") or 0)
+    thumb_w = int(options.get("thumbnail_width") or 0)
+    reuse_after = path.stat().st_mtime if reuse else 0.0
+
+    with Image.open(path) as im:
+        info["width"], info["height"] = im.size
+        if im.mode not in ("RGB", "RGBA", "L"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+
+        # Without a target format there is no variant to downscale into: originals keep
+        # their hash names (and may be hardlinked into the image store), so they are
+        # never resized in place.
+        if fmt:
+            target = _variant_path(images_dir, path.name, fmt)
+            if target != path:
+                box = (max_dim, max_dim) if max_dim else im.size
+                variant = _save_variant(im, target, fmt, quality, box, reuse_after)
+                info["variant"] = dict(variant, path=target.name)
+
+        if thumb_w and im.size[0] > thumb_w:
+            ext = fmt or "jpg"
+            target = _variant_path(images_dir, path.name, ext, thumb=True)
+            thumb = _save_variant(
+                im, target, ext, quality, (thumb_w, thumb_w * 10), reuse_after
+            )
+            info["thumbnail"] = dict(thumb, path=f"{THUMBS_DIR}/{target.name}")
+    return path.name, info
+
+
+def image_pool(workers: int = 0) -> ProcessPoolExecutor:
+    """A process pool for process_images, to share across the documents of a run.
+
+    Processes are spawned (not forked): forking a multi-threaded process, such as one
+    running p2r.convert_many, can deadlock the child on a lock another thread held.
+
+    Args:
+        workers: Worker processes (0: one per CPU)
+    """
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=int(workers or 0) or None, mp_context=context)
+
+
+def process_images(
+    images_dir: Path,
+    options: Optional[Dict[str, Any]] = None,
+    transcode: bool = True,
+    reuse: bool = False,
+    pool: Optional[Executor] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Measure (and, with Pillow and transcode=True, re-encode) every image in images_dir.
+
+    With reuse=True, variants newer than their original are kept instead of re-encoded;
+    only pass it when they were produced with the same options. max_dimension applies to
+    transcoded variants only: with format "" (keep) originals are left at full size.
+
+    Pillow work runs in pool (see image_pool); without one, a pool is started for this
+    call alone, sized by the "workers" option.
+
+    Returns:
+        {file name: {"width", "height", optional "variant", optional "thumbnail"}}
+    """
+    opts = dict(default_options(), **(options or {}))
+    use_pillow = transcode and has_pillow()
+    names = sorted(
+        e.name
+        for e in os.scandir(images_dir)
+        if e.is_file() and not e.name.startswith(".") and Path(e.name).suffix.lower() != ".json"
+    )
+    # Skip variants written by an earlier run (same stem as an original, target format).
+    fmt = opts.get("format") or ""
+    stems = {}
+    for name in names:
+        stems.setdefault(Path(name).stem, []).append(name)
+    names = [
+        n
+        for n in names
+        if not (fmt and n.endswith("." + fmt) and len(stems[Path(n).stem]) > 1)
+    ]
+    jobs = [(str(images_dir / n), str(images_dir), opts, use_pillow, reuse) for n in names]
+    if not use_pillow or len(jobs) < 2:
+        # Header parsing is microseconds per image: not worth a process pool.
+        return dict(_process_one(job) for job in jobs)
+
+    if pool is not None:
+        return dict(pool.map(_process_one, jobs, chunksize=4))
+    with image_pool(opts.get("workers") or 0) as own_pool:
+        return dict(own_pool.map(_process_one, jobs, chunksize=4))
+
+
+def img_attributes(src: str, info: Optional[Dict[str, Any]], sizes: str = DEFAULT_SIZES) -> str:
+    """Extra <img> attributes for an image: lazy loading, dimensions and srcset."""
+    attrs = ['loading="lazy"', 'decoding="async"']
+    if not info:
+        return " ".join(attrs)
+    if info.get("width") and info.get("height"):
+        attrs.append(f'width="{info["width"]}" height="{info["height"]}"')
+
+    base = src.rsplit("/", 1)[0] + "/" if "/" in src else ""
+    candidates = []
+    for key in ("thumbnail", "variant"):
+        variant = info.get(key)
+        if variant:
+            candidates.append(f"{base}{variant['path']} {variant['width']}w")
+    if candidates:
+        if not info.get("variant") and info.get("width"):
+            candidates.append(f"{src} {info['width']}w")
+        attrs.append(f'srcset="{html.escape(", ".join(candidates))}"')
+        attrs.append(f'sizes="{sizes}"')
+    return " ".join(attrs)
+
+
+def annotate_html_images(html_text: str, manifest: Dict[str, Dict[str, Any]]) -> str:
+    """Add lazy-loading, dimension and srcset attributes to <img> tags that lack them."""
+
+    def annotate(tag_match: "re.Match") -> str:
+        tag = tag_match.group()
+        if re.search(r"\bloading\s*=", tag, re.IGNORECASE):
+            return tag
+        src = _SRC_RE.search(tag)
+        src_value = html.unescape(src.group(1)) if src else ""
+        info = manifest.get(src_value)
+        extra = img_attributes(src_value, info)
+        if re.search(r"\bwidth\s*=", tag, re.IGNORECASE):
+            extra = re.sub(r'width="\d+" height="\d+"', "", extra).replace("  ", " ")
+        end = -2 if tag.endswith("/>") else -1
+        return tag[:end].rstrip() + " " + extra.strip() + (" />" if end == -2 else ">")
+
+    return _IMG_TAG_RE.sub(annotate, html_text)
+
+
+def load_images_manifest(doc_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Load doc_dir/images.json as {"images/<name>": info} ({} if missing)."""
+    try:
+        with open(doc_dir / IMAGES_MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f).get("images", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def derived_images(doc_dir: Path) -> Set[str]:
+    """Paths ("images/<name>") of the variants and thumbnails listed in doc_dir/images.json.
+
+    They keep the hash stem of their original, so unlike MinerU's images their names do
+    not identify their content (see p2r.imagestore.image_key).
+    """
+    derived = set()
+    for src, info in load_images_manifest(doc_dir).items():
+        base = src.rsplit("/", 1)[0]
+        for key in ("variant", "thumbnail"):
+            if info.get(key):
+                derived.add(f"{base}/{info[key]['path']}")
+    return derived
+
+
+def postprocess_images(
+    doc_dir: Path,
+    options: Optional[Dict[str, Any]] = None,
+    transcode: bool = True,
+    pool: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """Run the image stage on one converted document directory.
+
+    Args:
+        doc_dir: Document output directory
+        options: Overrides of default_options()
+        transcode: Re-encode images and generate thumbnails (requires Pillow)
+        pool: Process pool shared with other documents (see image_pool)
+
+    Returns:
+        Summary {"images", "inlined_moved", "transcoded", "pillow"}
+    """
+    images_dir = doc_dir / "images"
+    html_files = [
+        p for p in sorted(doc_dir.glob("*.html")) if not p.name.startswith("rebuilt")
+    ]
+
+    moved = 0
+    html_texts = {}
+    for path in html_files:
+        text, n = externalize_inline_images(path.read_text(encoding="utf-8"), images_dir)
+        html_texts[path] = text
+        moved += n
+
+    opts = dict(default_options(), **(options or {}))
+    opts.pop("workers", None)  # Does not affect the output
+    try:
+        with open(doc_dir / IMAGES_MANIFEST_NAME, "r", encoding="utf-8") as f:
+            reuse = json.load(f).get("options") == opts
+    except (OSError, ValueError):
+        reuse = False
+
+    infos = {}
+    if images_dir.is_dir():
+        infos = process_images(images_dir, options, transcode=transcode, reuse=reuse, pool=pool)
+    manifest = {f"{images_dir.name}/{name}": info for name, info in infos.items()}
+
+    tmp = doc_dir / (IMAGES_MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "options": opts, "images": manifest}, f, indent=2)
+    os.replace(tmp, doc_dir / IMAGES_MANIFEST_NAME)
+
+    for path, text in html_texts.items():
+        path.write_text(annotate_html_images(text, manifest), encoding="utf-8")
+
+    return {
+        "images": len(manifest),
+        "inlined_moved": moved,
+        "transcoded": sum(1 for info in infos.values() if "variant" in info),
+        "pillow": has_pillow(),
+    }
@@ -0,0 +1,206 @@
+"""Cross-document content-addressed image store.
+
+MinerU names extracted images by the SHA-256 of their content, so identical figures,
+logos and equation renders share a name across documents. With a store configured, each
+image is kept once under `<store>/<first two hex digits>/<name>` and linked into every
+document's images/ directory: a hardlink when possible, a symlink when the store lives
+on another filesystem, and a plain copy as the last resort. Transcoded variants keep
+their original's name but not its content, so they are stored under their own hash.
+
+Hardlinked images are reference-counted by the filesystem. Documents that had to use
+symlinks are recorded in `<store>/documents.txt` so that `gc()` can see their references.
+"""
+
+import errno
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Set
+
+from .images import derived_images
+
+
+DOCUMENTS_FILE = "documents.txt"
+# os.link errors meaning "this filesystem cannot hardlink here", not "src is gone".
+_NO_HARDLINK_ERRNOS = (errno.EXDEV, errno.EPERM, errno.EMLINK)
+
+_HASH_NAME_RE = re.compile(r"^[0-9a-f]{64}\.[A-Za-z0-9]+$")
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def image_key(path: Path, trust_name: bool = True) -> str:
+    """Content key of an image: the SHA-256 of its bytes plus its suffix.
+
+    MinerU names extracted images exactly so, and with trust_name such a name is used
+    without reading the file. Transcoded variants and thumbnails keep their original's
+    hash stem (see p2r.images.derived_images): pass trust_name=False for them.
+    """
+    if trust_name and _HASH_NAME_RE.match(path.name):
+        return path.name
+    return _sha256_file(path) + path.suffix.lower()
+
+
+def _link(src: Path, dest: Path) -> str:
+    """Link dest to src, replacing dest atomically. Returns "hardlink", "symlink" or "copy"."""
+    if not dest.is_symlink() and dest.exists() and os.path.samefile(src, dest):
+        # Already a hardlink (rename() between two links of one inode would be a no-op).
+        return "hardlink"
+    tmp = dest.with_name(f".{dest.name}.p2r-link")
+    if tmp.exists() or tmp.is_symlink():
+        tmp.unlink()
+    try:
+        os.link(src, tmp)
+        method = "hardlink"
+    except OSError as e:
+        # Anything else (e.g. src removed by a concurrent gc) must not replace dest with a
+        # dangling symlink: dest may be the document's only copy of the image.
+        if e.errno not in _NO_HARDLINK_ERRNOS:
+            raise
+        try:
+            os.symlink(src.resolve(), tmp)
+            method = "symlink"
+        except OSError:
+            shutil.copy2(src, tmp)
+            method = "copy"
+    os.replace(tmp, dest)
+    return method
+
+
+def link_tree(src_dir: Path, dest_dir: Path) -> None:
+    """Mirror a flat directory of images by hardlinking files (copying if linking fails)."""
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    for entry in os.scandir(src_dir):
+        if entry.is_file():
+            _link(Path(entry.path), dest_dir / entry.name)
+
+
+class ImageStore:
+    """Store of images keyed by the SHA-256 of their content."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).expanduser()
+
+    def path_for(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    def key_for(self, path: Path, trust_name: bool = True) -> str:
+        """Store key of an image (see image_key)."""
+        return image_key(path, trust_name)
+
+    def deposit_dir(self, images_dir: Path, register: bool = True) -> Dict[str, int]:
+        """Deduplicate a document's images/ directory against the store.
+
+        New images are moved into the store; every image in images_dir is then replaced
+        by a link to the stored copy, keeping its original file name.
+
+        Args:
+            images_dir: Document images directory
+            register: Record images_dir for gc when it ends up with symlinks; callers
+                that move the document afterwards register its final path instead
+
+        Returns:
+            Counts of {"stored", "deduplicated", "hardlink", "symlink", "copy"}
+        """
+        stats = {"stored": 0, "deduplicated": 0, "hardlink": 0, "symlink": 0, "copy": 0}
+        if not images_dir.is_dir():
+            return stats
+
+        derived = derived_images(images_dir.parent)
+        for entry in sorted(os.scandir(images_dir), key=lambda e: e.name):
+            if entry.is_symlink() or not entry.is_file():
+                continue
+            path = Path(entry.path)
+            original = f"{images_dir.name}/{entry.name}" not in derived
+            stored = self.path_for(self.key_for(path, trust_name=original))
+            if stored.exists():
+                stats["deduplicated"] += 1
+            else:
+                stored.parent.mkdir(parents=True, exist_ok=True)
+                tmp = stored.with_name(f".{stored.name}.p2r-tmp")
+                try:
+                    os.link(path, tmp)  # Same filesystem: no data is copied
+                except OSError:
+                    shutil.copy2(path, tmp)
+                os.replace(tmp, stored)
+                stats["stored"] += 1
+            stats[_link(stored, path)] += 1
+
+        if stats["symlink"] and register:
+            self.register(images_dir)
+        return stats
+
+    def register(self, images_dir: Path) -> None:
+        """Record a document images/ directory that references the store by symlink."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        line = str(Path(images_dir).resolve()) + "\n"
+        # O_APPEND keeps concurrent writers from clobbering each other's lines.
+        fd = os.open(self.root / DOCUMENTS_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def _registered_dirs(self) -> List[Path]:
+        try:
+            text = (self.root / DOCUMENTS_FILE).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return []
+        return [Path(line) for line in dict.fromkeys(text.splitlines()) if line]
+
+    def _symlink_targets(self, dirs: List[Path]) -> Set[Path]:
+        targets = set()
+        for images_dir in dirs:
+            try:
+                entries = list(os.scandir(images_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_symlink():
+                    targets.add(Path(os.path.realpath(entry.path)))
+        return targets
+
+    def iter_images(self) -> Iterator[Path]:
+        """Yield every image held by the store."""
+        if not self.root.is_dir():
+            return
+        for shard in sorted(self.root.iterdir()):
+            if shard.is_dir():
+                for path in sorted(shard.iterdir()):
+                    if path.is_file() and not path.name.startswith("."):
+                        yield path
+
+    def gc(self, dry_run: bool = False) -> List[Path]:
+        """Remove stored images no document references any more.
+
+        An image is live if it has more than one hardlink or a registered document's
+        images/ directory symlinks to it. Registered directories that no longer exist are
+        dropped from documents.txt.
+
+        Returns:
+            Paths of removed (or, with dry_run, removable) images
+        """
+        dirs = [d for d in self._registered_dirs() if d.is_dir()]
+        live = self._symlink_targets(dirs)
+
+        orphans = []
+        for path in self.iter_images():
+            if path.stat().st_nlink > 1 or path.resolve() in live:
+                continue
+            orphans.append(path)
+            if not dry_run:
+                path.unlink()
+
+        if not dry_run and (self.root / DOCUMENTS_FILE).exists():
+            tmp = self.root / (DOCUMENTS_FILE + ".tmp")
+            tmp.write_text("".join(f"{d}\n" for d in dirs), encoding="utf-8")
+            os.replace(tmp, self.root / DOCUMENTS_FILE)
+        return orphans
@@ -0,0 +1,614 @@
+"""Durable job queue shared by `p2r worker` processes on one or more hosts.
+
+Sources are enqueued once, keyed by the SHA-256 of the file (or by the URL), so adding
+the same document again, from any path or host, is a no-op. Workers claim jobs under a
+lease that they extend with heartbeats while converting; when a worker crashes its lease
+expires and the job is handed to another worker. Completion is idempotent: the first
+worker to complete a job records its output and later completions are reported as
+duplicates. Delivery is at-least-once, so a worker that dies after committing its
+output but before completing the job leaves a versioned duplicate behind.
+
+The default backend is a SQLite file, which may live on a disk shared by several hosts.
+It uses the rollback journal rather than WAL, because WAL needs shared memory that
+network filesystems do not provide. Lease times are wall-clock times, so hosts need
+synchronised clocks. Other backends are registered with `register_backend`;
+`MemoryJobQueue` is an in-process stand-in for tests and single-process use.
+"""
+
+import abc
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .mineru import MinerUClient, Source, is_url
+
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("pending", "leased", "done", "failed")
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, id);
+"""
+
+_COLUMNS = (
+    "id", "key", "source", "state", "worker", "lease_until", "attempts", "output", "error"
+)
+
+
+def source_key(source: Source) -> str:
+    """Idempotency key of a source: "sha256:<hex>" of a file's content, or "url:<url>"."""
+    if is_url(source):
+        return f"url:{source}"
+    h = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return f"sha256:{h.hexdigest()}"
+
+
+def default_worker_id() -> str:
+    """"<hostname>-<pid>", unique among the workers sharing a queue."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue(abc.ABC):
+    """Interface of job queue backends.
+
+    Jobs are dicts with "id", "key", "source", "state" (see JOB_STATES), "worker",
+    "lease_until", "attempts", "output" (list of output paths once done) and "error".
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Add (key, source) pairs; keys already in the queue are skipped.
+
+        Returns:
+            Number of jobs added
+        """
+
+    @abc.abstractmethod
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Lease the oldest pending job, or one whose lease expired, to worker.
+
+        Jobs whose lease expired after their last allowed attempt are failed instead.
+
+        Returns:
+            The claimed job, or None if there is nothing to do
+        """
+
+    @abc.abstractmethod
+    def heartbeat(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+        """Extend worker's lease on a job; False if the worker no longer holds it."""
+
+    @abc.abstractmethod
+    def complete(self, job_id: int, worker: str, output: List[str]) -> bool:
+        """Mark a job done; False if it was already done (a duplicate completion)."""
+
+    @abc.abstractmethod
+    def fail(self, job_id: int, worker: str, error: str) -> Optional[str]:
+        """Record a failed attempt: the job is retried until max_attempts, then failed.
+
+        Returns:
+            The job's new state, or None if worker no longer holds the lease
+        """
+
+    @abc.abstractmethod
+    def release(self, job_id: int, worker: str) -> bool:
+        """Give a leased job back without counting the attempt (e.g. on shutdown)."""
+
+    @abc.abstractmethod
+    def retry_failed(self) -> int:
+        """Reset failed jobs to pending with a fresh attempt budget; how many were reset."""
+
+    @abc.abstractmethod
+    def jobs(self, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """All jobs (or those in state), in queue order."""
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per state (every state present)."""
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for job in self.jobs():
+            counts[job["state"]] += 1
+        return counts
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _job(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    job = dict(zip(_COLUMNS, row))
+    job["output"] = json.loads(job["output"]) if job["output"] else None
+    return job
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a SQLite file, safe for processes on several hosts sharing it."""
+
+    def __init__(self, path: Path, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        # Transactions are explicit; the lock serialises a worker's heartbeat thread.
+        self.conn = sqlite3.connect(
+            str(self.path), timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"Unsupported job queue version {version}: {self.path}")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn in an IMMEDIATE transaction, which takes the write lock up front."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, items: Iterable[Tuple[str, str]]) -> int:
+        now = time.time()
+        rows = [(key, str(source), now, now) for key, source in items]
+
+        def insert(conn: sqlite3.Connection) -> int:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, source, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+        return self._write(insert)
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        def take(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET state = 'failed', worker = NULL, lease_until = NULL, "
+                "error = 'Lease expired on the last attempt', updated_at = ? "
+                "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_until < ?) ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row[0]),
+            )
+            return _job(
+                conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (row[0],)
+                ).fetchone()
+            )
+
+        return self._write(take)
+
+    def _update(self, sql: str, params: Tuple[Any, ...]) -> int:
+        return self._write(lambda conn: conn.execute(sql, params).rowcount)
+
+    def heartbeat(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND state = 'leased'",
+            (now + lease_seconds, now, job_id, worker),
+        ) == 1
+
+    def complete(self, job_id: int, worker: str, output: List[str]) -> bool:
+        # Accepted even after the lease was lost: the work is done either way.
+        return self._update(
+            "UPDATE jobs SET state = 'done', worker = ?, lease_until = NULL, output = ?, "
+            "error = NULL, updated_at = ? WHERE id = ? AND state != 'done'",
+            (worker, json.dumps(output), time.time(), job_id),
+        ) == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> Optional[str]:
+        def record(conn: sqlite3.Connection) -> Optional[str]:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'leased'",
+                (job_id, worker),
+            ).fetchone()
+            if row is None:
+                return None
+            state = "failed" if row[0] >= self.max_attempts else "pending"
+            conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_until = NULL, error = ?, "
+                "updated_at = ? WHERE id = ?",
+                (state, error, time.time(), job_id),
+            )
+            return state
+
+        return self._write(record)
+
+    def release(self, job_id: int, worker: str) -> bool:
+        return self._update(
+            "UPDATE jobs SET state = 'pending', worker = NULL, lease_until = NULL, "
+            "attempts = attempts - 1, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND state = 'leased'",
+            (time.time(), job_id, worker),
+        ) == 1
+
+    def retry_failed(self) -> int:
+        return self._update(
+            "UPDATE jobs SET state = 'pending', attempts = 0, updated_at = ? "
+            "WHERE state = 'failed'",
+            (time.time(),),
+        )
+
+    def jobs(self, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params: Tuple[Any, ...] = ()
+        if state is not None:
+            sql += " WHERE state = ?"
+            params = (state,)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY id", params).fetchall()
+        return [_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(JOB_STATES, 0)
+        with self._lock:
+            for state, n in self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+                counts[state] = n
+        return counts
+
+
+class MemoryJobQueue(JobQueue):
+    """In-process job queue with the same semantics, for tests and single-process use."""
+
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._jobs: Dict[int, Dict[str, Any]] = {}
+        self._keys: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, items: Iterable[Tuple[str, str]]) -> int:
+        added = 0
+        with self._lock:
+            for key, source in items:
+                if key in self._keys:
+                    continue
+                job_id = len(self._jobs) + 1
+                self._jobs[job_id] = dict.fromkeys(_COLUMNS)
+                self._jobs[job_id].update(
+                    id=job_id, key=key, source=str(source), state="pending", attempts=0
+                )
+                self._keys[key] = job_id
+                added += 1
+        return added
+
+    def _held(self, job_id: int, worker: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None or job["state"] != "leased" or job["worker"] != worker:
+            return None
+        return job
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                expired = job["state"] == "leased" and job["lease_until"] < now
+                if expired and job["attempts"] >= self.max_attempts:
+                    job.update(
+                        state="failed",
+                        worker=None,
+                        lease_until=None,
+                        error="Lease expired on the last attempt",
+                    )
+                elif job["state"] == "pending" or expired:
+                    job.update(
+                        state="leased",
+                        worker=worker,
+                        lease_until=now + lease_seconds,
+                        attempts=job["attempts"] + 1,
+                    )
+                    return dict(job)
+        return None
+
+    def heartbeat(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+        with self._lock:
+            job = self._held(job_id, worker)
+            if job is not None:
+                job["lease_until"] = time.time() + lease_seconds
+            return job is not None
+
+    def complete(self, job_id: int, worker: str, output: List[str]) -> bool:
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["state"] == "done":
+                return False
+            job.update(
+                state="done", worker=worker, lease_until=None, output=list(output), error=None
+            )
+            return True
+
+    def fail(self, job_id: int, worker: str, error: str) -> Optional[str]:
+        with self._lock:
+            job = self._held(job_id, worker)
+            if job is None:
+                return None
+            state = "failed" if job["attempts"] >= self.max_attempts else "pending"
+            job.update(state=state, worker=None, lease_until=None, error=error)
+            return state
+
+    def release(self, job_id: int, worker: str) -> bool:
+        with self._lock:
+            job = self._held(job_id, worker)
+            if job is not None:
+                job.update(
+                    state="pending", worker=None, lease_until=None, attempts=job["attempts"] - 1
+                )
+            return job is not None
+
+    def retry_failed(self) -> int:
+        with self._lock:
+            failed = [job for job in self._jobs.values() if job["state"] == "failed"]
+            for job in failed:
+                job.update(state="pending", attempts=0)
+            return len(failed)
+
+    def jobs(self, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                dict(job)
+                for job in self._jobs.values()
+                if state is None or job["state"] == state
+            ]
+
+
+# Queue spec scheme -> factory taking the rest of the spec and max_attempts.
+_BACKENDS: Dict[str, Callable[[str, int], JobQueue]] = {
+    "sqlite": lambda rest, max_attempts: SQLiteJobQueue(Path(rest), max_attempts),
+    "memory": lambda rest, max_attempts: MemoryJobQueue(max_attempts),
+}
+
+
+def register_backend(scheme: str, factory: Callable[[str, int], JobQueue]) -> None:
+    """Make open_queue("<scheme>:<rest>") call factory(rest, max_attempts)."""
+    _BACKENDS[scheme] = factory
+
+
+def open_queue(spec: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> JobQueue:
+    """Open a job queue from a spec: a file path or "sqlite:<path>" (SQLite),
+    "memory:" (in-process) or "<scheme>:..." of a registered backend.
+
+    Raises:
+        ValueError: If the scheme has no registered backend
+    """
+    spec = str(spec)
+    m = re.match(r"([a-zA-Z][a-zA-Z0-9+.-]+):(?://)?(.*)", spec, re.DOTALL)
+    if m is None:  # A plain path (drive letters have a one-letter "scheme")
+        return SQLiteJobQueue(Path(spec), max_attempts)
+    scheme, rest = m.group(1).lower(), m.group(2)
+    if scheme not in _BACKENDS:
+        raise ValueError(f"Unknown job queue backend: {scheme}")
+    return _BACKENDS[scheme](rest, max_attempts)
+
+
+def enqueue_sources(queue: JobQueue, sources: Iterable[Source]) -> Dict[str, int]:
+    """Hash and enqueue sources.
+
+    Local paths are stored absolute, so that workers started elsewhere can open them
+    (on other hosts, the shared disk must be mounted at the same path).
+
+    Returns:
+        {"added": new jobs, "skipped": sources already queued (by content or URL)}
+    """
+    items = [
+        (source_key(source), source if is_url(source) else str(Path(source).resolve()))
+        for source in sources
+    ]
+    added = queue.enqueue(items)
+    return {"added": added, "skipped": len(items) - added}
+
+
+def run_worker(
+    queue: JobQueue,
+    output_dir: Path,
+    client: Optional[MinerUClient] = None,
+    worker_id: Optional[str] = None,
+    concurrency: int = 1,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    max_jobs: Optional[int] = None,
+    exit_when_empty: bool = False,
+    idle_sleep: float = 5.0,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    stop: Optional[threading.Event] = None,
+    **options: Any,
+) -> Dict[str, int]:
+    """Claim and convert jobs until stopped.
+
+    concurrency threads each claim a job, convert it with MinerUClient.parse_batch
+    (so long PDFs are split as usual) into output_dir/<name>, and complete or fail it.
+    A heartbeat thread extends the leases of the jobs in progress every third of
+    lease_seconds. Jobs interrupted by KeyboardInterrupt (or another exception that is
+    not an Exception) are released back to the queue.
+
+    Args:
+        queue: Shared job queue
+        output_dir: Parent directory of the per-document outputs (shared by all workers)
+        client: Client to use (default: one configured from ~/.p2r_config.json, closed
+            when the worker returns)
+        worker_id: Name recorded on claimed jobs (default: default_worker_id())
+        concurrency: Jobs converted at once by this process
+        lease_seconds: How long a claim lasts without a heartbeat
+        max_jobs: Stop after this many jobs (default: no limit)
+        exit_when_empty: Stop when there is nothing to claim instead of waiting
+        idle_sleep: Seconds to wait before claiming again when the queue is empty
+        on_result: Called with {"job", "state", "output", "error", "duplicate"} after
+            every job ("state" is the job's new state)
+        stop: Set to stop taking new jobs
+        **options: Passed on to MinerUClient.parse_batch
+
+    Returns:
+        {"done", "retried", "failed", "duplicates"} counts of this worker
+    """
+    owned = client is None
+    if client is None:
+        client = MinerUClient()
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    lock = threading.Lock()
+    held: Dict[int, Dict[str, Any]] = {}
+    stats = {"done": 0, "retried": 0, "failed": 0, "duplicates": 0}
+    claimed = [0]
+
+    def next_job() -> Optional[Dict[str, Any]]:
+        while not stop.is_set():
+            # Reserve a max_jobs slot, then claim without the lock: a claim may wait on a
+            # busy shared disk, and heartbeats must not wait for it.
+            with lock:
+                if max_jobs is not None and claimed[0] >= max_jobs:
+                    return None
+                claimed[0] += 1
+            try:
+                job = queue.claim(worker_id, lease_seconds)
+            except BaseException:
+                with lock:
+                    claimed[0] -= 1
+                raise
+            with lock:
+                if job is None:
+                    claimed[0] -= 1
+                elif not stop.is_set():
+                    held[job["id"]] = job
+                    return job
+            if job is not None:
+                # Interrupted while claiming: the jobs in held were already released.
+                queue.release(job["id"], worker_id)
+                return None
+            if exit_when_empty:
+                return None
+            stop.wait(idle_sleep)
+        return None
+
+    def convert(job: Dict[str, Any]) -> Dict[str, Any]:
+        outputs, errors = [], []
+        try:
+            for update in client.parse_batch([job["source"]], Path(output_dir), **options):
+                if update["state"] == "completed":
+                    outputs.append(update["output_dir"])
+                elif update["state"] == "failed":
+                    errors.append(update["error"])
+        except Exception as e:
+            errors.append(str(e))
+        if errors:
+            state = queue.fail(job["id"], worker_id, "; ".join(errors))
+            return {"state": state, "output": outputs, "error": "; ".join(errors)}
+        fresh = queue.complete(job["id"], worker_id, outputs)
+        return {"state": "done", "output": outputs, "error": None, "duplicate": not fresh}
+
+    def work() -> None:
+        while True:
+            job = next_job()
+            if job is None:
+                return
+            if job["attempts"] > 1:
+                client.metrics.increment("retries_total")
+            try:
+                result = convert(job)
+            except BaseException:
+                queue.release(job["id"], worker_id)
+                raise
+            finally:
+                with lock:
+                    held.pop(job["id"], None)
+            result = {"job": job, "duplicate": False, **result}
+            with lock:
+                if result["duplicate"]:
+                    stats["duplicates"] += 1
+                elif result["state"] == "done":
+                    stats["done"] += 1
+                elif result["state"] == "pending":
+                    stats["retried"] += 1
+                elif result["state"] == "failed":
+                    stats["failed"] += 1
+            if on_result is not None:
+                on_result(result)
+
+    finished = threading.Event()
+
+    def heartbeat() -> None:
+        while not finished.wait(lease_seconds / 3):
+            with lock:
+                job_ids = list(held)
+            for job_id in job_ids:
+                try:
+                    queue.heartbeat(job_id, worker_id, lease_seconds)
+                except Exception as e:
+                    # e.g. "database is locked" on a busy shared disk: the lease lasts
+                    # until the next beat, so keep beating rather than let it expire.
+                    logger.warning("Heartbeat for job %s failed: %s", job_id, e)
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        if concurrency <= 1:
+            work()
+        else:
+            threads = [threading.Thread(target=work, daemon=True) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            except BaseException:
+                # Interrupted: give the jobs in progress back instead of waiting for them.
+                stop.set()
+                with lock:
+                    for job_id in list(held):
+                        queue.release(job_id, worker_id)
+                raise
+    finally:
+        finished.set()
+        beat.join()
+        if owned:
+            client.close()
+    return stats
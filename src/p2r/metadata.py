@@ -0,0 +1,465 @@
+"""Bibliographic metadata for document names and Markdown frontmatter.
+
+Metadata comes from three sources, cheapest first (see doc/PRD.md, 5.2):
+
+1. the PDF itself: its Info dictionary, XMP packet and first page, read without parsing
+   the rest of the file (see p2r.preflight.read_pdf_metadata)
+2. the first page of MinerU's content_list, decoded alone through the page index
+3. CrossRef records of the DOIs found in either, fetched up to `BATCH_SIZE` per request
+   and kept in a SQLite cache shared by all runs, so each DOI is looked up once
+
+MinerUClient reads 1 and looks up the DOIs found there in a background thread while
+MinerU parses, so only DOIs that first show up in the content_list are looked up after
+the download. The result is written to metadata.json and as YAML frontmatter of the
+Markdown, and can name the document (`render_name`).
+"""
+
+import json
+import re
+import sqlite3
+import string
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from .pages import read_pages
+from .preflight import read_pdf_metadata
+
+
+CROSSREF_URL = "https://api.crossref.org"
+CACHE_FILE_NAME = ".p2r_metadata_cache.db"
+METADATA_NAME = "metadata.json"
+METADATA_VERSION = 1
+SCHEMA_VERSION = 1
+# DOIs per CrossRef request (one filter=doi:...,doi:... query).
+BATCH_SIZE = 20
+# DOIs CrossRef did not know are asked about again after this many seconds.
+NOT_FOUND_TTL = 7 * 24 * 3600
+# Fields written to the frontmatter, in this order.
+FIELDS = ("title", "authors", "year", "doi", "journal", "publisher")
+
+_DOI_RE = re.compile(r"\b10\.\d{4,9}/[^\s\"<>]+")
+_OPENERS = {")": "(", "]": "[", "}": "{"}
+# Info /Title values naming the authoring tool's file rather than the paper.
+_JUNK_TITLE_RE = re.compile(r"(?i)^(?:untitled|microsoft word\b.*|.*\.(?:docx?|tex|dvi|pdf))$")
+_DATE_YEAR_RE = re.compile(r"^(?:D:)?((?:19|20)\d\d)")
+_UNSAFE_NAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+_MAX_NAME_CHARS = 120
+
+
+def find_doi(text: str) -> Optional[str]:
+    """The first DOI in text, without trailing punctuation, or None."""
+    match = _DOI_RE.search(text or "")
+    if match is None:
+        return None
+    doi = match.group().rstrip(".,;:'")
+    # Keep closing brackets that belong to the DOI, e.g. 10.1002/(SICI)1097-...
+    while doi[-1] in _OPENERS and doi.count(doi[-1]) > doi.count(_OPENERS[doi[-1]]):
+        doi = doi[:-1].rstrip(".,;:'")
+    return doi
+
+
+def normalize_doi(doi: str) -> str:
+    """Cache key of a DOI (DOIs are case-insensitive)."""
+    return doi.strip().lower()
+
+
+def _split_authors(value: str) -> List[str]:
+    parts = re.split(r";" if ";" in value else r",|\band\b|&", value)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def family_name(author: str) -> str:
+    """Family name of "Given Family" or "Family, Given"."""
+    if "," in author:
+        return author.split(",", 1)[0].strip()
+    return author.split()[-1] if author.split() else ""
+
+
+def from_pdf(path: Path) -> Dict[str, Any]:
+    """Metadata from a PDF's Info dictionary, XMP packet, first page and file name."""
+    raw = read_pdf_metadata(path)
+    info = raw["info"]
+    meta: Dict[str, Any] = {}
+    title = info.get("Title", "")
+    if title and not _JUNK_TITLE_RE.match(title):
+        meta["title"] = title
+    if info.get("Author"):
+        meta["authors"] = _split_authors(info["Author"])
+    # The file's creation date: a last resort for the publication year.
+    year = _DATE_YEAR_RE.match(info.get("CreationDate", ""))
+    if year:
+        meta["year"] = int(year.group(1))
+    for text in (
+        info.get("doi", ""),
+        info.get("Subject", ""),
+        info.get("Keywords", ""),
+        raw["xmp"] or "",
+        raw["first_page_text"],
+        Path(path).stem,
+    ):
+        doi = find_doi(text)
+        if doi:
+            meta["doi"] = doi
+            break
+    return meta
+
+
+def from_content_list(elements: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Metadata from the first page's content_list elements: heading title and DOI."""
+    meta: Dict[str, Any] = {}
+    for element in elements:
+        text = (element.get("text") or "").strip()
+        if text and element.get("text_level") == 1:
+            meta["title"] = text
+            break
+    doi = find_doi(" ".join(element.get("text") or "" for element in elements))
+    if doi:
+        meta["doi"] = doi
+    return meta
+
+
+def from_crossref(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata from a CrossRef work record."""
+    meta: Dict[str, Any] = {}
+    if item.get("DOI"):
+        meta["doi"] = item["DOI"]
+    if item.get("title"):
+        meta["title"] = item["title"][0]
+    authors = []
+    for author in item.get("author") or []:
+        name = " ".join(p for p in (author.get("given"), author.get("family")) if p)
+        if name or author.get("name"):
+            authors.append(name or author["name"])
+    if authors:
+        meta["authors"] = authors
+    for key in ("published-print", "published-online", "issued", "created"):
+        parts = (item.get(key) or {}).get("date-parts") or [[None]]
+        if parts[0] and parts[0][0]:
+            meta["year"] = int(parts[0][0])
+            break
+    if item.get("container-title"):
+        meta["journal"] = item["container-title"][0]
+    if item.get("publisher"):
+        meta["publisher"] = item["publisher"]
+    return meta
+
+
+def merge(*layers: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine metadata layers; for each field the first layer that has it wins."""
+    result: Dict[str, Any] = {}
+    for layer in layers:
+        for key, value in (layer or {}).items():
+            if value and key not in result:
+                result[key] = value
+    return result
+
+
+def default_cache_path() -> Path:
+    return Path.home() / CACHE_FILE_NAME
+
+
+class MetadataCache:
+    """Persistent CrossRef records by DOI, including DOIs CrossRef does not know."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path).expanduser() if path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Used from the client's prefetch thread and the thread storing results.
+        self.conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self._lock = threading.Lock()
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.conn.close()
+            raise ValueError(f"Unsupported metadata cache version {version}: {self.path}")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS dois ("
+                "doi TEXT PRIMARY KEY, record TEXT, fetched_at REAL NOT NULL)"
+            )
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def get_many(self, dois: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Cached records of normalized DOIs (None: not found, and not yet worth a retry)."""
+        dois = list(dois)
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        expired = time.time() - NOT_FOUND_TTL
+        with self._lock:
+            for start in range(0, len(dois), 500):
+                chunk = dois[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT doi, record, fetched_at FROM dois WHERE doi IN ({marks})", chunk
+                )
+                for doi, record, fetched_at in rows:
+                    if record is not None:
+                        found[doi] = json.loads(record)
+                    elif fetched_at > expired:
+                        found[doi] = None
+        return found
+
+    def put_many(self, records: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        now = time.time()
+        rows = [
+            (doi, None if record is None else json.dumps(record), now)
+            for doi, record in records.items()
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dois (doi, record, fetched_at) VALUES (?, ?, ?)", rows
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM dois").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "MetadataCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class DOIResolver:
+    """Looks DOIs up on CrossRef in batches, through a MetadataCache."""
+
+    def __init__(
+        self,
+        api_url: str = CROSSREF_URL,
+        cache: Optional[MetadataCache] = None,
+        mailto: str = "",
+        timeout: float = 10,
+        batch_size: int = BATCH_SIZE,
+    ):
+        """Set up the resolver.
+
+        Args:
+            api_url: CrossRef REST API base URL
+            cache: Cache of earlier lookups (None looks every DOI up every time)
+            mailto: Contact address sent along, for CrossRef's "polite" pool
+            timeout: Seconds to wait for one request
+            batch_size: DOIs per request
+        """
+        self.api_url = api_url.rstrip("/")
+        self.cache = cache
+        self.mailto = mailto
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+
+    @classmethod
+    def from_options(cls, options: Dict[str, Any]) -> "DOIResolver":
+        """Resolver (with its cache) configured like the "metadata" config section."""
+        return cls(
+            api_url=options.get("crossref_url") or CROSSREF_URL,
+            cache=MetadataCache(options.get("cache_path") or None),
+            mailto=options.get("mailto", ""),
+            timeout=float(options.get("timeout", 10)),
+        )
+
+    def _fetch(self, dois: List[str]) -> Dict[str, Dict[str, Any]]:
+        """CrossRef records of a batch of DOIs, by normalized DOI.
+
+        Raises:
+            requests.RequestException: If CrossRef cannot be reached
+            ValueError: If CrossRef answers with something other than JSON
+        """
+        params: Dict[str, Any] = {
+            "filter": ",".join(f"doi:{doi}" for doi in dois),
+            "rows": len(dois),
+        }
+        if self.mailto:
+            params["mailto"] = self.mailto
+        response = requests.get(f"{self.api_url}/works", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        items = (response.json().get("message") or {}).get("items") or []
+        return {normalize_doi(item["DOI"]): item for item in items if item.get("DOI")}
+
+    def lookup(self, dois: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadata of DOIs, from the cache or batched CrossRef requests.
+
+        Lookups that fail (network errors) are skipped and not cached, so they are
+        retried next time; once one fails, the remaining batches are skipped too.
+
+        Returns:
+            {normalized DOI: metadata (see from_crossref)} of the DOIs CrossRef knows
+        """
+        # A comma would end the DOI inside the filter parameter.
+        keys = sorted({normalize_doi(doi) for doi in dois if doi and "," not in doi})
+        records = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = [key for key in keys if key not in records]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            try:
+                fetched = self._fetch(batch)
+            except (requests.RequestException, ValueError):
+                break  # Offline: metadata stays partial, as without CrossRef
+            found = {key: fetched.get(key) for key in batch}
+            if self.cache is not None:
+                self.cache.put_many(found)
+            records.update(found)
+        return {key: from_crossref(record) for key, record in records.items() if record}
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self) -> "DOIResolver":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def prefetch(paths: Iterable[Path], resolver: Optional[DOIResolver]) -> Dict[Path, Dict]:
+    """Read local PDFs' metadata and look up all their DOIs in one batched lookup.
+
+    Returns:
+        {path: {"pdf": metadata from the PDF, "crossref": CrossRef metadata or None}}
+    """
+    found = {}
+    for path in map(Path, paths):
+        try:
+            found[path] = from_pdf(path)
+        except Exception:
+            found[path] = {}  # One damaged file must not cost the batch its metadata
+    records = {}
+    if resolver is not None:
+        records = resolver.lookup(meta["doi"] for meta in found.values() if meta.get("doi"))
+    return {
+        path: {"pdf": meta, "crossref": records.get(normalize_doi(meta.get("doi", "")))}
+        for path, meta in found.items()
+    }
+
+
+def collect_metadata(
+    doc_dir: Path,
+    prefetched: Optional[Dict[str, Any]] = None,
+    resolver: Optional[DOIResolver] = None,
+) -> Dict[str, Any]:
+    """Combine prefetched PDF and CrossRef metadata with the document's first page.
+
+    Args:
+        doc_dir: Document directory, with an indexed content_list
+        prefetched: This document's entry of prefetch() (None for URLs)
+        resolver: Used when no CrossRef record was prefetched but a DOI is known now
+
+    Returns:
+        The merged fields, plus "sources": the layers that contributed
+    """
+    prefetched = prefetched or {}
+    pdf, crossref = prefetched.get("pdf") or {}, prefetched.get("crossref")
+    try:
+        pages = read_pages(Path(doc_dir), [0])
+    except (FileNotFoundError, ValueError):
+        pages = []
+    content = from_content_list(pages[0]["content"] if pages else [])
+    doi = pdf.get("doi") or content.get("doi")
+    if crossref is None and doi and resolver is not None:
+        crossref = resolver.lookup([doi]).get(normalize_doi(doi))
+    layers = {"crossref": crossref, "pdf": pdf, "content_list": content}
+    meta = merge(*layers.values())
+    meta["sources"] = [name for name, layer in layers.items() if layer]
+    return meta
+
+
+def _yaml_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_yaml_value(item) for item in value) + "]"
+    # A JSON string is a valid double-quoted YAML scalar.
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def frontmatter(meta: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> str:
+    """A YAML frontmatter block of the metadata fields, extra fields and created_date.
+
+    Args:
+        meta: Metadata (see collect_metadata); empty fields are left out
+        extra: Further fields (e.g. {"tags": ["literature-note"]}), after the metadata
+    """
+    fields = {key: meta[key] for key in FIELDS if meta.get(key)}
+    fields.update(extra or {})
+    fields["created_date"] = time.strftime("%Y-%m-%d %H:%M")
+    lines = [f"{key}: {_yaml_value(value)}" for key, value in fields.items()]
+    return "---\n" + "\n".join(lines) + "\n---\n"
+
+
+def add_frontmatter(text: str, block: str) -> str:
+    """Put block at the top of a Markdown text, replacing a frontmatter it already has."""
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 4)
+        if end >= 0:
+            text = text[end + 5 :]
+    return block + "\n" + text.lstrip("\n")
+
+
+def render_name(template: str, meta: Dict[str, Any]) -> Optional[str]:
+    """File name from a template such as "{author}-{year}-{title}".
+
+    Fields: author (first author's family name), authors (family names joined by
+    ", "), year, title, doi ("/" replaced by "_"), journal and publisher.
+
+    Returns:
+        The name, or None if the template uses a field the metadata lacks
+    """
+    authors = [family_name(author) for author in meta.get("authors") or []]
+    values = {
+        "author": authors[0] if authors else "",
+        "authors": ", ".join(authors),
+        "year": str(meta.get("year") or ""),
+        "title": meta.get("title") or "",
+        "doi": (meta.get("doi") or "").replace("/", "_"),
+        "journal": meta.get("journal") or "",
+        "publisher": meta.get("publisher") or "",
+    }
+    try:
+        used = [field for _, field, _, _ in string.Formatter().parse(template) if field]
+    except ValueError:
+        return None
+    if not used or any(not values.get(field) for field in used):
+        return None
+    name = _UNSAFE_NAME_RE.sub("", template.format_map(values))
+    name = " ".join(name.split())[:_MAX_NAME_CHARS].strip(" .")
+    return name or None
+
+
+def write_metadata(
+    doc_dir: Path,
+    meta: Dict[str, Any],
+    fields: Optional[Dict[str, Any]] = None,
+    inject: bool = True,
+) -> List[Path]:
+    """Write doc_dir/metadata.json and the frontmatter of its top-level Markdown files.
+
+    Args:
+        doc_dir: Document directory
+        meta: Metadata (see collect_metadata)
+        fields: Extra frontmatter fields
+        inject: Add the frontmatter to the Markdown (else only write metadata.json)
+
+    Returns:
+        The files written
+    """
+    doc_dir = Path(doc_dir)
+    path = doc_dir / METADATA_NAME
+    tmp = path.with_name(METADATA_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(meta, version=METADATA_VERSION), f, indent=2, ensure_ascii=False)
+    tmp.replace(path)
+    written = [path]
+    if not inject:
+        return written
+    block = frontmatter(meta, fields)
+    for md in sorted(doc_dir.glob("*.md")):
+        md.write_text(add_frontmatter(md.read_text(encoding="utf-8"), block), encoding="utf-8")
+        written.append(md)
+    return written
@@ -0,0 +1,343 @@
+"""Pluggable metrics for long-running deployments.
+
+`MinerUClient` reports counters (documents, pages, API requests and errors, polls,
+bytes transferred) and stage latency histograms through a `Metrics` backend chosen by
+the "metrics" config section:
+
+- "none" (default): `Metrics`, which discards everything
+- "prometheus": `PrometheusMetrics`, rendered in the Prometheus text format, served over
+  HTTP and/or written to a node-exporter textfile after every document
+- "statsd": `StatsdMetrics`, sent as StatsD lines over UDP (tags in DogStatsD syntax)
+
+Metric names are given without prefix; backends prepend their own ("p2r" by default).
+
+A process exposes one Prometheus registry: every client configured for "prometheus"
+shares it, so the /metrics port is bound once and the textfile holds the totals of all
+of them. It is shut down when the last of those clients closes.
+"""
+
+import bisect
+import os
+import socket
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+Tags = Optional[Dict[str, Any]]
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+HELP = {
+    "documents_total": "Documents processed, by status",
+    "pages_total": "Pages parsed by MinerU",
+    "api_requests_total": "MinerU API and storage requests, by endpoint",
+    "api_errors_total": "Failed MinerU API requests, by HTTP status or API error code",
+    "poll_requests_total": "Batch status polls",
+    "retries_total": "Conversions attempted again after a failed or expired attempt",
+    "preflight_rejected_total": "Files rejected by the local pre-flight check",
+    "bytes_uploaded_total": "PDF bytes uploaded",
+    "picgo_images_total": "Distinct images linked to PicGo uploads, by status",
+    "bytes_downloaded_total": "Result bytes downloaded",
+    "stage_duration_seconds": "Duration of conversion stages",
+}
+
+
+class Metrics:
+    """No-op metrics backend; also the interface of the real ones."""
+
+    def increment(self, name: str, value: float = 1, tags: Tags = None) -> None:
+        """Add value to a counter."""
+
+    def gauge(self, name: str, value: float, tags: Tags = None) -> None:
+        """Set a gauge."""
+
+    def observe(self, name: str, value: float, tags: Tags = None) -> None:
+        """Record one observation (e.g. a duration in seconds) in a histogram."""
+
+    def flush(self) -> None:
+        """Push buffered state out (e.g. rewrite the textfile)."""
+
+    def close(self) -> None:
+        """Release sockets and servers."""
+
+
+def _label_key(tags: Tags) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((str(k), str(v)) for k, v in (tags or {}).items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[str, str] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class PrometheusMetrics(Metrics):
+    """In-process registry exposed in the Prometheus text exposition format."""
+
+    def __init__(
+        self,
+        prefix: str = "p2r",
+        textfile: Optional[Path] = None,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.prefix = prefix
+        self.textfile = Path(textfile).expanduser() if textfile else None
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        self._gauges: Dict[str, Dict[tuple, float]] = {}
+        # name -> labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[tuple, list]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}_{name}" if self.prefix else name
+
+    def increment(self, name: str, value: float = 1, tags: Tags = None) -> None:
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(tags)
+            series[key] = series.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, tags: Tags = None) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(tags)] = value
+
+    def observe(self, name: str, value: float, tags: Tags = None) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.setdefault(_label_key(tags), [0] * len(self.buckets) + [0.0, 0])
+            # Buckets are stored non-cumulatively and summed when rendering.
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for kind, registry in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(registry):
+                    full = self._name(name)
+                    lines.append(f"# HELP {full} {HELP.get(name, name)}")
+                    lines.append(f"# TYPE {full} {kind}")
+                    for labels, value in sorted(registry[name].items()):
+                        lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+            for name in sorted(self._histograms):
+                full = self._name(name)
+                lines.append(f"# HELP {full} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {full} histogram")
+                for labels, state in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, state):
+                        cumulative += count
+                        le = ("le", _format_value(bound))
+                        lines.append(f"{full}_bucket{_format_labels(labels, le)} {cumulative}")
+                    le = ("le", "+Inf")
+                    lines.append(f"{full}_bucket{_format_labels(labels, le)} {state[-1]}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(state[-2])}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path) -> None:
+        """Write the metrics for node-exporter's textfile collector (atomically).
+
+        Each call writes its own temporary file, so concurrent flushes never collide.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.chmod(tmp, 0o644)  # mkstemp creates it 0600; the collector must read it
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def flush(self) -> None:
+        if self.textfile is not None:
+            try:
+                self.write_textfile(self.textfile)
+            except OSError:
+                pass  # Metrics must never break a conversion
+
+    def serve(self, port: int = 0, addr: str = "127.0.0.1") -> Tuple[str, int]:
+        """Serve GET /metrics from a daemon thread.
+
+        Args:
+            port: TCP port (0 picks a free one)
+            addr: Interface to bind
+
+        Returns:
+            The bound (address, port)
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 (http.server naming)
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass  # Keep scrapes out of the console
+
+        self._server = ThreadingHTTPServer((addr, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[0], self._server.server_address[1]
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _SharedPrometheus(Metrics):
+    """One client's reference to the process-wide PrometheusMetrics of its config."""
+
+    def __init__(self, key: Tuple[Any, ...], registry: PrometheusMetrics):
+        self._key = key
+        self.registry = registry
+        self._closed = False
+
+    def increment(self, name: str, value: float = 1, tags: Tags = None) -> None:
+        self.registry.increment(name, value, tags)
+
+    def gauge(self, name: str, value: float, tags: Tags = None) -> None:
+        self.registry.gauge(name, value, tags)
+
+    def observe(self, name: str, value: float, tags: Tags = None) -> None:
+        self.registry.observe(name, value, tags)
+
+    def flush(self) -> None:
+        self.registry.flush()
+
+    def close(self) -> None:
+        with _SHARED_LOCK:
+            if self._closed:
+                return
+            self._closed = True
+            users = _SHARED[self._key][1] - 1
+            if users:
+                _SHARED[self._key] = (self.registry, users)
+                return
+            del _SHARED[self._key]
+        self.registry.close()
+
+
+# (prefix, textfile, addr, port) -> (registry, open references)
+_SHARED: Dict[Tuple[Any, ...], Tuple[PrometheusMetrics, int]] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_prometheus(
+    prefix: str = "p2r", textfile: Optional[Path] = None, port: int = 0, addr: str = "127.0.0.1"
+) -> Metrics:
+    """A reference to the process-wide Prometheus registry for these settings.
+
+    The first reference creates the registry and, if port is set, starts its HTTP
+    endpoint; closing the last one stops it.
+    """
+    key = (prefix, str(Path(textfile).expanduser()) if textfile else None, addr, port)
+    with _SHARED_LOCK:
+        registry, users = _SHARED.get(key, (None, 0))
+        if registry is None:
+            registry = PrometheusMetrics(prefix=prefix, textfile=textfile)
+            if port:
+                registry.serve(port, addr)
+        _SHARED[key] = (registry, users + 1)
+    return _SharedPrometheus(key, registry)
+
+
+class StatsdMetrics(Metrics):
+    """Fire-and-forget StatsD emitter over UDP.
+
+    Counters are sent as "c", gauges as "g" and observations as timers in milliseconds
+    ("ms"). Tags use the DogStatsD "|#key:value" extension.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8125, prefix: str = "p2r"):
+        self.address = (host, int(port))
+        self.prefix = prefix
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, name: str, value: float, kind: str, tags: Tags) -> None:
+        full = f"{self.prefix}.{name}" if self.prefix else name
+        line = f"{full}:{_format_value(value)}|{kind}"
+        if tags:
+            line += "|#" + ",".join(f"{k}:{v}" for k, v in sorted(tags.items()))
+        try:
+            self._sock.sendto(line.encode("utf-8"), self.address)
+        except OSError:
+            pass  # Metrics must never break a conversion
+
+    def increment(self, name: str, value: float = 1, tags: Tags = None) -> None:
+        self._send(name, value, "c", tags)
+
+    def gauge(self, name: str, value: float, tags: Tags = None) -> None:
+        self._send(name, value, "g", tags)
+
+    def observe(self, name: str, value: float, tags: Tags = None) -> None:
+        if name.endswith("_seconds"):
+            self._send(name[: -len("_seconds")] + "_ms", round(value * 1000, 3), "ms", tags)
+        else:
+            self._send(name, value, "ms", tags)
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+def from_config(cfg: Dict[str, Any]) -> Metrics:
+    """Build the metrics backend described by the "metrics" config section.
+
+    Prometheus backends are references to the process-wide registry (see
+    shared_prometheus); close them when done.
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    section = cfg.get("metrics", {})
+    backend = section.get("backend", "none")
+    prefix = section.get("prefix", "p2r")
+    if backend in ("none", "", None):
+        return Metrics()
+    if backend == "prometheus":
+        return shared_prometheus(
+            prefix,
+            section.get("textfile") or None,
+            int(section.get("port") or 0),
+            section.get("addr", "127.0.0.1"),
+        )
+    if backend == "statsd":
+        return StatsdMetrics(
+            section.get("statsd_host", "127.0.0.1"), section.get("statsd_port", 8125), prefix
+        )
+    raise ValueError(f"Unknown metrics backend: {backend}")
@@ -2,11 +2,59 @@
 
 import time  # 用于延迟和计时功能（轮询检查任务状态）
 import shutil
+import sqlite3
+import threading
 import zipfile  # 用于处理ZIP格式文件（解压MinerU返回的结果）
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from pathlib import Path  # 用于跨平台文件路径操作
-from typing import Dict, Any, Optional, Iterable  # 用于类型提示
+from typing import Dict, Any, List, Optional, Iterable, Union  # 用于类型提示
+from urllib.parse import unquote, urlsplit
 import requests  # 用于HTTP请求（与MinerU API通信）
 from . import config  # 导入本地配置模块（读取API令牌和基础URL）
+from . import metrics as metrics_backends
+from .bundle import bundle_path, iter_zip, write_bundle
+from .images import has_pillow, image_pool, postprocess_images
+from .imagestore import ImageStore
+from .metadata import DOIResolver, collect_metadata, prefetch, render_name, write_metadata
+from .output import (
+    allocate_name,
+    commit_dir,
+    commit_file,
+    create_staging_dir,
+    discard_dir,
+    write_manifest,
+)
+from .pages import artifact_kind, write_page_index
+from .picgo import PicGoUploader, upload_document
+from .preflight import MAX_PAGES, plan_parts, preflight
+from .quota import configured_usage_path, record_pages
+from .search import SearchIndex
+from .spatial import write_spatial_index
+from .storage import COMPRESSIONS, compress_raw_bytes, compress_raw_dir, compressed_name
+from .timing import Hook, RunTimer
+
+
+# MinerU accepts at most this many files per batch request.
+MAX_BATCH_FILES = 200
+
+# Task states that are still in progress.
+ACTIVE_STATES = ("waiting-file", "pending", "running", "converting")
+
+# Formats MinerU parses (see doc/mineru_api_reference.md).
+DOCUMENT_SUFFIXES = (".pdf", ".doc", ".docx", ".ppt", ".pptx", ".png", ".jpg", ".jpeg", ".html")
+
+# A local path, or an http(s) URL MinerU fetches itself.
+Source = Union[str, Path]
+
+# How a converted document is stored: a directory, or a single file (see p2r.bundle).
+OUTPUT_FORMATS = ("directory", "bundle")
+
+# Raw/debug artifacts moved from the archive root into raw/.
+_RAW_NAMES = {"layout.json"}
+_RAW_SUFFIXES = ("_content_list.json", "_model.json", "_origin.pdf")
+
+# Pre-flight results plan() keeps for files not converted yet; the oldest go first.
+_MAX_PLANNED = 1024
 
 
 class MinerUError(Exception):
@@ -14,8 +62,49 @@ class MinerUError(Exception):
     pass
 
 
+def is_url(source: Source) -> bool:
+    """True if source is an http(s) URL rather than a local path."""
+    return isinstance(source, str) and source.lower().startswith(("http://", "https://"))
+
+
+def source_name(source: Source) -> str:
+    """File name of a local path or URL ("document.pdf" if the URL path has none)."""
+    if is_url(source):
+        name = unquote(urlsplit(source).path.rstrip("/").rsplit("/", 1)[-1])
+        return name or "document.pdf"
+    return Path(source).name
+
+
+def document_stem(source: Source) -> str:
+    """Output directory name for source: its file name without a document suffix."""
+    name = source_name(source)
+    stem, suffix = Path(name).stem, Path(name).suffix
+    return stem if suffix.lower() in DOCUMENT_SUFFIXES and stem else name
+
+
+def _progress_update(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Progress update for a task result that is still in progress."""
+    state = result.get("state")
+    # Show progress if available
+    if state == "running" and "extract_progress" in result:
+        progress = result["extract_progress"]
+        extracted = progress.get("extracted_pages", 0)
+        total = progress.get("total_pages", 0)
+        return {
+            "state": state,
+            "progress": f"{extracted}/{total}",
+            "extracted_pages": extracted,
+            "total_pages": total,
+        }
+    return {"state": state}
+
+
 class MinerUClient:
-    """Client for interacting with MinerU cloud API."""
+    """Client for interacting with MinerU cloud API.
+
+    Close it (or use it as a context manager) to stop its metrics exporter and image
+    workers and release the DOI cache.
+    """
 
     def __init__(self, api_token: Optional[str] = None, api_base_url: Optional[str] = None):
         """Initialize MinerU client.
@@ -40,6 +129,81 @@ class MinerUClient:
         cfg = config.load_config()
         self.poll_interval = cfg.get("mineru", {}).get("poll_interval", 3)
         self.max_poll_time = cfg.get("mineru", {}).get("max_poll_time", 600)
+        # How raw/ JSON artifacts are stored: "none", "gzip" or "zstd".
+        self.raw_compression = cfg.get("output", {}).get("raw_compression", "none")
+        # "directory" or "bundle" (one SQLite file per document, see p2r.bundle).
+        self.output_format = cfg.get("output", {}).get("format", "directory")
+        # Optional cross-document image store ("" disables it).
+        self.image_store = cfg.get("output", {}).get("image_store", "")
+        # Image post-processing stage (see p2r.images); its process pool is started on
+        # first use and shared by all documents.
+        self.image_options = dict(cfg.get("images", {}))
+        self._image_pool: Optional[Executor] = None
+        self._image_pool_lock = threading.Lock()
+        # Image hosting through PicGo (see p2r.picgo).
+        self.picgo_options = dict(cfg.get("picgo", {}))
+        # Metadata for frontmatter and naming (see p2r.metadata); the CrossRef resolver
+        # is opened on first use and shared by all documents.
+        self.metadata_options = dict(cfg.get("metadata", {}))
+        self._resolver: Optional[DOIResolver] = None
+        self._resolver_lock = threading.Lock()
+        # Optional full-text search index ("" disables it).
+        self.search_index = cfg.get("search", {}).get("index_path", "")
+        # Check local PDFs before uploading them (see p2r.preflight).
+        self.preflight = cfg.get("mineru", {}).get("preflight", True)
+        # Results of plan(), by file, until the file is converted (at most _MAX_PLANNED).
+        self._planned: Dict[Any, Dict[str, Any]] = {}
+        self._planned_lock = threading.Lock()
+        # Ledger the pages of converted documents are added to (see p2r.quota); None
+        # records nothing.
+        self.usage_ledger: Optional[Path] = configured_usage_path(cfg)
+        # Called with every finished timing span (see p2r.timing).
+        self.hooks: List[Hook] = []
+        # Counters and stage latencies for long-running deployments (see p2r.metrics).
+        self._metrics: metrics_backends.Metrics = metrics_backends.Metrics()
+        try:
+            self.metrics = metrics_backends.from_config(cfg)
+        except (ValueError, OSError) as e:
+            raise MinerUError(f"Failed to set up metrics: {e}")
+
+    @property
+    def metrics(self) -> metrics_backends.Metrics:
+        """Metrics backend (see p2r.metrics)."""
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, backend: metrics_backends.Metrics) -> None:
+        # The replaced backend may hold an HTTP server or a socket.
+        if backend is not self._metrics:
+            self._metrics.close()
+        self._metrics = backend
+
+    def close(self) -> None:
+        """Close the metrics backend, the image worker pool and the DOI resolver's cache."""
+        self._metrics.flush()
+        self._metrics.close()
+        with self._image_pool_lock:
+            if self._image_pool is not None:
+                self._image_pool.shutdown()
+                self._image_pool = None
+        with self._resolver_lock:
+            if self._resolver is not None:
+                self._resolver.close()
+                self._resolver = None
+
+    def __enter__(self) -> "MinerUClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def add_hook(self, hook: Hook) -> None:
+        """Register a callback receiving each timing span as a stage finishes.
+
+        The span dict holds "document", "stage", "start" and "duration" (seconds), plus
+        sizes such as "bytes"/"pages" and the derived "bytes_per_sec"/"pages_per_sec".
+        """
+        self.hooks.append(hook)
 
     def _get_headers(self) -> Dict[str, str]:
         """Get HTTP headers for API requests.
@@ -53,6 +217,16 @@ class MinerUClient:
             "Accept": "*/*",
         }
 
+    def _record_span(self, span: Dict[str, Any]) -> None:
+        """Timing hook feeding stage latencies and transfer sizes into the metrics."""
+        self.metrics.observe("stage_duration_seconds", span["duration"], {"stage": span["stage"]})
+        if span["stage"] == "upload" and "error" not in span:
+            self.metrics.increment("bytes_uploaded_total", span.get("bytes", 0))
+        elif span["stage"] == "download" and "error" not in span:
+            self.metrics.increment("bytes_downloaded_total", span.get("bytes", 0))
+        elif span["stage"] == "running" and span.get("pages"):
+            self.metrics.increment("pages_total", span["pages"])
+
     def _check_response(self, response: requests.Response) -> Dict[str, Any]:
         """Check API response for errors.
 
@@ -66,6 +240,9 @@ class MinerUClient:
             MinerUError: If response indicates an error
         """
         if response.status_code != 200:
+            self.metrics.increment(
+                "api_errors_total", tags={"code": f"http_{response.status_code}"}
+            )
             raise MinerUError(
                 f"HTTP {response.status_code}: {response.text}"
             )
@@ -73,26 +250,47 @@ class MinerUClient:
         try:
             data = response.json()
         except ValueError as e:
+            self.metrics.increment("api_errors_total", tags={"code": "invalid_json"})
             raise MinerUError(f"Invalid JSON response: {e}")
 
         if data.get("code") != 0:
             error_code = data.get("code")
+            self.metrics.increment("api_errors_total", tags={"code": str(error_code)})
             error_msg = data.get("msg", "Unknown error")
             raise MinerUError(f"API error {error_code}: {error_msg}")
 
         return data
 
+    def _batch_payload(
+        self,
+        files: List[Dict[str, Any]],
+        model_version: str,
+        extra_formats: Optional[Iterable[str]],
+    ) -> Dict[str, Any]:
+        """Request body shared by the upload and URL batch endpoints."""
+        if len(files) > MAX_BATCH_FILES:
+            raise MinerUError(
+                f"Too many files in one batch ({len(files)}); MinerU accepts {MAX_BATCH_FILES}"
+            )
+        payload = {"files": files, "model_version": model_version}
+        if extra_formats:
+            # MinerU default outputs markdown+json; extra_formats requests additional formats like html.
+            payload["extra_formats"] = list(extra_formats)
+        return payload
+
     def request_upload_urls(
         self,
         file_path: Path,
         model_version: str = "vlm",
         extra_formats: Optional[Iterable[str]] = None,
+        file_options: Optional[Dict[str, Any]] = None,
     ) -> tuple[str, str]:
         """Request upload URL for a file.
 
         Args:
             file_path: Path to the file to upload
             model_version: MinerU model version ("pipeline" or "vlm")
+            file_options: Extra per-file fields, e.g. {"is_ocr": True, "page_ranges": "1-600"}
 
         Returns:
             Tuple of (batch_id, upload_url)
@@ -100,33 +298,105 @@ class MinerUClient:
         Raises:
             MinerUError: If request fails
         """
-        url = f"{self.api_base_url}/file-urls/batch"
+        batch_id, upload_urls = self.request_upload_batch(
+            [file_path],
+            model_version=model_version,
+            extra_formats=extra_formats,
+            file_options=[file_options or {}],
+        )
+        return batch_id, upload_urls[0]
 
-        # Check file size (200MB limit)
-        file_size = file_path.stat().st_size
-        max_size = 200 * 1024 * 1024  # 200MB
-        if file_size > max_size:
-            raise MinerUError(
-                f"File size ({file_size / 1024 / 1024:.1f}MB) exceeds 200MB limit"
-            )
+    def request_upload_batch(
+        self,
+        file_paths: List[Path],
+        model_version: str = "vlm",
+        extra_formats: Optional[Iterable[str]] = None,
+        data_ids: Optional[List[str]] = None,
+        file_options: Optional[List[Dict[str, Any]]] = None,
+    ) -> tuple[str, List[str]]:
+        """Request upload URLs for several files in one batch.
 
-        payload = {
-            "files": [{"name": file_path.name}],
-            "model_version": model_version,
-        }
-        if extra_formats:
-            # MinerU default outputs markdown+json; extra_formats requests additional formats like html.
-            payload["extra_formats"] = list(extra_formats)
+        Args:
+            file_paths: Paths of the files to upload
+            model_version: MinerU model version ("pipeline" or "vlm")
+            extra_formats: Request additional output formats (e.g. ["html"])
+            data_ids: Optional data_id per file, echoed back in the batch results
+            file_options: Optional extra fields per file ("is_ocr", "page_ranges", ...)
 
+        Returns:
+            Tuple of (batch_id, upload URLs in file order)
+
+        Raises:
+            MinerUError: If a file is too large or the request fails
+        """
+        url = f"{self.api_base_url}/file-urls/batch"
+
+        files = []
+        for n, file_path in enumerate(file_paths):
+            # Check file size (200MB limit)
+            file_size = Path(file_path).stat().st_size
+            max_size = 200 * 1024 * 1024  # 200MB
+            if file_size > max_size:
+                raise MinerUError(
+                    f"File size ({file_size / 1024 / 1024:.1f}MB) exceeds 200MB limit"
+                )
+            entry = {"name": Path(file_path).name}
+            if data_ids:
+                entry["data_id"] = data_ids[n]
+            if file_options:
+                entry.update(file_options[n])
+            files.append(entry)
+        payload = self._batch_payload(files, model_version, extra_formats)
+
+        self.metrics.increment("api_requests_total", tags={"endpoint": "file_urls"})
         response = requests.post(
             url, headers=self._get_headers(), json=payload, timeout=30
         )
         data = self._check_response(response)
 
-        batch_id = data["data"]["batch_id"]
-        upload_url = data["data"]["file_urls"][0]
+        return data["data"]["batch_id"], list(data["data"]["file_urls"])
 
-        return batch_id, upload_url
+    def submit_urls(
+        self,
+        urls: List[str],
+        model_version: str = "vlm",
+        extra_formats: Optional[Iterable[str]] = None,
+        data_ids: Optional[List[str]] = None,
+        file_options: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        """Submit hosted documents by URL; MinerU fetches them itself, nothing is uploaded.
+
+        Args:
+            urls: http(s) URLs of the documents
+            model_version: MinerU model version ("pipeline" or "vlm")
+            extra_formats: Request additional output formats (e.g. ["html"])
+            data_ids: Optional data_id per URL, echoed back in the batch results
+            file_options: Optional extra fields per URL ("is_ocr", "page_ranges", ...)
+
+        Returns:
+            Batch ID, polled like an upload batch
+
+        Raises:
+            MinerUError: If request fails
+        """
+        url = f"{self.api_base_url}/extract/task/batch"
+        files = []
+        for n, source in enumerate(urls):
+            entry = {"url": source}
+            if data_ids:
+                entry["data_id"] = data_ids[n]
+            if file_options:
+                entry.update(file_options[n])
+            files.append(entry)
+        payload = self._batch_payload(files, model_version, extra_formats)
+
+        self.metrics.increment("api_requests_total", tags={"endpoint": "task_batch"})
+        response = requests.post(
+            url, headers=self._get_headers(), json=payload, timeout=30
+        )
+        data = self._check_response(response)
+
+        return data["data"]["batch_id"]
 
     def upload_file(self, file_path: Path, upload_url: str) -> None:
         """Upload file to the provided URL.
@@ -138,10 +408,14 @@ class MinerUClient:
         Raises:
             MinerUError: If upload fails
         """
+        self.metrics.increment("api_requests_total", tags={"endpoint": "upload"})
         with open(file_path, "rb") as f:
             response = requests.put(upload_url, data=f, timeout=300)
 
         if response.status_code != 200:
+            self.metrics.increment(
+                "api_errors_total", tags={"code": f"http_{response.status_code}"}
+            )
             raise MinerUError(
                 f"File upload failed: HTTP {response.status_code}"
             )
@@ -159,6 +433,8 @@ class MinerUClient:
             MinerUError: If request fails
         """
         url = f"{self.api_base_url}/extract-results/batch/{batch_id}"
+        self.metrics.increment("api_requests_total", tags={"endpoint": "batch_status"})
+        self.metrics.increment("poll_requests_total")
         response = requests.get(url, headers=self._get_headers(), timeout=30)
         data = self._check_response(response)
 
@@ -200,29 +476,21 @@ class MinerUClient:
             elif state == "failed":
                 err_msg = result.get("err_msg", "Unknown error")
                 raise MinerUError(f"Extraction failed: {err_msg}")
-            elif state in ["waiting-file", "pending", "running", "converting"]:
-                # Show progress if available
-                if state == "running" and "extract_progress" in result:
-                    progress = result["extract_progress"]
-                    extracted = progress.get("extracted_pages", 0)
-                    total = progress.get("total_pages", 0)
-                    yield {
-                        "state": state,
-                        "progress": f"{extracted}/{total}",
-                    }
-                else:
-                    yield {"state": state}
-
+            elif state in ACTIVE_STATES:
+                yield _progress_update(result)
                 time.sleep(self.poll_interval)
             else:
                 raise MinerUError(f"Unknown state: {state}")
 
-    def download_result(self, zip_url: str, output_dir: Path) -> Path:
+    def download_result(
+        self, zip_url: str, output_dir: Path, timer: Optional[RunTimer] = None
+    ) -> Path:
         """Download and extract result ZIP file.
 
         Args:
             zip_url: URL of the result ZIP file
             output_dir: Directory to extract files to
+            timer: Records "download" and "extract" spans when given
 
         Returns:
             Path to the extracted directory
@@ -230,12 +498,41 @@ class MinerUClient:
         Raises:
             MinerUError: If download or extraction fails
         """
+        timer = timer or RunTimer()
+        zip_path = self._download_zip(zip_url, output_dir, timer)
+
+        # Extract ZIP
+        with timer.span("extract") as span:
+            try:
+                with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                    span["bytes"] = sum(info.file_size for info in zip_ref.infolist())
+                    zip_ref.extractall(output_dir)
+            except zipfile.BadZipFile as e:
+                raise MinerUError(f"Invalid ZIP file: {e}")
+            finally:
+                # Clean up ZIP file
+                zip_path.unlink(missing_ok=True)
+
+        return output_dir
+
+    def _download_zip(self, zip_url: str, output_dir: Path, timer: RunTimer) -> Path:
+        """Download a result ZIP into output_dir/result.zip (recording a "download" span).
+
+        Raises:
+            MinerUError: If the download fails
+        """
         # Download ZIP file
-        response = requests.get(zip_url, timeout=300)
-        if response.status_code != 200:
-            raise MinerUError(
-                f"Failed to download result: HTTP {response.status_code}"
-            )
+        with timer.span("download") as span:
+            self.metrics.increment("api_requests_total", tags={"endpoint": "download"})
+            response = requests.get(zip_url, timeout=300)
+            if response.status_code != 200:
+                self.metrics.increment(
+                    "api_errors_total", tags={"code": f"http_{response.status_code}"}
+                )
+                raise MinerUError(
+                    f"Failed to download result: HTTP {response.status_code}"
+                )
+            span["bytes"] = len(response.content)
 
         # Save to temporary file
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -243,97 +540,788 @@ class MinerUClient:
 
         with open(zip_path, "wb") as f:
             f.write(response.content)
-
-        # Extract ZIP
-        try:
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(output_dir)
-        except zipfile.BadZipFile as e:
-            raise MinerUError(f"Invalid ZIP file: {e}")
-        finally:
-            # Clean up ZIP file
-            zip_path.unlink(missing_ok=True)
-
-        return output_dir
+        return zip_path
 
     def _safe_move_to_dir(self, src: Path, dest_dir: Path) -> Path:
         """Move src into dest_dir, avoiding overwrites by suffixing _vN when needed."""
         dest_dir.mkdir(parents=True, exist_ok=True)
-        candidate = dest_dir / src.name
-        if not candidate.exists():
-            shutil.move(str(src), str(candidate))
-            return candidate
-
-        stem, suffix = src.stem, src.suffix
-        for n in range(2, 1000):
-            candidate = dest_dir / f"{stem}_v{n}{suffix}"
-            if not candidate.exists():
-                shutil.move(str(src), str(candidate))
-                return candidate
-
-        raise MinerUError(f"Too many name conflicts while moving {src.name}")
+        candidate = allocate_name(dest_dir, src.name)
+        shutil.move(str(src), str(candidate))
+        return candidate
 
     def _organize_output_dir(self, output_dir: Path) -> None:
         """Lightweight post-processing: keep reading assets at root, move raw artifacts into raw/."""
         raw_dir = output_dir / "raw"
-        raw_names = {"layout.json"}
-        raw_suffixes = ("_content_list.json", "_model.json", "_origin.pdf")
 
         for p in output_dir.iterdir():
             if not p.is_file():
                 continue
-            if p.name in raw_names or p.name.endswith(raw_suffixes):
+            if _is_raw_artifact(p.name):
                 self._safe_move_to_dir(p, raw_dir)
 
+    def _resolve_options(
+        self,
+        raw_compression: Optional[str],
+        image_store: Optional[str],
+        optimize_images: Optional[bool],
+        search_index: Optional[str],
+        output_format: Optional[str] = None,
+        upload_images: Optional[bool] = None,
+        extract_metadata: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """Fill unset post-processing options from the config (see parse_pdf).
+
+        Returns:
+            One dict of every option, handed to _store_result as a whole
+        """
+        if output_format is None:
+            output_format = self.output_format
+        if output_format not in OUTPUT_FORMATS:
+            raise MinerUError(f"Unknown output format: {output_format}")
+        if raw_compression is None:
+            raw_compression = self.raw_compression
+        if raw_compression not in COMPRESSIONS:
+            raise MinerUError(f"Unknown raw compression: {raw_compression}")
+        if image_store is None:
+            image_store = self.image_store
+        image_options = dict(self.image_options)
+        if optimize_images is None:
+            optimize_images = bool(image_options.get("enabled", False))
+        image_options.pop("enabled", None)
+        if search_index is None:
+            search_index = self.search_index
+        if upload_images is None:
+            upload_images = bool(self.picgo_options.get("enabled", False))
+        if extract_metadata is None:
+            extract_metadata = bool(self.metadata_options.get("enabled", False))
+        return {
+            "raw_compression": raw_compression,
+            "image_store": image_store,
+            "optimize_images": optimize_images,
+            "image_options": image_options,
+            "search_index": search_index,
+            "output_format": output_format,
+            "upload_images": upload_images,
+            "extract_metadata": extract_metadata,
+        }
+
+    def plan(self, file_path: Path, model_version: str) -> List[Dict[str, Any]]:
+        """Plan the tasks of a local file ahead of converting it (see p2r.preflight).
+
+        The pre-flight result is kept until the file is converted, so parse_pdf and
+        parse_batch do not read it again unless it changed in between. Only the latest
+        results are kept, for files planned but never converted.
+
+        Returns:
+            One {"suffix", "pages", "options"} entry per task; several for a PDF over
+            MinerU's page limit
+        """
+        file_path = Path(file_path)
+        if not self.preflight or file_path.suffix.lower() != ".pdf":
+            return [{"suffix": "", "pages": None, "options": {}}]
+        info = preflight(file_path)
+        key = _file_key(file_path)
+        with self._planned_lock:
+            self._planned.pop(key, None)
+            self._planned[key] = info
+            while len(self._planned) > _MAX_PLANNED:
+                del self._planned[next(iter(self._planned))]
+        return plan_parts(info, model_version)
+
+    def _preflight(
+        self, file_path: Path, model_version: str, timer: RunTimer
+    ) -> List[Dict[str, Any]]:
+        """Pre-flight a local PDF and plan its tasks (see p2r.preflight.plan_parts).
+
+        Raises:
+            MinerUError: If MinerU would reject the file
+        """
+        if not self.preflight or file_path.suffix.lower() != ".pdf":
+            return [{"suffix": "", "pages": None, "options": {}}]
+        with timer.span("preflight") as span:
+            with self._planned_lock:
+                info = self._planned.pop(_file_key(file_path), None)
+            info = info or preflight(file_path)
+            if info["pages"] is not None:
+                span["pages"] = info["pages"]
+        if info["errors"]:
+            self.metrics.increment("preflight_rejected_total")
+            raise MinerUError(
+                f"Pre-flight check failed for {file_path.name}: {'; '.join(info['errors'])}"
+            )
+        return plan_parts(info, model_version)
+
+    def _store_result(
+        self,
+        zip_url: str,
+        output_dir: Path,
+        timer: RunTimer,
+        source: str,
+        options: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None,
+        name_suffix: Optional[str] = None,
+    ) -> Path:
+        """Download a finished task and commit it as a document directory.
+
+        Args:
+            options: Post-processing options resolved by _resolve_options
+            metadata: Prefetched metadata of the source (see p2r.metadata.prefetch)
+            name_suffix: Set when output_dir was named after the source: with a
+                metadata.name_template, the document is named after its metadata
+                instead (plus this suffix)
+
+        Returns:
+            The committed directory (output_dir or a versioned sibling), or the committed
+            bundle file for the "bundle" output format
+        """
+        if options["output_format"] == "bundle":
+            return self._store_bundle(
+                zip_url, output_dir, timer, source, options["raw_compression"]
+            )
+        # Everything local happens in a staging directory next to output_dir, committed
+        # with one rename, so a failure never leaves a half-populated output behind.
+        staging = create_staging_dir(Path(output_dir))
+        deposit: Dict[str, int] = {}
+        try:
+            self.download_result(zip_url, staging, timer=timer)
+            # Keep full.md/images at root; move raw/debug artifacts into raw/ for cleaner
+            # consumption.
+            with timer.span("organize"):
+                self._organize_output_dir(staging)
+            if options["optimize_images"]:
+                # Runs before the image store so transcoded variants are deduplicated too.
+                with timer.span("images"):
+                    postprocess_images(
+                        staging, options["image_options"], pool=self._images_pool()
+                    )
+            image_store = options["image_store"]
+            if image_store:
+                with timer.span("image_store"):
+                    # Symlinked documents are registered once they have their final path.
+                    deposit = ImageStore(Path(image_store)).deposit_dir(
+                        staging / "images", register=False
+                    )
+            if options["upload_images"]:
+                with timer.span("picgo") as span:
+                    self._upload_images(staging, span)
+            # Sidecar indexes: per-page byte ranges for random access, per-page R-trees for
+            # hit-testing.
+            raw_dir = staging / "raw"
+            raw_compression = options["raw_compression"]
+            if raw_dir.is_dir():
+                if raw_compression != "none":
+                    with timer.span("compress_raw"):
+                        try:
+                            compress_raw_dir(raw_dir, raw_compression)
+                        except ImportError as e:
+                            raise MinerUError(str(e))
+                with timer.span("index"):
+                    write_page_index(raw_dir)
+                    write_spatial_index(raw_dir)
+            dest = Path(output_dir)
+            if options["extract_metadata"]:
+                with timer.span("metadata"):
+                    meta = self._write_metadata(staging, metadata)
+                template = self.metadata_options.get("name_template", "")
+                name = render_name(template, meta) if template else None
+                if name and name_suffix is not None:
+                    dest = dest.with_name(name + name_suffix)
+            with timer.span("commit"):
+                write_manifest(staging, source=source)
+                extracted_dir = commit_dir(staging, dest)
+        except BaseException:
+            discard_dir(staging)
+            raise
+        if deposit.get("symlink"):
+            ImageStore(Path(image_store)).register(extracted_dir / "images")
+        search_index = options["search_index"]
+        if search_index:
+            with timer.span("search_index") as span:
+                try:
+                    with SearchIndex(Path(search_index)) as index:
+                        index.index_document(extracted_dir)
+                except FileNotFoundError:
+                    pass  # No content_list in this result: nothing to index
+                except (sqlite3.Error, ValueError, OSError) as e:
+                    # The document is committed: failing it now would only get it converted
+                    # again. `p2r reindex` catches the index up later.
+                    span["warning"] = f"Failed to update search index {search_index}: {e}"
+        return extracted_dir
+
+    def _images_pool(self) -> Optional[Executor]:
+        """The shared image worker pool, or None without Pillow (nothing to transcode)."""
+        if not has_pillow():
+            return None
+        with self._image_pool_lock:
+            if self._image_pool is None:
+                self._image_pool = image_pool(self.image_options.get("workers") or 0)
+            return self._image_pool
+
+    def _doi_resolver(self) -> Optional[DOIResolver]:
+        """The shared CrossRef resolver, or None if lookups are disabled."""
+        if not self.metadata_options.get("crossref", True):
+            return None
+        with self._resolver_lock:
+            if self._resolver is None:
+                try:
+                    self._resolver = DOIResolver.from_options(self.metadata_options)
+                except (sqlite3.Error, ValueError, OSError) as e:
+                    raise MinerUError(f"Failed to open metadata cache: {e}")
+            return self._resolver
+
+    def _prefetch_metadata(self, sources: Iterable[Source]) -> Optional[Future]:
+        """Start reading local PDFs' metadata and looking up their DOIs in the background.
+
+        Returns:
+            Future of p2r.metadata.prefetch's result, or None without local PDFs
+        """
+        paths = sorted(
+            {Path(s) for s in sources if not is_url(s) and Path(s).suffix.lower() == ".pdf"}
+        )
+        if not paths:
+            return None
+        resolver = self._doi_resolver()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="p2r-metadata")
+        future = executor.submit(prefetch, paths, resolver)
+        executor.shutdown(wait=False)  # The thread exits once the prefetch is done
+        return future
+
+    def _write_metadata(
+        self, doc_dir: Path, prefetched: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Complete a staged document's metadata and write metadata.json and frontmatter."""
+        meta = collect_metadata(doc_dir, prefetched, self._doi_resolver())
+        write_metadata(
+            doc_dir,
+            meta,
+            self.metadata_options.get("frontmatter_fields") or {},
+            inject=self.metadata_options.get("frontmatter", True),
+        )
+        return meta
+
+    def _upload_images(self, doc_dir: Path, span: Dict[str, Any]) -> None:
+        """Upload a staged document's images through PicGo and rewrite its links.
+
+        Upload failures are recorded on the span, not raised: the document keeps its
+        local images/ links for those images.
+        """
+        try:
+            uploader = PicGoUploader.from_options(self.picgo_options)
+        except (sqlite3.Error, ValueError, OSError) as e:
+            raise MinerUError(f"Failed to open PicGo upload cache: {e}")
+        with uploader:
+            summary = upload_document(doc_dir, uploader)
+        for status in ("uploaded", "cached", "failed"):
+            span[status] = summary[status]
+            if summary[status]:
+                self.metrics.increment(
+                    "picgo_images_total", summary[status], tags={"status": status}
+                )
+
+    def _store_bundle(
+        self,
+        zip_url: str,
+        output_dir: Path,
+        timer: RunTimer,
+        source: str,
+        raw_compression: str,
+    ) -> Path:
+        """Download a finished task and commit it as a single bundle file (see p2r.bundle).
+
+        Archive members are written straight into the bundle, laid out like a document
+        directory. Image post-processing, the image store, image uploads, metadata
+        extraction (metadata.json, frontmatter and name_template naming) and the search
+        index work on directories and are skipped; `p2r bundle export` restores one when
+        needed.
+
+        Returns:
+            The committed bundle (output_dir.p2r or a versioned sibling)
+        """
+
+        def entries():
+            for path, data in iter_zip(zip_path):
+                if "/" not in path and _is_raw_artifact(path):
+                    path = f"raw/{path}"
+                    if raw_compression != "none" and artifact_kind(path[4:]) is not None:
+                        data = compress_raw_bytes(data, raw_compression)
+                        path = compressed_name(path, raw_compression)
+                yield path, data
+
+        dest = bundle_path(output_dir)
+        staging = create_staging_dir(dest)
+        try:
+            zip_path = self._download_zip(zip_url, staging, timer)
+            with timer.span("bundle") as span:
+                try:
+                    stats = write_bundle(staging / dest.name, entries(), source=source)
+                except zipfile.BadZipFile as e:
+                    raise MinerUError(f"Invalid ZIP file: {e}")
+                except ImportError as e:
+                    raise MinerUError(str(e))
+                span["bytes"] = stats["bytes"]
+            with timer.span("commit"):
+                committed = commit_file(staging / dest.name, dest)
+        finally:
+            discard_dir(staging)
+        try:
+            output_dir.rmdir()  # Created up front by callers; only the bundle is kept
+        except OSError:
+            pass
+        return committed
+
     def parse_pdf(
         self,
-        file_path: Path,
+        file_path: Source,
         output_dir: Path,
         model_version: str = "vlm",
         extra_formats: Optional[Iterable[str]] = None,
+        raw_compression: Optional[str] = None,
+        image_store: Optional[str] = None,
+        optimize_images: Optional[bool] = None,
+        search_index: Optional[str] = None,
+        output_format: Optional[str] = None,
+        upload_images: Optional[bool] = None,
+        extract_metadata: Optional[bool] = None,
     ) -> Path:
         """Parse a PDF file and download results.
 
-        This is the main high-level method that orchestrates the entire process.
+        This is the main high-level method that orchestrates the entire process. It yields
+        progress updates; the last one is {"state": "completed", "output_dir": ...,
+        "timings": ...} with the per-stage timing report (see p2r.timing).
 
         Args:
-            file_path: Path to PDF file
-            output_dir: Directory to save results
+            file_path: Path to PDF file, or an http(s) URL that MinerU fetches itself
+                (submitted through the URL batch API, so nothing is uploaded). Local PDFs
+                are pre-flighted first (see p2r.preflight); ones MinerU would reject, or
+                that need splitting, raise before anything is uploaded
+            output_dir: Directory to save results; if it already holds files, the next free
+                sibling output_dir_v2, output_dir_v3, ... is used
             model_version: MinerU model version ("pipeline" or "vlm")
             extra_formats: Request additional output formats (e.g. ["html"])
+            raw_compression: Storage of raw/ JSON artifacts ("none", "gzip" or "zstd");
+                defaults to the output.raw_compression config value
+            image_store: Directory of the shared content-addressed image store ("" disables
+                it); defaults to the output.image_store config value
+            optimize_images: Run the image post-processing stage; defaults to the
+                images.enabled config value
+            search_index: SQLite search index to add the document to ("" disables it);
+                defaults to the search.index_path config value
+            output_format: "directory", or "bundle" to store the document as the single
+                file output_dir.p2r (see p2r.bundle); defaults to the output.format config
+                value. Bundles skip optimize_images, image_store, upload_images,
+                extract_metadata and search_index
+            upload_images: Upload images through PicGo and link to the uploads (see
+                p2r.picgo); defaults to the picgo.enabled config value
+            extract_metadata: Write metadata.json and Markdown frontmatter (title,
+                authors, year, DOI; see p2r.metadata); defaults to the metadata.enabled
+                config value. The PDF's own metadata is read and its DOI looked up
+                while MinerU parses
 
         Returns:
-            Path to the directory containing extracted files
+            Path to the directory containing extracted files (or to the bundle)
 
         Raises:
             MinerUError: If any step fails
         """
-        # Step 1: Request upload URL
-        batch_id, upload_url = self.request_upload_urls(
-            file_path, model_version=model_version, extra_formats=extra_formats
+        options = self._resolve_options(
+            raw_compression,
+            image_store,
+            optimize_images,
+            search_index,
+            output_format,
+            upload_images,
+            extract_metadata,
         )
 
-        # Step 2: Upload file
-        self.upload_file(file_path, upload_url)
+        prefetched = None
+        try:
+            timer = RunTimer(
+                document=source_name(file_path), hooks=[self._record_span, *self.hooks]
+            )
+
+            if is_url(file_path):
+                # Step 1-2: MinerU downloads the document itself
+                with timer.span("submit"):
+                    batch_id = self.submit_urls(
+                        [file_path], model_version=model_version, extra_formats=extra_formats
+                    )
+            else:
+                # Step 0: Catch files MinerU would reject before transferring them
+                parts = self._preflight(Path(file_path), model_version, timer)
+                if len(parts) > 1:
+                    raise MinerUError(
+                        f"{Path(file_path).name} has more than {MAX_PAGES} pages; convert it "
+                        f"with parse_batch, which splits it into {len(parts)} parts"
+                    )
+
+                if options["extract_metadata"]:
+                    # Read while the file is uploaded and parsed (see p2r.metadata).
+                    prefetched = self._prefetch_metadata([file_path])
+
+                # Step 1: Request upload URL
+                with timer.span("request_urls"):
+                    batch_id, upload_url = self.request_upload_urls(
+                        Path(file_path),
+                        model_version=model_version,
+                        extra_formats=extra_formats,
+                        file_options=parts[0]["options"],
+                    )
+
+                # Step 2: Upload file
+                with timer.span("upload", bytes=Path(file_path).stat().st_size):
+                    self.upload_file(Path(file_path), upload_url)
+
+            # Step 3: Wait for completion and show progress
+            result = None
+            timer.mark("submitted")  # Until MinerU reports the first task state
+            for update in self.wait_for_completion(batch_id):
+                # These are progress updates; state transitions delimit queue and parse spans
+                _mark_state(timer, update)
+                yield update
+            timer.close_mark()
+
+            # At this point, we should have the final result
+            # Get it one more time to ensure we have the complete data
+            batch_data = self.get_batch_status(batch_id)
+            result = batch_data.get("extract_result", [{}])[0]
+
+            # Step 4: Download result
+            zip_url = result.get("full_zip_url")
+            if not zip_url:
+                raise MinerUError("No result URL in response")
+            extracted_dir = self._store_result(
+                zip_url,
+                Path(output_dir),
+                timer,
+                _manifest_source(file_path),
+                options,
+                metadata=_prefetched(prefetched, file_path),
+            )
+
+            report = timer.report()
+            _record_usage(report, self.usage_ledger)
+            self.metrics.increment("documents_total", tags={"status": "completed"})
+        except Exception:
+            self.metrics.increment("documents_total", tags={"status": "failed"})
+            raise
+        finally:
+            self.metrics.flush()
+
+        yield {
+            "state": "completed",
+            "output_dir": str(extracted_dir),
+            "timings": report,
+        }
+
+    def parse_batch(
+        self,
+        sources: Iterable[Source],
+        output_dir: Path,
+        model_version: str = "vlm",
+        extra_formats: Optional[Iterable[str]] = None,
+        raw_compression: Optional[str] = None,
+        image_store: Optional[str] = None,
+        optimize_images: Optional[bool] = None,
+        search_index: Optional[str] = None,
+        output_format: Optional[str] = None,
+        upload_images: Optional[bool] = None,
+        extract_metadata: Optional[bool] = None,
+    ):
+        """Parse several local files and/or URLs, submitted together.
+
+        Local files share one upload batch (one request for all upload URLs, then one PUT
+        each); URLs share one URL batch task and are never downloaded or uploaded by p2r.
+        Both batches are polled together and every document is downloaded and committed
+        to output_dir/<name> as soon as it is done.
+
+        Local PDFs are pre-flighted first: ones MinerU would reject fail without being
+        uploaded, and ones over the page limit are submitted as several page_ranges
+        parts, committed to output_dir/<name>_p<first>-<last>.
+
+        Yields progress updates carrying "source" (as given), and "part" (its page range)
+        for split documents, next to the fields parse_pdf yields. Each document or part
+        ends with either {"state": "completed", "output_dir", "timings"} or {"state":
+        "failed", "error"}; one failed document does not stop the others. A document
+        times out after max_poll_time seconds without progress: of its own task, or,
+        while queued at MinerU, of any task of its batch. Time spent downloading and
+        storing results does not count.
 
-        # Step 3: Wait for completion and show progress
-        result = None
-        for update in self.wait_for_completion(batch_id):
-            # These are progress updates
-            yield update
+        Args:
+            sources: Local paths and http(s) URLs, in any mix
+            output_dir: Parent directory of the per-document directories; documents with
+                the same name get output_dir/<name>_v2, ...
+            model_version: MinerU model version ("pipeline" or "vlm")
+            extra_formats: Request additional output formats (e.g. ["html"])
+            raw_compression: See parse_pdf
+            image_store: See parse_pdf
+            optimize_images: See parse_pdf
+            search_index: See parse_pdf
+            output_format: See parse_pdf; bundles are output_dir/<name>.p2r
+            upload_images: See parse_pdf
+            extract_metadata: See parse_pdf; with a metadata.name_template, documents
+                are committed to output_dir/<name from the metadata> when it renders
+
+        Raises:
+            MinerUError: If a batch cannot be submitted (nothing has been written then) or
+                polling its status fails
+        """
+        options = self._resolve_options(
+            raw_compression,
+            image_store,
+            optimize_images,
+            search_index,
+            output_format,
+            upload_images,
+            extract_metadata,
+        )
+        hooks = [self._record_span, *self.hooks]
+        jobs = []
+        for n, source in enumerate(sources):
+            timer = RunTimer(document=source_name(source), hooks=hooks)
+            parts = [{"suffix": "", "options": {}}]
+            if not is_url(source):
+                try:
+                    parts = self._preflight(Path(source), model_version, timer)
+                except MinerUError as e:
+                    parts = [{"suffix": "", "options": {}, "error": str(e)}]
+            for k, part in enumerate(parts):
+                job = {
+                    "source": source,
+                    "data_id": f"p2r-{n}" if len(parts) == 1 else f"p2r-{n}-{k}",
+                    "suffix": part["suffix"],
+                    "options": part["options"],
+                    "timer": timer,
+                }
+                if k > 0:
+                    name = source_name(source) + part["suffix"]
+                    job["timer"] = RunTimer(document=name, hooks=hooks)
+                if "error" in part:
+                    job["error"] = part["error"]
+                jobs.append(job)
+        files = [job for job in jobs if not is_url(job["source"]) and "error" not in job]
+        urls = [job for job in jobs if is_url(job["source"])]
+        if options["extract_metadata"]:
+            # One background read of every PDF and one batched DOI lookup, done while
+            # the batch is uploaded and parsed (see p2r.metadata).
+            prefetched = self._prefetch_metadata(job["source"] for job in files)
+            for job in files:
+                job["metadata"] = prefetched
+        # Shared submission requests are timed once, outside any document's report.
+        batch_timer = RunTimer(hooks=hooks)
+
+        try:
+            batches = []
+            for start in range(0, len(files), MAX_BATCH_FILES):
+                chunk = files[start:start + MAX_BATCH_FILES]
+                with batch_timer.span("request_urls"):
+                    batch_id, upload_urls = self.request_upload_batch(
+                        [Path(job["source"]) for job in chunk],
+                        model_version=model_version,
+                        extra_formats=extra_formats,
+                        data_ids=[job["data_id"] for job in chunk],
+                        file_options=[job["options"] for job in chunk],
+                    )
+                batches.append((batch_id, chunk))
+                for job, upload_url in zip(chunk, upload_urls):
+                    size = Path(job["source"]).stat().st_size
+                    try:
+                        with job["timer"].span("upload", bytes=size):
+                            self.upload_file(Path(job["source"]), upload_url)
+                    except MinerUError as e:
+                        job["error"] = str(e)
+            for start in range(0, len(urls), MAX_BATCH_FILES):
+                chunk = urls[start:start + MAX_BATCH_FILES]
+                with batch_timer.span("submit"):
+                    batch_id = self.submit_urls(
+                        [job["source"] for job in chunk],
+                        model_version=model_version,
+                        extra_formats=extra_formats,
+                        data_ids=[job["data_id"] for job in chunk],
+                        file_options=[job["options"] for job in chunk],
+                    )
+                batches.append((batch_id, chunk))
+        except Exception:
+            self.metrics.increment("documents_total", len(jobs), tags={"status": "failed"})
+            self.metrics.flush()
+            raise
+
+        try:
+            submitted = time.time()
+            for job in jobs:
+                if "error" in job:
+                    yield self._finish_failed(job)
+                else:
+                    job["timer"].mark("submitted")
+                    # Each document gets max_poll_time from its last state change, so a
+                    # long queue at MinerU does not time out documents still progressing.
+                    job["deadline"] = submitted + self.max_poll_time
+
+            while any("finished" not in job for job in jobs):
+                for batch_id, chunk in batches:
+                    active = [(n, job) for n, job in enumerate(chunk) if "finished" not in job]
+                    if not active:
+                        continue
+                    results = self.get_batch_status(batch_id).get("extract_result", [])
+                    by_id = {r.get("data_id"): r for r in results if r.get("data_id")}
+                    moved = False
+                    for position, job in active:
+                        result = by_id.get(job["data_id"])
+                        if result is None:
+                            # Fall back to submission order if data_id is not echoed.
+                            if by_id or position >= len(results):
+                                continue
+                            result = results[position]
+                        seen, started = job.get("seen"), time.time()
+                        update = self._advance_job(job, result, Path(output_dir), options)
+                        moved = moved or "finished" in job or job.get("seen") != seen
+                        if update is not None and update["state"] == "completed":
+                            # Downloading and storing a result is not time spent waiting
+                            # on MinerU: keep it off the other documents' deadlines.
+                            spent = time.time() - started
+                            for other in jobs:
+                                if "deadline" in other:
+                                    other["deadline"] += spent
+                        if update is not None:
+                            yield update
+                    if moved:
+                        # Documents queued behind ones that moved on are not stuck either.
+                        renewed = time.time() + self.max_poll_time
+                        for _, job in active:
+                            if job.get("seen", ("pending",))[0] in ("waiting-file", "pending"):
+                                job["deadline"] = max(job["deadline"], renewed)
+
+                now = time.time()
+                for job in jobs:
+                    if "finished" not in job and now > job["deadline"]:
+                        job["error"] = (
+                            f"Extraction timed out: no progress for {self.max_poll_time}s"
+                        )
+                        yield self._finish_failed(job)
+                if any("finished" not in job for job in jobs):
+                    time.sleep(self.poll_interval)
+        finally:
+            self.metrics.flush()
+
+    def _advance_job(
+        self,
+        job: Dict[str, Any],
+        result: Dict[str, Any],
+        output_dir: Path,
+        options: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """Apply one polled task result to a parse_batch document; the update to yield."""
+        state = result.get("state")
+        timer = job["timer"]
+        if state in ACTIVE_STATES:
+            update = _progress_update(result)
+            seen = (update["state"], update.get("extracted_pages"))
+            if seen != job.get("seen"):
+                job["seen"] = seen
+                job["deadline"] = time.time() + self.max_poll_time
+            _mark_state(timer, update)
+            return _job_update(job, update)
+        if state == "failed":
+            job["error"] = f"Extraction failed: {result.get('err_msg', 'Unknown error')}"
+            return self._finish_failed(job)
+        if state != "done":
+            job["error"] = f"Unknown state: {state}"
+            return self._finish_failed(job)
+
+        timer.close_mark()
+        try:
+            zip_url = result.get("full_zip_url")
+            if not zip_url:
+                raise MinerUError("No result URL in response")
+            extracted_dir = self._store_result(
+                zip_url,
+                output_dir / (document_stem(job["source"]) + job["suffix"]),
+                timer,
+                _manifest_source(job["source"]),
+                options,
+                metadata=_prefetched(job.get("metadata"), job["source"]),
+                name_suffix=job["suffix"],
+            )
+        except (MinerUError, OSError) as e:
+            job["error"] = str(e)
+            return self._finish_failed(job)
+        job["finished"] = True
+        report = timer.report()
+        _record_usage(report, self.usage_ledger)
+        self.metrics.increment("documents_total", tags={"status": "completed"})
+        return _job_update(
+            job, {"state": "completed", "output_dir": str(extracted_dir), "timings": report}
+        )
+
+    def _finish_failed(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Mark a parse_batch document failed; the final update for it."""
+        job["finished"] = True
+        job["timer"].close_mark()
+        self.metrics.increment("documents_total", tags={"status": "failed"})
+        return _job_update(job, {"state": "failed", "error": job["error"]})
+
+
+def _file_key(path: Path) -> Any:
+    """Identity of a file's current content for plan(): path, size and mtime."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return str(path.resolve()), st.st_size, st.st_mtime_ns
+
+
+def _prefetched(future: Optional[Future], source: Source) -> Optional[Dict[str, Any]]:
+    """A source's entry of a metadata prefetch (None for URLs or if it failed)."""
+    if future is None or is_url(source):
+        return None
+    try:
+        return future.result().get(Path(source))
+    except Exception:
+        return None  # Metadata then comes from the content_list alone
+
+
+def _job_update(job: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """A parse_batch update, tagged with the document's source (and part)."""
+    update = dict(update, source=job["source"])
+    if job["suffix"]:
+        update["part"] = job["options"]["page_ranges"]
+    return update
+
+
+def _mark_state(timer: RunTimer, update: Dict[str, Any]) -> None:
+    """Record a polled task state on timer, with the page count once it is known."""
+    if update.get("total_pages"):
+        timer.mark(update["state"], pages=update["total_pages"])
+    else:
+        timer.mark(update["state"])
+
+
+def _record_usage(report: Dict[str, Any], ledger: Optional[Path]) -> None:
+    """Add a converted document's pages to today's quota ledger (see p2r.quota).
+
+    The ledger is advisory: failing to update it never fails the conversion. Nothing is
+    recorded when ledger is None.
+    """
+    if ledger is None:
+        return
+    pages = max(
+        (
+            span.get("pages") or 0
+            for span in report.get("stages", [])
+            if span.get("stage") == "running"
+        ),
+        default=0,
+    )
+    if pages:
+        try:
+            record_pages(pages, path=ledger)
+        except OSError:
+            pass
 
-        # At this point, we should have the final result
-        # Get it one more time to ensure we have the complete data
-        batch_data = self.get_batch_status(batch_id)
-        result = batch_data.get("extract_result", [{}])[0]
 
-        # Step 4: Download result
-        zip_url = result.get("full_zip_url")
-        if not zip_url:
-            raise MinerUError("No result URL in response")
+def _is_raw_artifact(name: str) -> bool:
+    return name in _RAW_NAMES or name.endswith(_RAW_SUFFIXES)
 
-        extracted_dir = self.download_result(zip_url, output_dir)
-        # Keep full.md/images at root; move raw/debug artifacts into raw/ for cleaner consumption.
-        self._organize_output_dir(extracted_dir)
 
-        yield {"state": "completed", "output_dir": str(extracted_dir)}
+def _manifest_source(source: Source) -> str:
+    """What a document's manifest records as its source: the URL or the file name."""
+    return source if is_url(source) else Path(source).name
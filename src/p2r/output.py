@@ -0,0 +1,233 @@
+"""Staged, atomic output directories with a manifest.
+
+A conversion is assembled in a staging directory created next to its destination (so
+both are on the same filesystem), then committed with one rename: readers see either no
+document or a complete one, and a crash leaves only a hidden `.p2r-staging-*` directory
+behind instead of a half-populated folder (PRD §5.4).
+
+At commit time `manifest.json` records every file with its size and SHA-256, so listings
+and downstream tools never need to walk the tree.
+
+Single-file outputs (see p2r.bundle) are committed the same way with `commit_file`.
+
+Name conflicts are resolved PRD §5.5-style (`name`, `name_v2`, `name_v3`, ...) from a
+single directory scan rather than one `exists()` probe per candidate.
+"""
+
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# p2r.rebuild's cache of input stats; rewritten without changing the document's content.
+REBUILD_MANIFEST_NAME = ".p2r_rebuild.json"
+STAGING_PREFIX = ".p2r-staging-"
+
+# Attempts to commit when concurrent writers keep taking the allocated name.
+_COMMIT_ATTEMPTS = 10
+
+
+def allocate_name(parent: Path, name: str, is_dir: bool = False) -> Path:
+    """First free `name`, `stem_v2<suffix>`, `stem_v3<suffix>`, ... in parent.
+
+    One scan of parent finds the highest version in use; the next one is returned.
+
+    Args:
+        parent: Directory the name is allocated in
+        name: Preferred file or directory name
+        is_dir: Treat name as a directory name (no suffix is split off)
+
+    Returns:
+        Path in parent that did not exist during the scan
+    """
+    stem, suffix = (name, "") if is_dir else (Path(name).stem, Path(name).suffix)
+    pattern = re.compile(rf"{re.escape(stem)}(?:_v(\d+))?{re.escape(suffix)}")
+    highest = 0
+    base_taken = False
+    try:
+        with os.scandir(parent) as entries:
+            for entry in entries:
+                match = pattern.fullmatch(entry.name)
+                if match:
+                    base_taken = base_taken or match.group(1) is None
+                    highest = max(highest, int(match.group(1) or 1))
+    except FileNotFoundError:
+        pass
+    if not base_taken:
+        return Path(parent) / name
+    return Path(parent) / f"{stem}_v{highest + 1}{suffix}"
+
+
+def create_staging_dir(dest: Path) -> Path:
+    """Create a hidden staging directory next to dest (on the same filesystem)."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f"{STAGING_PREFIX}{dest.name}-", dir=dest.parent))
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_manifest(doc_dir: Path, source: Optional[str] = None) -> Dict[str, Any]:
+    """Describe every file below doc_dir (except the manifest and the rebuild manifest).
+
+    Returns:
+        {"version", "source", "created_at", "files": [{"path", "size", "sha256"}]} with
+        POSIX paths relative to doc_dir, sorted
+    """
+    doc_dir = Path(doc_dir)
+    files = []
+    for root, dirs, names in os.walk(doc_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = Path(root) / name
+            rel = path.relative_to(doc_dir).as_posix()
+            if rel in (MANIFEST_NAME, REBUILD_MANIFEST_NAME) or not path.exists():
+                continue  # Dangling symlinks are skipped too
+            files.append({"path": rel, "size": path.stat().st_size, "sha256": _sha256_file(path)})
+    return {
+        "version": MANIFEST_VERSION,
+        "source": source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": files,
+    }
+
+
+def write_manifest(doc_dir: Path, source: Optional[str] = None) -> Path:
+    """Build and write doc_dir/manifest.json.
+
+    Returns:
+        Path to the written manifest
+    """
+    # Built before the temporary file exists, which would otherwise list itself.
+    manifest = build_manifest(doc_dir, source)
+    manifest_path = Path(doc_dir) / MANIFEST_NAME
+    tmp = manifest_path.with_name(MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, manifest_path)
+    return manifest_path
+
+
+def load_manifest(doc_dir: Path) -> Optional[Dict[str, Any]]:
+    """doc_dir/manifest.json, or None if missing or unreadable."""
+    try:
+        with open(Path(doc_dir) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def refresh_manifest(doc_dir: Path) -> bool:
+    """Rewrite doc_dir/manifest.json after a committed document was modified in place.
+
+    The recorded source is kept. Documents without a manifest are left without one.
+
+    Returns:
+        True if the manifest was rewritten
+    """
+    manifest = load_manifest(doc_dir)
+    if manifest is None:
+        return False
+    write_manifest(doc_dir, source=manifest.get("source"))
+    return True
+
+
+def manifest_paths(doc_dir: Path, suffixes: Optional[List[str]] = None) -> Optional[List[str]]:
+    """Relative paths listed in doc_dir's manifest, optionally filtered by suffix.
+
+    Returns:
+        Paths, or None if the document has no manifest
+    """
+    manifest = load_manifest(doc_dir)
+    if manifest is None:
+        return None
+    paths = [f["path"] for f in manifest.get("files", [])]
+    if suffixes:
+        paths = [p for p in paths if p.endswith(tuple(suffixes))]
+    return paths
+
+
+def _is_empty_dir(path: Path) -> bool:
+    with os.scandir(path) as entries:
+        return next(entries, None) is None
+
+
+def commit_dir(staging: Path, dest: Path) -> Path:
+    """Move a staging directory into place with one rename.
+
+    dest is used if it does not exist or is an empty directory; otherwise the next free
+    versioned sibling (dest_v2, dest_v3, ...) is.
+
+    Returns:
+        The committed directory
+    """
+    staging, dest = Path(staging), Path(dest)
+    target = dest
+    for _ in range(_COMMIT_ATTEMPTS):
+        if target.is_dir() and _is_empty_dir(target):
+            try:
+                target.rmdir()  # rename() cannot replace a directory on Windows
+            except OSError:
+                pass
+        if not target.exists():
+            try:
+                os.rename(staging, target)
+                return target
+            except OSError as e:
+                # Another writer took the name between the check and the rename.
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY, errno.EACCES):
+                    raise
+        target = allocate_name(dest.parent, dest.name, is_dir=True)
+    raise OSError(errno.EEXIST, f"Could not allocate an output directory for {dest}")
+
+
+def commit_file(tmp: Path, dest: Path) -> Path:
+    """Move a finished file into place without replacing an existing one.
+
+    dest is used if it does not exist; otherwise the next free versioned sibling
+    (stem_v2<suffix>, stem_v3<suffix>, ...) is.
+
+    Returns:
+        The committed file
+    """
+    tmp, dest = Path(tmp), Path(dest)
+    target = dest
+    for _ in range(_COMMIT_ATTEMPTS):
+        try:
+            # Unlike rename(), link() fails instead of replacing a file that appeared since
+            # the name was allocated.
+            os.link(tmp, target)
+        except FileExistsError:
+            target = allocate_name(dest.parent, dest.name)
+            continue
+        except OSError:
+            # No hard links on this filesystem: fall back to check-then-rename.
+            if target.exists():
+                target = allocate_name(dest.parent, dest.name)
+                continue
+            os.replace(tmp, target)
+            return target
+        tmp.unlink()
+        return target
+    raise OSError(errno.EEXIST, f"Could not allocate an output file for {dest}")
+
+
+def discard_dir(staging: Path) -> None:
+    """Remove a staging directory, ignoring errors."""
+    shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,384 @@
+"""Page-offset sidecar index for random access into raw MinerU artifacts.
+
+`layout.json`, `*_model.json` and `*_content_list.json` can be large for long books, and
+fetching a single page used to mean parsing the whole file. At extraction time we record,
+for every page, the byte ranges (and element counts) it occupies in each raw JSON file, in
+`raw/page_index.json`. Readers then seek to those ranges and decode only what they need.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .storage import is_compressed, iter_raw, open_raw, read_raw_bytes, split_compression
+
+
+PAGE_INDEX_NAME = "page_index.json"
+PAGE_INDEX_VERSION = 1
+
+ARTIFACT_KINDS = ("content_list", "layout", "model")
+
+# Structural tokens of a JSON document. Strings are matched whole so that brackets and
+# commas inside them are skipped.
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{},:]')
+_WS = b" \t\r\n"
+# Largest read used to skip forward through a stream.
+_SKIP_CHUNK = 1024 * 1024
+
+
+def artifact_kind(name: str) -> Optional[str]:
+    """Classify a raw artifact file name ("content_list", "layout", "model" or None).
+
+    Compressed variants (e.g. "layout.json.gz") are classified like their logical name.
+    """
+    name = split_compression(name)[0]
+    if not name.endswith(".json") or name == PAGE_INDEX_NAME:
+        return None
+    stem = name[: -len(".json")]
+    if re.search(r"_content_list(_v\d+)?$", stem):
+        return "content_list"
+    if re.search(r"_model(_v\d+)?$", stem):
+        return "model"
+    if re.fullmatch(r"layout(_v\d+)?", stem):
+        return "layout"
+    return None
+
+
+def _skip_ws(data: bytes, pos: int, step: int = 1) -> int:
+    while 0 <= pos < len(data) and data[pos] in _WS:
+        pos += step
+    return pos
+
+
+def _array_spans(data: bytes, start: int) -> List[Tuple[int, int]]:
+    """Byte spans [s, e) of the elements of the JSON array opening at data[start]."""
+    if data[start : start + 1] != b"[":
+        raise ValueError(f"Expected '[' at byte {start}")
+
+    spans = []
+    depth = 0
+    elem_start = start + 1
+    for m in _TOKEN_RE.finditer(data, start):
+        tok = m.group()
+        if tok in (b"[", b"{"):
+            depth += 1
+        elif tok in (b"]", b"}"):
+            depth -= 1
+            if depth == 0:
+                s, e = _skip_ws(data, elem_start), _skip_ws(data, m.start() - 1, -1) + 1
+                if s < e:
+                    spans.append((s, e))
+                return spans
+        elif tok == b"," and depth == 1:
+            spans.append((_skip_ws(data, elem_start), _skip_ws(data, m.start() - 1, -1) + 1))
+            elem_start = m.end()
+    raise ValueError("Unterminated JSON array")
+
+
+def _object_value_start(data: bytes, key: str) -> int:
+    """Byte offset of the value of a top-level object key."""
+    wanted = json.dumps(key).encode("utf-8")
+    depth = 0
+    prev = None
+    for m in _TOKEN_RE.finditer(data):
+        tok = m.group()
+        if tok in (b"[", b"{"):
+            depth += 1
+        elif tok in (b"]", b"}"):
+            depth -= 1
+        elif tok == b":" and depth == 1 and prev == wanted:
+            return _skip_ws(data, m.end())
+        prev = tok
+    raise ValueError(f"Key {key!r} not found")
+
+
+def _group_runs(spans: List[Tuple[int, int]], pages: List[int]) -> Dict[str, List[List[int]]]:
+    """Group consecutive element spans by page into [start, end, count] runs."""
+    result: Dict[str, List[List[int]]] = {}
+    run = None
+    run_page = None
+    for (s, e), page in zip(spans, pages):
+        if run is not None and page == run_page:
+            run[1] = e
+            run[2] += 1
+            continue
+        run = [s, e, 1]
+        run_page = page
+        result.setdefault(str(page), []).append(run)
+    return result
+
+
+def _json_object(data: bytes) -> Dict[str, Any]:
+    value = json.loads(data)
+    if not isinstance(value, dict):
+        raise ValueError("Expected a JSON object")
+    return value
+
+
+def _page_idx(item: Dict[str, Any], default: int) -> int:
+    page_idx = item.get("page_idx", default)
+    if not isinstance(page_idx, int) or isinstance(page_idx, bool):
+        raise ValueError(f"page_idx is not an integer: {page_idx!r}")
+    return page_idx
+
+
+def index_artifact(data: bytes, kind: str) -> Dict[str, List[List[int]]]:
+    """Build the page -> [[start, end, count], ...] map for one raw artifact.
+
+    For content_list the byte ranges cover runs of consecutive elements on the same page
+    and count is the number of elements. For layout and model each range covers one
+    page object and count is its number of blocks.
+
+    Raises:
+        ValueError: If data is not JSON of the shape expected for kind
+    """
+    if kind == "content_list":
+        spans = _array_spans(data, _skip_ws(data, 0))
+        pages = [_page_idx(_json_object(data[s:e]), 0) for s, e in spans]
+        return _group_runs(spans, pages)
+
+    if kind == "layout":
+        spans = _array_spans(data, _object_value_start(data, "pdf_info"))
+        result = {}
+        for n, (s, e) in enumerate(spans):
+            page = _json_object(data[s:e])
+            blocks = page.get("para_blocks", [])
+            if not isinstance(blocks, list):
+                raise ValueError("para_blocks is not a list")
+            result.setdefault(str(_page_idx(page, n)), []).append([s, e, len(blocks)])
+        return result
+
+    if kind == "model":
+        spans = _array_spans(data, _skip_ws(data, 0))
+        result = {}
+        for page_idx, (s, e) in enumerate(spans):
+            page = json.loads(data[s:e])
+            count = len(page) if isinstance(page, list) else 1
+            result[str(page_idx)] = [[s, e, count]]
+        return result
+
+    raise ValueError(f"Unknown artifact kind: {kind}")
+
+
+def build_page_index(raw_dir: Path) -> Dict[str, Any]:
+    """Index every recognised raw artifact in raw_dir.
+
+    Byte ranges refer to the decompressed stream of compressed artifacts. Artifacts that
+    are not valid JSON of the expected shape are recorded with "pages": null so that the
+    index is still considered complete.
+    """
+    artifacts = {}
+    for name, path in iter_raw(raw_dir):
+        kind = artifact_kind(name)
+        if kind is None:
+            continue
+        try:
+            pages: Optional[Dict[str, List[List[int]]]] = index_artifact(
+                read_raw_bytes(path), kind
+            )
+        except (ValueError, OSError):
+            pages = None
+        st = path.stat()
+        artifacts[path.name] = {
+            "kind": kind,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "pages": pages,
+        }
+    return {"version": PAGE_INDEX_VERSION, "artifacts": artifacts}
+
+
+def write_page_index(raw_dir: Path) -> Path:
+    """Build and write raw_dir/page_index.json.
+
+    Returns:
+        Path to the written index
+    """
+    index = build_page_index(raw_dir)
+    index_path = raw_dir / PAGE_INDEX_NAME
+    tmp = raw_dir / (PAGE_INDEX_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, index_path)
+    return index_path
+
+
+def load_page_index(raw_dir: Path) -> Dict[str, Any]:
+    """Load raw_dir/page_index.json, or index raw_dir in memory if it is missing or stale.
+
+    Readers never write the index: raw_dir may be read-only, and rewriting it would
+    change a committed document behind its manifest. Conversion writes it instead.
+    """
+    index_path = raw_dir / PAGE_INDEX_NAME
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+
+    if index is not None and index.get("version") == PAGE_INDEX_VERSION:
+        indexed = index.get("artifacts", {})
+        present = {path.name for name, path in iter_raw(raw_dir) if artifact_kind(name)}
+        fresh = present == set(indexed)
+        for name, entry in indexed.items():
+            if not fresh:
+                break
+            try:
+                st = (raw_dir / name).stat()
+            except FileNotFoundError:
+                fresh = False
+                break
+            if st.st_size != entry.get("size") or st.st_mtime_ns != entry.get("mtime_ns"):
+                fresh = False
+                break
+        if fresh:
+            return index
+
+    return build_page_index(raw_dir)
+
+
+def parse_page_spec(spec: str) -> List[int]:
+    """Parse a 1-based page spec such as "40-45" or "2,4-6" into sorted 0-based page_idx.
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        m = re.fullmatch(r"(\d+)(?:\s*-\s*(\d+))?", part)
+        if not m:
+            raise ValueError(f"Invalid page range: {part!r}")
+        first = int(m.group(1))
+        last = int(m.group(2) or first)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part!r}")
+        pages.update(range(first - 1, last))
+    if not pages:
+        raise ValueError("Empty page range")
+    return sorted(pages)
+
+
+def _find_artifact(index: Dict[str, Any], kind: str) -> Optional[str]:
+    names = sorted(
+        n
+        for n, e in index.get("artifacts", {}).items()
+        if e.get("kind") == kind and e.get("pages") is not None
+    )
+    return names[0] if names else None
+
+
+def _skip(f: BinaryIO, n: int) -> None:
+    """Advance a stream that may not be seekable by n bytes, in bounded reads."""
+    while n > 0:
+        data = f.read(min(n, _SKIP_CHUNK))
+        if not data:
+            return
+        n -= len(data)
+
+
+def _read_ranges(path: Path, ranges: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], bytes]:
+    """Read disjoint [start, end) byte ranges of a raw artifact's (decompressed) stream.
+
+    Plain files are seeked. Compressed streams cannot seek, so they are read forward once,
+    keeping only the requested ranges.
+    """
+    compressed = is_compressed(path)
+    found = {}
+    with open_raw(path) as f:
+        pos = 0
+        for start, end in sorted(set(ranges)):
+            if compressed:
+                _skip(f, start - pos)
+            else:
+                f.seek(start)
+            found[(start, end)] = f.read(end - start)
+            pos = end
+    return found
+
+
+def read_pages(
+    doc_dir: Path, page_indices: Iterable[int], kind: str = "content_list"
+) -> List[Dict[str, Any]]:
+    """Read selected pages of a raw artifact, decoding only their byte ranges.
+
+    Args:
+        doc_dir: Document output directory (containing raw/)
+        page_indices: 0-based page indices
+        kind: "content_list", "layout" or "model"
+
+    Returns:
+        [{"page_idx": i, "content": ...}] for every requested page present in the artifact.
+        content is a list of elements for content_list, the pdf_info page object for
+        layout, and the list of model blocks for model.
+
+    Raises:
+        FileNotFoundError: If the document has no indexable artifact of that kind
+    """
+    if kind not in ARTIFACT_KINDS:
+        raise ValueError(f"Unknown artifact kind: {kind}")
+
+    raw_dir = doc_dir / "raw"
+    index = load_page_index(raw_dir)
+    name = _find_artifact(index, kind)
+    if name is None:
+        raise FileNotFoundError(f"No indexed {kind} artifact in {raw_dir}")
+
+    pages = index["artifacts"][name]["pages"]
+    wanted = []
+    for page_idx in page_indices:
+        runs = pages.get(str(page_idx))
+        if runs:
+            wanted.append((page_idx, runs if kind == "content_list" else runs[:1]))
+    data = _read_ranges(
+        raw_dir / name, ((start, end) for _, runs in wanted for start, end, _count in runs)
+    )
+
+    results = []
+    for page_idx, runs in wanted:
+        if kind == "content_list":
+            content: Any = []
+            for start, end, _count in runs:
+                content.extend(json.loads(b"[" + data[(start, end)] + b"]"))
+        else:
+            start, end, _count = runs[0]
+            content = json.loads(data[(start, end)])
+        results.append({"page_idx": page_idx, "content": content})
+    return results
+
+
+def iter_content_list(doc_dir: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Stream (element index, element) pairs of a document's content_list in order.
+
+    Runs of elements are decoded one at a time while reading the artifact sequentially,
+    so memory use is bounded by the largest page rather than the whole file. This works
+    for compressed artifacts too.
+
+    Raises:
+        FileNotFoundError: If the document has no indexable content_list
+    """
+    raw_dir = doc_dir / "raw"
+    index = load_page_index(raw_dir)
+    name = _find_artifact(index, "content_list")
+    if name is None:
+        raise FileNotFoundError(f"No indexed content_list artifact in {raw_dir}")
+
+    runs = sorted(
+        (start, end)
+        for page_runs in index["artifacts"][name]["pages"].values()
+        for start, end, _count in page_runs
+    )
+    idx = 0
+    with open_raw(raw_dir / name) as f:
+        pos = 0
+        for start, end in runs:
+            _skip(f, start - pos)  # Separators; compressed streams cannot seek
+            data = f.read(end - start)
+            pos = end
+            for element in json.loads(b"[" + data + b"]"):
+                yield idx, element
+                idx += 1
@@ -0,0 +1,287 @@
+"""Image hosting through PicGo: concurrent uploads with a corpus-wide dedupe cache.
+
+PicGo's upload server sends local files to whichever image host PicGo is set up for:
+POST {"list": [<absolute path>, ...]} to its upload endpoint answers {"success": true,
+"result": [<url>, ...]}.
+
+MinerU names extracted images by the SHA-256 of their content, so a name identifies an
+image across documents; transcoded variants and thumbnails keep that name but not that
+content, so they are hashed (see p2r.imagestore.image_key). `UploadCache` keeps key -> URL
+in a SQLite file shared by all runs and `PicGoUploader` only uploads keys it has not seen,
+several at a time, so each distinct image is uploaded once for the whole corpus.
+`upload_document` then rewrites the images/ links of a document's Markdown and HTML in
+one pass per file. Images that could not be uploaded keep their local images/ links,
+which stay valid.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import requests
+
+from .images import derived_images
+from .imagestore import image_key
+
+
+DEFAULT_API_URL = "http://127.0.0.1:36677/upload"
+CACHE_FILE_NAME = ".p2r_picgo_cache.db"
+SCHEMA_VERSION = 1
+
+# A relative images/ reference in Markdown, HTML src/srcset or JSON.
+_IMAGE_LINK_RE = re.compile(r"(?<![\w./-])images/([\w.-]+(?:/[\w.-]+)*)")
+
+
+class PicGoError(Exception):
+    """PicGo did not return a URL for an image."""
+
+
+def default_cache_path() -> Path:
+    return Path.home() / CACHE_FILE_NAME
+
+
+class UploadCache:
+    """Persistent map of image keys (see p2r.imagestore.image_key) to uploaded URLs."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path).expanduser() if path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Shared by concurrent conversions and workers: wait for each other's writes.
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.conn.close()
+            raise ValueError(f"Unsupported PicGo cache version {version}: {self.path}")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, uploaded_at REAL NOT NULL)"
+            )
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """URLs of the keys that have been uploaded before."""
+        keys = list(keys)
+        found: Dict[str, str] = {}
+        # Stay below SQLite's default limit of host parameters per statement.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            found.update(
+                self.conn.execute(f"SELECT key, url FROM images WHERE key IN ({marks})", chunk)
+            )
+        return found
+
+    def put_many(self, urls: Dict[str, str]) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO images (key, url, uploaded_at) VALUES (?, ?, ?)",
+                [(key, url, now) for key, url in urls.items()],
+            )
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "UploadCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class PicGoUploader:
+    """Uploads images through a PicGo server, each distinct image at most once."""
+
+    def __init__(
+        self,
+        api_url: str = DEFAULT_API_URL,
+        cache: Optional[UploadCache] = None,
+        workers: int = 8,
+        timeout: float = 30,
+    ):
+        """Set up the uploader.
+
+        Args:
+            api_url: PicGo upload endpoint
+            cache: Cache of earlier uploads (None uploads every image every time)
+            workers: Uploads in flight at once
+            timeout: Seconds to wait for one upload
+        """
+        self.api_url = api_url
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.timeout = timeout
+
+    @classmethod
+    def from_options(cls, options: Dict[str, Any]) -> "PicGoUploader":
+        """Uploader (with its cache) configured like the "picgo" config section."""
+        return cls(
+            api_url=options.get("api_url") or DEFAULT_API_URL,
+            cache=UploadCache(options.get("cache_path") or None),
+            workers=int(options.get("workers", 8)),
+            timeout=float(options.get("timeout", 30)),
+        )
+
+    def upload_one(self, path: Path) -> str:
+        """Upload one image; its URL.
+
+        Raises:
+            PicGoError: If PicGo is unreachable or reports a failure
+        """
+        try:
+            response = requests.post(
+                self.api_url, json={"list": [str(Path(path).resolve())]}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except requests.RequestException as e:
+            raise PicGoError(f"PicGo upload of {Path(path).name} failed: {e}") from e
+        except ValueError:
+            raise PicGoError(f"PicGo returned invalid JSON for {Path(path).name}")
+        result = payload.get("result") or []
+        if not payload.get("success") or not result or not isinstance(result[0], str):
+            message = payload.get("message") or "no URL returned"
+            raise PicGoError(f"PicGo upload of {Path(path).name} failed: {message}")
+        return result[0]
+
+    def upload(self, paths: Iterable[Path], derived: Iterable[Path] = ()) -> Dict[str, Any]:
+        """Upload images not uploaded before, workers at a time.
+
+        Paths with the same key (the same image in several documents) are uploaded once.
+        Once PicGo turns out to be unreachable, the remaining uploads are not attempted.
+
+        Args:
+            paths: Images to upload
+            derived: Those of paths that p2r derived from a MinerU image (variants and
+                thumbnails), keyed by their content rather than their name
+
+        Returns:
+            {"urls": {path: url} for every path that has a URL, "uploaded", "cached",
+            "failed": counts of distinct images, "errors": [messages]}
+        """
+        derived = {Path(path) for path in derived}
+        by_key: Dict[str, list] = {}
+        for path in map(Path, paths):
+            by_key.setdefault(image_key(path, path not in derived), []).append(path)
+        known = self.cache.get_many(by_key) if self.cache is not None else {}
+        missing = [key for key in by_key if key not in known]
+        unreachable = threading.Event()
+
+        def upload(key: str) -> Tuple[str, Optional[str], Optional[str]]:
+            if unreachable.is_set():
+                return key, None, None
+            try:
+                return key, self.upload_one(by_key[key][0]), None
+            except PicGoError as e:
+                if isinstance(e.__cause__, requests.ConnectionError):
+                    unreachable.set()
+                return key, None, str(e)
+
+        uploaded: Dict[str, str] = {}
+        errors = []
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                for key, url, error in pool.map(upload, missing):
+                    if url is not None:
+                        uploaded[key] = url
+                    elif error is not None:
+                        errors.append(error)
+        if uploaded and self.cache is not None:
+            self.cache.put_many(uploaded)
+
+        urls = {}
+        for key, key_paths in by_key.items():
+            url = known.get(key) or uploaded.get(key)
+            if url is not None:
+                for path in key_paths:
+                    urls[path] = url
+        return {
+            "urls": urls,
+            "uploaded": len(uploaded),
+            "cached": len(known),
+            "failed": len(missing) - len(uploaded),
+            "errors": errors,
+        }
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self) -> "PicGoUploader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def rewrite_image_links(text: str, urls: Dict[str, str]) -> Tuple[str, int]:
+    """Replace images/<name> references with their URLs in a single pass.
+
+    Args:
+        text: Markdown or HTML
+        urls: {"images/<name>": url}; references without an entry are kept
+
+    Returns:
+        (rewritten text, number of references replaced)
+    """
+    replaced = 0
+
+    def replace(match: "re.Match") -> str:
+        nonlocal replaced
+        url = urls.get(match.group())
+        if url is None:
+            return match.group()
+        replaced += 1
+        return url
+
+    return _IMAGE_LINK_RE.sub(replace, text), replaced
+
+
+def upload_document(doc_dir: Path, uploader: PicGoUploader) -> Dict[str, Any]:
+    """Upload the images a document links to and point its links at the uploads.
+
+    The top-level .md and .html files are read once, their images/ references uploaded
+    together, and each file is rewritten in one pass. The images/ directory is kept, so
+    links of images that failed to upload keep working.
+
+    Returns:
+        Summary {"images", "uploaded", "cached", "failed", "links", "errors"}
+    """
+    doc_dir = Path(doc_dir)
+    texts = {}
+    for path in sorted(doc_dir.iterdir()):
+        if path.suffix in (".md", ".html") and path.is_file():
+            texts[path] = path.read_text(encoding="utf-8")
+    refs = set()
+    for text in texts.values():
+        refs.update(match.group() for match in _IMAGE_LINK_RE.finditer(text))
+    files = {ref: doc_dir / ref for ref in sorted(refs) if (doc_dir / ref).is_file()}
+    # MinerU writes its images flat into images/; anything deeper is p2r's.
+    derived = derived_images(doc_dir) | {ref for ref in files if ref.count("/") > 1}
+
+    result = uploader.upload(files.values(), [files[ref] for ref in files if ref in derived])
+    urls = {ref: result["urls"][path] for ref, path in files.items() if path in result["urls"]}
+    links = 0
+    for path, text in texts.items():
+        text, n = rewrite_image_links(text, urls)
+        if n:
+            tmp = path.with_name(f".{path.name}.p2r-tmp")
+            tmp.write_text(text, encoding="utf-8")
+            tmp.replace(path)
+            links += n
+    return {
+        "images": len(files),
+        "uploaded": result["uploaded"],
+        "cached": result["cached"],
+        "failed": result["failed"],
+        "links": links,
+        "errors": result["errors"],
+    }
@@ -0,0 +1,842 @@
+"""Fast local pre-flight checks for PDFs, before anything is uploaded.
+
+MinerU rejects files over 200 MB or 600 pages, and encrypted or unreadable ones, but only
+after the upload and a wait in its queue. `preflight` reads the header, the trailer and
+the cross-reference data (tables or streams), then only the few objects between the
+catalog and the first pages: page count, encryption and a scanned-vs-text heuristic come
+out in about a millisecond per file, whatever its size.
+
+The results drive the conversion plan (`plan_parts`): documents over the page limit are
+split into `page_ranges` parts, scanned documents get `is_ocr` under the pipeline model,
+and `p2r convert --dry-run` sums the pages against the daily quota (see p2r.quota).
+
+Files whose cross-reference data cannot be followed fall back to a scan for page objects.
+They are reported but not rejected, since MinerU repairs many of them.
+
+`read_pdf_metadata` follows the same path to the Info dictionary, the XMP packet and the
+text of the first page, for p2r.metadata.
+"""
+
+import hashlib
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# MinerU limits (see doc/mineru_api_reference.md).
+MAX_FILE_BYTES = 200 * 1024 * 1024
+MAX_PAGES = 600
+
+# startxref must be within the last 1024 bytes; allow for trailing garbage.
+_TAIL_BYTES = 4096
+# First pages inspected by the scanned-vs-text heuristic.
+_SAMPLE_PAGES = 3
+# Largest single object read while following the page tree.
+_MAX_OBJECT_BYTES = 4 * 1024 * 1024
+_MAX_DEPTH = 32
+# Deepest nesting of arrays and dictionaries parsed (real files stay in single digits).
+_MAX_NESTING = 64
+
+_WS = b" \t\r\n\f\x00"
+_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+_NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_SPACE_RE = re.compile(rb"(?:[ \t\r\n\f\x00]+|%[^\r\n]*)*")
+_REGULAR_RE = re.compile(rb"[^ \t\r\n\f\x00()<>\[\]{}/%]*")
+_PAGE_OBJECT_RE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+# Padding of the standard security handler (PDF 32000-1, 7.6.3.3).
+_PASSWORD_PAD = bytes.fromhex(
+    "28bf4e5e4e758a4164004e56fffa01082e2e00b6d0683e802f0ca9fe6453697a"
+)
+
+
+class PreflightError(Exception):
+    """The cross-reference data or page tree could not be followed."""
+
+
+class _NeedMore(PreflightError):
+    """The object continues past the bytes read so far."""
+
+
+# What malformed cross-reference data or objects can raise on their way to a PreflightError
+# check (e.g. a name where a number belongs): all mean the file is damaged.
+_MALFORMED = (PreflightError, ValueError, TypeError, IndexError)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class _Ref:
+    __slots__ = ("num", "gen")
+
+    def __init__(self, num: int, gen: int):
+        self.num = num
+        self.gen = gen
+
+
+class _Lexer:
+    """Parser for PDF objects in a byte buffer."""
+
+    def __init__(self, data: bytes, pos: int = 0, final: bool = True):
+        self.data = data
+        self.pos = pos
+        # False while data may be a prefix of the object (more can be read).
+        self.final = final
+        self._nesting = 0
+
+    def skip_ws(self) -> None:
+        """Skip whitespace and % comments."""
+        self.pos = _SPACE_RE.match(self.data, self.pos).end()
+
+    def _regular(self) -> bytes:
+        start = self.pos
+        self.pos = _REGULAR_RE.match(self.data, start).end()
+        if self.pos == len(self.data) and not self.final:
+            raise _NeedMore()
+        return self.data[start:self.pos]
+
+    def keyword(self) -> bytes:
+        self.skip_ws()
+        return self._regular()
+
+    def parse(self) -> Any:
+        self.skip_ws()
+        if self.pos >= len(self.data):
+            raise _NeedMore()
+        data = self.data
+        c = data[self.pos]
+        if data.startswith(b"<<", self.pos) or c == 0x5B:
+            if self._nesting >= _MAX_NESTING:
+                raise PreflightError("arrays or dictionaries nested too deeply")
+            self._nesting += 1
+            try:
+                return self._dict() if c == 0x3C else self._array()
+            finally:
+                self._nesting -= 1
+        if c == 0x3C:  # < hex string
+            end = data.find(b">", self.pos)
+            if end < 0:
+                raise _NeedMore()
+            digits = bytes(b for b in data[self.pos + 1:end] if b not in _WS)
+            self.pos = end + 1
+            if len(digits) % 2:
+                digits += b"0"
+            try:
+                return bytes.fromhex(digits.decode("ascii"))
+            except ValueError:
+                raise PreflightError("invalid hex string")
+        if c == 0x28:  # ( literal string
+            return self._literal()
+        if c == 0x2F:  # /name
+            self.pos += 1
+            raw = self._regular()
+            return re.sub(
+                rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw
+            ).decode("latin-1")
+        token = self._regular()
+        if not token:
+            raise PreflightError(f"unexpected byte {chr(c)!r}")
+        if _NUMBER_RE.fullmatch(token):
+            if b"." in token:
+                return float(token)
+            number = int(token)
+            # "num gen R" is an indirect reference.
+            saved = self.pos
+            try:
+                self.skip_ws()
+                gen = self._regular()
+                self.skip_ws()
+                if gen.isdigit() and self._regular() == b"R":
+                    return _Ref(number, int(gen))
+            except _NeedMore:
+                if not self.final:
+                    raise
+            self.pos = saved
+            return number
+        if token == b"true":
+            return True
+        if token == b"false":
+            return False
+        if token == b"null":
+            return None
+        return token
+
+    def _dict(self) -> Dict[str, Any]:
+        data = self.data
+        self.pos += 2
+        result: Dict[str, Any] = {}
+        while True:
+            self.skip_ws()
+            if data.startswith(b">>", self.pos):
+                self.pos += 2
+                return result
+            key = self.parse()
+            if not isinstance(key, str):
+                raise PreflightError("dictionary key is not a name")
+            result[key] = self.parse()
+
+    def _array(self) -> List[Any]:
+        data = self.data
+        self.pos += 1
+        items = []
+        while True:
+            self.skip_ws()
+            if self.pos >= len(data):
+                raise _NeedMore()
+            if data[self.pos] == 0x5D:
+                self.pos += 1
+                return items
+            items.append(self.parse())
+
+    def _literal(self) -> bytes:
+        data, n = self.data, len(self.data)
+        out = bytearray()
+        depth = 0
+        self.pos += 1
+        while self.pos < n:
+            c = data[self.pos]
+            self.pos += 1
+            if c == 0x5C:  # backslash
+                if self.pos >= n:
+                    break
+                e = data[self.pos]
+                self.pos += 1
+                if e in _ESCAPES:
+                    out += _ESCAPES[e]
+                elif 0x30 <= e <= 0x37:
+                    digits = bytes([e])
+                    while len(digits) < 3 and self.pos < n and 0x30 <= data[self.pos] <= 0x37:
+                        digits += bytes([data[self.pos]])
+                        self.pos += 1
+                    out.append(int(digits, 8) & 0xFF)
+                elif e == 0x0D:  # line continuation
+                    if self.pos < n and data[self.pos] == 0x0A:
+                        self.pos += 1
+                elif e != 0x0A:
+                    out.append(e)
+            elif c == 0x28:
+                depth += 1
+                out.append(c)
+            elif c == 0x29:
+                if depth == 0:
+                    return bytes(out)
+                depth -= 1
+                out.append(c)
+            else:
+                out.append(c)
+        raise _NeedMore()
+
+
+def _unpredict(data: bytes, params: Dict[str, Any]) -> bytes:
+    """Undo a PNG predictor (the only kind used by cross-reference streams in practice)."""
+    predictor = params.get("Predictor", 1)
+    if not isinstance(predictor, int) or predictor < 10:
+        if predictor not in (1, None):
+            raise PreflightError(f"unsupported predictor {predictor}")
+        return data
+    columns = params.get("Columns", 1) * params.get("Colors", 1)
+    columns = columns * params.get("BitsPerComponent", 8) // 8
+    bpp = max(1, params.get("Colors", 1) * params.get("BitsPerComponent", 8) // 8)
+    out = bytearray()
+    prev = bytearray(columns)
+    for start in range(0, len(data) - columns, columns + 1):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + 1 + columns])
+        for i in range(len(row)):
+            left = row[i - bpp] if i >= bpp else 0
+            up = prev[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                upleft = prev[i - bpp] if i >= bpp else 0
+                p = left + up - upleft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upleft)
+                pred = left if pa <= pb and pa <= pc else up if pb <= pc else upleft
+                row[i] = (row[i] + pred) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
+
+
+class _PDFReader:
+    """Random access to the objects of a PDF through its cross-reference data."""
+
+    def __init__(self, f: Any, size: int):
+        self.f = f
+        self.size = size
+        self.trailer: Dict[str, Any] = {}
+        # Newest first: ("table", first, count, entries_offset, entry_len) or
+        # ("stream", {num: (type, field2, field3)}).
+        self._sections: List[Tuple[Any, ...]] = []
+        self._objstms: Dict[int, Tuple[bytes, Dict[int, int]]] = {}
+        self._depth = 0
+
+    def _read(self, offset: int, length: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(length)
+
+    def load_xref(self) -> None:
+        tail_start = max(0, self.size - _TAIL_BYTES)
+        tail = self._read(tail_start, _TAIL_BYTES)
+        match = None
+        for match in re.finditer(rb"startxref\s+(\d+)", tail):
+            pass
+        if match is None:
+            raise PreflightError("no startxref")
+        offset: Optional[int] = int(match.group(1))
+        seen = set()
+        while offset is not None and offset not in seen and len(seen) < 64:
+            seen.add(offset)
+            trailer = self._load_section(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            if isinstance(trailer.get("XRefStm"), int):
+                self._load_section(trailer["XRefStm"])
+            offset = trailer.get("Prev") if isinstance(trailer.get("Prev"), int) else None
+
+    def _load_section(self, offset: int) -> Dict[str, Any]:
+        if offset <= 0 or offset >= self.size:
+            raise PreflightError("startxref points outside the file")
+        head = self._read(offset, 64)
+        if head.lstrip(_WS).startswith(b"xref"):
+            return self._load_table(offset + head.index(b"xref") + 4)
+        value, stream = self._object_at(offset)
+        if not isinstance(value, dict) or value.get("Type") != "XRef" or stream is None:
+            raise PreflightError("startxref does not point to cross-reference data")
+        self._load_stream_section(value, stream)
+        return value
+
+    def _load_table(self, pos: int) -> Dict[str, Any]:
+        while True:
+            chunk = self._read(pos, 64)
+            lexer = _Lexer(chunk)
+            lexer.skip_ws()
+            if chunk.startswith(b"trailer", lexer.pos):
+                return self._parse_at(pos + lexer.pos + len(b"trailer"))
+            header = re.match(rb"(\d+)\s+(\d+)[ \t]*(?:\r\n|\r|\n)", chunk[lexer.pos:])
+            if header is None:
+                raise PreflightError("malformed cross-reference table")
+            first, count = int(header.group(1)), int(header.group(2))
+            entries = pos + lexer.pos + header.end()
+            sample = self._read(entries, 21)
+            # Entries are 20 bytes; some writers drop the space before a one-byte EOL.
+            entry_len = 19 if sample[18:20] != b"\r\n" and sample[18:19] in (b"\r", b"\n") else 20
+            self._sections.append(("table", first, count, entries, entry_len))
+            pos = entries + count * entry_len
+
+    def _load_stream_section(self, info: Dict[str, Any], stream: Tuple[int, Dict]) -> None:
+        data = self._stream_data(info, stream)
+        widths = info.get("W")
+        if not isinstance(widths, list) or len(widths) != 3:
+            raise PreflightError("cross-reference stream without /W")
+        if not all(_is_int(width) and width >= 0 for width in widths):
+            raise PreflightError("malformed cross-reference stream /W")
+        index = info.get("Index") or [0, info.get("Size", 0)]
+        if not isinstance(index, list) or not all(_is_int(n) and n >= 0 for n in index):
+            raise PreflightError("malformed cross-reference stream /Index")
+        row = sum(widths)
+        entries: Dict[int, Tuple[int, int, int]] = {}
+        pos = 0
+        for first, count in zip(index[0::2], index[1::2]):
+            for num in range(first, first + count):
+                if pos + row > len(data):
+                    break
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(data[pos:pos + width], "big"))
+                    pos += width
+                kind = fields[0] if widths[0] else 1
+                entries[num] = (kind, fields[1], fields[2])
+        self._sections.append(("stream", entries))
+
+    def _lookup(self, num: int) -> Optional[Tuple[int, int, int]]:
+        """(1, offset, gen) or (2, object stream, index); None if free or unknown."""
+        for section in self._sections:
+            if section[0] == "stream":
+                entry = section[1].get(num)
+                if entry is not None:
+                    return entry if entry[0] in (1, 2) else None
+                continue
+            _, first, count, entries, entry_len = section
+            if first <= num < first + count:
+                raw = self._read(entries + (num - first) * entry_len, 18)
+                match = re.match(rb"(\d{10}) (\d{5}) ([nf])", raw)
+                if match is None:
+                    raise PreflightError("malformed cross-reference entry")
+                if match.group(3) == b"f":
+                    return None
+                return (1, int(match.group(1)), int(match.group(2)))
+        return None
+
+    def _parse_at(self, offset: int) -> Any:
+        size = 4096
+        while True:
+            data = self._read(offset, size)
+            try:
+                return _Lexer(data, final=len(data) < size).parse()
+            except _NeedMore:
+                if len(data) < size or size >= _MAX_OBJECT_BYTES:
+                    raise PreflightError("truncated object")
+                size *= 4
+
+    def _object_at(self, offset: int) -> Tuple[Any, Optional[Tuple[int, Dict]]]:
+        """Parse "num gen obj value"; a stream's (data offset, dict) comes along."""
+        size = 4096
+        while True:
+            data = self._read(offset, size)
+            lexer = _Lexer(data, final=len(data) < size)
+            try:
+                num, gen, keyword = lexer.parse(), lexer.parse(), lexer.keyword()
+                if not isinstance(num, int) or not isinstance(gen, int) or keyword != b"obj":
+                    raise PreflightError(f"no object at offset {offset}")
+                value = lexer.parse()
+                lexer.skip_ws()
+                if data.startswith(b"stream", lexer.pos):
+                    start = lexer.pos + len(b"stream")
+                    if data.startswith(b"\r\n", start):
+                        start += 2
+                    elif data.startswith(b"\n", start):
+                        start += 1
+                    return value, (offset + start, value)
+                return value, None
+            except _NeedMore:
+                if len(data) < size or size >= _MAX_OBJECT_BYTES:
+                    raise PreflightError("truncated object")
+                size *= 4
+
+    def _stream_data(self, info: Dict[str, Any], stream: Tuple[int, Dict]) -> bytes:
+        length = self.resolve(info.get("Length"))
+        if not isinstance(length, int) or length < 0:
+            raise PreflightError("stream without /Length")
+        data = self._read(stream[0], length)
+        filters = info.get("Filter")
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        params = self.resolve(info.get("DecodeParms")) or {}
+        if isinstance(params, list):
+            params = params[0] if params and isinstance(params[0], dict) else {}
+        for name in filters:
+            if name != "FlateDecode":
+                raise PreflightError(f"unsupported stream filter {name}")
+            try:
+                data = zlib.decompressobj().decompress(data)
+            except zlib.error as e:
+                raise PreflightError(f"undecodable stream: {e}")
+            data = _unpredict(data, params)
+        return data
+
+    def get(self, num: int) -> Any:
+        entry = self._lookup(num)
+        if entry is None:
+            return None
+        if entry[0] == 1:
+            return self._object_at(entry[1])[0]
+        stm = entry[1]
+        if stm not in self._objstms:
+            entry = self._lookup(stm)
+            if entry is None or entry[0] != 1:
+                raise PreflightError(f"object stream {stm} not found")
+            info, stream = self._object_at(entry[1])
+            if stream is None:
+                raise PreflightError(f"object {stm} is not a stream")
+            data = self._stream_data(info, stream)
+            first = info.get("First", 0)
+            if not _is_int(first) or not _is_int(info.get("N", 0)):
+                raise PreflightError(f"object stream {stm} without a valid /First or /N")
+            numbers = [int(n) for n in re.findall(rb"\d+", data[:first])]
+            offsets = {
+                num: first + offset
+                for num, offset in zip(numbers[0:2 * info.get("N", 0):2], numbers[1::2])
+            }
+            self._objstms[stm] = (data, offsets)
+        data, offsets = self._objstms[stm]
+        if num not in offsets:
+            raise PreflightError(f"object {num} missing from object stream {stm}")
+        try:
+            return _Lexer(data, offsets[num]).parse()
+        except _NeedMore:
+            raise PreflightError(f"truncated object {num}")
+
+    def resolve(self, value: Any) -> Any:
+        if not isinstance(value, _Ref):
+            return value
+        if self._depth > _MAX_DEPTH:
+            raise PreflightError("reference chain too deep")
+        self._depth += 1
+        try:
+            return self.get(value.num)
+        finally:
+            self._depth -= 1
+
+
+def _rc4(key: bytes, data: bytes) -> bytes:
+    state = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + state[i] + key[i % len(key)]) & 0xFF
+        state[i], state[j] = state[j], state[i]
+    out = bytearray()
+    i = j = 0
+    for byte in data:
+        i = (i + 1) & 0xFF
+        j = (j + state[i]) & 0xFF
+        state[i], state[j] = state[j], state[i]
+        out.append(byte ^ state[(state[i] + state[j]) & 0xFF])
+    return bytes(out)
+
+
+def empty_user_password(encrypt: Dict[str, Any], file_id: bytes) -> Optional[bool]:
+    """Whether a standard-security PDF opens without a password.
+
+    Only the owner password restricts such files, and MinerU parses them. Returns None
+    when it cannot be told (other security handlers, AES-256 revision 6).
+    """
+    if encrypt.get("Filter") != "Standard":
+        return None
+    revision = encrypt.get("R")
+    owner, user = encrypt.get("O"), encrypt.get("U")
+    if not isinstance(owner, bytes) or not isinstance(user, bytes):
+        return None
+    if revision == 5:
+        return hashlib.sha256(user[32:40]).digest() == user[:32]
+    if revision not in (2, 3, 4):
+        return None
+    length = 5 if revision == 2 else int(encrypt.get("Length", 40)) // 8
+    digest = hashlib.md5(_PASSWORD_PAD)
+    digest.update(owner[:32])
+    digest.update(struct.pack("<I", int(encrypt.get("P", 0)) & 0xFFFFFFFF))
+    digest.update(file_id)
+    if revision >= 4 and encrypt.get("EncryptMetadata") is False:
+        digest.update(b"\xff\xff\xff\xff")
+    key = digest.digest()
+    if revision >= 3:
+        for _ in range(50):
+            key = hashlib.md5(key[:length]).digest()
+    key = key[:length]
+    if revision == 2:
+        return _rc4(key, _PASSWORD_PAD) == user[:32]
+    check = _rc4(key, hashlib.md5(_PASSWORD_PAD + file_id).digest())
+    for i in range(1, 20):
+        check = _rc4(bytes(b ^ i for b in key), check)
+    return check == user[:16]
+
+
+def _first_pages(reader: _PDFReader, root: Dict[str, Any], limit: int) -> List[Dict]:
+    """Up to limit leading page dicts, with inherited /Resources filled in.
+
+    Each object is visited once: the walk stops at a /Kids entry leading back to a node
+    already seen.
+    """
+    pages: List[Dict[str, Any]] = []
+    seen = set()
+
+    def walk(node: Any, resources: Any, depth: int) -> bool:
+        """Collect pages under node; False once the walk should stop."""
+        if isinstance(node, _Ref):
+            if node.num in seen:
+                return False
+            seen.add(node.num)
+        node = reader.resolve(node)
+        if not isinstance(node, dict) or depth > _MAX_DEPTH:
+            return True
+        resources = node.get("Resources", resources)
+        kids = reader.resolve(node.get("Kids"))
+        if node.get("Type") == "Page" or not isinstance(kids, list):
+            pages.append(dict(node, Resources=resources))
+            return len(pages) < limit
+        for kid in kids:
+            if not walk(kid, resources, depth + 1):
+                return False
+        return True
+
+    walk(root, None, 0)
+    return pages
+
+
+def _looks_scanned(reader: _PDFReader, pages: List[Dict[str, Any]]) -> Optional[bool]:
+    """True if the sampled pages are bare images, False if any has fonts."""
+    if not pages:
+        return None
+    for page in pages:
+        resources = reader.resolve(page.get("Resources"))
+        if not isinstance(resources, dict):
+            return None
+        fonts = resources.get("Font")
+        if isinstance(fonts, _Ref) or (isinstance(fonts, dict) and fonts):
+            return False
+        xobjects = reader.resolve(resources.get("XObject"))
+        if not isinstance(xobjects, dict) or not xobjects:
+            return None  # Blank or vector-only page: no evidence either way
+        for xobject in xobjects.values():
+            if not isinstance(xobject, _Ref):
+                return None
+            entry = reader._lookup(xobject.num)
+            if entry is None or entry[0] != 1:
+                return None
+            info = reader._object_at(entry[1])[0]
+            if not isinstance(info, dict) or info.get("Subtype") != "Image":
+                return None  # Forms may carry text of their own
+    return True
+
+
+def _scan_page_objects(path: Path) -> int:
+    """Count page objects by scanning the whole file (fallback for broken xrefs)."""
+    count = 0
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            data = tail + chunk
+            if not chunk:
+                return count + len(_PAGE_OBJECT_RE.findall(data))
+            # Matches starting in the last bytes are counted with the next chunk, so ones
+            # crossing the boundary are neither lost nor counted twice.
+            cut = max(0, len(data) - 32)
+            count += sum(1 for m in _PAGE_OBJECT_RE.finditer(data) if m.start() < cut)
+            tail = data[cut:]
+
+
+def preflight(path: Path) -> Dict[str, Any]:
+    """Check a PDF against MinerU's limits without parsing its content.
+
+    Args:
+        path: PDF file
+
+    Returns:
+        {"path", "size", "version", "pages", "encrypted", "password_required", "scanned",
+        "repaired", "errors", "warnings", "seconds"}. "errors" lists reasons MinerU would
+        reject the file; "pages", "password_required" and "scanned" are None when unknown.
+    """
+    started = time.perf_counter()
+    path = Path(path)
+    info: Dict[str, Any] = {
+        "path": str(path),
+        "size": 0,
+        "version": None,
+        "pages": None,
+        "encrypted": False,
+        "password_required": None,
+        "scanned": None,
+        "repaired": False,
+        "errors": [],
+        "warnings": [],
+    }
+    errors, warnings = info["errors"], info["warnings"]
+    try:
+        size = path.stat().st_size
+        info["size"] = size
+        with open(path, "rb") as f:
+            header = f.read(1024)
+            match = re.search(rb"%PDF-(\d\.\d)", header)
+            if size == 0:
+                errors.append("empty file")
+            elif match is None:
+                errors.append("not a PDF (no %PDF header)")
+            if size > MAX_FILE_BYTES:
+                errors.append(
+                    f"{size / 1024 / 1024:.1f}MB exceeds the "
+                    f"{MAX_FILE_BYTES // 1024 // 1024}MB limit"
+                )
+            if errors and (size == 0 or match is None):
+                info["seconds"] = round(time.perf_counter() - started, 6)
+                return info
+            info["version"] = match.group(1).decode("ascii")
+
+            reader = _PDFReader(f, size)
+            try:
+                reader.load_xref()
+                encrypt = reader.resolve(reader.trailer.get("Encrypt"))
+                if isinstance(encrypt, dict):
+                    info["encrypted"] = True
+                    ids = reader.trailer.get("ID")
+                    file_id = ids[0] if isinstance(ids, list) and ids else b""
+                    if not isinstance(file_id, bytes):
+                        file_id = b""
+                    empty = empty_user_password(encrypt, file_id)
+                    info["password_required"] = None if empty is None else not empty
+                root = reader.resolve(reader.trailer.get("Root"))
+                page_root = reader.resolve(root.get("Pages")) if isinstance(root, dict) else None
+                if not isinstance(page_root, dict):
+                    raise PreflightError("no page tree")
+                count = reader.resolve(page_root.get("Count"))
+                if not isinstance(count, int):
+                    raise PreflightError("no page count in the page tree")
+                info["pages"] = count
+                try:
+                    sample = _first_pages(reader, page_root, _SAMPLE_PAGES)
+                    info["scanned"] = _looks_scanned(reader, sample)
+                except _MALFORMED:
+                    pass  # The heuristic is optional
+            except _MALFORMED as e:
+                info["repaired"] = True
+                warnings.append(f"cross-reference data unreadable ({e}); pages counted by scan")
+                pages = _scan_page_objects(path)
+                info["pages"] = pages or None
+                if not pages:
+                    warnings.append("no page objects found; the file may be corrupt")
+    except OSError as e:
+        errors.append(f"unreadable: {e}")
+
+    if info["password_required"]:
+        errors.append("encrypted with a user password")
+    elif info["encrypted"] and info["password_required"] is None:
+        warnings.append("encrypted; could not verify that it opens without a password")
+    if info["pages"] is not None and info["pages"] > MAX_PAGES:
+        warnings.append(f"{info['pages']} pages exceed the {MAX_PAGES}-page limit; split")
+    if info["scanned"]:
+        warnings.append("looks scanned (images without fonts); OCR needed")
+    info["seconds"] = round(time.perf_counter() - started, 6)
+    return info
+
+
+def plan_parts(
+    info: Dict[str, Any], model_version: str = "vlm", max_pages: int = MAX_PAGES
+) -> List[Dict[str, Any]]:
+    """Tasks to submit for a pre-flighted document.
+
+    Args:
+        info: Result of preflight
+        model_version: MinerU model version ("pipeline" or "vlm")
+        max_pages: Pages per task
+
+    Returns:
+        One {"suffix", "pages", "options"} per task. "options" are extra per-file fields
+        for MinerU ("page_ranges" for parts of a split document, "is_ocr" for scanned
+        documents under the pipeline model, the only one it affects); "suffix" is "" or
+        "_p<first>-<last>" for the part's output directory.
+    """
+    options: Dict[str, Any] = {}
+    if info.get("scanned") and model_version == "pipeline":
+        options["is_ocr"] = True
+    pages = info.get("pages")
+    if not pages or pages <= max_pages:
+        return [{"suffix": "", "pages": pages, "options": options}]
+    parts = []
+    for first in range(1, pages + 1, max_pages):
+        last = min(first + max_pages - 1, pages)
+        parts.append(
+            {
+                "suffix": f"_p{first}-{last}",
+                "pages": last - first + 1,
+                "options": dict(options, page_ranges=f"{first}-{last}"),
+            }
+        )
+    return parts
+
+
+def _text_string(value: Any) -> Optional[str]:
+    """Decode a PDF text string (UTF-16BE or UTF-8 with a BOM, else PDFDocEncoding)."""
+    if isinstance(value, str):
+        return value  # A name where a string was expected
+    if not isinstance(value, bytes):
+        return None
+    if value.startswith(b"\xfe\xff"):
+        text = value[2:].decode("utf-16-be", "replace")
+    elif value.startswith(b"\xef\xbb\xbf"):
+        text = value[3:].decode("utf-8", "replace")
+    else:
+        text = value.decode("latin-1")  # PDFDocEncoding agrees on all printable ASCII
+    return text.replace("\x00", "").strip() or None
+
+
+def _content_text(data: bytes) -> str:
+    """Text of the string operands of a content stream (best effort, no font encodings).
+
+    Strings of one TJ array or consecutive Tj operators are joined directly, strings
+    separated by other operators with a space.
+    """
+    parts: List[bytes] = []
+    pos = data.find(b"(")
+    end = 0
+    while pos >= 0:
+        lexer = _Lexer(data, pos)
+        try:
+            text = lexer._literal()
+        except _NeedMore:
+            break
+        if parts and re.search(rb"[A-Za-z'\"*]", re.sub(rb"T[Jj]", b"", data[end:pos])):
+            parts.append(b" ")
+        parts.append(text)
+        end = lexer.pos
+        pos = data.find(b"(", end)
+    return b"".join(parts).decode("latin-1")
+
+
+def _page_text(reader: _PDFReader, page: Dict[str, Any]) -> str:
+    contents = reader.resolve(page.get("Contents"))
+    refs = contents if isinstance(contents, list) else [page.get("Contents")]
+    texts = []
+    for ref in refs:
+        if not isinstance(ref, _Ref):
+            continue
+        entry = reader._lookup(ref.num)
+        if entry is None or entry[0] != 1:
+            continue
+        info, stream = reader._object_at(entry[1])
+        if stream is None or not isinstance(info, dict):
+            continue
+        length = reader.resolve(info.get("Length"))
+        if not isinstance(length, int) or length > _MAX_OBJECT_BYTES:
+            continue
+        try:
+            texts.append(_content_text(reader._stream_data(info, stream)))
+        except PreflightError:
+            pass  # e.g. a filter other than Flate
+    return " ".join(texts)
+
+
+def read_pdf_metadata(path: Path) -> Dict[str, Any]:
+    """Read the Info dictionary, XMP packet and first-page text of a PDF.
+
+    Only the cross-reference data and the objects leading to these are read, like
+    preflight does. Encrypted files yield nothing, since their strings are encrypted.
+
+    Args:
+        path: PDF file
+
+    Returns:
+        {"info": {key: text} of the Info dictionary, "xmp": XMP packet or None,
+        "first_page_text": text of the first page's string operands ("" if unknown)}
+    """
+    result: Dict[str, Any] = {"info": {}, "xmp": None, "first_page_text": ""}
+    try:
+        with open(path, "rb") as f:
+            size = Path(path).stat().st_size
+            if not re.search(rb"%PDF-\d\.\d", f.read(1024)):
+                return result
+            reader = _PDFReader(f, size)
+            reader.load_xref()
+            if reader.trailer.get("Encrypt") is not None:
+                return result
+            info = reader.resolve(reader.trailer.get("Info"))
+            if isinstance(info, dict):
+                for key, value in info.items():
+                    text = _text_string(reader.resolve(value))
+                    if text is not None:
+                        result["info"][key] = text
+            root = reader.resolve(reader.trailer.get("Root"))
+            if not isinstance(root, dict):
+                return result
+            metadata = root.get("Metadata")
+            entry = reader._lookup(metadata.num) if isinstance(metadata, _Ref) else None
+            if entry is not None and entry[0] == 1:
+                xmp_info, stream = reader._object_at(entry[1])
+                if stream is not None and isinstance(xmp_info, dict):
+                    try:
+                        data = reader._stream_data(xmp_info, stream)
+                        result["xmp"] = data.decode("utf-8", "replace")
+                    except PreflightError:
+                        pass
+            pages = _first_pages(reader, root.get("Pages"), 1)
+            if pages:
+                result["first_page_text"] = _page_text(reader, pages[0])
+    except (OSError, *_MALFORMED):
+        pass
+    return result
@@ -0,0 +1,250 @@
+"""CPU and memory profiling of p2r runs, for actionable performance reports.
+
+`Profiler` wraps any block (the CLI wraps a whole subcommand with `p2r --profile`):
+
+- "cpu": cProfile, written as `<name>.pstats` (for `python -m pstats`, snakeviz, ...),
+  plus wall-clock stack samples of the profiled thread in collapsed-stack format
+  (`<name>.folded`, for flamegraph.pl or speedscope)
+- "mem": tracemalloc, written as a snapshot (`<name>.tracemalloc`, reload with
+  `tracemalloc.Snapshot.load`) plus allocation-weighted collapsed stacks
+
+Both write a top-N summary to `<name>.txt`. Only the calling process is profiled, not
+the worker processes of parallel stages (run those with workers=1 to include them).
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+MODES = ("cpu", "mem")
+DEFAULT_TOP = 25
+TRACEMALLOC_FRAMES = 25
+
+# Allocation sites left out of summaries. Matched on grouped statistics rather than with
+# Snapshot.filter_traces(), which pattern-matches every trace and is slow on big heaps.
+_MEM_EXCLUDE = {
+    tracemalloc.__file__,
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    "<unknown>",
+}
+
+
+def _short_path(filename: str) -> str:
+    parts = Path(filename).parts
+    return "/".join(parts[-2:]) if len(parts) > 2 else filename
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval into collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="p2r-profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                labels.append(
+                    f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """Profile a block of code and write the results to files.
+
+    Example:
+        with Profiler("mem", "./profiles", name="rebuild") as prof:
+            rebuild_document(doc_dir)
+        print(prof.summary, prof.files)
+
+    Attributes (set when the block exits):
+        files: Output kind ("stats", "folded", "summary") -> path
+        summary: The top-N text summary
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        output_dir: Path = Path("."),
+        name: str = "p2r",
+        top: int = DEFAULT_TOP,
+        sample_interval: float = 0.005,
+    ):
+        """Set up a profiler.
+
+        Args:
+            mode: "cpu" or "mem"
+            output_dir: Directory receiving the output files
+            name: Base name of the output files
+            top: Number of entries in the summary
+            sample_interval: Seconds between stack samples (cpu mode)
+
+        Raises:
+            ValueError: If mode is unknown
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {mode} (expected one of {MODES})")
+        self.mode = mode
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.top = top
+        self.sample_interval = sample_interval
+        self.files: Dict[str, Path] = {}
+        self.summary = ""
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._started = 0.0
+        self._was_tracing = False
+
+    def start(self) -> None:
+        """Start profiling the calling thread."""
+        self._started = time.perf_counter()
+        if self.mode == "cpu":
+            self._sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._was_tracing = tracemalloc.is_tracing()
+            if not self._was_tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+
+    def stop(self) -> Dict[str, Path]:
+        """Stop profiling and write the output files.
+
+        Returns:
+            Output kind -> path
+        """
+        elapsed = time.perf_counter() - self._started
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / self.name
+        if self.mode == "cpu":
+            self._profile.disable()
+            self._sampler.stop()
+            self._write_cpu(base, elapsed)
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not self._was_tracing:
+                tracemalloc.stop()
+            self._write_mem(base, snapshot, current, peak, elapsed)
+        summary_path = base.with_name(base.name + ".txt")
+        summary_path.write_text(self.summary, encoding="utf-8")
+        self.files["summary"] = summary_path
+        return self.files
+
+    def _write_cpu(self, base: Path, elapsed: float) -> None:
+        stats_path = base.with_name(base.name + ".pstats")
+        self._profile.dump_stats(str(stats_path))
+        self.files["stats"] = stats_path
+        self.files["folded"] = _write_folded(
+            base.with_name(base.name + ".folded"), self._sampler.stacks
+        )
+
+        out = io.StringIO()
+        out.write(f"CPU profile: {elapsed:.2f}s wall, {len(self._sampler.stacks)} stacks\n")
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        self.summary = out.getvalue()
+
+    def _write_mem(
+        self,
+        base: Path,
+        snapshot: tracemalloc.Snapshot,
+        current: int,
+        peak: int,
+        elapsed: float,
+    ) -> None:
+        snapshot_path = base.with_name(base.name + ".tracemalloc")
+        snapshot.dump(str(snapshot_path))
+        self.files["stats"] = snapshot_path
+
+        stacks: Counter = Counter()
+        for stat in snapshot.statistics("traceback"):
+            if stat.traceback[-1].filename in _MEM_EXCLUDE:
+                continue
+            labels = [f"{_short_path(f.filename)}:{f.lineno}" for f in stat.traceback]
+            stacks[";".join(labels)] += stat.size
+        self.files["folded"] = _write_folded(base.with_name(base.name + ".folded"), stacks)
+
+        lines = [
+            f"Memory profile: {elapsed:.2f}s wall, peak traced {_format_size(peak)}, "
+            f"still allocated {_format_size(current)}",
+        ]
+        rss = max_rss()
+        if rss:
+            lines.append(f"Peak RSS of the process: {_format_size(rss)}")
+        lines.append(f"\nTop {self.top} allocation sites still alive at the end:")
+        sites = [
+            stat
+            for stat in snapshot.statistics("lineno")
+            if stat.traceback[0].filename not in _MEM_EXCLUDE
+        ]
+        for i, stat in enumerate(sites[: self.top], 1):
+            frame = stat.traceback[0]
+            lines.append(
+                f"{i:3d}. {_format_size(stat.size):>12} in {stat.count:>7} blocks  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+        self.summary = "\n".join(lines) + "\n"
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def _write_folded(path: Path, stacks: Counter) -> Path:
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in stacks.most_common():
+            f.write(f"{stack} {weight}\n")
+    return path
+
+
+def max_rss() -> int:
+    """Peak resident set size of this process in bytes (0 where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def default_name(command: str, mode: str) -> str:
+    """Output base name for a profiled CLI run, e.g. "p2r-convert-cpu-20240101-120000"."""
+    return f"p2r-{command or 'run'}-{mode}-{time.strftime('%Y%m%d-%H%M%S')}"
@@ -0,0 +1,129 @@
+"""Local accounting of pages parsed by MinerU against the daily priority quota.
+
+MinerU parses the first 2000 pages per account and day at the highest priority; pages
+beyond that are queued at lower priority (see doc/mineru_api_reference.md). The service
+does not report usage, so p2r keeps a ledger of pages per day (mineru.usage_ledger,
+~/.p2r_usage.json by default; "" disables it), which `p2r convert --dry-run` uses to
+estimate where a run lands. MinerUClient records every document it converts, so
+concurrent conversions update the ledger under a lock.
+"""
+
+import contextlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+USAGE_FILE_NAME = ".p2r_usage.json"
+DAILY_PRIORITY_PAGES = 2000
+
+# Days kept in the ledger.
+_KEEP_DAYS = 31
+
+
+def get_usage_path() -> Path:
+    """Get the path to the usage ledger (~/.p2r_usage.json)."""
+    return Path.home() / USAGE_FILE_NAME
+
+
+def configured_usage_path(cfg: Dict[str, Any]) -> Optional[Path]:
+    """The ledger set by mineru.usage_ledger in cfg; None if it is "" (disabled)."""
+    setting = cfg.get("mineru", {}).get("usage_ledger")
+    if setting is None:
+        return get_usage_path()
+    return Path(setting).expanduser() if setting else None
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d")
+
+
+def load_usage(path: Optional[Path] = None) -> Dict[str, int]:
+    """Pages per day ("YYYY-MM-DD"); empty if there is no readable ledger."""
+    try:
+        with open(path or get_usage_path(), "r", encoding="utf-8") as f:
+            usage = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(usage, dict):
+        return {}
+    return {day: pages for day, pages in usage.items() if isinstance(pages, int)}
+
+
+def pages_used(day: Optional[str] = None, path: Optional[Path] = None) -> int:
+    """Pages recorded for day (default: today)."""
+    return load_usage(path).get(day or _today(), 0)
+
+
+@contextlib.contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on path's sidecar lock file (across processes)."""
+    with open(path.with_name(path.name + ".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def record_pages(pages: int, day: Optional[str] = None, path: Optional[Path] = None) -> int:
+    """Add pages to day's total (default: today) and drop days past the retention.
+
+    The read-modify-write holds a file lock, so concurrent processes and threads each
+    add their pages.
+
+    Returns:
+        The day's new total
+    """
+    path = Path(path or get_usage_path())
+    day = day or _today()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _locked(path):
+        usage = load_usage(path)
+        usage[day] = usage.get(day, 0) + pages
+        usage = dict(sorted(usage.items())[-_KEEP_DAYS:])
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(usage, f, indent=2)
+        os.replace(tmp, path)
+    return usage.get(day, 0)
+
+
+def estimate(pages: int, used: int = 0, limit: int = DAILY_PRIORITY_PAGES) -> Dict[str, Any]:
+    """Split planned pages into those within today's priority quota and the rest.
+
+    Args:
+        pages: Pages about to be submitted
+        used: Pages already parsed today
+        limit: Daily priority quota
+
+    Returns:
+        {"pages", "used", "limit", "priority_pages", "low_priority_pages", "remaining"}
+    """
+    remaining = max(0, limit - used)
+    priority = min(pages, remaining)
+    return {
+        "pages": pages,
+        "used": used,
+        "limit": limit,
+        "priority_pages": priority,
+        "low_priority_pages": pages - priority,
+        "remaining": remaining - priority,
+    }
@@ -0,0 +1,833 @@
+"""Rebuild Markdown and HTML documents from MinerU's content_list.json.
+
+Elements are rendered in the order MinerU emits them, so footnotes naturally land at the
+end of each page. Page numbers are skipped; everything else of value is kept.
+"""
+
+import hashlib
+import html
+import json
+import os
+import shutil
+import textwrap
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .images import IMAGES_MANIFEST_NAME, img_attributes, load_images_manifest
+from .output import REBUILD_MANIFEST_NAME, refresh_manifest
+from .storage import find_raw, load_raw_json
+
+
+# Bump whenever rendering output changes so existing manifests are invalidated.
+RENDERER_VERSION = 2
+
+MARKDOWN_NAME = "rebuilt.md"
+HTML_NAME = "rebuilt.html"
+# Page-chunked HTML output: one file per chunk, a shared stylesheet and a navigation index.
+CHUNKS_DIR_NAME = "rebuilt_html"
+CHUNK_INDEX_NAME = "index.html"
+STYLESHEET_NAME = "style.css"
+CONTENT_LIST_SUFFIX = "_content_list.json"
+
+
+def load_content_list(json_path: Path) -> list:
+    """Load a MinerU content_list.json file (plain or compressed).
+
+    Args:
+        json_path: Path to the *_content_list.json file
+
+    Returns:
+        List of content elements
+    """
+    return load_raw_json(json_path)
+
+
+def rebuild_markdown(
+    content_list: list,
+    images_dir: str = "images",
+    include_page_markers: bool = True,
+    include_footnotes: bool = True,
+    include_aside: bool = False,
+) -> str:
+    """Rebuild a Markdown document from a content_list.
+
+    Args:
+        content_list: Content elements produced by MinerU
+        images_dir: Relative path of the images directory
+        include_page_markers: Insert a separator at every page break
+        include_footnotes: Include page footnotes
+        include_aside: Include aside text (e.g. the arXiv identifier in the margin)
+
+    Returns:
+        Markdown string
+    """
+    lines = []
+    current_page = -1
+
+    for item in content_list:
+        page_idx = item.get("page_idx", 0)
+        item_type = item["type"]
+
+        # Page separator (none before the first page)
+        if include_page_markers and page_idx != current_page:
+            current_page = page_idx
+            if current_page > 0:
+                lines.append(f"\n---\n<!-- Page {current_page + 1} -->\n")
+
+        if item_type == "text":
+            text = item.get("text", "")
+            level = item.get("text_level")
+
+            if level == 1:
+                lines.append(f"# {text}")
+            elif level == 2:
+                lines.append(f"## {text}")
+            elif level == 3:
+                lines.append(f"### {text}")
+            else:
+                lines.append(text)
+
+        elif item_type == "page_footnote":
+            if include_footnotes:
+                # Italics keep footnotes visually distinct from body text
+                lines.append(f"*{item.get('text', '')}*")
+
+        elif item_type == "image":
+            img_path = item.get("img_path", "")
+            captions = item.get("image_caption", [])
+            caption = captions[0] if captions else ""
+
+            lines.append(f"![{caption}]({img_path})")
+            if caption:
+                lines.append(f"*{caption}*")
+
+        elif item_type == "table":
+            table_body = item.get("table_body", "")
+            captions = item.get("table_caption", [])
+            caption = captions[0] if captions else ""
+
+            # Caption goes above the table
+            if caption:
+                lines.append(f"**{caption}**")
+
+            # MinerU emits tables as HTML, which Markdown allows inline
+            lines.append(table_body)
+
+        elif item_type == "list":
+            for li in item.get("list_items", []):
+                lines.append(li)
+
+        elif item_type == "aside_text":
+            if include_aside:
+                lines.append(f"> {item.get('text', '')}")
+
+        elif item_type == "page_number":
+            pass
+
+        else:
+            # Unknown type: keep the raw text if there is any
+            if "text" in item:
+                lines.append(item["text"])
+
+    return "\n\n".join(lines)
+
+
+_HTML_STYLE = """
+        :root {
+            --text-color: #1a1a1a;
+            --bg-color: #fdfdfd;
+            --footnote-color: #555;
+            --border-color: #ddd;
+            --page-marker-color: #999;
+        }
+
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+            line-height: 1.7;
+            color: var(--text-color);
+            background-color: var(--bg-color);
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 40px 20px;
+        }
+
+        h1 { font-size: 1.8em; margin-top: 1.5em; border-bottom: 1px solid var(--border-color); padding-bottom: 0.3em; }
+        h2 { font-size: 1.4em; margin-top: 1.3em; }
+        h3 { font-size: 1.2em; margin-top: 1.2em; }
+
+        p { margin: 1em 0; }
+
+        img {
+            max-width: 100%;
+            height: auto;
+            display: block;
+            margin: 1.5em auto;
+        }
+
+        .image-caption {
+            text-align: center;
+            font-style: italic;
+            color: #666;
+            margin-top: -1em;
+            margin-bottom: 1.5em;
+            font-size: 0.9em;
+        }
+
+        .footnote {
+            color: var(--footnote-color);
+            font-size: 0.9em;
+            padding: 0.5em 1em;
+            margin: 0.5em 0;
+            border-left: 3px solid var(--border-color);
+            background-color: #f9f9f9;
+        }
+
+        .page-marker {
+            color: var(--page-marker-color);
+            font-size: 0.8em;
+            text-align: center;
+            margin: 2em 0;
+            padding: 0.5em;
+            border-top: 1px dashed var(--border-color);
+        }
+
+        .aside {
+            color: #888;
+            font-size: 0.85em;
+            font-style: italic;
+        }
+
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin: 1.5em 0;
+            font-size: 0.9em;
+        }
+
+        table th, table td {
+            border: 1px solid var(--border-color);
+            padding: 8px 12px;
+            text-align: left;
+        }
+
+        table th {
+            background-color: #f5f5f5;
+            font-weight: bold;
+        }
+
+        table tr:nth-child(even) {
+            background-color: #fafafa;
+        }
+
+        .table-caption {
+            font-weight: bold;
+            margin-bottom: 0.5em;
+        }
+
+        ul, ol {
+            margin: 1em 0;
+            padding-left: 2em;
+        }
+
+        li {
+            margin: 0.5em 0;
+        }
+"""
+
+
+def _render_html_elements(
+    content_list: Iterable[Dict[str, Any]],
+    include_page_markers: bool = True,
+    include_footnotes: bool = True,
+    include_aside: bool = False,
+    image_info: Optional[Dict[str, Dict[str, Any]]] = None,
+    path_prefix: str = "",
+    heading_ids: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """Render content_list elements to HTML fragments (the body of a document).
+
+    Args:
+        path_prefix: Prepended to image paths (e.g. "../" for pages in a subdirectory)
+        heading_ids: One id per element, set on heading tags when given
+    """
+    html_parts = []
+    current_page = -1
+    ids = iter(heading_ids) if heading_ids is not None else None
+
+    for item in content_list:
+        page_idx = item.get("page_idx", 0)
+        item_type = item["type"]
+        element_id = next(ids) if ids is not None else None
+
+        if include_page_markers and page_idx != current_page:
+            current_page = page_idx
+            if current_page > 0:
+                html_parts.append(f'<div class="page-marker">Page {current_page + 1}</div>')
+
+        if item_type == "text":
+            text = html.escape(item.get("text", ""))
+            level = item.get("text_level")
+            id_attr = f' id="{element_id}"' if element_id else ""
+
+            if level == 1:
+                html_parts.append(f"<h1{id_attr}>{text}</h1>")
+            elif level == 2:
+                html_parts.append(f"<h2{id_attr}>{text}</h2>")
+            elif level == 3:
+                html_parts.append(f"<h3{id_attr}>{text}</h3>")
+            else:
+                html_parts.append(f"<p>{text}</p>")
+
+        elif item_type == "page_footnote":
+            if include_footnotes:
+                text = html.escape(item.get("text", ""))
+                html_parts.append(f'<div class="footnote">{text}</div>')
+
+        elif item_type == "image":
+            raw_path = item.get("img_path", "")
+            src = path_prefix + raw_path if raw_path else raw_path
+            img_path = html.escape(src)
+            captions = item.get("image_caption", [])
+            caption = html.escape(captions[0]) if captions else ""
+            attrs = img_attributes(src, (image_info or {}).get(raw_path))
+
+            html_parts.append(f'<img src="{img_path}" alt="{caption}" {attrs}>')
+            if caption:
+                html_parts.append(f'<p class="image-caption">{caption}</p>')
+
+        elif item_type == "table":
+            table_body = item.get("table_body", "")  # Already HTML, no escaping
+            captions = item.get("table_caption", [])
+            caption = html.escape(captions[0]) if captions else ""
+
+            if caption:
+                html_parts.append(f'<p class="table-caption">{caption}</p>')
+            html_parts.append(table_body)
+
+        elif item_type == "list":
+            html_parts.append("<ul>")
+            for li in item.get("list_items", []):
+                # Strip the Markdown list marker
+                li_text = li.lstrip("- ")
+                html_parts.append(f"<li>{html.escape(li_text)}</li>")
+            html_parts.append("</ul>")
+
+        elif item_type == "aside_text":
+            if include_aside:
+                text = html.escape(item.get("text", ""))
+                html_parts.append(f'<p class="aside">{text}</p>')
+
+        elif item_type == "page_number":
+            pass
+
+    return html_parts
+
+
+def rebuild_html(
+    content_list: list,
+    images_dir: str = "images",
+    title: str = "Document",
+    include_page_markers: bool = True,
+    include_footnotes: bool = True,
+    include_aside: bool = False,
+    image_info: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> str:
+    """Rebuild a standalone HTML document from a content_list.
+
+    Args:
+        content_list: Content elements produced by MinerU
+        images_dir: Relative path of the images directory
+        title: Document title
+        include_page_markers: Insert a marker at every page break
+        include_footnotes: Include page footnotes
+        include_aside: Include aside text
+        image_info: images.json entries keyed by img_path (dimensions and variants);
+            images are lazy-loaded either way
+
+    Returns:
+        HTML string
+    """
+    html_parts = [
+        f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{html.escape(title)}</title>
+    <style>{_HTML_STYLE}    </style>
+</head>
+<body>
+"""
+    ]
+    html_parts.extend(
+        _render_html_elements(
+            content_list,
+            include_page_markers=include_page_markers,
+            include_footnotes=include_footnotes,
+            include_aside=include_aside,
+            image_info=image_info,
+        )
+    )
+    html_parts.append("""
+</body>
+</html>
+""")
+
+    return "\n".join(html_parts)
+
+
+_CHUNK_STYLE = """
+        .chunk-nav {
+            display: flex;
+            justify-content: space-between;
+            margin: 1em 0;
+            padding: 0.5em 0;
+            border-top: 1px solid #ddd;
+            border-bottom: 1px solid #ddd;
+            font-size: 0.9em;
+        }
+
+        .toc li { margin: 0.4em 0; }
+
+        .toc .pages {
+            color: #999;
+            font-size: 0.85em;
+        }
+"""
+
+
+def _chunk_name(n: int) -> str:
+    return f"part-{n + 1:04d}.html"
+
+
+def split_chunks(
+    content_list: List[Dict[str, Any]], max_pages: int = 20, split_level: int = 1
+) -> List[range]:
+    """Split a content_list into chunks of consecutive elements.
+
+    A chunk ends before a heading of level <= split_level that starts on a later page than
+    the chunk did, and at the first page break once the chunk spans max_pages pages.
+
+    Args:
+        content_list: Content elements produced by MinerU
+        max_pages: Maximum number of pages per chunk (0 = unlimited)
+        split_level: Deepest heading level that starts a new chunk (0 = pages only)
+
+    Returns:
+        Ranges of element indices, one per chunk
+    """
+    chunks = []
+    start = 0
+    start_page = None
+    for i, item in enumerate(content_list):
+        page = item.get("page_idx", 0)
+        if start_page is None:
+            start_page = page
+            continue
+        level = item.get("text_level") if item.get("type") == "text" else None
+        at_heading = bool(split_level and level and level <= split_level and page > start_page)
+        too_long = bool(max_pages and page - start_page >= max_pages)
+        if at_heading or too_long:
+            chunks.append(range(start, i))
+            start, start_page = i, page
+    if start < len(content_list):
+        chunks.append(range(start, len(content_list)))
+    return chunks
+
+
+def _chunk_title(content_list: List[Dict[str, Any]], chunk: range) -> str:
+    for i in chunk:
+        item = content_list[i]
+        if item.get("type") == "text" and item.get("text_level"):
+            return item.get("text", "")
+    first = content_list[chunk[0]].get("page_idx", 0) + 1
+    last = content_list[chunk[-1]].get("page_idx", 0) + 1
+    return f"Page {first}" if first == last else f"Pages {first}-{last}"
+
+
+def rebuild_html_chunks(
+    content_list: list,
+    title: str = "Document",
+    include_page_markers: bool = True,
+    include_footnotes: bool = True,
+    include_aside: bool = False,
+    image_info: Optional[Dict[str, Dict[str, Any]]] = None,
+    max_pages: int = 20,
+    split_level: int = 1,
+) -> Dict[str, str]:
+    """Rebuild a content_list as a set of page-range/section HTML files.
+
+    Every chunk links the shared stylesheet, its neighbours (rel=prev/next) and prefetches
+    the next chunk, so a browser only lays out the part being read. The index lists every
+    chunk with its page range and headings.
+
+    Args:
+        content_list: Content elements produced by MinerU
+        title: Document title
+        include_page_markers: Insert a marker at every page break
+        include_footnotes: Include page footnotes
+        include_aside: Include aside text
+        image_info: images.json entries keyed by img_path
+        max_pages: Maximum number of pages per chunk (0 = unlimited)
+        split_level: Deepest heading level that starts a new chunk (0 = pages only)
+
+    Returns:
+        {file name: content} for the chunks, index.html and style.css. Chunks are meant to
+        live in a subdirectory of the document, next to images/.
+    """
+    chunks = split_chunks(content_list, max_pages=max_pages, split_level=split_level)
+    names = [_chunk_name(n) for n in range(len(chunks))]
+    escaped_title = html.escape(title)
+    files = {STYLESHEET_NAME: textwrap.dedent(_HTML_STYLE + _CHUNK_STYLE).lstrip()}
+
+    def head(page_title: str, links: List[str]) -> str:
+        extra = "".join(f"\n    {link}" for link in links)
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{page_title}</title>
+    <link rel="stylesheet" href="{STYLESHEET_NAME}">{extra}
+</head>
+<body>
+"""
+
+    toc = []
+    for n, chunk in enumerate(chunks):
+        prev_name = names[n - 1] if n > 0 else None
+        next_name = names[n + 1] if n + 1 < len(chunks) else None
+        links = []
+        if prev_name:
+            links.append(f'<link rel="prev" href="{prev_name}">')
+        if next_name:
+            links.append(f'<link rel="next" href="{next_name}">')
+            links.append(f'<link rel="prefetch" href="{next_name}">')
+
+        nav = ['<nav class="chunk-nav">']
+        nav.append(f'<a href="{prev_name}">&larr; Previous</a>' if prev_name else "<span></span>")
+        nav.append(f'<a href="{CHUNK_INDEX_NAME}">Contents</a>')
+        nav.append(f'<a href="{next_name}">Next &rarr;</a>' if next_name else "<span></span>")
+        nav.append("</nav>")
+        nav_html = "".join(nav)
+
+        chunk_title = html.escape(_chunk_title(content_list, chunk))
+        parts = [head(f"{chunk_title} - {escaped_title}", links), nav_html]
+        parts.extend(
+            _render_html_elements(
+                (content_list[i] for i in chunk),
+                include_page_markers=include_page_markers,
+                include_footnotes=include_footnotes,
+                include_aside=include_aside,
+                image_info=image_info,
+                path_prefix="../",
+                heading_ids=(f"e{i}" for i in chunk),
+            )
+        )
+        parts.append(nav_html)
+        parts.append("""
+</body>
+</html>
+""")
+        files[names[n]] = "\n".join(parts)
+
+        first = content_list[chunk[0]].get("page_idx", 0) + 1
+        last = content_list[chunk[-1]].get("page_idx", 0) + 1
+        pages = f"p. {first}" if first == last else f"pp. {first}-{last}"
+        headings = [
+            f'<li><a href="{names[n]}#e{i}">{html.escape(content_list[i].get("text", ""))}</a></li>'
+            for i in chunk
+            if content_list[i].get("type") == "text"
+            and content_list[i].get("text_level") in (1, 2)
+        ]
+        entry = f'<li><a href="{names[n]}">{chunk_title}</a> <span class="pages">{pages}</span>'
+        if len(headings) > 1:
+            entry += "\n<ul>\n" + "\n".join(headings) + "\n</ul>"
+        toc.append(entry + "</li>")
+
+    index_links = [f'<link rel="prefetch" href="{names[0]}">'] if names else []
+    files[CHUNK_INDEX_NAME] = "\n".join(
+        [head(escaped_title, index_links), f"<h1>{escaped_title}</h1>", '<ol class="toc">']
+        + toc
+        + ["</ol>", """
+</body>
+</html>
+"""]
+    )
+    return files
+
+
+def write_html_chunks(out_dir: Path, files: Dict[str, str]) -> List[str]:
+    """Write rebuild_html_chunks() output, removing chunks left over from a longer build.
+
+    Returns:
+        Names of the files whose content changed
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    changed = [
+        name for name, content in files.items() if _write_if_changed(out_dir / name, content)
+    ]
+    for path in out_dir.glob("part-*.html"):
+        if path.name not in files:
+            path.unlink()
+    return changed
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _stat_entry(path: Path) -> Dict[str, int]:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _write_if_changed(path: Path, content: str) -> bool:
+    """Write content to path unless the file already holds exactly these bytes."""
+    data = content.encode("utf-8")
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_bytes(data)
+    return True
+
+
+def find_content_list(doc_dir: Path) -> Optional[Path]:
+    """Find the content_list.json of an extracted document.
+
+    Args:
+        doc_dir: Document output directory (as produced by `p2r convert`)
+
+    Returns:
+        Path to the content_list file, or None if the directory holds no document
+    """
+    for base in (doc_dir / "raw", doc_dir):
+        if base.is_dir():
+            found = find_raw(base, CONTENT_LIST_SUFFIX)
+            if found is not None:
+                return found
+    return None
+
+
+def find_documents(root: Path) -> Iterator[Path]:
+    """Yield every document directory at or below root.
+
+    Hidden directories and raw/ subtrees are not descended into.
+    """
+    if find_content_list(root) is not None:
+        yield root
+        return
+
+    try:
+        entries = sorted(os.scandir(root), key=lambda e: e.name)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.startswith(".") or entry.name == "raw":
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from find_documents(Path(entry.path))
+
+
+def load_rebuild_manifest(doc_dir: Path) -> Dict[str, Any]:
+    """Load the rebuild manifest of a document directory ({} if missing or unreadable)."""
+    try:
+        with open(doc_dir / REBUILD_MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _save_rebuild_manifest(doc_dir: Path, manifest: Dict[str, Any]) -> None:
+    tmp = doc_dir / (REBUILD_MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, doc_dir / REBUILD_MANIFEST_NAME)
+
+
+def _check_manifest(
+    doc_dir: Path,
+    manifest: Dict[str, Any],
+    inputs: Dict[str, Path],
+    options: Dict[str, Any],
+    outputs: Iterable[str] = (MARKDOWN_NAME, HTML_NAME),
+) -> Optional[bool]:
+    """Compare a manifest against the current tree.
+
+    Returns:
+        True if up to date by stat alone, False if stale, None if only input stats drifted
+        but their hashes still match (the manifest should be refreshed, outputs kept).
+    """
+    if manifest.get("renderer_version") != RENDERER_VERSION:
+        return False
+    if manifest.get("options") != options:
+        return False
+
+    recorded_outputs = manifest.get("outputs", {})
+    # Every recorded output must be intact, e.g. each chunk of a page-chunked build.
+    for name in dict.fromkeys([*outputs, *recorded_outputs]):
+        recorded = recorded_outputs.get(name)
+        try:
+            if recorded is None or _stat_entry(doc_dir / name) != {
+                "size": recorded.get("size"),
+                "mtime_ns": recorded.get("mtime_ns"),
+            }:
+                return False
+        except FileNotFoundError:
+            return False
+
+    recorded_inputs = manifest.get("inputs", {})
+    if set(recorded_inputs) != set(inputs):
+        return False
+
+    stats_match = True
+    for rel, path in inputs.items():
+        recorded = recorded_inputs[rel]
+        try:
+            current = _stat_entry(path)
+        except FileNotFoundError:
+            return False
+        if current["size"] != recorded.get("size"):
+            return False
+        if current["mtime_ns"] != recorded.get("mtime_ns"):
+            # Touched but maybe not changed (e.g. re-extracted, rsync'd): fall back to hash.
+            if _sha256_file(path) != recorded.get("sha256"):
+                return False
+            stats_match = False
+
+    return True if stats_match else None
+
+
+def rebuild_document(
+    doc_dir: Path,
+    include_page_markers: bool = True,
+    include_footnotes: bool = True,
+    include_aside: bool = False,
+    force: bool = False,
+    chunk_pages: int = 0,
+    split_level: int = 1,
+) -> bool:
+    """Rebuild rebuilt.md/rebuilt.html of one document, skipping it when up to date.
+
+    A per-directory manifest records input stats and hashes, the renderer version and the
+    rendering options. Up-to-date documents are detected with a couple of stat() calls;
+    inputs are only hashed when their stat changed. Outputs whose bytes did not change are
+    not rewritten, so their mtimes stay stable for downstream sync tools. A committed
+    document's manifest.json is rewritten to match after every re-render.
+
+    Args:
+        doc_dir: Document output directory
+        include_page_markers: Insert page separators
+        include_footnotes: Include page footnotes
+        include_aside: Include aside text
+        force: Rebuild even if the manifest says the outputs are current
+        chunk_pages: Write page-chunked HTML to rebuilt_html/ instead of rebuilt.html,
+            with at most this many pages per chunk (0 = single rebuilt.html). Whichever
+            of the two the other mode left behind is removed
+        split_level: With chunk_pages, deepest heading level that starts a new chunk
+
+    Returns:
+        True if the document was re-rendered, False if it was skipped
+
+    Raises:
+        FileNotFoundError: If doc_dir contains no content_list.json
+    """
+    content_list_path = find_content_list(doc_dir)
+    if content_list_path is None:
+        raise FileNotFoundError(f"No *{CONTENT_LIST_SUFFIX} found in {doc_dir}")
+
+    options = {
+        "include_page_markers": include_page_markers,
+        "include_footnotes": include_footnotes,
+        "include_aside": include_aside,
+    }
+    manifest_options = dict(options)
+    outputs = [MARKDOWN_NAME, HTML_NAME]
+    if chunk_pages:
+        manifest_options.update(chunk_pages=chunk_pages, split_level=split_level)
+        outputs = [MARKDOWN_NAME, f"{CHUNKS_DIR_NAME}/{CHUNK_INDEX_NAME}"]
+    inputs = {content_list_path.relative_to(doc_dir).as_posix(): content_list_path}
+    images_manifest = doc_dir / IMAGES_MANIFEST_NAME
+    if images_manifest.exists():
+        inputs[IMAGES_MANIFEST_NAME] = images_manifest
+
+    manifest = load_rebuild_manifest(doc_dir)
+    if not force:
+        status = _check_manifest(doc_dir, manifest, inputs, manifest_options, outputs)
+        if status is True:
+            return False
+        if status is None:
+            for rel, path in inputs.items():
+                manifest["inputs"][rel].update(_stat_entry(path))
+            # Only the recorded stats change; manifest.json lists content, which did not.
+            _save_rebuild_manifest(doc_dir, manifest)
+            return False
+
+    content_list = load_content_list(content_list_path)
+    title = next(
+        (
+            item.get("text", "")
+            for item in content_list
+            if item.get("type") == "text" and item.get("text_level") == 1
+        ),
+        doc_dir.name,
+    )
+
+    _write_if_changed(doc_dir / MARKDOWN_NAME, rebuild_markdown(content_list, **options))
+    image_info = load_images_manifest(doc_dir)
+    if chunk_pages:
+        files = rebuild_html_chunks(
+            content_list,
+            title=title,
+            image_info=image_info,
+            max_pages=chunk_pages,
+            split_level=split_level,
+            **options,
+        )
+        write_html_chunks(doc_dir / CHUNKS_DIR_NAME, files)
+        outputs = [MARKDOWN_NAME] + [f"{CHUNKS_DIR_NAME}/{name}" for name in files]
+        # Drop the other mode's output so the document has one current HTML rendering.
+        if (doc_dir / HTML_NAME).exists():
+            (doc_dir / HTML_NAME).unlink()
+    else:
+        html_text = rebuild_html(content_list, title=title, image_info=image_info, **options)
+        _write_if_changed(doc_dir / HTML_NAME, html_text)
+        shutil.rmtree(doc_dir / CHUNKS_DIR_NAME, ignore_errors=True)
+
+    _save_rebuild_manifest(
+        doc_dir,
+        {
+            "renderer_version": RENDERER_VERSION,
+            "options": manifest_options,
+            "inputs": {
+                rel: dict(_stat_entry(path), sha256=_sha256_file(path))
+                for rel, path in inputs.items()
+            },
+            "outputs": {name: _stat_entry(doc_dir / name) for name in outputs},
+        },
+    )
+    refresh_manifest(doc_dir)
+    return True
+
+
+def rebuild_tree(root: Path, **kwargs: Any) -> List[Dict[str, Any]]:
+    """Rebuild every document below root.
+
+    Args:
+        root: Document directory or a directory containing many of them
+        **kwargs: Passed through to rebuild_document
+
+    Returns:
+        One {"doc_dir": Path, "rebuilt": bool} entry per document
+    """
+    return [
+        {"doc_dir": doc_dir, "rebuilt": rebuild_document(doc_dir, **kwargs)}
+        for doc_dir in find_documents(root)
+    ]
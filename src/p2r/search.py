@@ -0,0 +1,410 @@
+"""Full-text search index over converted documents (SQLite FTS5).
+
+Every text-bearing element of a document's content_list becomes one row of an FTS5
+table, so hits carry the document, page_idx, element type and bbox. Documents are
+(re)indexed individually in a single transaction, keyed by the content_list's stat, which
+makes updates after each conversion cheap. `reindex()` parses documents in a process pool
+and funnels the rows into the single SQLite writer.
+"""
+
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .rebuild import find_content_list, find_documents, load_content_list
+
+
+SCHEMA_VERSION = 1
+
+# Elements that carry no searchable prose.
+_SKIPPED_TYPES = {"page_number", "header", "footer"}
+_TAG_RE = re.compile(r"<[^>]+>")
+_TERM_RE = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS elements (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    page_idx INTEGER,
+    type TEXT NOT NULL,
+    text_level INTEGER,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL
+);
+CREATE INDEX IF NOT EXISTS elements_doc ON elements(doc_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS element_text USING fts5(
+    text, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _texts(item: Dict[str, Any], key: str) -> List[Any]:
+    value = item.get(key, [])
+    if not isinstance(value, list):
+        raise ValueError(f"{key} of a content_list element is not a list")
+    return value
+
+
+def element_text(item: Dict[str, Any]) -> str:
+    """Searchable text of one content_list element ("" if it has none).
+
+    Raises:
+        ValueError: If item is not an object, or one of its text fields has the wrong type
+    """
+    if not isinstance(item, dict):
+        raise ValueError("content_list element is not an object")
+    item_type = item.get("type")
+    if not isinstance(item_type, (str, type(None))):
+        raise ValueError("type of a content_list element is not a string")
+    if item_type in _SKIPPED_TYPES:
+        return ""
+    parts = []
+    if item.get("text"):
+        parts.append(str(item["text"]))
+    parts.extend(_texts(item, "list_items"))
+    for key in ("image_caption", "image_footnote", "table_caption", "table_footnote"):
+        parts.extend(_texts(item, key))
+    table_body = item.get("table_body")
+    if table_body:
+        if not isinstance(table_body, str):
+            raise ValueError("table_body of a content_list element is not a string")
+        parts.append(_TAG_RE.sub(" ", table_body))
+    return " ".join(" ".join(str(p) for p in parts).split())
+
+
+def extract_rows(doc_dir: Path) -> Dict[str, Any]:
+    """Parse one document into index rows (runs in worker processes during reindex).
+
+    Returns:
+        {"path", "title", "source", "size", "mtime_ns", "rows"} where every row is
+        (idx, page_idx, type, text_level, x0, y0, x1, y1, text)
+
+    Raises:
+        FileNotFoundError: If doc_dir contains no content_list
+        ValueError: If the content_list is not a list of elements of the expected shape
+    """
+    source = find_content_list(doc_dir)
+    if source is None:
+        raise FileNotFoundError(f"No content_list found in {doc_dir}")
+    st = source.stat()
+    content_list = load_content_list(source)
+    if not isinstance(content_list, list):
+        raise ValueError(f"{source.name} is not a list of elements")
+
+    title = ""
+    rows = []
+    for idx, item in enumerate(content_list):
+        text = element_text(item)
+        if not text:
+            continue
+        page_idx, text_level = item.get("page_idx"), item.get("text_level")
+        if not all(value is None or _is_int(value) for value in (page_idx, text_level)):
+            raise ValueError(f"Element {idx} of {source.name} has a non-integer page or level")
+        if not title and item.get("type") == "text" and text_level == 1:
+            title = text
+        bbox = item.get("bbox")
+        if not (
+            isinstance(bbox, list)
+            and len(bbox) == 4
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in bbox)
+        ):
+            bbox = [None] * 4
+        x0, y0, x1, y1 = bbox
+        rows.append(
+            (
+                idx,
+                page_idx,
+                item.get("type") or "",
+                text_level,
+                x0,
+                y0,
+                x1,
+                y1,
+                text,
+            )
+        )
+    return {
+        "path": str(Path(doc_dir).resolve()),
+        "title": title or Path(doc_dir).resolve().name,
+        "source": source.name,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "rows": rows,
+    }
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query that ANDs the quoted terms.
+
+    A trailing "*" keeps its meaning as a prefix match ("transform*"); every other
+    character of FTS5 syntax is treated as a separator.
+    """
+    terms = _TERM_RE.findall(query)
+    if not terms:
+        raise ValueError("Empty search query")
+    return " ".join(f'"{term}"{star}' for term, star in terms)
+
+
+class SearchIndex:
+    """On-disk FTS5 index of converted documents."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"Unsupported search index version {version}: {self.path}")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _is_current(self, doc_dir: Path) -> bool:
+        row = self.conn.execute(
+            "SELECT source, size, mtime_ns FROM documents WHERE path = ?",
+            (str(Path(doc_dir).resolve()),),
+        ).fetchone()
+        if row is None:
+            return False
+        source = find_content_list(doc_dir)
+        if source is None or source.name != row[0]:
+            return False
+        st = source.stat()
+        return (st.st_size, st.st_mtime_ns) == (row[1], row[2])
+
+    def _delete(self, path: str) -> bool:
+        row = self.conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        self.conn.execute(
+            "DELETE FROM element_text WHERE rowid IN (SELECT id FROM elements WHERE doc_id = ?)",
+            (row[0],),
+        )
+        self.conn.execute("DELETE FROM elements WHERE doc_id = ?", (row[0],))
+        self.conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        return True
+
+    def _store(self, doc: Dict[str, Any]) -> None:
+        """Replace one document's rows (caller commits)."""
+        self._delete(doc["path"])
+        cur = self.conn.execute(
+            "INSERT INTO documents (path, title, source, size, mtime_ns, indexed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (doc["path"], doc["title"], doc["source"], doc["size"], doc["mtime_ns"], time.time()),
+        )
+        doc_id = cur.lastrowid
+        # Assign element ids up front so both tables can be filled with executemany().
+        first_id = self.conn.execute(
+            "SELECT COALESCE(MAX(id), 0) + 1 FROM elements"
+        ).fetchone()[0]
+        rows = doc["rows"]
+        self.conn.executemany(
+            "INSERT INTO elements (id, doc_id, idx, page_idx, type, text_level, x0, y0, x1, y1)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((first_id + n, doc_id) + tuple(row[:8]) for n, row in enumerate(rows)),
+        )
+        self.conn.executemany(
+            "INSERT INTO element_text (rowid, text) VALUES (?, ?)",
+            ((first_id + n, row[8]) for n, row in enumerate(rows)),
+        )
+
+    def index_document(self, doc_dir: Path, force: bool = False) -> bool:
+        """Index (or re-index) one document directory.
+
+        Returns:
+            True if the document was indexed, False if the index was already current
+
+        Raises:
+            FileNotFoundError: If doc_dir contains no content_list
+        """
+        if not force and self._is_current(doc_dir):
+            return False
+        doc = extract_rows(doc_dir)
+        with self.conn:
+            self._store(doc)
+        return True
+
+    def remove_document(self, doc_dir: Path) -> bool:
+        with self.conn:
+            return self._delete(str(Path(doc_dir).resolve()))
+
+    def prune(self) -> int:
+        """Drop documents whose directory or content_list no longer exists."""
+        paths = [row[0] for row in self.conn.execute("SELECT path FROM documents")]
+        removed = 0
+        with self.conn:
+            for path in paths:
+                if find_content_list(Path(path)) is None:
+                    removed += self._delete(path)
+        return removed
+
+    def reindex(
+        self, roots: Iterable[Path], workers: int = 0, force: bool = False
+    ) -> Dict[str, int]:
+        """Index every document below roots, parsing documents in parallel.
+
+        Unchanged documents are skipped (unless force), and documents that no longer exist
+        are pruned.
+
+        Args:
+            roots: Document directories or directories containing many
+            workers: Parser processes (0 = one per CPU, 1 = no pool)
+            force: Re-index documents even if unchanged
+
+        Returns:
+            Counts of {"indexed", "unchanged", "removed", "failed"}
+        """
+        stats = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        todo = []
+        for root in roots:
+            for doc_dir in find_documents(Path(root)):
+                if not force and self._is_current(doc_dir):
+                    stats["unchanged"] += 1
+                else:
+                    todo.append(doc_dir)
+
+        def store_all(results: Iterable[Optional[Dict[str, Any]]]) -> None:
+            pending = 0
+            self.conn.execute("BEGIN")
+            try:
+                for doc in results:
+                    if doc is None:
+                        stats["failed"] += 1
+                        continue
+                    self._store(doc)
+                    stats["indexed"] += 1
+                    pending += 1
+                    if pending >= 200:  # Bound transaction size on huge corpora
+                        self.conn.execute("COMMIT")
+                        self.conn.execute("BEGIN")
+                        pending = 0
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        if workers == 1 or len(todo) < 2:
+            store_all(_extract_or_none(d) for d in todo)
+        else:
+            with ProcessPoolExecutor(max_workers=workers or None) as pool:
+                store_all(pool.map(_extract_or_none, todo, chunksize=8))
+
+        stats["removed"] = self.prune()
+        return stats
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        element_type: Optional[str] = None,
+        raw: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Search the index, best matches (BM25) first.
+
+        Args:
+            query: Free text (all terms must match; "term*" matches a prefix), or an
+                FTS5 query expression with raw=True
+            limit: Maximum number of hits
+            element_type: Only return elements of this content_list type
+            raw: Pass query to FTS5 unchanged
+
+        Returns:
+            Hits with "path", "title", "page_idx", "type", "text_level", "bbox",
+            "snippet" and "score"
+
+        Raises:
+            ValueError: If the query is empty or not valid FTS5 syntax
+        """
+        match = query if raw else _fts_query(query)
+        # Rank and limit inside the FTS5 query, then join: joining first would make SQLite
+        # score and sort every match before applying LIMIT.
+        hits = (
+            "SELECT element_text.rowid AS rowid, rank,"
+            " snippet(element_text, 0, '[', ']', '...', 16) AS snippet"
+            " FROM element_text"
+        )
+        params: List[Any] = []
+        if element_type:
+            hits += " JOIN elements f ON f.id = element_text.rowid"
+            hits += " WHERE element_text MATCH ? AND f.type = ?"
+            params += [match, element_type]
+        else:
+            hits += " WHERE element_text MATCH ?"
+            params.append(match)
+        hits += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        sql = (
+            "SELECT d.path, d.title, e.page_idx, e.type, e.text_level, e.x0, e.y0, e.x1, e.y1,"
+            f" h.snippet, h.rank FROM ({hits}) h"
+            " JOIN elements e ON e.id = h.rowid"
+            " JOIN documents d ON d.id = e.doc_id"
+            " ORDER BY h.rank"
+        )
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e}") from e
+
+        return [
+            {
+                "path": path,
+                "title": title,
+                "page_idx": page_idx,
+                "type": element_type_,
+                "text_level": text_level,
+                "bbox": [x0, y0, x1, y1] if x0 is not None else None,
+                "snippet": snippet,
+                "score": -score,
+            }
+            for (path, title, page_idx, element_type_, text_level, x0, y0, x1, y1, snippet, score)
+            in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        elements = self.conn.execute("SELECT COUNT(*) FROM elements").fetchone()[0]
+        return {"documents": documents, "elements": elements}
+
+
+def _extract_or_none(doc_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return extract_rows(doc_dir)
+    except (OSError, ValueError):
+        # Unreadable, or a content_list of unexpected shape (e.g. non-dict elements).
+        return None
+
+
+def default_index_path() -> Optional[Path]:
+    """Search index path from the search.index_path config value (None if disabled)."""
+    from .config import load_config
+
+    configured = load_config().get("search", {}).get("index_path", "")
+    return Path(configured).expanduser() if configured else None
+
@@ -0,0 +1,346 @@
+"""Per-page spatial index over extracted bounding boxes.
+
+Mapping a click on a PDF page back to extracted text used to require a linear scan of
+layout.json's nested blocks. This module builds, for every page, a static R-tree packed
+with the Sort-Tile-Recursive (STR) algorithm over two layers:
+
+- "content": content_list element bboxes (MinerU's normalised 0-1000 page space);
+  refs are element indices into the content_list
+- "lines": layout.json line bboxes (PDF points, see each page's page_size);
+  refs are [block, line] or [block, sub_block, line] paths into pdf_info[page].para_blocks
+
+The packed tree is persisted as raw/spatial_index.json, so loading it costs one JSON
+read and queries descend only the nodes whose bounding rectangles match.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .pages import artifact_kind
+from .storage import iter_raw, load_raw_json
+
+
+SPATIAL_INDEX_NAME = "spatial_index.json"
+SPATIAL_INDEX_VERSION = 1
+DEFAULT_FANOUT = 16
+
+LAYERS = ("content", "lines")
+
+
+def _union(boxes: Sequence[Sequence[float]]) -> List[float]:
+    return [
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
+    ]
+
+
+def _intersects(b: Sequence[float], x0: float, y0: float, x1: float, y1: float) -> bool:
+    return b[0] <= x1 and b[2] >= x0 and b[1] <= y1 and b[3] >= y0
+
+
+class SpatialIndex:
+    """Static STR-packed R-tree over the boxes of one page layer.
+
+    Leaves are the entries themselves, stored in STR order. Level k node i covers the
+    level k-1 items [i * fanout, (i + 1) * fanout), so the tree needs no child pointers.
+    """
+
+    def __init__(
+        self,
+        boxes: List[List[float]],
+        refs: List[Any],
+        texts: Optional[List[str]] = None,
+        fanout: int = DEFAULT_FANOUT,
+        levels: Optional[List[List[List[float]]]] = None,
+    ):
+        self.boxes = boxes
+        self.refs = refs
+        self.texts = texts
+        self.fanout = fanout
+        self.levels = levels if levels is not None else self._pack_levels()
+
+    @classmethod
+    def build(
+        cls,
+        entries: Sequence[Tuple[Sequence[float], Any, Optional[str]]],
+        fanout: int = DEFAULT_FANOUT,
+    ) -> "SpatialIndex":
+        """Build an index from (bbox, ref, text) entries using STR ordering."""
+        items = list(entries)
+        n = len(items)
+        if n > fanout:
+            # Sort-Tile-Recursive: vertical slices by x-centre, then runs by y-centre.
+            leaves = math.ceil(n / fanout)
+            slices = math.ceil(math.sqrt(leaves))
+            per_slice = slices * fanout
+            items.sort(key=lambda it: it[0][0] + it[0][2])
+            ordered = []
+            for s in range(0, n, per_slice):
+                chunk = items[s : s + per_slice]
+                chunk.sort(key=lambda it: it[0][1] + it[0][3])
+                ordered.extend(chunk)
+            items = ordered
+
+        has_text = any(it[2] is not None for it in items)
+        return cls(
+            boxes=[[float(v) for v in it[0]] for it in items],
+            refs=[it[1] for it in items],
+            texts=[it[2] or "" for it in items] if has_text else None,
+            fanout=fanout,
+        )
+
+    def _pack_levels(self) -> List[List[List[float]]]:
+        levels = []
+        current = self.boxes
+        while len(current) > self.fanout:
+            current = [
+                _union(current[i : i + self.fanout]) for i in range(0, len(current), self.fanout)
+            ]
+            levels.append(current)
+        return levels
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def _search(self, x0: float, y0: float, x1: float, y1: float) -> Iterator[int]:
+        fanout = self.fanout
+        if not self.levels:
+            candidates: Sequence[int] = range(len(self.boxes))
+        else:
+            top = len(self.levels) - 1
+            stack = [(top, i) for i in range(len(self.levels[top]))]
+            candidates = []
+            while stack:
+                level, i = stack.pop()
+                box = self.levels[level][i]
+                if not _intersects(box, x0, y0, x1, y1):
+                    continue
+                lo = i * fanout
+                if level == 0:
+                    candidates.extend(range(lo, min(lo + fanout, len(self.boxes))))
+                else:
+                    hi = min(lo + fanout, len(self.levels[level - 1]))
+                    stack.extend((level - 1, j) for j in range(lo, hi))
+        for i in candidates:
+            if _intersects(self.boxes[i], x0, y0, x1, y1):
+                yield i
+
+    def _hit(self, i: int) -> Dict[str, Any]:
+        hit = {"ref": self.refs[i], "bbox": self.boxes[i]}
+        if self.texts is not None:
+            hit["text"] = self.texts[i]
+        return hit
+
+    def query_point(self, x: float, y: float) -> List[Dict[str, Any]]:
+        """Entries whose bbox contains the point (smallest box first)."""
+        hits = [self._hit(i) for i in self._search(x, y, x, y)]
+        hits.sort(key=lambda h: (h["bbox"][2] - h["bbox"][0]) * (h["bbox"][3] - h["bbox"][1]))
+        return hits
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[Dict[str, Any]]:
+        """Entries whose bbox intersects the rectangle, in index order."""
+        return [self._hit(i) for i in sorted(self._search(x0, y0, x1, y1))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "fanout": self.fanout,
+            "boxes": self.boxes,
+            "refs": self.refs,
+            "levels": self.levels,
+        }
+        if self.texts is not None:
+            data["texts"] = self.texts
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpatialIndex":
+        return cls(
+            boxes=data["boxes"],
+            refs=data["refs"],
+            texts=data.get("texts"),
+            fanout=data.get("fanout", DEFAULT_FANOUT),
+            levels=data.get("levels"),
+        )
+
+
+def _bbox(value: Any) -> Optional[List[float]]:
+    """value as [x0, y0, x1, y1], or None unless it is 4 numbers."""
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        return None
+    return [float(v) for v in value]
+
+
+def _dicts(value: Any) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(position, item) for the dict items of a list; anything else yields nothing."""
+    if isinstance(value, list):
+        for n, item in enumerate(value):
+            if isinstance(item, dict):
+                yield n, item
+
+
+def _line_text(line: Dict[str, Any]) -> str:
+    return "".join(str(span.get("content", "")) for _, span in _dicts(line.get("spans")))
+
+
+def _layout_line_entries(page: Dict[str, Any]) -> Iterator[Tuple[List[float], List[int], str]]:
+    for b, block in _dicts(page.get("para_blocks")):
+        for n, line in _dicts(block.get("lines")):
+            bbox = _bbox(line.get("bbox"))
+            if bbox:
+                yield bbox, [b, n], _line_text(line)
+        for s, sub in _dicts(block.get("blocks")):
+            for n, line in _dicts(sub.get("lines")):
+                bbox = _bbox(line.get("bbox"))
+                if bbox:
+                    yield bbox, [b, s, n], _line_text(line)
+
+
+def _indexed_artifacts(raw_dir: Path) -> Iterator[Tuple[str, Path]]:
+    """(kind, path) of the first content_list and the first layout in raw_dir."""
+    seen_kinds = set()
+    for name, path in iter_raw(raw_dir):
+        kind = artifact_kind(name)
+        if kind in ("content_list", "layout") and kind not in seen_kinds:
+            seen_kinds.add(kind)
+            yield kind, path
+
+
+def _index_artifact(data: Any, kind: str, fanout: int) -> Dict[str, Dict[str, Any]]:
+    """Page -> {layer: packed index, "page_size"} for one parsed raw artifact.
+
+    Entries without a page or without 4 numeric bbox coordinates are skipped, and so is
+    data of any other shape.
+    """
+    pages: Dict[str, Dict[str, Any]] = {}
+    if kind == "content_list":
+        by_page: Dict[int, list] = {}
+        for i, item in _dicts(data):
+            bbox = _bbox(item.get("bbox"))
+            page_idx = item.get("page_idx")
+            if bbox and isinstance(page_idx, int) and not isinstance(page_idx, bool):
+                by_page.setdefault(page_idx, []).append((bbox, i, None))
+        for page_idx, entries in by_page.items():
+            pages[str(page_idx)] = {"content": SpatialIndex.build(entries, fanout).to_dict()}
+    elif isinstance(data, dict):
+        for n, page in _dicts(data.get("pdf_info")):
+            page_entry = pages.setdefault(str(page.get("page_idx", n)), {})
+            page_entry["lines"] = SpatialIndex.build(
+                list(_layout_line_entries(page)), fanout
+            ).to_dict()
+            if page.get("page_size"):
+                page_entry["page_size"] = page["page_size"]
+    return pages
+
+
+def build_spatial_index(raw_dir: Path, fanout: int = DEFAULT_FANOUT) -> Dict[str, Any]:
+    """Build per-page spatial indexes from the raw artifacts in raw_dir.
+
+    Artifacts that are not valid JSON of the expected shape contribute no boxes but are
+    still recorded as sources, so that the index is considered complete.
+    """
+    pages: Dict[str, Dict[str, Any]] = {}
+    sources: Dict[str, Dict[str, Any]] = {}
+
+    for kind, path in _indexed_artifacts(raw_dir):
+        try:
+            st = path.stat()
+            data = load_raw_json(path)
+        except OSError:
+            continue
+        except ValueError:
+            data = None
+        for page_idx, entry in _index_artifact(data, kind, fanout).items():
+            pages.setdefault(page_idx, {}).update(entry)
+        sources[path.name] = {"kind": kind, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    return {"version": SPATIAL_INDEX_VERSION, "sources": sources, "pages": pages}
+
+
+def write_spatial_index(raw_dir: Path, fanout: int = DEFAULT_FANOUT) -> Path:
+    """Build and write raw_dir/spatial_index.json.
+
+    Returns:
+        Path to the written index
+    """
+    index = build_spatial_index(raw_dir, fanout)
+    index_path = raw_dir / SPATIAL_INDEX_NAME
+    tmp = raw_dir / (SPATIAL_INDEX_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp, index_path)
+    return index_path
+
+
+class DocumentSpatialIndex:
+    """Spatial indexes of every page of one converted document."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self._pages = data.get("pages", {})
+        self._cache: Dict[Tuple[int, str], Optional[SpatialIndex]] = {}
+
+    @classmethod
+    def load(cls, doc_dir: Path) -> "DocumentSpatialIndex":
+        """Load raw/spatial_index.json, or index raw/ in memory if it is missing or stale.
+
+        Like p2r.pages.load_page_index, this never writes the index: the document may be
+        read-only, and rewriting it would change it behind its manifest.
+        """
+        raw_dir = Path(doc_dir) / "raw"
+        try:
+            with open(raw_dir / SPATIAL_INDEX_NAME, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+
+        if not isinstance(data, dict) or not _is_fresh(raw_dir, data):
+            data = build_spatial_index(raw_dir)
+        return cls(data)
+
+    def page(self, page_idx: int, layer: str = "lines") -> Optional[SpatialIndex]:
+        """Index of one page layer (None if the page or layer has no boxes)."""
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown layer: {layer}")
+        key = (page_idx, layer)
+        if key not in self._cache:
+            data = self._pages.get(str(page_idx), {}).get(layer)
+            self._cache[key] = SpatialIndex.from_dict(data) if data else None
+        return self._cache[key]
+
+    def page_size(self, page_idx: int) -> Optional[List[float]]:
+        """PDF page size in points, as recorded in layout.json."""
+        return self._pages.get(str(page_idx), {}).get("page_size")
+
+    def hit_test(self, page_idx: int, x: float, y: float, layer: str = "lines") -> List[Dict]:
+        """Entries under a point on a page, smallest first."""
+        index = self.page(page_idx, layer)
+        return index.query_point(x, y) if index else []
+
+    def query_rect(
+        self, page_idx: int, x0: float, y0: float, x1: float, y1: float, layer: str = "lines"
+    ) -> List[Dict]:
+        """Entries intersecting a rectangle on a page."""
+        index = self.page(page_idx, layer)
+        return index.query_rect(x0, y0, x1, y1) if index else []
+
+
+def _is_fresh(raw_dir: Path, data: Dict[str, Any]) -> bool:
+    if data.get("version") != SPATIAL_INDEX_VERSION:
+        return False
+    present = {path.name for _, path in _indexed_artifacts(raw_dir)}
+    if set(data.get("sources", {})) != present:
+        return False
+    for name, entry in data.get("sources", {}).items():
+        try:
+            st = (raw_dir / name).stat()
+        except FileNotFoundError:
+            return False
+        if st.st_size != entry.get("size") or st.st_mtime_ns != entry.get("mtime_ns"):
+            return False
+    return True
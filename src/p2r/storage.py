@@ -0,0 +1,179 @@
+"""Storage helpers for raw extraction artifacts.
+
+Raw JSON artifacts (layout.json, *_model.json, *_content_list.json) may be stored as-is
+or re-encoded as compact JSON and compressed with gzip or zstd (`layout.json.gz`,
+`layout.json.zst`). Every consumer reads them through this module, which resolves the
+logical name ("raw/layout.json") to whichever variant exists on disk.
+
+zstd requires the optional `zstandard` package; gzip is always available.
+"""
+
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Tuple
+
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+_METHODS = {suffix: method for method, suffix in _SUFFIXES.items()}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression requires the 'zstandard' package (pip install zstandard)"
+        ) from e
+    return zstandard
+
+
+def split_compression(name: str) -> Tuple[str, Optional[str]]:
+    """Split a file name into (logical name, compression method or None).
+
+    Example: "layout.json.gz" -> ("layout.json", "gzip")
+    """
+    for suffix, method in _METHODS.items():
+        if name.endswith(suffix):
+            return name[: -len(suffix)], method
+    return name, None
+
+
+def resolve_raw(path: Path) -> Path:
+    """Resolve a logical artifact path to the file that exists on disk.
+
+    Args:
+        path: Logical path (e.g. raw/layout.json) or an actual compressed path
+
+    Raises:
+        FileNotFoundError: If no variant of the artifact exists
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    for suffix in _METHODS:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"No such raw artifact: {path}")
+
+
+def is_compressed(path: Path) -> bool:
+    return split_compression(Path(path).name)[1] is not None
+
+
+def open_raw(path: Path) -> BinaryIO:
+    """Open a raw artifact for binary reading, decompressing transparently."""
+    actual = resolve_raw(path)
+    method = split_compression(actual.name)[1]
+    if method == "gzip":
+        return gzip.open(actual, "rb")
+    if method == "zstd":
+        f = open(actual, "rb")
+        return io.BufferedReader(_zstd().ZstdDecompressor().stream_reader(f, closefd=True))
+    return open(actual, "rb")
+
+
+def read_raw_bytes(path: Path) -> bytes:
+    """Read the (decompressed) bytes of a raw artifact."""
+    with open_raw(path) as f:
+        return f.read()
+
+
+def load_raw_json(path: Path) -> Any:
+    """Parse a raw JSON artifact, whichever way it is stored."""
+    return json.loads(read_raw_bytes(path))
+
+
+def iter_raw(raw_dir: Path) -> Iterator[Tuple[str, Path]]:
+    """Yield (logical name, actual path) for every file in raw_dir, sorted by name."""
+    for path in sorted(raw_dir.iterdir()):
+        if path.is_file():
+            yield split_compression(path.name)[0], path
+
+
+def find_raw(raw_dir: Path, suffix: str) -> Optional[Path]:
+    """Find the first raw artifact whose logical name ends with suffix."""
+    for name, path in iter_raw(raw_dir):
+        if name.endswith(suffix):
+            return path
+    return None
+
+
+def compress_raw_bytes(data: bytes, method: str, compact: bool = True) -> bytes:
+    """Re-encode and compress the bytes of one raw JSON artifact.
+
+    Args:
+        data: Uncompressed artifact bytes
+        method: "none", "gzip" or "zstd"
+        compact: Re-serialise JSON without indentation before compressing
+
+    Returns:
+        The bytes to store under the name with the method's suffix (see compressed_name)
+    """
+    if method not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression method: {method}")
+    if compact:
+        try:
+            data = json.dumps(
+                json.loads(data), ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+        except ValueError:
+            pass  # Not valid JSON: store the bytes untouched
+
+    if method == "gzip":
+        # mtime=0 keeps the output reproducible for identical inputs.
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if method == "zstd":
+        return _zstd().ZstdCompressor(level=19).compress(data)
+    return data
+
+
+def decompress_raw_bytes(data: bytes, method: Optional[str]) -> bytes:
+    """Decompress bytes stored with method (as returned by split_compression)."""
+    if method == "gzip":
+        return gzip.decompress(data)
+    if method == "zstd":
+        return _zstd().ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def compressed_name(name: str, method: str) -> str:
+    """File name of an artifact stored with method (e.g. "layout.json.gz")."""
+    return name + _SUFFIXES.get(method, "")
+
+
+def compress_raw_file(path: Path, method: str, compact: bool = True) -> Path:
+    """Re-encode and compress one raw JSON artifact in place.
+
+    Args:
+        path: Uncompressed artifact
+        method: "none", "gzip" or "zstd"
+        compact: Re-serialise JSON without indentation before compressing
+
+    Returns:
+        Path of the stored artifact (the original is removed once the new file is written)
+    """
+    path = Path(path)
+    data = compress_raw_bytes(path.read_bytes(), method, compact and path.suffix == ".json")
+    target = path.with_name(compressed_name(path.name, method))
+
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+    if target != path:
+        path.unlink()
+    return target
+
+
+def compress_raw_dir(raw_dir: Path, method: str, compact: bool = True) -> None:
+    """Compress every uncompressed JSON artifact in raw_dir (sidecar indexes excluded)."""
+    from .pages import artifact_kind
+
+    for name, path in iter_raw(raw_dir):
+        if path.name == name and artifact_kind(name) is not None:
+            compress_raw_file(path, method, compact=compact)
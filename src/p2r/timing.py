@@ -0,0 +1,156 @@
+"""Per-stage timing spans and run reports.
+
+`MinerUClient.parse_pdf` records one span per stage (requesting upload URLs, upload,
+each MinerU task state, download, extraction and local post-processing) on a `RunTimer`.
+Spans carry optional sizes ("bytes", "pages") from which throughput is derived. Finished
+spans are passed to every registered hook as they happen, and the whole timeline is
+returned as a report in the final "completed" progress update.
+
+Queue and parse times are measured from task state transitions seen while polling, so
+their resolution is the poll interval.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+REPORT_VERSION = 1
+
+Hook = Callable[[Dict[str, Any]], None]
+
+# Attribute -> derived rate written next to it when the span has a duration.
+_RATES = {"bytes": "bytes_per_sec", "pages": "pages_per_sec"}
+
+
+def _with_rates(span: Dict[str, Any]) -> Dict[str, Any]:
+    duration = span.get("duration") or 0.0
+    for attr, rate in _RATES.items():
+        if duration > 0 and isinstance(span.get(attr), (int, float)):
+            span[rate] = round(span[attr] / duration, 3)
+    return span
+
+
+class RunTimer:
+    """Collects the timing spans of one document conversion."""
+
+    def __init__(self, document: str = "", hooks: Optional[Iterable[Hook]] = None):
+        self.document = document
+        self.hooks: List[Hook] = list(hooks or [])
+        self.spans: List[Dict[str, Any]] = []
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._open: Optional[Dict[str, Any]] = None
+
+    def _emit(self, span: Dict[str, Any]) -> None:
+        _with_rates(span)
+        self.spans.append(span)
+        for hook in self.hooks:
+            hook(dict(span, document=self.document))
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block. The yielded dict can be updated with sizes (e.g. "bytes").
+
+        A span that raises is recorded with "error" set to the exception type.
+        """
+        start = time.perf_counter()
+        span: Dict[str, Any] = {"stage": name, "start": round(start - self._t0, 6)}
+        span.update(attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = type(e).__name__
+            raise
+        finally:
+            span["duration"] = round(time.perf_counter() - start, 6)
+            self._emit(span)
+
+    def mark(self, name: str, **attrs: Any) -> None:
+        """Close the open state span and open a new one called name.
+
+        Used for phases only observable as state changes, such as MinerU's "pending" and
+        "running". Attributes of a repeated mark update the open span.
+        """
+        now = time.perf_counter()
+        if self._open is not None and self._open["stage"] == name:
+            self._open.update(attrs)
+            return
+        self.close_mark(now)
+        self._open = dict({"stage": name, "start": round(now - self._t0, 6)}, **attrs)
+        self._open["_t"] = now
+
+    def close_mark(self, now: Optional[float] = None) -> None:
+        """Close the open state span, if any."""
+        if self._open is None:
+            return
+        span = self._open
+        self._open = None
+        span["duration"] = round((now or time.perf_counter()) - span.pop("_t"), 6)
+        self._emit(span)
+
+    def report(self) -> Dict[str, Any]:
+        """Per-document report: every span plus total seconds per stage."""
+        self.close_mark()
+        return {
+            "document": self.document,
+            "started_at": self.started_at,
+            "total_seconds": round(time.perf_counter() - self._t0, 6),
+            "stages": list(self.spans),
+            "totals": stage_totals(self.spans),
+        }
+
+
+def stage_totals(spans: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Total seconds per stage name."""
+    totals: Dict[str, float] = {}
+    for span in spans:
+        totals[span["stage"]] = round(totals.get(span["stage"], 0.0) + span["duration"], 6)
+    return totals
+
+
+def batch_report(
+    documents: List[Dict[str, Any]], wall_seconds: Optional[float] = None
+) -> Dict[str, Any]:
+    """Combine per-document reports into a batch report with per-stage totals."""
+    totals: Dict[str, float] = {}
+    sizes: Dict[str, float] = {}
+    for doc in documents:
+        for stage, seconds in doc.get("totals", {}).items():
+            totals[stage] = round(totals.get(stage, 0.0) + seconds, 6)
+        for span in doc.get("stages", []):
+            for attr in _RATES:
+                if isinstance(span.get(attr), (int, float)):
+                    key = f"{span['stage']}.{attr}"
+                    sizes[key] = sizes.get(key, 0) + span[attr]
+    if wall_seconds is None:
+        wall_seconds = sum(doc.get("total_seconds", 0.0) for doc in documents)
+
+    throughput = {}
+    for key, amount in sizes.items():
+        stage, attr = key.split(".", 1)
+        if totals.get(stage):
+            throughput[f"{stage}.{_RATES[attr]}"] = round(amount / totals[stage], 3)
+    return {
+        "version": REPORT_VERSION,
+        "documents": documents,
+        "batch": {
+            "documents": len(documents),
+            "wall_seconds": round(wall_seconds, 6),
+            "stage_totals": totals,
+            "throughput": throughput,
+        },
+    }
+
+
+def write_report(path: Path, report: Dict[str, Any]) -> None:
+    """Write a report as JSON (atomically)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
@@ -1,6 +1,11 @@
+import io
+import json
 import sys
+import zipfile
 from pathlib import Path
 
+import pytest
+
 
 # Allow running tests without installing the package (src-layout).
 ROOT = Path(__file__).resolve().parents[1]
@@ -8,3 +13,124 @@ SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
 
+
+@pytest.fixture
+def configure_p2r(monkeypatch, tmp_path: Path):
+    """Point p2r's home directory at tmp_path and its API at a fake server.
+
+    Returns a function taking the server (see p2r.fakeserver); clients and CLI commands
+    created afterwards pick the settings up from the environment and config file.
+    """
+
+    def configure(server) -> None:
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.setenv("P2R_MINERU_TOKEN", "test")
+        monkeypatch.setenv("P2R_MINERU_API_BASE_URL", server.api_base_url)
+        cfg = {"mineru": {"poll_interval": 0.01, "max_poll_time": 30}}
+        (tmp_path / ".p2r_config.json").write_text(json.dumps(cfg), encoding="utf-8")
+
+    return configure
+
+
+@pytest.fixture
+def make_client(monkeypatch, tmp_path: Path):
+    """Factory of MinerUClients talking to a fake server, polling every 10ms.
+
+    HOME is tmp_path, so no user config, cache or ledger is touched, and metrics go to
+    the no-op backend.
+    """
+    from p2r.metrics import Metrics
+    from p2r.mineru import MinerUClient
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    def make(server):
+        client = MinerUClient(api_token="test", api_base_url=server.api_base_url)
+        client.poll_interval = 0.01
+        client.metrics = Metrics()
+        return client
+
+    return make
+
+
+_CONTENT_LIST = [
+    {"type": "text", "text": "Title", "text_level": 1, "bbox": [0, 0, 10, 10], "page_idx": 0},
+    {"type": "text", "text": "Body", "bbox": [0, 10, 10, 20], "page_idx": 0},
+    {"type": "page_footnote", "text": "Note", "bbox": [0, 90, 10, 99], "page_idx": 1},
+]
+
+
+@pytest.fixture
+def make_doc():
+    """Factory of converted documents: root/name/raw/name_content_list.json + page index.
+
+    Returns a function taking (root, name="doc", content_list=None, compression="none");
+    the default content list is a title, a body paragraph and a footnote on page 2.
+    """
+    from p2r.pages import write_page_index
+    from p2r.storage import compress_raw_file
+
+    def make(root: Path, name: str = "doc", content_list=None, compression: str = "none"):
+        doc = Path(root) / name
+        (doc / "raw").mkdir(parents=True)
+        path = doc / "raw" / f"{name}_content_list.json"
+        content = _CONTENT_LIST if content_list is None else content_list
+        path.write_text(json.dumps(content, indent=2), encoding="utf-8")
+        compress_raw_file(path, compression)
+        write_page_index(doc / "raw")
+        return doc
+
+    return make
+
+
+class _Response:
+    def __init__(self, payload=None, content=b"", status_code=200):
+        self.status_code = status_code
+        self._payload = payload
+        self.content = content
+        self.text = json.dumps(payload) if payload is not None else ""
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Patch p2r.mineru's HTTP calls with a one-file MinerU API.
+
+    Returns a function taking upload_code (non-zero makes the upload URL request fail
+    with that API code). Tasks go pending, running (page 1 of 4), done; the function
+    returns the result zip's bytes.
+    """
+
+    def install(upload_code: int = 0) -> bytes:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("full.md", "# Title\n")
+            zf.writestr("x_content_list.json", json.dumps([{"type": "text", "text": "T"}]))
+        result_zip = buf.getvalue()
+        states = iter(["pending", "running", "done"])
+
+        def fake_post(url, headers=None, json=None, timeout=None):  # noqa: A002
+            if upload_code:
+                return _Response({"code": upload_code, "msg": "quota exceeded"})
+            return _Response({"code": 0, "data": {"batch_id": "b", "file_urls": ["https://up"]}})
+
+        def fake_put(url, data=None, timeout=None):
+            return _Response()
+
+        def fake_get(url, headers=None, timeout=None):
+            if url == "https://zip":
+                return _Response(content=result_zip)
+            state = next(states, "done")
+            result = {"state": state, "full_zip_url": "https://zip"}
+            if state == "running":
+                result["extract_progress"] = {"extracted_pages": 1, "total_pages": 4}
+            return _Response({"code": 0, "data": {"extract_result": [result]}})
+
+        monkeypatch.setattr("p2r.mineru.requests.post", fake_post)
+        monkeypatch.setattr("p2r.mineru.requests.put", fake_put)
+        monkeypatch.setattr("p2r.mineru.requests.get", fake_get)
+        return result_zip
+
+    return install
@@ -0,0 +1,105 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+
+def test_convert_many_streams_with_bounded_in_flight(tmp_path: Path, make_client):
+    import p2r
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    names = [f"doc{n}" for n in range(5)]
+    for name in names:
+        (docs / f"{name}.pdf").write_bytes(SAMPLE_PDF)
+    (docs / "empty.pdf").write_bytes(b"")
+    taken = []
+
+    def sources():
+        for name in names + ["empty"]:
+            taken.append(name)
+            yield docs / f"{name}.pdf"
+
+    options = {"image_store": "", "search_index": "", "model_version": "pipeline"}
+    with FakeMinerU(pages=2, page_time=0.02) as server:
+        client = make_client(server)
+        events, final = [], []
+        for event in p2r.convert_many(sources(), tmp_path / "out", 2, client, **options):
+            if not isinstance(event, p2r.Progress):
+                # Only documents whose final event was consumed have freed their slot.
+                assert len(taken) <= len(final) + 2
+                final.append(event)
+            events.append(event)
+
+    assert len(final) == 6 and any(isinstance(e, p2r.Progress) for e in events)
+    completed = sorted(e.source.stem for e in final if isinstance(e, p2r.Completed))
+    assert completed == names
+    failed = [e for e in final if isinstance(e, p2r.Failed)]
+    assert [e.source.name for e in failed] == ["empty.pdf"]
+    assert "empty file" in failed[0].error and "Failed(" in repr(failed[0])
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == names
+
+
+def test_convert_many_stops_early_and_reports_input_errors(tmp_path: Path, make_client):
+    import p2r
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(SAMPLE_PDF)
+    taken = []
+
+    def endless():
+        while True:
+            taken.append(pdf)
+            yield pdf
+
+    def broken():
+        yield pdf
+        raise RuntimeError("queue went away")
+
+    with FakeMinerU(pages=1, page_time=0.01) as server:
+        client = make_client(server)
+        before = threading.active_count()
+        stream = p2r.convert_many(
+            endless(), tmp_path / "out", 3, client, progress=False, search_index=""
+        )
+        first = next(stream)
+        stream.close()
+        assert isinstance(first, p2r.Completed) and first.output_dir.is_dir()
+        assert len(taken) <= 4 and threading.active_count() == before
+
+        stream = p2r.convert_many(broken(), tmp_path / "more", 2, client, search_index="")
+        with pytest.raises(RuntimeError, match="queue went away"):
+            events = []
+            for event in stream:
+                events.append(event)
+        assert any(isinstance(e, p2r.Completed) for e in events)
+
+
+def test_closing_abandons_documents_in_flight(tmp_path: Path, make_client):
+    import time
+
+    import p2r
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+
+    sources = [tmp_path / "first.pdf", tmp_path / "second.pdf"]
+    for pdf in sources:
+        pdf.write_bytes(SAMPLE_PDF)
+
+    # One task parsed at a time: the second document is still queued at MinerU.
+    with FakeMinerU(pages=1, page_time=0.5, queue_depth=1) as server:
+        client = make_client(server)
+        stream = p2r.convert_many(
+            sources, tmp_path / "out", 2, client, progress=False, search_index=""
+        )
+        first = next(stream)
+        start = time.monotonic()
+        stream.close()
+        elapsed = time.monotonic() - start
+
+    assert isinstance(first, p2r.Completed) and elapsed < 0.4
+    assert [p.name for p in (tmp_path / "out").iterdir()] == [first.output_dir.name]
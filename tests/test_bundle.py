@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+
+def test_convert_writes_bundle_with_random_access(tmp_path: Path, configure_p2r):
+    from click.testing import CliRunner
+
+    from p2r.bundle import Bundle, is_bundle
+    from p2r.cli import main
+    from p2r.fakeserver import FakeMinerU
+    from p2r.output import load_manifest
+    from p2r.pages import read_pages
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    out = tmp_path / "papers" / "paper"
+    args = ["convert", str(pdf), "-o", str(out), "--output-format", "bundle"]
+    with FakeMinerU(pages=3, page_time=0.01, zip_size=2048) as server:
+        configure_p2r(server)
+        first = CliRunner().invoke(main, args)
+        second = CliRunner().invoke(main, args + ["--compress-raw", "gzip"])
+
+    assert first.exit_code == 0, first.output
+    assert "- full.md" in first.output
+    assert sorted(p.name for p in out.parent.iterdir()) == ["paper.p2r", "paper_v2.p2r"]
+    assert is_bundle(out.parent / "paper.p2r") and not is_bundle(pdf)
+
+    with Bundle(out.parent / "paper.p2r") as bundle:
+        assert bundle.source == "paper.pdf"
+        paths = [f["path"] for f in bundle.files()]
+        assert "raw/paper_content_list.json" in paths and "raw/layout.json" in paths
+        assert bundle.markdown().startswith("# Section 1")
+        assert len(bundle.image("padding.jpg")) == 2048
+        page = bundle.read_pages([1], kind="content_list")
+        layout = bundle.read_pages([2], kind="layout")
+        exported = bundle.export()
+
+    assert exported == out
+    assert read_pages(exported, [1]) == page
+    assert read_pages(exported, [2], kind="layout") == layout
+    manifest = {f["path"] for f in load_manifest(exported)["files"]}
+    assert {"full.md", "raw/page_index.json", "images/padding.jpg"} <= manifest
+
+    assert second.exit_code == 0, second.output
+    with Bundle(out.parent / "paper_v2.p2r") as bundle:
+        assert "raw/paper_content_list.json.gz" in [f["path"] for f in bundle.files()]
+        assert bundle.read_pages([1]) == page
+
+
+def test_pack_and_bundle_cli(tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.bundle import Bundle, pack_dir
+    from p2r.cli import main
+
+    doc = tmp_path / "docs" / "paper"
+    (doc / "raw").mkdir(parents=True)
+    (doc / "images").mkdir()
+    (doc / "full.md").write_text("# Paper\n", encoding="utf-8")
+    (doc / "images" / "fig.png").write_bytes(b"\x89PNG fake")
+    content_list = [{"type": "text", "text": f"p{n}", "page_idx": n // 2} for n in range(6)]
+    (doc / "raw" / "paper_content_list.json").write_text(json.dumps(content_list))
+
+    bundle_file = pack_dir(doc)
+    assert bundle_file == tmp_path / "docs" / "paper.p2r"
+    with Bundle(bundle_file) as bundle:
+        assert bundle.read_pages([2])[0]["content"] == content_list[4:]
+        assert bundle.read_pages([9]) == []
+
+    runner = CliRunner()
+    result = runner.invoke(main, ["bundle", "cat", str(bundle_file)])
+    assert result.exit_code == 0 and result.output == "# Paper\n"
+    result = runner.invoke(main, ["bundle", "pages", str(bundle_file), "1"])
+    assert json.loads(result.output)["pages"][0]["content"] == content_list[:2]
+    result = runner.invoke(main, ["bundle", "cat", str(bundle_file), "images/missing.png"])
+    assert result.exit_code == 1 and "No such file" in result.output
+
+    export = ["bundle", "export", str(tmp_path / "docs"), "-o", str(tmp_path / "x")]
+    result = runner.invoke(main, export)
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "x" / "paper" / "images" / "fig.png").read_bytes() == b"\x89PNG fake"
+
+    result = runner.invoke(main, ["bundle", "pack", str(tmp_path / "x"), "--remove"])
+    assert result.exit_code == 0, result.output
+    assert sorted(p.name for p in (tmp_path / "x").iterdir()) == ["paper.p2r"]
+
+
+def test_export_rejects_escaping_paths(tmp_path: Path):
+    import sqlite3
+
+    import pytest
+
+    from p2r.bundle import Bundle, pack_dir
+
+    doc = tmp_path / "paper"
+    doc.mkdir()
+    (doc / "full.md").write_text("# Paper\n", encoding="utf-8")
+    bundle_file = pack_dir(doc)
+    conn = sqlite3.connect(bundle_file)
+    with conn:
+        conn.execute("UPDATE files SET path = '../evil.md' WHERE path = 'full.md'")
+    conn.close()
+
+    with Bundle(bundle_file) as bundle, pytest.raises(ValueError, match="Unsafe path"):
+        bundle.export(tmp_path / "out" / "paper")
+    assert not (tmp_path / "out" / "evil.md").exists()
+    assert list((tmp_path / "out").iterdir()) == []
@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+
+CONTENT_LIST = [
+    {"type": "text", "text": "Title", "text_level": 1, "page_idx": 0},
+    {"type": "text", "text": "Intro", "text_level": 2, "page_idx": 0},
+    {"type": "text", "text": "First sentence. " * 10, "bbox": [1, 2, 3, 4], "page_idx": 0},
+    {"type": "page_footnote", "text": "A footnote", "page_idx": 0},
+    {"type": "page_number", "text": "1", "page_idx": 0},
+    {"type": "text", "text": "Methods", "text_level": 2, "page_idx": 1},
+    {"type": "text", "text": "Body text", "page_idx": 1},
+]
+
+
+def test_chunks_follow_headings_and_size(tmp_path: Path, make_doc):
+    from p2r.chunks import chunk_document
+
+    doc = make_doc(tmp_path, "doc", CONTENT_LIST, compression="gzip")
+    chunks = list(chunk_document(doc, max_chars=100))
+
+    assert [c["headings"] for c in chunks] == [
+        ["Title"], ["Title", "Intro"], ["Title", "Intro"], ["Title", "Methods"]
+    ]
+    assert chunks[0]["text"].startswith("Title\n\nIntro")
+    assert all(len(c["text"]) <= 100 for c in chunks)
+    # The over-long paragraph is split, and its footnote stays on its page.
+    assert [e["idx"] for e in chunks[1]["elements"]] == [2]
+    assert [e["idx"] for e in chunks[2]["elements"]] == [2, 3]
+    assert chunks[1]["elements"][0]["bbox"] == [1, 2, 3, 4]
+    assert (chunks[3]["page_start"], chunks[3]["page_end"]) == (1, 1)
+    assert len({c["id"] for c in chunks}) == len(chunks)
+
+    no_notes = list(chunk_document(doc, max_chars=100, include_footnotes=False))
+    assert "A footnote" not in "".join(c["text"] for c in no_notes)
+
+
+def test_export_resumes_by_document_hash(tmp_path: Path, make_doc):
+    from p2r.chunks import export_chunks
+
+    corpus = tmp_path / "corpus"
+    make_doc(corpus, "a", CONTENT_LIST)
+    make_doc(corpus, "b", CONTENT_LIST[:3])
+    out = tmp_path / "chunks.jsonl"
+
+    stats = export_chunks([corpus], out, workers=2)
+    assert stats["documents"] == 2 and stats["failed"] == 0
+    lines = out.read_bytes()
+
+    # Simulate a crash after a partial write: the torn tail is dropped on resume.
+    with open(out, "ab") as f:
+        f.write(b'{"id": "partial')
+    with open(out.with_name("chunks.jsonl.done"), "a") as f:
+        f.write('{"sha2')
+    stats = export_chunks([corpus], out, workers=1)
+    assert stats == {"documents": 0, "chunks": 0, "skipped": 2, "failed": 0}
+    assert out.read_bytes() == lines
+
+    make_doc(corpus, "c", CONTENT_LIST[5:])
+    assert export_chunks([corpus], out, workers=1)["documents"] == 1
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert sorted({Path(r["doc"]).name for r in records}) == ["a", "b", "c"]
+    # Spooled documents are cleaned up.
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "chunks.jsonl",
+        "chunks.jsonl.done",
+        "corpus",
+    ]
+
+
+def test_export_counts_malformed_documents_and_skips_by_stat(monkeypatch, tmp_path, make_doc):
+    import os
+
+    import p2r.chunks as chunks
+
+    corpus = tmp_path / "corpus"
+    make_doc(corpus, "a", CONTENT_LIST)
+    make_doc(corpus, "bad", [{"type": "text", "text": "T", "text_level": "1", "page_idx": 0}])
+    for workers, out in ((1, tmp_path / "one.jsonl"), (2, tmp_path / "pool.jsonl")):
+        stats = chunks.export_chunks([corpus], out, workers=workers)
+        assert stats == {"documents": 1, "chunks": 2, "skipped": 0, "failed": 1}
+
+    # Unchanged documents are skipped without reading them; touched ones by their hash.
+    hashed = []
+    document_hash = chunks.document_hash
+    monkeypatch.setattr(chunks, "document_hash", lambda d: hashed.append(d) or document_hash(d))
+    out = tmp_path / "one.jsonl"
+    assert chunks.export_chunks([corpus], out, workers=1)["skipped"] == 1
+    assert [Path(d).name for d in hashed] == ["bad"]
+
+    cl = corpus / "a" / "raw" / "a_content_list.json"
+    os.utime(cl, ns=(cl.stat().st_atime_ns, cl.stat().st_mtime_ns + 10_000_000))
+    stats = chunks.export_chunks([corpus], out, workers=1)
+    assert stats == {"documents": 0, "chunks": 0, "skipped": 1, "failed": 1}
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 2
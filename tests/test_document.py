@@ -0,0 +1,77 @@
+from pathlib import Path
+
+
+CONTENT_LIST = [
+    {"type": "text", "text": "Title", "text_level": 1, "bbox": [100, 50, 900, 90], "page_idx": 0},
+    {"type": "text", "text": "Größe", "bbox": [100, 100, 900, 400], "page_idx": 0},
+    {"type": "page_footnote", "text": "fn0", "bbox": [100, 900, 900, 950], "page_idx": 0},
+    {
+        "type": "image",
+        "img_path": "images/a.jpg",
+        "image_caption": ["Fig"],
+        "bbox": [100, 100, 500, 500],
+        "page_idx": 1,
+    },
+    {"type": "page_footnote", "text": "fn1", "bbox": [100, 900, 900, 950], "page_idx": 1},
+    {"type": "custom_kind", "text": "x", "page_idx": 2},
+]
+
+
+def test_document_round_trips_content_list():
+    from p2r.document import Document
+
+    doc = Document.from_content_list(CONTENT_LIST)
+
+    assert len(doc) == len(CONTENT_LIST)
+    assert doc.to_content_list() == CONTENT_LIST
+    assert doc.text_of(1) == "Größe"
+    assert doc.type_of(5) == "custom_kind"
+
+    # Values that do not fit a column are kept verbatim rather than rejected.
+    odd = [
+        {"type": "text", "text": "a", "bbox": [0.1, 0.2, 10.5, 1e300], "page_idx": 0},
+        {"type": "text", "text": ["a"], "text_level": "1", "page_idx": "2"},
+        {"type": "text", "text_level": 300, "bbox": ["x", 0, 1, 1], "page_idx": 2**40},
+        {"type": "text", "bbox": [0, 0, 1, 10**400]},
+    ]
+    odd_doc = Document.from_content_list(odd)
+    assert odd_doc.to_content_list() == odd
+    assert odd_doc.bbox_of(0) == [0.1, 0.2, 10.5, 1e300] and odd_doc.bbox_of(2) is None
+    assert list(odd_doc.page_range(0)) == [0]
+
+
+def test_document_queries():
+    from p2r.document import Document
+
+    doc = Document.from_content_list(CONTENT_LIST)
+
+    assert doc.type_counts() == {"text": 2, "page_footnote": 2, "image": 1, "custom_kind": 1}
+    assert doc.page_counts() == {0: 3, 1: 2, 2: 1}
+    assert doc.num_pages == 3
+    assert list(doc.page_range(1)) == [3, 4]
+    assert doc.footnotes(page=1) == [4]
+    assert doc.footnotes() == [2, 4]
+    assert doc.select(type="missing") == []
+    assert doc.in_bbox(0, 0, 1000, 450, page=0) == [0, 1]
+    assert doc.in_bbox(420, 420, 450, 450, intersects=True) == [3]
+
+    # An element without page_idx between pages must not break the binary search.
+    gap = Document.from_content_list(
+        [{"type": "text", "page_idx": 0}, {"type": "text"}, {"type": "text", "page_idx": 1}]
+    )
+    assert list(gap.page_range(0)) == [0] and list(gap.page_range(1)) == [2]
+    assert gap.to_content_list()[1] == {"type": "text"}
+
+
+def test_document_load_from_directory(tmp_path: Path):
+    import json
+
+    from p2r.document import Document
+
+    (tmp_path / "raw").mkdir()
+    (tmp_path / "raw" / "id_content_list.json").write_text(
+        json.dumps(CONTENT_LIST), encoding="utf-8"
+    )
+
+    doc = Document.load(tmp_path)
+    assert doc.element(3)["img_path"] == "images/a.jpg"
@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+import pytest
+
+
+def test_client_converts_against_fake_server(tmp_path: Path, make_client):
+    from p2r.fakeserver import FakeMinerU
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    with FakeMinerU(pages=3, page_time=0.02, pending_time=0.02, token="test") as server:
+        client = make_client(server)
+        updates = list(client.parse_pdf(pdf, tmp_path / "out", search_index="", image_store=""))
+
+    states = [u["state"] for u in updates]
+    assert "pending" in states and "running" in states and states[-1] == "completed"
+    out = tmp_path / "out"
+    assert (out / "full.md").read_text(encoding="utf-8").startswith("# Section 1")
+    assert (out / "raw" / "paper_content_list.json").exists()
+    assert (out / "raw" / "page_index.json").exists()
+    assert server.counts["api.file_urls"] == 1 and server.counts["zip"] == 1
+
+
+def test_queue_depth_keeps_later_tasks_pending(tmp_path: Path):
+    import requests
+
+    from p2r.fakeserver import FakeMinerU
+
+    with FakeMinerU(queue_depth=1, pages=1, page_time=30) as server:
+        created = requests.post(
+            f"{server.api_base_url}/file-urls/batch",
+            json={"files": [{"name": "a.pdf"}, {"name": "b.pdf"}]},
+            timeout=5,
+        ).json()["data"]
+        status_url = f"{server.api_base_url}/extract-results/batch/{created['batch_id']}"
+        first = requests.get(status_url, timeout=5).json()["data"]["extract_result"]
+        for url in created["file_urls"]:
+            assert requests.put(url, data=b"%PDF", timeout=5).status_code == 200
+        second = requests.get(status_url, timeout=5).json()["data"]["extract_result"]
+
+    assert [r["state"] for r in first] == ["waiting-file", "waiting-file"]
+    assert [r["state"] for r in second] == ["running", "pending"]
+    assert second[0]["extract_progress"] == {"extracted_pages": 0, "total_pages": 1}
+
+
+def test_injected_faults_and_bench_report(monkeypatch, tmp_path: Path, make_client):
+    from p2r.bench import run_bench
+    from p2r.fakeserver import FakeMinerU
+    from p2r.mineru import MinerUError
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    with FakeMinerU(throttle_rate=1.0) as server:
+        client = make_client(server)
+        with pytest.raises(MinerUError, match="HTTP 429"):
+            list(client.parse_pdf(pdf, tmp_path / "out", search_index="", image_store=""))
+
+    # The bench ignores the user's configured outputs and leaves their quota ledger alone.
+    home = tmp_path / "home"
+    home.mkdir()
+    cfg = {
+        "output": {"format": "bundle"},
+        "picgo": {"enabled": True, "api_url": "http://127.0.0.1:9/upload"},
+        "metadata": {"enabled": True, "crossref_url": "http://127.0.0.1:9"},
+    }
+    (home / ".p2r_config.json").write_text(json.dumps(cfg), encoding="utf-8")
+    monkeypatch.setenv("HOME", str(home))
+    report = run_bench(
+        documents=4,
+        concurrency=2,
+        workdir=tmp_path / "bench",
+        poll_interval=0.01,
+        server_options={"pages": 2, "page_time": 0.01, "zip_size": 10000},
+    )
+    assert report["completed"] == 4 and report["failed"] == 0
+    assert report["requests"]["zip"] == 4 and report["requests"]["upload"] == 4
+    assert 0 < report["latency_seconds"]["p50"] <= report["latency_seconds"]["p99"]
+    assert report["pages_per_sec"] > 0 and report["peak_rss_bytes"] > 0
+    assert (tmp_path / "bench" / "doc-00003" / "full.md").exists()
+    assert not (tmp_path / "bench" / "doc-00003" / "metadata.json").exists()
+    assert sorted(p.name for p in home.iterdir()) == [".p2r_config.json"]
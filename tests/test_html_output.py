@@ -48,6 +48,12 @@ def test_cli_html_default_and_no_html(monkeypatch, tmp_path: Path):
     calls = []
 
     class FakeClient:
+        def plan(self, file_path, model_version):
+            return [{"suffix": "", "pages": None, "options": {}}]
+
+        def close(self):
+            pass
+
         def parse_pdf(self, pdf_file, output_dir, model_version="vlm", extra_formats=None):
             calls.append(
                 {
@@ -0,0 +1,127 @@
+import base64
+import json
+import struct
+import zlib
+from pathlib import Path
+
+import pytest
+
+
+def _png(width: int, height: int) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    raw = b"".join(b"\x00" + b"\x80" * (3 * width) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def test_image_size_from_headers():
+    from p2r.images import image_size_from_bytes
+
+    assert image_size_from_bytes(_png(7, 3)) == (7, 3)
+    assert image_size_from_bytes(b"GIF89a" + struct.pack("<HH", 20, 10)) == (20, 10)
+    jpeg = (
+        b"\xff\xd8"
+        + b"\xff\xe0" + struct.pack(">H", 4) + b"\x00\x00"  # APP0
+        + b"\xff\xc0" + struct.pack(">HBHH", 11, 8, 480, 640) + b"\x03\x00\x00\x00"
+    )
+    assert image_size_from_bytes(jpeg) == (640, 480)
+    assert image_size_from_bytes(b"not an image") is None
+
+
+def test_postprocess_externalizes_inline_images(tmp_path: Path):
+    from p2r.images import IMAGES_MANIFEST_NAME, postprocess_images
+
+    doc = tmp_path / "doc"
+    doc.mkdir()
+    data = _png(4, 2)
+    uri = "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+    (doc / "full.html").write_text(f'<p><img role="img" src="{uri}" /></p>', encoding="utf-8")
+
+    summary = postprocess_images(doc, transcode=False)
+
+    assert summary["images"] == 1 and summary["inlined_moved"] == 1
+    html = (doc / "full.html").read_text(encoding="utf-8")
+    assert "data:image" not in html
+    assert 'loading="lazy"' in html and 'width="4" height="2"' in html
+    images = json.loads((doc / IMAGES_MANIFEST_NAME).read_text(encoding="utf-8"))["images"]
+    [(src, info)] = images.items()
+    assert f'src="{src}"' in html
+    assert (doc / src).read_bytes() == data
+    assert info == {"width": 4, "height": 2}
+
+    # A second run leaves the annotated HTML alone.
+    postprocess_images(doc, transcode=False)
+    assert (doc / "full.html").read_text(encoding="utf-8") == html
+
+
+def test_transcode_writes_variants_and_srcset(tmp_path: Path):
+    pytest.importorskip("PIL")
+    from p2r.images import img_attributes, postprocess_images
+
+    doc = tmp_path / "doc"
+    (doc / "images").mkdir(parents=True)
+    (doc / "images" / "a.png").write_bytes(_png(64, 32))
+    (doc / "images" / "b.png").write_bytes(_png(8, 8))
+
+    summary = postprocess_images(
+        doc, {"format": "webp", "max_dimension": 40, "thumbnail_width": 16}
+    )
+
+    assert summary["transcoded"] == 2
+    info = json.loads((doc / "images.json").read_text(encoding="utf-8"))["images"]
+    assert info["images/a.png"]["variant"] == {"width": 40, "height": 20, "path": "a.webp"}
+    assert info["images/a.png"]["thumbnail"]["path"] == "thumbs/a.webp"
+    assert "thumbnail" not in info["images/b.png"]
+    attrs = img_attributes("images/a.png", info["images/a.png"])
+    assert 'srcset="images/thumbs/a.webp 16w, images/a.webp 40w"' in attrs
+
+
+def test_images_command_reports_failed_documents(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("good", "bad"):
+        (tmp_path / "docs" / name / "images").mkdir(parents=True)
+        (tmp_path / "docs" / name / "id_content_list.json").write_text("[]", encoding="utf-8")
+    (tmp_path / "docs" / "bad" / "full.html").mkdir()  # Unreadable as HTML
+
+    result = CliRunner().invoke(main, ["images", str(tmp_path / "docs"), "--no-transcode"])
+    assert result.exit_code == 1
+    assert "bad" in result.output and "Processed 1 document(s), failed: 1" in result.output
+
+
+def test_images_command_shares_one_pool(monkeypatch, tmp_path: Path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from click.testing import CliRunner
+
+    import p2r.images
+    from p2r.cli import main
+
+    pools = []
+
+    def counting_pool(workers=0):
+        pools.append(ThreadPoolExecutor(max_workers=1))
+        return pools[-1]
+
+    monkeypatch.setattr(p2r.images, "has_pillow", lambda: True)
+    monkeypatch.setattr(p2r.images, "image_pool", counting_pool)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    for name in ("a", "b", "c"):
+        (tmp_path / "docs" / name / "images").mkdir(parents=True)
+        (tmp_path / "docs" / name / "id_content_list.json").write_text("[]", encoding="utf-8")
+
+    result = CliRunner().invoke(main, ["images", str(tmp_path / "docs")])
+    assert result.exit_code == 0, result.output
+    assert "Processed 3 document(s)" in result.output
+    assert len(pools) == 1 and pools[0]._shutdown
@@ -0,0 +1,108 @@
+import os
+from pathlib import Path
+
+
+HASH_A = "a" * 64 + ".jpg"
+HASH_B = "b" * 64 + ".jpg"
+
+
+def _make_images(doc: Path, files) -> Path:
+    images = doc / "images"
+    images.mkdir(parents=True)
+    for name, data in files.items():
+        (images / name).write_bytes(data)
+    return images
+
+
+def test_deposit_deduplicates_across_documents(tmp_path: Path):
+    from p2r.imagestore import ImageStore
+
+    store = ImageStore(tmp_path / "store")
+    doc1 = _make_images(tmp_path / "doc1", {HASH_A: b"logo", HASH_B: b"figure"})
+    doc2 = _make_images(tmp_path / "doc2", {HASH_A: b"logo", "plain.png": b"png"})
+
+    s1 = store.deposit_dir(doc1)
+    s2 = store.deposit_dir(doc2)
+
+    assert s1["stored"] == 2 and s1["deduplicated"] == 0
+    assert s2["stored"] == 1 and s2["deduplicated"] == 1
+    assert os.path.samefile(doc1 / HASH_A, doc2 / HASH_A)
+    assert os.path.samefile(doc1 / HASH_A, store.path_for(HASH_A))
+    assert (doc2 / "plain.png").read_bytes() == b"png"
+    assert len(list(store.iter_images())) == 3
+    assert sorted(p.name for p in doc1.iterdir()) == sorted([HASH_A, HASH_B])
+
+
+def test_gc_removes_only_orphans(tmp_path: Path):
+    import shutil
+
+    from p2r.imagestore import ImageStore
+
+    store = ImageStore(tmp_path / "store")
+    doc1 = _make_images(tmp_path / "doc1", {HASH_A: b"logo"})
+    doc2 = _make_images(tmp_path / "doc2", {HASH_A: b"logo", HASH_B: b"figure"})
+    store.deposit_dir(doc1)
+    store.deposit_dir(doc2)
+
+    shutil.rmtree(tmp_path / "doc2")
+
+    assert store.gc(dry_run=True) == [store.path_for(HASH_B)]
+    assert store.path_for(HASH_B).exists()
+    assert store.gc() == [store.path_for(HASH_B)]
+    assert not store.path_for(HASH_B).exists()
+    assert store.path_for(HASH_A).exists()
+
+
+def test_cli_gc(tmp_path: Path):
+    from click.testing import CliRunner
+    import p2r.cli as cli
+    from p2r.imagestore import ImageStore
+
+    store = ImageStore(tmp_path / "store")
+    store.deposit_dir(_make_images(tmp_path / "doc", {HASH_A: b"logo"}))
+    (tmp_path / "doc" / "images" / HASH_A).unlink()
+
+    r = CliRunner().invoke(cli.main, ["gc", "--store", str(store.root)])
+    assert r.exit_code == 0
+    assert "Removed 1 orphaned image(s)" in r.output
+
+
+def test_variants_are_keyed_by_content(tmp_path: Path):
+    import json
+
+    import pytest
+
+    from p2r.imagestore import ImageStore, _link
+
+    store = ImageStore(tmp_path / "store")
+    variant = "a" * 64 + ".webp"
+    manifest = {"images": {f"images/{HASH_A}": {"variant": {"path": variant}}}}
+    dirs = []
+    for doc, encoded in (("doc1", b"quality 80"), ("doc2", b"quality 50")):
+        images = _make_images(tmp_path / doc, {HASH_A: b"logo", variant: encoded})
+        (images.parent / "images.json").write_text(json.dumps(manifest), encoding="utf-8")
+        dirs.append(images)
+    s1 = store.deposit_dir(dirs[0])
+    s2 = store.deposit_dir(dirs[1])
+
+    # Same original, differently encoded variants: each document keeps its own.
+    assert s1["stored"] == 2 and s2["stored"] == 1 and s2["deduplicated"] == 1
+    assert (dirs[0] / variant).read_bytes() == b"quality 80"
+    assert (dirs[1] / variant).read_bytes() == b"quality 50"
+    assert not store.path_for(variant).exists()
+
+    # A stored image that vanished (e.g. a concurrent gc) is an error, not a symlink.
+    dest = dirs[1] / HASH_A
+    with pytest.raises(FileNotFoundError):
+        _link(tmp_path / "store" / "gone.jpg", dest)
+    assert not dest.is_symlink() and dest.read_bytes() == b"logo"
+
+
+def test_cli_gc_reports_unusable_store(tmp_path: Path):
+    from click.testing import CliRunner
+    import p2r.cli as cli
+
+    store = tmp_path / "store"
+    (store / "documents.txt").mkdir(parents=True)  # Unreadable registry
+    r = CliRunner().invoke(cli.main, ["gc", "--store", str(store)])
+    assert r.exit_code == 1 and "Error" in r.output
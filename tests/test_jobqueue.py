@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "memory"])
+def test_leases_heartbeats_and_idempotent_completion(tmp_path: Path, backend: str):
+    from p2r.jobqueue import open_queue
+
+    spec = f"sqlite:{tmp_path / 'queue.db'}" if backend == "sqlite" else "memory:"
+    with open_queue(spec, max_attempts=2) as queue:
+        assert queue.enqueue([("k1", "a.pdf"), ("k2", "b.pdf"), ("k1", "copy-of-a.pdf")]) == 2
+
+        first = queue.claim("w1", lease_seconds=60)
+        second = queue.claim("w2", lease_seconds=0.05)
+        assert (first["source"], second["source"]) == ("a.pdf", "b.pdf")
+        assert queue.claim("w3", lease_seconds=60) is None
+        assert queue.heartbeat(first["id"], "w1", 60)
+
+        # w2 crashes: its lease expires and w3 takes the job over.
+        time.sleep(0.1)
+        retaken = queue.claim("w3", lease_seconds=60)
+        assert retaken["id"] == second["id"] and retaken["attempts"] == 2
+        assert not queue.heartbeat(second["id"], "w2", 60)
+        assert queue.fail(second["id"], "w2", "late") is None
+
+        assert queue.complete(first["id"], "w1", ["out/a"])
+        assert not queue.complete(first["id"], "w9", ["out/a_v2"])  # Duplicate completion
+        assert queue.fail(retaken["id"], "w3", "boom") == "failed"  # Attempts used up
+        assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+        assert queue.jobs("done")[0]["output"] == ["out/a"]
+        assert queue.retry_failed() == 1 and queue.counts()["pending"] == 1
+        job = queue.claim("w1", 60)
+        assert queue.release(job["id"], "w1") and queue.jobs("pending")[0]["attempts"] == 0
+
+
+def test_workers_share_a_sqlite_queue(tmp_path: Path, make_client):
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+    from p2r.jobqueue import SQLiteJobQueue, enqueue_sources, run_worker
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for n in range(6):
+        (docs / f"doc{n}.pdf").write_bytes(SAMPLE_PDF + b"%" * n)
+    (docs / "same-as-doc0.pdf").write_bytes(SAMPLE_PDF)
+    (docs / "empty.pdf").write_bytes(b"")
+
+    queue_path = tmp_path / "shared" / "queue.db"
+    with SQLiteJobQueue(queue_path, max_attempts=1) as queue:
+        assert enqueue_sources(queue, sorted(docs.iterdir())) == {"added": 7, "skipped": 1}
+
+    results = []
+    with FakeMinerU(pages=1, page_time=0.01) as server:
+
+        def node(name: str) -> None:
+            # Every "node" has its own client and its own connection to the queue file.
+            client = make_client(server)
+            with SQLiteJobQueue(queue_path, max_attempts=1) as queue:
+                run_worker(
+                    queue,
+                    tmp_path / "out",
+                    client=client,
+                    worker_id=name,
+                    concurrency=2,
+                    lease_seconds=0.3,
+                    exit_when_empty=True,
+                    on_result=results.append,
+                    search_index="",
+                )
+
+        nodes = [threading.Thread(target=node, args=(f"node{n}",)) for n in range(3)]
+        for thread in nodes:
+            thread.start()
+        for thread in nodes:
+            thread.join()
+        uploads = server.counts["upload"]
+
+    with SQLiteJobQueue(queue_path) as queue:
+        assert queue.counts() == {"pending": 0, "leased": 0, "done": 6, "failed": 1}
+        done = queue.jobs("done")
+    assert uploads == 6 and len(results) == 7  # Nothing was converted twice
+    outputs = sorted(Path(job["output"][0]).name for job in done)
+    assert outputs == [f"doc{n}" for n in range(6)]
+
+
+def test_cli_enqueue_worker_and_status(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.bench import SAMPLE_PDF
+    from p2r.cli import main
+    from p2r.fakeserver import FakeMinerU
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.pdf").write_bytes(SAMPLE_PDF)
+    (docs / "b.pdf").write_bytes(SAMPLE_PDF + b"%")
+    queue = str(tmp_path / "queue.db")
+    runner = CliRunner()
+    with FakeMinerU(pages=1, page_time=0.01) as server:
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.setenv("P2R_MINERU_TOKEN", "test")
+        monkeypatch.setenv("P2R_MINERU_API_BASE_URL", server.api_base_url)
+        cfg = {"mineru": {"poll_interval": 0.01}, "worker": {"queue": queue}}
+        (tmp_path / ".p2r_config.json").write_text(json.dumps(cfg), encoding="utf-8")
+
+        result = runner.invoke(main, ["enqueue", str(docs)])
+        assert result.exit_code == 0, result.output
+        assert "Queued 2 documents (0 already queued)" in result.output
+        result = runner.invoke(main, ["enqueue", str(docs / "a.pdf")])
+        assert "Queued 0 documents (1 already queued)" in result.output
+
+        args = ["worker", "-o", str(tmp_path / "out"), "--exit-when-empty"]
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0, result.output
+        assert "2 done, 0 retried, 0 failed" in result.output
+
+    result = runner.invoke(main, ["queue-status"])
+    assert "pending: 0, leased: 0, done: 2, failed: 0" in result.output
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["a", "b"]
+
+
+def test_enqueued_paths_are_absolute_and_heartbeat_errors_are_survived(
+    monkeypatch, tmp_path: Path, make_client
+):
+    import sqlite3
+
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+    from p2r.jobqueue import JobQueue, MemoryJobQueue, enqueue_sources, run_worker
+
+    with pytest.raises(TypeError):
+        JobQueue()  # Backends must implement every operation
+
+    class FlakyQueue(MemoryJobQueue):
+        beats = 0
+
+        def heartbeat(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+            self.beats += 1
+            if self.beats == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return super().heartbeat(job_id, worker, lease_seconds)
+
+    (tmp_path / "corpus").mkdir()
+    (tmp_path / "corpus" / "a.pdf").write_bytes(SAMPLE_PDF)
+    monkeypatch.chdir(tmp_path)
+    queue = FlakyQueue()
+    enqueue_sources(queue, [Path("corpus/a.pdf")])
+    assert queue.jobs()[0]["source"] == str(tmp_path / "corpus" / "a.pdf")
+
+    with FakeMinerU(pages=4, page_time=0.1) as server:
+        client = make_client(server)
+        stats = run_worker(
+            queue,
+            tmp_path / "out",
+            client=client,
+            lease_seconds=0.15,
+            exit_when_empty=True,
+            search_index="",
+        )
+    # The lease outlived the failed beat: converted once, no duplicate.
+    assert queue.beats > 2 and stats == {"done": 1, "retried": 0, "failed": 0, "duplicates": 0}
+
+
+def test_slow_claims_do_not_delay_heartbeats(tmp_path: Path, make_client):
+    import time
+
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+    from p2r.jobqueue import MemoryJobQueue, enqueue_sources, run_worker
+
+    class SlowQueue(MemoryJobQueue):
+        """An empty claim waits like one on a busy shared disk."""
+
+        def __init__(self):
+            super().__init__()
+            self.beats = []
+            self.waits = []
+
+        def claim(self, worker: str, lease_seconds: float):
+            job = super().claim(worker, lease_seconds)
+            if job is None:
+                start = time.monotonic()
+                time.sleep(0.6)
+                self.waits.append((start, time.monotonic()))
+            return job
+
+        def heartbeat(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+            self.beats.append(time.monotonic())
+            return super().heartbeat(job_id, worker, lease_seconds)
+
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(SAMPLE_PDF)
+    queue = SlowQueue()
+    enqueue_sources(queue, [pdf])
+    with FakeMinerU(pages=4, page_time=0.2) as server:
+        stats = run_worker(
+            queue,
+            tmp_path / "out",
+            client=make_client(server),
+            concurrency=2,
+            lease_seconds=0.15,
+            exit_when_empty=True,
+            search_index="",
+        )
+    assert stats["done"] == 1
+    start, end = queue.waits[0]
+    assert any(start < beat < end for beat in queue.beats)
@@ -0,0 +1,188 @@
+import json
+import zlib
+from pathlib import Path
+
+
+DOI = "10.5555/attention.2017"
+RECORD = {
+    "DOI": DOI,
+    "title": ["Attention Is All You Need"],
+    "author": [{"given": "Ashish", "family": "Vaswani"}, {"given": "Noam", "family": "Shazeer"}],
+    "issued": {"date-parts": [[2017, 6]]},
+    "container-title": ["Advances in Neural Information Processing Systems"],
+    "publisher": "Curran Associates",
+}
+
+
+def _pdf(info: bytes = b"", content: bytes = b"") -> bytes:
+    """A one-page PDF with an optional Info dictionary and page content stream."""
+    stream = zlib.compress(content)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 4 0 R >> >> "
+        b"/Contents 5 0 R /MediaBox [0 0 612 792] >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+        + stream
+        + b"\nendstream",
+        info or b"<< >>",
+    ]
+    out = bytearray(b"%PDF-1.7\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 6 0 R >>\n" % (len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+def _paper(path: Path) -> Path:
+    subject = "Transformer paper".encode("utf-16-be")
+    info = (
+        b"<< /Title (Attention Is All You Need) /Author (Ashish Vaswani; Noam Shazeer) "
+        b"/Subject <feff" + subject.hex().encode() + b"> /CreationDate (D:20170612120000Z) >>"
+    )
+    content = (
+        b"BT /F1 12 Tf 72 700 Td (Attention Is All You Need) Tj 0 -14 Td "
+        b"[(https://doi.org/10.5555/)-120(attention.2017)] TJ (.) Tj ET"
+    )
+    path.write_bytes(_pdf(info, content))
+    return path
+
+
+def test_pdf_metadata_from_info_and_first_page(monkeypatch, tmp_path: Path):
+    from p2r import metadata
+    from p2r.metadata import find_doi, from_pdf
+    from p2r.preflight import read_pdf_metadata
+
+    pdf = _paper(tmp_path / "paper.pdf")
+    raw = read_pdf_metadata(pdf)
+    assert raw["info"]["Subject"] == "Transformer paper"
+    assert "https://doi.org/10.5555/attention.2017." in raw["first_page_text"]
+    assert raw["first_page_text"].startswith("Attention Is All You Need ")
+    assert from_pdf(pdf) == {
+        "title": "Attention Is All You Need",
+        "authors": ["Ashish Vaswani", "Noam Shazeer"],
+        "year": 2017,
+        "doi": DOI,
+    }
+
+    junk = tmp_path / "10.1000_xyz.pdf"
+    junk.write_bytes(_pdf(b"<< /Title (Microsoft Word - draft.docx) >>"))
+    assert from_pdf(junk) == {}
+    assert read_pdf_metadata(tmp_path / "missing.pdf")["info"] == {}
+
+    assert find_doi("(doi: 10.1002/(SICI)1097-0142(1999)5:3<>.0.CO;2-8).") == (
+        "10.1002/(SICI)1097-0142(1999)5:3"
+    )
+    assert find_doi("see [10.1145/3290605.3300233], p. 3") == "10.1145/3290605.3300233"
+    assert find_doi("no identifier here") is None
+
+    def read(path: Path):
+        if path == junk:
+            raise TypeError("damaged")
+        return {"doi": DOI}
+
+    monkeypatch.setattr(metadata, "from_pdf", read)
+    found = metadata.prefetch([junk, pdf], None)
+    assert found[junk] == {"pdf": {}, "crossref": None} and found[pdf]["pdf"] == {"doi": DOI}
+
+
+def test_resolver_batches_and_caches_lookups(tmp_path: Path):
+    import socket
+
+    from p2r.fakeserver import FakeCrossRef
+    from p2r.metadata import (
+        DOIResolver,
+        MetadataCache,
+        add_frontmatter,
+        frontmatter,
+        render_name,
+    )
+
+    records = {f"10.5555/{n}": {"DOI": f"10.5555/{n}", "title": [f"Paper {n}"]} for n in range(25)}
+    wanted = list(records) + ["10.5555/UNKNOWN", "10.5555/0"]
+    cache_path = tmp_path / "cache.db"
+    with FakeCrossRef(records) as crossref:
+        with DOIResolver(crossref.base_url, MetadataCache(cache_path)) as resolver:
+            first = resolver.lookup(wanted)
+        assert crossref.counts == {"works": 2, "dois": 26}
+        with DOIResolver(crossref.base_url, MetadataCache(cache_path)) as resolver:
+            again = resolver.lookup(["10.5555/3", "10.5555/unknown"])
+        assert crossref.counts["works"] == 2
+
+    assert len(first) == 25 and first["10.5555/7"] == {"doi": "10.5555/7", "title": "Paper 7"}
+    assert again == {"10.5555/3": {"doi": "10.5555/3", "title": "Paper 3"}}
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    with DOIResolver(f"http://127.0.0.1:{port}", MetadataCache(cache_path)) as resolver:
+        assert resolver.lookup(["10.5555/new"]) == {}
+    with MetadataCache(cache_path) as cache:
+        assert len(cache) == 26  # Failed lookups are not cached
+
+    meta = {"title": "Attention: All You Need?", "authors": ["Ashish Vaswani"], "year": 2017}
+    assert render_name("{author}-{year}-{title}", meta) == "Vaswani-2017-Attention All You Need"
+    assert render_name("{author}-{journal}", meta) is None
+    block = frontmatter(meta, {"tags": ["literature-note", "unread"]})
+    assert block.startswith('---\ntitle: "Attention: All You Need?"\nauthors: ["Ashish Vaswani"]')
+    assert 'year: 2017\ntags: ["literature-note", "unread"]\ncreated_date: ' in block
+    text = add_frontmatter("# Heading\n", block)
+    assert add_frontmatter(text, "---\nx: 1\n---\n") == "---\nx: 1\n---\n\n# Heading\n"
+
+
+def test_convert_writes_metadata_and_names_documents(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.bench import SAMPLE_PDF
+    from p2r.cli import main
+    from p2r.fakeserver import FakeCrossRef, FakeMinerU
+    from p2r.output import load_manifest
+
+    papers = tmp_path / "in"
+    papers.mkdir()
+    _paper(papers / "paper.pdf")
+    (papers / "notes.pdf").write_bytes(SAMPLE_PDF)
+    out = tmp_path / "out"
+    with FakeMinerU(pages=2, page_time=0.01) as server, FakeCrossRef({DOI: RECORD}) as crossref:
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.setenv("P2R_MINERU_TOKEN", "test")
+        monkeypatch.setenv("P2R_MINERU_API_BASE_URL", server.api_base_url)
+        config = {
+            "mineru": {"poll_interval": 0.01, "max_poll_time": 30},
+            "metadata": {
+                "crossref_url": crossref.base_url,
+                "name_template": "{author}-{year}-{title}",
+                "frontmatter_fields": {"tags": ["literature-note"]},
+            },
+        }
+        (tmp_path / ".p2r_config.json").write_text(json.dumps(config), encoding="utf-8")
+        result = CliRunner().invoke(main, ["convert", str(papers), "-o", str(out), "--metadata"])
+        lookups = dict(crossref.counts)
+
+    assert result.exit_code == 0, result.output
+    assert lookups == {"works": 1, "dois": 1}
+    assert sorted(p.name for p in out.iterdir()) == [
+        "Vaswani-2017-Attention Is All You Need",
+        "notes",
+    ]
+    doc = out / "Vaswani-2017-Attention Is All You Need"
+    meta = json.loads((doc / "metadata.json").read_text(encoding="utf-8"))
+    assert meta["journal"] == RECORD["container-title"][0] and meta["doi"] == DOI
+    assert meta["sources"] == ["crossref", "pdf", "content_list"]
+    md = (doc / "full.md").read_text(encoding="utf-8")
+    assert md.startswith('---\ntitle: "Attention Is All You Need"\n')
+    assert 'tags: ["literature-note"]' in md and "\n---\n\n# Section 1" in md
+    sizes = {f["path"]: f["size"] for f in load_manifest(doc)["files"]}
+    assert sizes["full.md"] == (doc / "full.md").stat().st_size and "metadata.json" in sizes
+
+    # No DOI and no Info dictionary: only the content_list title, not enough for a name.
+    notes = json.loads((out / "notes" / "metadata.json").read_text(encoding="utf-8"))
+    assert notes["title"] == "Section 1" and notes["sources"] == ["content_list"]
@@ -0,0 +1,185 @@
+import json
+import socket
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+
+def test_prometheus_render_and_http_endpoint():
+    from p2r.metrics import PrometheusMetrics
+
+    metrics = PrometheusMetrics(buckets=(1.0, 5.0))
+    metrics.increment("documents_total", tags={"status": "completed"})
+    metrics.increment("documents_total", 2, tags={"status": "completed"})
+    metrics.observe("stage_duration_seconds", 0.5, {"stage": "upload"})
+    metrics.observe("stage_duration_seconds", 3.0, {"stage": "upload"})
+    metrics.observe("stage_duration_seconds", 9.0, {"stage": "upload"})
+
+    addr, port = metrics.serve(0)
+    try:
+        with urllib.request.urlopen(f"http://{addr}:{port}/metrics", timeout=5) as resp:
+            body = resp.read().decode("utf-8")
+    finally:
+        metrics.close()
+
+    assert body == metrics.render()
+    lines = body.splitlines()
+    assert "# TYPE p2r_documents_total counter" in lines
+    assert 'p2r_documents_total{status="completed"} 3' in lines
+    assert 'p2r_stage_duration_seconds_bucket{stage="upload",le="1"} 1' in lines
+    assert 'p2r_stage_duration_seconds_bucket{stage="upload",le="5"} 2' in lines
+    assert 'p2r_stage_duration_seconds_bucket{stage="upload",le="+Inf"} 3' in lines
+    assert 'p2r_stage_duration_seconds_sum{stage="upload"} 12.5' in lines
+    assert 'p2r_stage_duration_seconds_count{stage="upload"} 3' in lines
+
+
+def test_statsd_emits_udp_lines():
+    from p2r.metrics import StatsdMetrics
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.settimeout(5)
+    metrics = StatsdMetrics("127.0.0.1", listener.getsockname()[1])
+    try:
+        metrics.increment("api_errors_total", tags={"code": "http_500"})
+        metrics.observe("stage_duration_seconds", 0.25, {"stage": "download"})
+        received = [listener.recv(1024).decode("utf-8") for _ in range(2)]
+    finally:
+        metrics.close()
+        listener.close()
+
+    assert received == [
+        "p2r.api_errors_total:1|c|#code:http_500",
+        "p2r.stage_duration_ms:250|ms|#stage:download",
+    ]
+
+
+def test_client_counts_documents_requests_and_errors(monkeypatch, tmp_path: Path, fake_api):
+    from p2r.metrics import PrometheusMetrics
+    from p2r.mineru import MinerUClient, MinerUError
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    textfile = tmp_path / "p2r.prom"
+
+    client = MinerUClient(api_token="t", api_base_url="https://mineru.net/api/v4")
+    client.poll_interval = 0
+    client.metrics = PrometheusMetrics(textfile=textfile)
+
+    fake_api()
+    list(client.parse_pdf(pdf, tmp_path / "out", search_index="", image_store=""))
+    fake_api(upload_code=-60005)
+    with pytest.raises(MinerUError):
+        list(client.parse_pdf(pdf, tmp_path / "out2", search_index="", image_store=""))
+
+    lines = textfile.read_text(encoding="utf-8").splitlines()
+    assert 'p2r_documents_total{status="completed"} 1' in lines
+    assert 'p2r_documents_total{status="failed"} 1' in lines
+    assert 'p2r_api_errors_total{code="-60005"} 1' in lines
+    assert 'p2r_api_requests_total{endpoint="file_urls"} 2' in lines
+    assert 'p2r_api_requests_total{endpoint="download"} 1' in lines
+    assert "p2r_pages_total 4" in lines
+    assert f"p2r_bytes_uploaded_total {pdf.stat().st_size}" in lines
+    polls = [line for line in lines if line.startswith("p2r_poll_requests_total ")]
+    assert polls and int(polls[0].split()[1]) >= 2
+    upload_count = 'p2r_stage_duration_seconds_count{stage="upload"}'
+    assert any(line.startswith(upload_count) for line in lines)
+
+
+def test_client_closes_replaced_and_final_backends(monkeypatch, tmp_path: Path):
+    from p2r.metrics import Metrics
+    from p2r.mineru import MinerUClient
+
+    class Tracked(Metrics):
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    first, second = Tracked(), Tracked()
+    with MinerUClient(api_token="t", api_base_url="https://mineru.net/api/v4") as client:
+        client.metrics = first
+        client.metrics = first
+        assert not first.closed
+        client.metrics = second
+        assert first.closed and not second.closed
+    assert second.closed
+
+
+def test_textfile_flushes_are_thread_safe_and_never_raise(tmp_path: Path):
+    import threading
+
+    from p2r.metrics import PrometheusMetrics
+
+    textfile = tmp_path / "p2r.prom"
+    metrics = PrometheusMetrics(textfile=textfile)
+    metrics.increment("documents_total")
+    errors = []
+
+    def flush_many():
+        try:
+            for _ in range(50):
+                metrics.flush()
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=flush_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert "p2r_documents_total 1" in textfile.read_text(encoding="utf-8").splitlines()
+    assert [p.name for p in tmp_path.iterdir()] == ["p2r.prom"]
+
+    # An unwritable textfile location does not fail the caller.
+    (tmp_path / "file").write_text("", encoding="utf-8")
+    PrometheusMetrics(textfile=tmp_path / "file" / "p2r.prom").flush()
+
+
+def test_configured_prometheus_clients_share_one_endpoint(monkeypatch, tmp_path: Path):
+    from p2r.mineru import MinerUClient
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cfg = {"metrics": {"backend": "prometheus", "port": port}}
+    (tmp_path / ".p2r_config.json").write_text(json.dumps(cfg), encoding="utf-8")
+    url = f"http://127.0.0.1:{port}/metrics"
+
+    first = MinerUClient(api_token="t", api_base_url="https://mineru.net/api/v4")
+    second = MinerUClient(api_token="t", api_base_url="https://mineru.net/api/v4")
+    first.metrics.increment("documents_total")
+    second.metrics.increment("documents_total")
+    first.close()
+    first.close()
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        assert "p2r_documents_total 2" in resp.read().decode("utf-8").splitlines()
+    second.close()
+    with pytest.raises(OSError):
+        urllib.request.urlopen(url, timeout=5)
+
+
+def test_worker_counts_retried_jobs(monkeypatch, tmp_path: Path, fake_api):
+    from p2r.jobqueue import MemoryJobQueue, run_worker
+    from p2r.metrics import PrometheusMetrics
+    from p2r.mineru import MinerUClient
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    queue = MemoryJobQueue()
+    queue.enqueue([("a", str(pdf))])
+    client = MinerUClient(api_token="t", api_base_url="https://mineru.net/api/v4")
+    client.poll_interval = 0
+    client.metrics = metrics = PrometheusMetrics()
+
+    fake_api(upload_code=-60005)
+    run_worker(queue, tmp_path / "out", client, max_jobs=1, exit_when_empty=True)
+    fake_api()
+    run_worker(queue, tmp_path / "out", client, exit_when_empty=True, search_index="")
+    assert "p2r_retries_total 1" in metrics.render().splitlines()
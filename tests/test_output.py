@@ -0,0 +1,70 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+
+def test_allocate_name_uses_one_scan(tmp_path: Path):
+    from p2r.output import allocate_name
+
+    assert allocate_name(tmp_path, "layout.json") == tmp_path / "layout.json"
+    (tmp_path / "layout_v3.json").write_text("{}")
+    assert allocate_name(tmp_path, "layout.json") == tmp_path / "layout.json"
+    for name in ("layout.json", "layout_v2.json", "layout_v10.json", "layout_v2.json.gz"):
+        (tmp_path / name).write_text("{}")
+    assert allocate_name(tmp_path, "layout.json") == tmp_path / "layout_v11.json"
+    (tmp_path / "out.d").mkdir()
+    assert allocate_name(tmp_path, "out.d", is_dir=True) == tmp_path / "out.d_v2"
+
+
+def test_cli_commits_versioned_dir_and_lists_manifest(tmp_path: Path, configure_p2r):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+    from p2r.fakeserver import FakeMinerU
+    from p2r.output import MANIFEST_NAME, load_manifest
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    out = tmp_path / "shared" / "paper"
+    out.mkdir(parents=True)
+    (out / "notes.md").write_text("keep me", encoding="utf-8")
+
+    with FakeMinerU(pages=2, page_time=0.01) as server:
+        configure_p2r(server)
+        result = CliRunner().invoke(main, ["convert", str(pdf), "-o", str(out)])
+
+    assert result.exit_code == 0, result.output
+    committed = tmp_path / "shared" / "paper_v2"
+    assert "paper_v2" in result.output and "- full.md" in result.output
+    assert (out / "notes.md").read_text(encoding="utf-8") == "keep me"
+    assert sorted(p.name for p in (tmp_path / "shared").iterdir()) == ["paper", "paper_v2"]
+
+    manifest = load_manifest(committed)
+    assert manifest["source"] == "paper.pdf"
+    files = {f["path"]: f for f in manifest["files"]}
+    assert MANIFEST_NAME not in files and "raw/paper_content_list.json" in files
+    data = (committed / "full.md").read_bytes()
+    assert files["full.md"]["size"] == len(data)
+    assert files["full.md"]["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_failure_after_download_leaves_nothing_behind(monkeypatch, tmp_path: Path, configure_p2r):
+    from p2r.fakeserver import FakeMinerU
+    from p2r.mineru import MinerUClient
+
+    def broken_index(raw_dir):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("p2r.mineru.write_page_index", broken_index)
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    parent = tmp_path / "shared"
+
+    with FakeMinerU(pages=1, page_time=0.01) as server:
+        configure_p2r(server)
+        client = MinerUClient()
+        with pytest.raises(OSError, match="disk full"):
+            list(client.parse_pdf(pdf, parent / "paper", search_index="", image_store=""))
+
+    assert list(parent.iterdir()) == []
@@ -0,0 +1,132 @@
+import json
+from pathlib import Path
+
+
+CONTENT_LIST = [
+    {"type": "text", "text": "a [b] {c}, \"d\"", "page_idx": 0},
+    {"type": "text", "text": "p1", "page_idx": 1},
+    {"type": "page_footnote", "text": "fn", "page_idx": 1},
+    {"type": "text", "text": "p2", "page_idx": 2},
+]
+LAYOUT = {
+    "pdf_info": [
+        {"para_blocks": [{"type": "text"}], "page_idx": 0},
+        {"para_blocks": [], "page_idx": 1},
+        {"para_blocks": [{"type": "title"}, {"type": "text"}], "page_idx": 2},
+    ],
+    "_backend": "vlm",
+}
+
+
+def _make_raw(tmp_path: Path) -> Path:
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "id_content_list.json").write_text(json.dumps(CONTENT_LIST, indent=4), encoding="utf-8")
+    (raw / "layout.json").write_text(json.dumps(LAYOUT, indent=4), encoding="utf-8")
+    return raw
+
+
+def test_page_index_random_access(tmp_path: Path):
+    from p2r.pages import read_pages, write_page_index
+
+    raw = _make_raw(tmp_path)
+    write_page_index(raw)
+
+    index = json.loads((raw / "page_index.json").read_text(encoding="utf-8"))
+    cl_pages = index["artifacts"]["id_content_list.json"]["pages"]
+    assert [run[2] for run in cl_pages["1"]] == [2]
+    assert index["artifacts"]["layout.json"]["pages"]["2"][0][2] == 2
+
+    result = read_pages(tmp_path, [1, 2, 7])
+    assert [p["page_idx"] for p in result] == [1, 2]
+    assert result[0]["content"] == CONTENT_LIST[1:3]
+
+    layout = read_pages(tmp_path, [2], kind="layout")
+    assert layout[0]["content"] == LAYOUT["pdf_info"][2]
+
+
+def test_page_index_rebuilt_when_stale(tmp_path: Path):
+    from p2r.pages import read_pages, write_page_index
+
+    raw = _make_raw(tmp_path)
+    write_page_index(raw)
+    (raw / "id_content_list.json").write_text(
+        json.dumps([{"type": "text", "text": "new", "page_idx": 0}]), encoding="utf-8"
+    )
+
+    assert read_pages(tmp_path, [0])[0]["content"][0]["text"] == "new"
+
+
+def test_parse_page_spec():
+    import pytest
+
+    from p2r.pages import parse_page_spec
+
+    assert parse_page_spec("40-42") == [39, 40, 41]
+    assert parse_page_spec("2,4-6") == [1, 3, 4, 5]
+    with pytest.raises(ValueError):
+        parse_page_spec("0")
+
+
+def test_cli_pages(tmp_path: Path):
+    from click.testing import CliRunner
+    import p2r.cli as cli
+
+    _make_raw(tmp_path)
+    r = CliRunner().invoke(cli.main, ["pages", str(tmp_path), "2-3"])
+    assert r.exit_code == 0
+    pages = json.loads(r.output)["pages"]
+    assert [p["page_idx"] for p in pages] == [1, 2]
+
+
+def test_stale_index_is_not_written_from_reads(tmp_path: Path):
+    from p2r.pages import read_pages
+
+    raw = _make_raw(tmp_path)
+    raw.chmod(0o555)
+    try:
+        assert read_pages(tmp_path, [2])[0]["content"] == CONTENT_LIST[3:]
+    finally:
+        raw.chmod(0o755)
+    assert not (raw / "page_index.json").exists()
+
+
+def test_compressed_pages_are_read_in_ranges(tmp_path: Path):
+    import gzip
+
+    from p2r.pages import iter_content_list, read_pages, write_page_index
+
+    raw = _make_raw(tmp_path)
+    path = raw / "id_content_list.json"
+    (raw / "id_content_list.json.gz").write_bytes(gzip.compress(path.read_bytes()))
+    path.unlink()
+    write_page_index(raw)
+
+    result = read_pages(tmp_path, [2, 0])
+    assert [p["content"] for p in result] == [CONTENT_LIST[3:], CONTENT_LIST[:1]]
+    assert [element for _, element in iter_content_list(tmp_path)] == CONTENT_LIST
+
+
+def test_malformed_artifacts_are_indexed_without_pages(tmp_path: Path):
+    import pytest
+
+    from p2r.pages import build_page_index, index_artifact
+
+    for data, kind in [
+        (b'["not an element"]', "content_list"),
+        (b'[{"page_idx": "1"}]', "content_list"),
+        (b'{"pdf_info": [{"para_blocks": 3}]}', "layout"),
+        (b'[1, 2]', "layout"),
+    ]:
+        with pytest.raises(ValueError):
+            index_artifact(data, kind)
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "id_content_list.json").write_text('[{"page_idx": [0]}]', encoding="utf-8")
+    (raw / "layout.json.gz").write_bytes(b"not gzip")
+    artifacts = build_page_index(raw)["artifacts"]
+    assert {name: a["pages"] for name, a in artifacts.items()} == {
+        "id_content_list.json": None,
+        "layout.json.gz": None,
+    }
@@ -0,0 +1,192 @@
+import json
+from pathlib import Path
+
+
+HASH_A = "a" * 64 + ".jpg"
+HASH_B = "b" * 64 + ".jpg"
+
+
+def _document(doc: Path, images, md: str, html: str = "") -> Path:
+    (doc / "images").mkdir(parents=True)
+    for name, data in images.items():
+        (doc / "images" / name).write_bytes(data)
+    (doc / "full.md").write_text(md, encoding="utf-8")
+    if html:
+        (doc / "full.html").write_text(html, encoding="utf-8")
+    return doc
+
+
+def _url(base: str, data: bytes, suffix: str = ".jpg") -> str:
+    import hashlib
+
+    return f"{base}/i/{hashlib.sha256(data).hexdigest()}{suffix}"
+
+
+def test_upload_documents_deduplicates_and_rewrites_links(tmp_path: Path):
+    from p2r.fakeserver import FakePicGo
+    from p2r.picgo import PicGoUploader, UploadCache, upload_document
+
+    doc1 = _document(
+        tmp_path / "doc1",
+        {HASH_A: b"logo", HASH_B: b"figure", "plain.png": b"png"},
+        f"![](images/{HASH_A})\n![](images/{HASH_B})\n![](images/{HASH_A})\n"
+        "![](images/plain.png) ![](images/missing.jpg) ![](my-images/x.jpg)\n",
+        f'<img src="images/{HASH_B}" srcset="images/{HASH_B} 800w, images/plain.png 320w">',
+    )
+    doc2 = _document(tmp_path / "doc2", {HASH_A: b"logo"}, f"![logo](images/{HASH_A})\n")
+    cache_path = tmp_path / "cache.db"
+
+    with FakePicGo(latency=0.05) as picgo:
+        with PicGoUploader(picgo.api_url, UploadCache(cache_path), workers=4) as uploader:
+            first = upload_document(doc1, uploader)
+            second = upload_document(doc2, uploader)
+        with PicGoUploader(picgo.api_url, UploadCache(cache_path)) as uploader:
+            doc3 = _document(tmp_path / "doc3", {HASH_B: b"figure"}, f"![](images/{HASH_B})")
+            again = upload_document(doc3, uploader)
+            rerun = upload_document(doc2, uploader)
+
+        assert picgo.counts["upload"] == 3 and picgo.max_in_flight > 1
+        base = picgo.base_url
+
+    assert first["images"] == 3 and first["uploaded"] == 3 and first["cached"] == 0
+    assert first["links"] == 7 and first["failed"] == 0
+    assert second["uploaded"] == 0 and second["cached"] == 1 and second["links"] == 1
+    assert again["cached"] == 1 and again["uploaded"] == 0 and rerun["images"] == 0
+    logo, figure = _url(base, b"logo"), _url(base, b"figure")
+    md = (doc1 / "full.md").read_text(encoding="utf-8")
+    assert md.count(logo) == 2 and figure in md and _url(base, b"png", ".png") in md
+    assert "![](images/missing.jpg)" in md and "![](my-images/x.jpg)" in md
+    html = (doc1 / "full.html").read_text(encoding="utf-8")
+    assert html.count(figure) == 2 and "images/" not in html.replace(f"{base}/i/", "")
+    assert (doc2 / "full.md").read_text(encoding="utf-8") == f"![logo]({logo})\n"
+    assert (doc3 / "full.md").read_text(encoding="utf-8") == f"![]({figure})"
+    # Local images stay as the fallback.
+    assert (doc1 / "images" / HASH_A).read_bytes() == b"logo"
+    with UploadCache(cache_path) as cache:
+        assert len(cache) == 3
+
+
+def test_failed_uploads_keep_local_links(tmp_path: Path):
+    import socket
+
+    from p2r.fakeserver import FakePicGo
+    from p2r.picgo import PicGoUploader, upload_document
+
+    md = f"![](images/{HASH_A}) ![](images/{HASH_B})\n"
+    doc = _document(tmp_path / "doc", {HASH_A: b"logo", HASH_B: b"figure"}, md)
+
+    with FakePicGo(fail=True) as picgo:
+        with PicGoUploader(picgo.api_url) as uploader:
+            summary = upload_document(doc, uploader)
+    assert summary["failed"] == 2 and summary["links"] == 0
+    assert "upload failed" in summary["errors"][0]
+    assert (doc / "full.md").read_text(encoding="utf-8") == md
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    with PicGoUploader(f"http://127.0.0.1:{port}/upload", workers=1) as uploader:
+        summary = upload_document(doc, uploader)
+    # Nothing listens there: the first refused connection stops further attempts.
+    assert summary["failed"] == 2 and len(summary["errors"]) == 1
+    assert (doc / "full.md").read_text(encoding="utf-8") == md
+
+
+def test_convert_uploads_images_and_picgo_command(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+    from p2r.fakeserver import FakeMinerU, FakePicGo
+    from p2r.output import load_manifest
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    with FakeMinerU(pages=2, page_time=0.01, zip_size=512) as server, FakePicGo() as picgo:
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.setenv("P2R_MINERU_TOKEN", "test")
+        monkeypatch.setenv("P2R_MINERU_API_BASE_URL", server.api_base_url)
+        config = {
+            "mineru": {"poll_interval": 0.01, "max_poll_time": 30},
+            "picgo": {"api_url": picgo.api_url, "cache_path": str(tmp_path / "cache.db")},
+        }
+        (tmp_path / ".p2r_config.json").write_text(json.dumps(config), encoding="utf-8")
+        runner = CliRunner()
+        uploaded = runner.invoke(
+            main, ["convert", str(pdf), "-o", str(tmp_path / "a"), "--upload-images"]
+        )
+        local = runner.invoke(main, ["convert", str(pdf), "-o", str(tmp_path / "b")])
+        local_md = (tmp_path / "b" / "full.md").read_text(encoding="utf-8")
+        command = runner.invoke(main, ["picgo", str(tmp_path / "b")])
+        url = f"{picgo.base_url}/i/"
+        uploads = picgo.counts["upload"]
+
+    assert uploaded.exit_code == 0, uploaded.output
+    assert url in (tmp_path / "a" / "full.md").read_text(encoding="utf-8")
+    assert local.exit_code == 0 and "](images/padding.jpg)" in local_md
+    assert command.exit_code == 0, command.output
+    assert "0 uploaded, 1 cached, 0 failed" in command.output and uploads == 1
+    md = tmp_path / "b" / "full.md"
+    assert url in md.read_text(encoding="utf-8")
+    sizes = {f["path"]: f["size"] for f in load_manifest(tmp_path / "b")["files"]}
+    assert sizes["full.md"] == md.stat().st_size
+
+
+def test_variants_and_thumbnails_are_keyed_by_content(tmp_path: Path):
+    from p2r.fakeserver import FakePicGo
+    from p2r.picgo import PicGoUploader, UploadCache, upload_document
+
+    stem = "a" * 64
+    html = (
+        f'<img src="images/{HASH_A}" srcset="images/thumbs/{stem}.webp 200w, '
+        f'images/{stem}.webp 1600w">'
+    )
+    manifest = {
+        "images": {
+            f"images/{HASH_A}": {
+                "variant": {"path": f"{stem}.webp"},
+                "thumbnail": {"path": f"thumbs/{stem}.webp"},
+            }
+        }
+    }
+    docs = []
+    for name, quality in (("doc1", b"q80"), ("doc2", b"q50")):
+        doc = _document(
+            tmp_path / name,
+            {HASH_A: b"logo", f"{stem}.webp": b"variant " + quality},
+            f"![](images/{HASH_A})\n",
+            html,
+        )
+        (doc / "images" / "thumbs").mkdir()
+        (doc / "images" / "thumbs" / f"{stem}.webp").write_bytes(b"thumb " + quality)
+        (doc / "images.json").write_text(json.dumps(manifest), encoding="utf-8")
+        docs.append(doc)
+
+    with FakePicGo() as picgo:
+        with PicGoUploader(picgo.api_url, UploadCache(tmp_path / "cache.db")) as uploader:
+            first = upload_document(docs[0], uploader)
+            second = upload_document(docs[1], uploader)
+        base = picgo.base_url
+
+    assert first["images"] == 3 and first["uploaded"] == 3
+    # Only the untouched original is shared; the other encodings are uploaded anew.
+    assert second["cached"] == 1 and second["uploaded"] == 2
+    for doc, quality in zip(docs, (b"q80", b"q50")):
+        text = (doc / "full.html").read_text(encoding="utf-8")
+        thumb = _url(base, b"thumb " + quality, ".webp")
+        variant = _url(base, b"variant " + quality, ".webp")
+        assert f'srcset="{thumb} 200w, {variant} 1600w"' in text
+
+
+def test_picgo_command_reports_setup_errors(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runner = CliRunner()
+    for picgo in ({"workers": "many"}, {"cache_path": str(tmp_path)}):
+        config = {"picgo": picgo}
+        (tmp_path / ".p2r_config.json").write_text(json.dumps(config), encoding="utf-8")
+        result = runner.invoke(main, ["picgo", str(tmp_path)])
+        assert result.exit_code == 1, result.output
+        assert "Failed to set up PicGo uploads" in result.output
@@ -0,0 +1,294 @@
+import hashlib
+import zlib
+from pathlib import Path
+
+
+def _page_objects(pages: int, scanned: bool):
+    """Catalog (1), page tree (2), pages (3..) and a shared font or image object."""
+    shared = 3 + pages
+    kids = " ".join(f"{3 + n} 0 R" for n in range(pages))
+    resources = f"/XObject << /Im1 {shared} 0 R >>" if scanned else f"/Font << /F1 {shared} 0 R >>"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode(),
+    ]
+    for _ in range(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /Resources << {resources} >> "
+            f"/MediaBox [0 0 612 792] >>".encode()
+        )
+    if scanned:
+        image = b"<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /Length 3 >>"
+        objects.append(image + b"\nstream\n\x00\x00\x00\nendstream")
+    else:
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    return objects
+
+
+def _pdf(pages: int = 2, scanned: bool = False, trailer_extra: bytes = b"", extra=()) -> bytes:
+    """A PDF with a classic cross-reference table."""
+    objects = _page_objects(pages, scanned) + list(extra)
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R " % (len(objects) + 1) + trailer_extra + b">>\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+def _pdf_with_object_streams(pages: int) -> bytes:
+    """A PDF 1.5 file: objects in a compressed object stream, PNG-predicted xref stream."""
+    objects = _page_objects(pages, scanned=False)
+    header, body = [], b""
+    for num, data in enumerate(objects, start=1):
+        header.append(f"{num} {len(body)}")
+        body += data + b" "
+    first = (" ".join(header) + " ").encode()
+    stream = zlib.compress(first + body)
+    out = bytearray(b"%PDF-1.5\n")
+    stm_num = len(objects) + 1
+    stm_offset = len(out)
+    out += (
+        f"{stm_num} 0 obj\n<< /Type /ObjStm /N {len(objects)} /First {len(first)} "
+        f"/Length {len(stream)} /Filter /FlateDecode >>\nstream\n"
+    ).encode() + stream + b"\nendstream\nendobj\n"
+
+    xref_num = stm_num + 1
+    xref_offset = len(out)
+    rows = [bytes([0]) + (0).to_bytes(4, "big") + (65535).to_bytes(2, "big")]
+    for n in range(len(objects)):
+        rows.append(bytes([2]) + stm_num.to_bytes(4, "big") + n.to_bytes(2, "big"))
+    rows.append(bytes([1]) + stm_offset.to_bytes(4, "big") + (0).to_bytes(2, "big"))
+    rows.append(bytes([1]) + xref_offset.to_bytes(4, "big") + (0).to_bytes(2, "big"))
+    predicted, prev = bytearray(), bytes(7)
+    for row in rows:
+        predicted += b"\x02" + bytes((a - b) & 0xFF for a, b in zip(row, prev))
+        prev = row
+    data = zlib.compress(bytes(predicted))
+    out += (
+        f"{xref_num} 0 obj\n<< /Type /XRef /Size {xref_num + 1} /W [1 4 2] /Root 1 0 R "
+        f"/Filter /FlateDecode /DecodeParms << /Predictor 12 /Columns 7 >> "
+        f"/Length {len(data)} >>\nstream\n"
+    ).encode() + data + b"\nendstream\nendobj\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+    return bytes(out)
+
+
+def _encrypted(user_password_required: bool) -> bytes:
+    """An RC4 (revision 3) encrypted PDF, openable without a password or not."""
+    from p2r.preflight import _PASSWORD_PAD, _rc4
+
+    owner, file_id, permissions = bytes(range(32)), bytes(range(16)), -1044
+    digest = hashlib.md5(_PASSWORD_PAD + owner)
+    digest.update((permissions & 0xFFFFFFFF).to_bytes(4, "little") + file_id)
+    key = digest.digest()
+    for _ in range(50):
+        key = hashlib.md5(key[:16]).digest()
+    key = key[:16]
+    user = _rc4(key, hashlib.md5(_PASSWORD_PAD + file_id).digest())
+    for i in range(1, 20):
+        user = _rc4(bytes(b ^ i for b in key), user)
+    if user_password_required:
+        user = bytes(b ^ 0xFF for b in user)
+    encrypt = (
+        f"<< /Filter /Standard /V 2 /R 3 /Length 128 /P {permissions} "
+        f"/O <{owner.hex()}> /U <{(user + bytes(16)).hex()}> >>"
+    ).encode()
+    trailer = b"/Encrypt 6 0 R /ID [<%s> <%s>] " % (file_id.hex().encode(), file_id.hex().encode())
+    return _pdf(pages=2, trailer_extra=trailer, extra=[encrypt])
+
+
+def test_preflight_reads_page_tree_and_plans_parts(tmp_path: Path):
+    from p2r.preflight import plan_parts, preflight
+
+    text = tmp_path / "text.pdf"
+    text.write_bytes(_pdf(pages=3))
+    info = preflight(text)
+    assert info["pages"] == 3 and info["version"] == "1.7"
+    assert info["scanned"] is False and not info["encrypted"] and not info["repaired"]
+    assert info["errors"] == [] and info["warnings"] == []
+    assert plan_parts(info) == [{"suffix": "", "pages": 3, "options": {}}]
+
+    scan = tmp_path / "scan.pdf"
+    scan.write_bytes(_pdf(pages=1300, scanned=True))
+    info = preflight(scan)
+    assert info["pages"] == 1300 and info["scanned"] is True
+    parts = plan_parts(info, model_version="pipeline")
+    assert [p["suffix"] for p in parts] == ["_p1-600", "_p601-1200", "_p1201-1300"]
+    assert parts[2]["options"] == {"is_ocr": True, "page_ranges": "1201-1300"}
+    assert "is_ocr" not in plan_parts(info, model_version="vlm")[0]["options"]
+
+    streams = tmp_path / "streams.pdf"
+    streams.write_bytes(_pdf_with_object_streams(pages=7))
+    info = preflight(streams)
+    assert info["pages"] == 7 and info["scanned"] is False and not info["repaired"]
+
+
+def test_preflight_flags_rejected_and_broken_files(tmp_path: Path):
+    from p2r.preflight import preflight, read_pdf_metadata
+
+    (tmp_path / "empty.pdf").write_bytes(b"")
+    (tmp_path / "html.pdf").write_bytes(b"<html>not a pdf</html>")
+    (tmp_path / "locked.pdf").write_bytes(_encrypted(user_password_required=True))
+    (tmp_path / "owner.pdf").write_bytes(_encrypted(user_password_required=False))
+    broken = _pdf(pages=4).replace(b"startxref\n", b"startxref\n9")
+    (tmp_path / "broken.pdf").write_bytes(broken)
+
+    assert preflight(tmp_path / "empty.pdf")["errors"] == ["empty file"]
+    assert preflight(tmp_path / "html.pdf")["errors"] == ["not a PDF (no %PDF header)"]
+    locked = preflight(tmp_path / "locked.pdf")
+    assert locked["encrypted"] and locked["password_required"] is True
+    assert locked["errors"] == ["encrypted with a user password"]
+    owner = preflight(tmp_path / "owner.pdf")
+    assert owner["encrypted"] and owner["password_required"] is False and not owner["errors"]
+    repaired = preflight(tmp_path / "broken.pdf")
+    assert repaired["repaired"] and repaired["pages"] == 4 and not repaired["errors"]
+
+    # Wrongly typed cross-reference stream fields fall back to the scan, never raise.
+    streams = _pdf_with_object_streams(pages=2)
+    for field in (b"/W [1 4 2] /Index [(0) 8]", b"/W [1 /Four 2]"):
+        path = tmp_path / "mangled.pdf"
+        path.write_bytes(streams.replace(b"/W [1 4 2]", field))
+        mangled = preflight(path)
+        assert mangled["repaired"] and not mangled["errors"]
+        assert "cross-reference data unreadable" in mangled["warnings"][0]
+        assert read_pdf_metadata(path)["info"] == {}
+
+
+def test_preflight_survives_cyclic_page_trees_and_deep_nesting(tmp_path: Path):
+    from p2r.preflight import preflight, read_pdf_metadata
+
+    # Kids leading back to their own node would otherwise be walked 2**depth times.
+    cyclic = tmp_path / "cyclic.pdf"
+    cyclic.write_bytes(_pdf(pages=1).replace(b"/Kids [3 0 R]", b"/Kids [2 0 R 2 0 R]"))
+    info = preflight(cyclic)
+    assert info["pages"] == 1 and info["scanned"] is None and not info["errors"]
+    assert read_pdf_metadata(cyclic)["first_page_text"] == ""
+
+    nested = tmp_path / "nested.pdf"
+    nested.write_bytes(_pdf(pages=2, trailer_extra=b"/Junk " + b"[" * 5000 + b"]" * 5000))
+    info = preflight(nested)
+    assert info["repaired"] and info["pages"] == 2 and not info["errors"]
+    assert "nested too deeply" in info["warnings"][0]
+
+
+def test_batch_splits_long_pdfs_and_skips_rejected_ones(tmp_path: Path, make_client):
+    from p2r.fakeserver import FakeMinerU
+
+    book, locked = tmp_path / "book.pdf", tmp_path / "locked.pdf"
+    book.write_bytes(_pdf(pages=700))
+    locked.write_bytes(_encrypted(user_password_required=True))
+    with FakeMinerU(pages=1, page_time=0.01) as server, make_client(server) as client:
+        updates = list(
+            client.parse_batch([book, locked], tmp_path / "out", search_index="", image_store="")
+        )
+        counts = dict(server.counts)
+
+    final = {
+        (u["source"].name, u.get("part")): u for u in updates if "error" in u or "timings" in u
+    }
+    assert final[("locked.pdf", None)]["state"] == "failed"
+    assert "user password" in final[("locked.pdf", None)]["error"]
+    assert final[("book.pdf", "1-600")]["state"] == "completed"
+    assert final[("book.pdf", "601-700")]["state"] == "completed"
+    assert counts["upload"] == 2 and counts["api.file_urls"] == 1
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["book_p1-600", "book_p601-700"]
+
+
+def test_client_records_usage_and_reuses_its_plan(monkeypatch, tmp_path: Path, make_client):
+    import threading
+
+    import p2r.mineru as mineru
+    from p2r.fakeserver import FakeMinerU
+    from p2r.preflight import preflight
+    from p2r.quota import pages_used, record_pages
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(_pdf(pages=3))
+    checked = []
+
+    def counting(path):
+        checked.append(path)
+        return preflight(path)
+
+    monkeypatch.setattr(mineru, "preflight", counting)
+    with FakeMinerU(pages=3, page_time=0.01) as server, make_client(server) as client:
+        assert len(client.plan(pdf, "vlm")) == 1
+        options = {"search_index": "", "image_store": ""}
+        list(client.parse_pdf(pdf, tmp_path / "out", model_version="vlm", **options))
+        list(client.parse_batch([pdf], tmp_path / "more", **options))
+    assert len(checked) == 2  # plan() and parse_batch, not parse_pdf
+    assert pages_used() == 6
+
+    # Concurrent writers each add their pages.
+    threads = [threading.Thread(target=record_pages, args=(1,)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pages_used() == 26
+
+
+def test_usage_ledger_is_configurable_and_plans_are_bounded(
+    monkeypatch, tmp_path: Path, make_client
+):
+    import p2r.mineru as mineru
+    from p2r.fakeserver import FakeMinerU
+    from p2r.quota import configured_usage_path, pages_used
+
+    assert configured_usage_path({"mineru": {"usage_ledger": ""}}) is None
+    assert configured_usage_path({}) == tmp_path / ".p2r_usage.json"
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(_pdf(pages=3))
+    ledger = tmp_path / "ledgers" / "usage.json"
+    options = {"search_index": "", "image_store": ""}
+    with FakeMinerU(pages=3, page_time=0.01) as server, make_client(server) as client:
+        client.usage_ledger = ledger
+        list(client.parse_pdf(pdf, tmp_path / "a", **options))
+        client.usage_ledger = None
+        list(client.parse_pdf(pdf, tmp_path / "b", **options))
+
+        monkeypatch.setattr(mineru, "_MAX_PLANNED", 2)
+        for n in range(3):
+            other = tmp_path / f"plan{n}.pdf"
+            other.write_bytes(_pdf(pages=1))
+            client.plan(other, "vlm")
+        assert len(client._planned) == 2
+    assert pages_used(path=ledger) == 3
+    assert not (tmp_path / ".p2r_usage.json").exists()
+
+
+def test_cli_dry_run_estimates_quota(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+    from p2r.quota import estimate, pages_used, record_pages
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.pdf").write_bytes(_pdf(pages=5))
+    (docs / "b.pdf").write_bytes(_pdf(pages=700, scanned=True))
+    (docs / "SCAN.PDF").write_bytes(_pdf(pages=1))
+    record_pages(1800)
+    assert pages_used() == 1800
+
+    result = CliRunner().invoke(main, ["convert", str(docs), "--dry-run", "--model", "pipeline"])
+    assert result.exit_code == 0, result.output
+    assert "Tasks: 4, 706 pages" in result.output
+    assert "2 parts, OCR" in result.output
+    assert "200 pages at priority, 506 at lower priority" in result.output
+    assert not list(tmp_path.glob("p2r_*"))
+
+    (docs / "c.pdf").write_bytes(b"")
+    result = CliRunner().invoke(main, ["convert", str(docs), "--dry-run"])
+    assert result.exit_code == 1 and "1 rejected" in result.output
+    assert pages_used() == 1800  # Dry runs do not count
+    assert estimate(10, used=1995)["low_priority_pages"] == 5
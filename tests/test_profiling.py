@@ -0,0 +1,52 @@
+import json
+import pstats
+import tracemalloc
+from pathlib import Path
+
+
+def _work():
+    return sorted(str(i) * 3 for i in range(2000))
+
+
+def test_profiler_cpu_and_mem_outputs(tmp_path: Path):
+    from p2r.profiling import Profiler
+
+    with Profiler("cpu", tmp_path, name="cpu", sample_interval=0.001) as prof:
+        _work()
+    assert set(prof.files) == {"stats", "folded", "summary"}
+    stats = pstats.Stats(str(prof.files["stats"]))
+    assert any(func[2] == "_work" for func in stats.stats)
+    assert "Ordered by: cumulative time" in prof.summary
+
+    with Profiler("mem", tmp_path, name="mem", top=5) as prof:
+        kept = _work()
+    assert kept and not tracemalloc.is_tracing()
+    snapshot = tracemalloc.Snapshot.load(str(prof.files["stats"]))
+    assert snapshot.statistics("lineno")
+    assert "peak traced" in prof.files["summary"].read_text(encoding="utf-8")
+    for line in prof.files["folded"].read_text(encoding="utf-8").splitlines():
+        stack, weight = line.rsplit(" ", 1)
+        assert stack and int(weight) > 0
+
+
+def test_cli_profile_wraps_subcommand(monkeypatch, tmp_path: Path):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    doc = tmp_path / "doc"
+    (doc / "raw").mkdir(parents=True)
+    items = [{"type": "text", "text": "Hello", "page_idx": 0}]
+    (doc / "raw" / "x_content_list.json").write_text(json.dumps(items), encoding="utf-8")
+
+    profiles = tmp_path / "profiles"
+    result = CliRunner().invoke(
+        main, ["--profile", "cpu", "--profile-dir", str(profiles), "rebuild", str(doc)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert (doc / "rebuilt.md").exists()
+    names = sorted(p.name for p in profiles.iterdir())
+    assert len(names) == 3 and all(n.startswith("p2r-rebuild-cpu-") for n in names)
+    assert "Profile (cpu):" in result.output
@@ -0,0 +1,132 @@
+import json
+import os
+from pathlib import Path
+
+
+def test_rebuild_document_skips_when_up_to_date(tmp_path: Path, make_doc):
+    from p2r.rebuild import HTML_NAME, MARKDOWN_NAME, rebuild_document
+
+    doc = make_doc(tmp_path)
+
+    assert rebuild_document(doc) is True
+    md = (doc / MARKDOWN_NAME).read_text(encoding="utf-8")
+    assert md.startswith("# Title")
+    assert "<!-- Page 2 -->" in md
+    assert "<title>Title</title>" in (doc / HTML_NAME).read_text(encoding="utf-8")
+
+    mtime = (doc / MARKDOWN_NAME).stat().st_mtime_ns
+    assert rebuild_document(doc) is False
+    assert (doc / MARKDOWN_NAME).stat().st_mtime_ns == mtime
+
+    # Touching the input without changing it only refreshes the manifest.
+    cl = doc / "raw" / "doc_content_list.json"
+    os.utime(cl, ns=(cl.stat().st_atime_ns, cl.stat().st_mtime_ns + 10_000_000))
+    assert rebuild_document(doc) is False
+    assert (doc / MARKDOWN_NAME).stat().st_mtime_ns == mtime
+
+    # Changing an option re-renders.
+    assert rebuild_document(doc, include_footnotes=False) is True
+    assert "*Note*" not in (doc / MARKDOWN_NAME).read_text(encoding="utf-8")
+
+
+def test_rebuild_document_detects_changed_input(tmp_path: Path, make_doc):
+    from p2r.rebuild import MARKDOWN_NAME, rebuild_document
+
+    doc = make_doc(tmp_path)
+    rebuild_document(doc)
+
+    (doc / "raw" / "doc_content_list.json").write_text(
+        json.dumps([{"type": "text", "text": "Changed", "page_idx": 0}]), encoding="utf-8"
+    )
+    assert rebuild_document(doc) is True
+    assert (doc / MARKDOWN_NAME).read_text(encoding="utf-8") == "Changed"
+
+
+def test_cli_rebuild_walks_tree(tmp_path: Path, make_doc):
+    from click.testing import CliRunner
+    import p2r.cli as cli
+
+    make_doc(tmp_path / "a")
+    make_doc(tmp_path / "b")
+
+    runner = CliRunner()
+    r1 = runner.invoke(cli.main, ["rebuild", str(tmp_path)])
+    assert r1.exit_code == 0
+    assert "Rebuilt: 2, up to date: 0" in r1.output
+
+    r2 = runner.invoke(cli.main, ["rebuild", str(tmp_path)])
+    assert r2.exit_code == 0
+    assert "Rebuilt: 0, up to date: 2" in r2.output
+
+
+def test_rebuild_and_images_keep_manifest_current(tmp_path: Path, make_doc):
+    from click.testing import CliRunner
+    import p2r.cli as cli
+    from p2r.output import build_manifest, load_manifest, write_manifest
+    from p2r.rebuild import MARKDOWN_NAME
+
+    doc = make_doc(tmp_path)
+    write_manifest(doc, source="paper.pdf")
+
+    for args in (["rebuild", str(doc)], ["images", str(doc), "--no-transcode"]):
+        assert CliRunner().invoke(cli.main, args).exit_code == 0
+        manifest = load_manifest(doc)
+        assert manifest["source"] == "paper.pdf"
+        assert manifest["files"] == build_manifest(doc)["files"]
+    assert MARKDOWN_NAME in {f["path"] for f in manifest["files"]}
+
+    # A touched but unchanged input only updates the rebuild manifest.
+    from p2r.rebuild import rebuild_document
+
+    rebuild_document(doc)  # Picks up images.json from `p2r images`
+    before = (doc / "manifest.json").read_bytes()
+    cl = doc / "raw" / "doc_content_list.json"
+    os.utime(cl, ns=(cl.stat().st_atime_ns, cl.stat().st_mtime_ns + 10_000_000))
+    assert rebuild_document(doc) is False
+    assert (doc / "manifest.json").read_bytes() == before
+    assert load_manifest(doc)["files"] == build_manifest(doc)["files"]
+
+
+def test_rebuild_html_chunks(tmp_path: Path, make_doc):
+    from p2r.rebuild import CHUNKS_DIR_NAME, HTML_NAME, rebuild_document, split_chunks
+
+    content_list = [
+        {"type": "text", "text": "Intro", "text_level": 1, "page_idx": 0},
+        {"type": "text", "text": "a", "page_idx": 0},
+        {"type": "text", "text": "Methods", "text_level": 1, "page_idx": 1},
+        {"type": "image", "img_path": "images/x.jpg", "page_idx": 2},
+        {"type": "text", "text": "b", "page_idx": 3},
+        {"type": "text", "text": "Same page", "text_level": 1, "page_idx": 3},
+    ]
+    assert split_chunks(content_list, max_pages=2) == [range(0, 2), range(2, 4), range(4, 6)]
+    assert split_chunks(content_list, max_pages=0, split_level=0) == [range(0, 6)]
+
+    doc = make_doc(tmp_path, content_list=content_list)
+
+    assert rebuild_document(doc, chunk_pages=2) is True
+    out = doc / CHUNKS_DIR_NAME
+    assert sorted(p.name for p in out.iterdir()) == [
+        "index.html", "part-0001.html", "part-0002.html", "part-0003.html", "style.css"
+    ]
+    part2 = (out / "part-0002.html").read_text(encoding="utf-8")
+    assert '<link rel="stylesheet" href="style.css">' in part2
+    assert '<link rel="prefetch" href="part-0003.html">' in part2
+    assert '<h1 id="e2">Methods</h1>' in part2
+    assert 'src="../images/x.jpg"' in part2
+    assert "<style>" not in part2
+    assert 'href="part-0002.html">Methods</a>' in (out / "index.html").read_text(encoding="utf-8")
+    assert rebuild_document(doc, chunk_pages=2) is False
+
+    # Fewer chunks on the next build: stale parts are removed.
+    assert rebuild_document(doc, chunk_pages=10, split_level=0) is True
+    assert sorted(p.name for p in out.glob("part-*.html")) == ["part-0001.html"]
+
+    # A damaged part is detected, not only a damaged index.
+    (out / "part-0001.html").write_text("truncated", encoding="utf-8")
+    assert rebuild_document(doc, chunk_pages=10, split_level=0) is True
+
+    # Switching modes removes the other mode's HTML.
+    assert rebuild_document(doc) is True
+    assert (doc / HTML_NAME).exists() and not out.exists()
+    assert rebuild_document(doc, chunk_pages=2) is True
+    assert out.is_dir() and not (doc / HTML_NAME).exists()
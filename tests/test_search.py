@@ -0,0 +1,94 @@
+import json
+from pathlib import Path
+
+
+def test_index_and_search(tmp_path: Path, make_doc):
+    from p2r.search import SearchIndex
+
+    doc = make_doc(
+        tmp_path,
+        "paper",
+        [
+            {"type": "text", "text": "Sparse Attention", "text_level": 1, "page_idx": 0},
+            {"type": "text", "text": "We study attention.", "bbox": [1, 2, 3, 4], "page_idx": 2},
+            {"type": "table", "table_caption": ["Ablation"], "table_body": "<td>BLEU</td>",
+             "page_idx": 3},
+            {"type": "page_number", "text": "attention", "page_idx": 3},
+        ],
+    )
+    with SearchIndex(tmp_path / "index.db") as index:
+        assert index.index_document(doc) is True
+        assert index.index_document(doc) is False
+
+        hits = index.search("attention")
+        assert [h["page_idx"] for h in hits] == [0, 2]
+        assert hits[0]["title"] == "Sparse Attention"
+        assert hits[1]["bbox"] == [1, 2, 3, 4] and "[attention]" in hits[1]["snippet"]
+        assert [h["type"] for h in index.search("bleu")] == ["table"]
+        assert index.search("attention", element_type="table") == []
+        assert index.search("abla") == []
+        assert index.search("abla*")[0]["page_idx"] == 3
+
+        # Changing the content_list re-indexes only that document.
+        (doc / "raw" / "paper_content_list.json").write_text(
+            json.dumps([{"type": "text", "text": "Dense", "page_idx": 0}]), encoding="utf-8"
+        )
+        assert index.index_document(doc) is True
+        assert index.search("attention") == []
+        assert index.stats() == {"documents": 1, "elements": 1}
+
+
+def test_cli_reindex_and_search(tmp_path: Path, make_doc):
+    import shutil
+
+    from click.testing import CliRunner
+    import p2r.cli as cli
+
+    corpus = tmp_path / "corpus"
+    for n in range(3):
+        make_doc(corpus, f"doc{n}", [{"type": "text", "text": f"topic{n} shared", "page_idx": n}])
+    db = str(tmp_path / "index.db")
+
+    runner = CliRunner()
+    r = runner.invoke(cli.main, ["reindex", str(corpus), "--index", db, "--workers", "2"])
+    assert r.exit_code == 0, r.output
+    assert "Indexed: 3, unchanged: 0, removed: 0" in r.output
+
+    shutil.rmtree(corpus / "doc0")
+    r = runner.invoke(cli.main, ["reindex", str(corpus), "--index", db])
+    assert "Indexed: 0, unchanged: 2, removed: 1" in r.output
+
+    r = runner.invoke(cli.main, ["search", "shared", "--index", db, "--json"])
+    assert r.exit_code == 0
+    hits = [json.loads(line) for line in r.output.splitlines()]
+    assert sorted(Path(h["path"]).name for h in hits) == ["doc1", "doc2"]
+
+
+def test_index_failure_does_not_fail_committed_document(tmp_path: Path, make_client):
+    from p2r.fakeserver import FakeMinerU
+
+    pdf = tmp_path / "paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    broken = tmp_path / "index.db"
+    broken.write_bytes(b"not a database" * 100)
+    with FakeMinerU(pages=1, page_time=0.01) as server, make_client(server) as client:
+        updates = list(client.parse_pdf(pdf, tmp_path / "out", search_index=str(broken)))
+
+    assert updates[-1]["state"] == "completed"
+    [span] = [s for s in updates[-1]["timings"]["stages"] if s["stage"] == "search_index"]
+    assert "Failed to update search index" in span["warning"]
+
+
+def test_reindex_counts_malformed_documents_as_failed(tmp_path: Path, make_doc):
+    from p2r.search import SearchIndex
+
+    corpus = tmp_path / "corpus"
+    make_doc(corpus, "good", [{"type": "text", "text": "fine words", "page_idx": 0}])
+    make_doc(corpus, "bad", ["not an element", {"type": "text", "text": "x", "page_idx": 0}])
+    make_doc(corpus, "odd", [{"type": "table", "table_caption": 5, "page_idx": 0}])
+    make_doc(corpus, "paged", [{"type": "text", "text": "x", "page_idx": {"n": 0}}])
+    for workers in (1, 2):
+        with SearchIndex(tmp_path / f"index{workers}.db") as index:
+            stats = index.reindex([corpus], workers=workers)
+            assert (stats["indexed"], stats["failed"]) == (1, 3)
+            assert [Path(h["path"]).name for h in index.search("fine")] == ["good"]
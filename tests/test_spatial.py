@@ -0,0 +1,106 @@
+import json
+import random
+from pathlib import Path
+
+
+def test_spatial_index_matches_linear_scan():
+    from p2r.spatial import SpatialIndex
+
+    rng = random.Random(0)
+    entries = []
+    for i in range(500):
+        x, y = rng.uniform(0, 600), rng.uniform(0, 800)
+        entries.append(([x, y, x + rng.uniform(1, 80), y + rng.uniform(1, 20)], i, None))
+    index = SpatialIndex.from_dict(json.loads(json.dumps(SpatialIndex.build(entries, 8).to_dict())))
+
+    for _ in range(100):
+        x0, y0 = rng.uniform(0, 600), rng.uniform(0, 800)
+        x1, y1 = x0 + rng.uniform(0, 50), y0 + rng.uniform(0, 50)
+        expected = sorted(
+            ref
+            for (bx0, by0, bx1, by1), ref, _ in entries
+            if bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0
+        )
+        assert sorted(h["ref"] for h in index.query_rect(x0, y0, x1, y1)) == expected
+
+
+def test_document_spatial_index_hit_test(tmp_path: Path):
+    from p2r.spatial import SPATIAL_INDEX_NAME, DocumentSpatialIndex, write_spatial_index
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    layout = {
+        "pdf_info": [
+            {
+                "page_idx": 0,
+                "page_size": [612, 792],
+                "para_blocks": [
+                    {
+                        "type": "title",
+                        "lines": [{"bbox": [10, 10, 300, 40], "spans": [{"content": "Title"}]}],
+                    },
+                    {
+                        "type": "image",
+                        "blocks": [
+                            {
+                                "type": "image_caption",
+                                "lines": [
+                                    {"bbox": [10, 500, 300, 520], "spans": [{"content": "Fig 1"}]}
+                                ],
+                            }
+                        ],
+                    },
+                ],
+            }
+        ]
+    }
+    content_list = [{"type": "text", "text": "Title", "bbox": [16, 12, 490, 50], "page_idx": 0}]
+    (raw / "layout.json").write_text(json.dumps(layout), encoding="utf-8")
+    (raw / "id_content_list.json").write_text(json.dumps(content_list), encoding="utf-8")
+
+    # Loading without an index builds one in memory and never writes it.
+    assert DocumentSpatialIndex.load(tmp_path).page_size(0) == [612, 792]
+    assert not (raw / SPATIAL_INDEX_NAME).exists()
+
+    write_spatial_index(raw)
+    index = DocumentSpatialIndex.load(tmp_path)
+    assert index.page_size(0) == [612, 792]
+
+    assert [h["text"] for h in index.hit_test(0, 100, 25)] == ["Title"]
+    assert index.hit_test(0, 100, 510)[0]["ref"] == [1, 0, 0]
+    assert index.hit_test(0, 100, 300) == []
+    assert index.hit_test(0, 100, 30, layer="content")[0]["ref"] == 0
+    assert index.hit_test(5, 0, 0) == []
+
+
+def test_spatial_index_skips_malformed_entries_and_tracks_new_artifacts(tmp_path: Path):
+    from p2r.spatial import (
+        SPATIAL_INDEX_NAME,
+        DocumentSpatialIndex,
+        build_spatial_index,
+        write_spatial_index,
+    )
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    content_list = [
+        "not an element",
+        {"type": "text", "bbox": [0, 0, None, 10], "page_idx": 0},
+        {"type": "text", "bbox": [0, 0, 10, 10]},
+        {"type": "text", "bbox": [0, 0, 10, 10], "page_idx": 1},
+    ]
+    (raw / "id_content_list.json").write_text(json.dumps(content_list), encoding="utf-8")
+    write_spatial_index(raw)
+    index = DocumentSpatialIndex.load(tmp_path)
+    assert index.hit_test(0, 5, 5, layer="content") == []
+    assert [h["ref"] for h in index.hit_test(1, 5, 5, layer="content")] == [3]
+
+    # A layout added after indexing makes the index stale; a malformed one is recorded.
+    line = {"bbox": [0, 0, 10, 10], "spans": ["x", {"content": "Line"}]}
+    layout = {"pdf_info": ["x", {"page_idx": 1, "para_blocks": [{"lines": [line, 3]}]}]}
+    (raw / "layout.json").write_text(json.dumps(layout), encoding="utf-8")
+    before = (raw / SPATIAL_INDEX_NAME).read_bytes()
+    assert [h["text"] for h in DocumentSpatialIndex.load(tmp_path).hit_test(1, 5, 5)] == ["Line"]
+    assert (raw / SPATIAL_INDEX_NAME).read_bytes() == before
+    (raw / "layout.json").write_text("[1, 2]", encoding="utf-8")
+    assert set(build_spatial_index(raw)["sources"]) == {"id_content_list.json", "layout.json"}
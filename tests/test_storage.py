@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+import pytest
+
+
+CONTENT_LIST = [
+    {"type": "text", "text": "Title", "text_level": 1, "bbox": [1, 2, 3, 4], "page_idx": 0},
+    {"type": "text", "text": "Body", "bbox": [1, 5, 3, 8], "page_idx": 1},
+]
+
+
+@pytest.mark.parametrize("method", ["gzip", "zstd"])
+def test_compressed_raw_artifacts_are_read_transparently(tmp_path: Path, method: str):
+    if method == "zstd":
+        pytest.importorskip("zstandard")
+    from p2r.document import Document
+    from p2r.pages import read_pages, write_page_index
+    from p2r.rebuild import MARKDOWN_NAME, rebuild_document
+    from p2r.storage import compress_raw_dir, load_raw_json
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    original = raw / "id_content_list.json"
+    original.write_text(json.dumps(CONTENT_LIST, indent=4), encoding="utf-8")
+
+    compress_raw_dir(raw, method)
+    suffix = {"gzip": ".gz", "zstd": ".zst"}[method]
+    assert not original.exists()
+    assert (raw / ("id_content_list.json" + suffix)).exists()
+
+    assert load_raw_json(original) == CONTENT_LIST
+    assert Document.load(tmp_path).to_content_list() == CONTENT_LIST
+
+    write_page_index(raw)
+    assert read_pages(tmp_path, [1])[0]["content"] == CONTENT_LIST[1:]
+
+    assert rebuild_document(tmp_path) is True
+    assert (tmp_path / MARKDOWN_NAME).read_text(encoding="utf-8").startswith("# Title")
+
+
+def test_compress_raw_none_only_compacts(tmp_path: Path):
+    from p2r.storage import compress_raw_file
+
+    path = tmp_path / "layout.json"
+    path.write_text(json.dumps({"pdf_info": []}, indent=4), encoding="utf-8")
+
+    assert compress_raw_file(path, "none") == path
+    assert path.read_text(encoding="utf-8") == '{"pdf_info":[]}'
+
+    with pytest.raises(ValueError):
+        compress_raw_file(path, "bzip9")
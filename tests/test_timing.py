@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+
+def test_parse_pdf_reports_stage_spans(monkeypatch, tmp_path: Path, fake_api):
+    from p2r.mineru import MinerUClient
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    result_zip = fake_api()
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+
+    client = MinerUClient(api_token="t", api_base_url="https://mineru.net/api/v4")
+    client.poll_interval = 0
+    seen = []
+    client.add_hook(seen.append)
+
+    updates = list(client.parse_pdf(pdf, tmp_path / "out", search_index="", image_store=""))
+    report = updates[-1]["timings"]
+
+    stages = [s["stage"] for s in report["stages"]]
+    assert stages == [
+        "preflight", "request_urls", "upload", "submitted", "pending", "running",
+        "download", "extract", "organize", "index", "commit",
+    ]
+    assert [s["stage"] for s in seen] == stages
+    assert all(s["document"] == "a.pdf" for s in seen)
+    upload = report["stages"][2]
+    assert upload["bytes"] == pdf.stat().st_size and "bytes_per_sec" in upload
+    assert report["stages"][5]["pages"] == 4
+    assert report["stages"][6]["bytes"] == len(result_zip)
+    assert set(report["totals"]) == set(stages)
+
+
+def test_cli_report_json(monkeypatch, tmp_path: Path, fake_api):
+    from click.testing import CliRunner
+    import p2r.cli as cli
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("P2R_MINERU_TOKEN", "t")
+    fake_api()
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 fake")
+    report_path = tmp_path / "report.json"
+
+    config_path = tmp_path / ".p2r_config.json"
+    config_path.write_text(json.dumps({"mineru": {"poll_interval": 0}}), encoding="utf-8")
+
+    args = ["convert", str(pdf), "-o", str(tmp_path / "out"), "--report-json", str(report_path)]
+    r = CliRunner().invoke(cli.main, args)
+    assert r.exit_code == 0, r.output
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["batch"]["documents"] == 1
+    assert report["documents"][0]["document"] == "a.pdf"
+    assert "upload.bytes_per_sec" in report["batch"]["throughput"]
+    assert report["batch"]["stage_totals"]["download"] >= 0
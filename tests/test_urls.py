@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+
+def test_source_names():
+    from p2r.mineru import document_stem, is_url, source_name
+
+    assert is_url("https://arxiv.org/pdf/2401.00001") and is_url("HTTP://x/a.pdf")
+    assert not is_url("paper.pdf") and not is_url(Path("https://x"))
+    assert source_name("https://cdn.example.com/docs/My%20Paper.pdf?sig=1") == "My Paper.pdf"
+    assert source_name("https://example.com/") == "document.pdf"
+    assert document_stem("https://arxiv.org/pdf/2401.00001") == "2401.00001"
+    assert document_stem(Path("notes/paper.PDF")) == "paper"
+
+
+def test_parse_pdf_submits_url_without_upload(tmp_path: Path, configure_p2r):
+    from p2r.fakeserver import FakeMinerU
+    from p2r.mineru import MinerUClient
+    from p2r.output import load_manifest
+
+    url = "https://example.org/files/paper.pdf"
+    with FakeMinerU(pages=2, page_time=0.01) as server:
+        configure_p2r(server)
+        client = MinerUClient()
+        updates = list(client.parse_pdf(url, tmp_path / "out", search_index="", image_store=""))
+        counts = dict(server.counts)
+
+    assert updates[-1]["state"] == "completed"
+    assert "submit" in updates[-1]["timings"]["totals"]
+    assert counts["api.task_batch"] == 1
+    assert "api.file_urls" not in counts and "upload" not in counts
+    assert load_manifest(tmp_path / "out")["source"] == url
+    assert (tmp_path / "out" / "raw" / "paper_content_list.json").exists()
+
+
+def test_cli_converts_mixed_batch(tmp_path: Path, configure_p2r):
+    from click.testing import CliRunner
+
+    from p2r.cli import main
+    from p2r.fakeserver import FakeMinerU
+
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF-1.4 fake")
+    args = [
+        "convert",
+        str(tmp_path / "a.pdf"),
+        "https://arxiv.org/pdf/2401.00001",
+        str(tmp_path / "b.pdf"),
+        "-o",
+        str(tmp_path / "out"),
+        "--report-json",
+        str(tmp_path / "report.json"),
+    ]
+    with FakeMinerU(pages=2, page_time=0.01) as server:
+        configure_p2r(server)
+        result = CliRunner().invoke(main, args)
+        counts = dict(server.counts)
+
+    assert result.exit_code == 0, result.output
+    assert "3 documents saved" in result.output
+    assert counts["api.file_urls"] == 1 and counts["upload"] == 2 and counts["zip"] == 3
+    assert counts["api.task_batch"] == 1
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["2401.00001", "a", "b"]
+    assert (tmp_path / "out" / "2401.00001" / "full.md").exists()
+    report = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    documents = sorted(doc["document"] for doc in report["documents"])
+    assert documents == ["2401.00001", "a.pdf", "b.pdf"]
+
+
+def test_batch_times_out_per_document_without_progress(tmp_path: Path, configure_p2r):
+    from p2r.bench import SAMPLE_PDF
+    from p2r.fakeserver import FakeMinerU
+    from p2r.mineru import MinerUClient
+
+    pdfs = [tmp_path / f"doc{n}.pdf" for n in range(3)]
+    for pdf in pdfs:
+        pdf.write_bytes(SAMPLE_PDF)
+
+    # Parsed one at a time: the batch takes 0.9s, each document progresses within 0.5s.
+    with FakeMinerU(queue_depth=1, pages=2, page_time=0.15) as server:
+        configure_p2r(server)
+        client = MinerUClient()
+        client.max_poll_time = 0.5
+        queued = list(client.parse_batch(pdfs, tmp_path / "out", search_index=""))
+    with FakeMinerU(pages=1, page_time=5) as server:
+        configure_p2r(server)
+        client = MinerUClient()
+        client.max_poll_time = 0.3
+        stuck = list(client.parse_batch(pdfs[:1], tmp_path / "stuck", search_index=""))
+
+    assert sorted(u["source"].name for u in queued if u["state"] == "completed") == [
+        "doc0.pdf",
+        "doc1.pdf",
+        "doc2.pdf",
+    ]
+    assert stuck[-1]["state"] == "failed" and "no progress for 0.3s" in stuck[-1]["error"]